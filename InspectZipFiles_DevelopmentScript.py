@@ -1,15 +1,20 @@
 import os
 
+from LizardTechDirectoryScanner import scan_files
+from LizardTechZipInspector import inspect_zips
+
 # job_dir = r"export_dir"
 job_dir = r"D:\Program Files\LizardTech\Express Server\ImageServer\var\export_dir"
 
-for root, dirnames, files in os.walk(job_dir):
-
-    for file in files:
-
-        full_path = os.path.join(root, file)
-        file_name, file_ext = os.path.splitext(full_path)
-        if file_ext == ".zip":
-            print(file)
-            print("\t", os.path.getsize(full_path)/1000, " KB")
+zip_entries = [entry for entry in scan_files(root=job_dir) if os.path.splitext(entry.path)[1] == ".zip"]
+zip_inspections = inspect_zips(paths=[entry.path for entry in zip_entries])
 
+for entry, zip_inspection in zip(zip_entries, zip_inspections):
+    print(entry.name)
+    print("\t", entry.size/1000, " KB")
+    if zip_inspection.error is not None:
+        print("\t", zip_inspection.error)
+        continue
+    print("\t", zip_inspection.uncompressed_size/1000, " KB uncompressed, ratio ", zip_inspection.compression_ratio)
+    print("\t", zip_inspection.entry_count, " entries, largest ", zip_inspection.largest_member, " ",
+          zip_inspection.largest_member_size/1000, " KB")
@@ -0,0 +1,497 @@
+"""
+Sections of the LizardTech lidar and imagery analyses, from the ingested job results to the output tables.
+The benchmark suite used to repeat every section of each analysis script's main() with the same library calls, so a
+change to a script was not timed until the copy in the suite was changed by hand to match. The sections now live here,
+one function per analysis, and both the analysis scripts and LizardTechBenchmarkSuite run them. Each function marks
+its sections on a RunInstrument under the script's section names, prints what the script printed, writes the side
+files beside the output and returns the output tables in sheet order. Getting the job results, from the job manifest,
+the job archive or a plain walk of the jobs folder, writing the output tables and writing the job facts database are
+left to the caller.
+
+Date Created: 20261017
+Revisions:
+"""
+
+from typing import NamedTuple
+
+import pandas as pd
+
+from LizardTechCapacityModel import capacity_model_frame
+from LizardTechCapacityModel import export_size_features
+from LizardTechCapacityModel import fit_capacity_model
+from LizardTechCapacityModel import save_capacity_model
+from LizardTechCapacityModel import storage_forecast_frame
+from LizardTechConcurrency import concurrency_minutes_frame
+from LizardTechConcurrency import concurrency_timeline
+from LizardTechConcurrency import daily_peaks_frame
+from LizardTechConcurrency import saturated_hours_frame
+from LizardTechConcurrency import write_concurrency_parquet
+from LizardTechCoverage import DEFAULT_CELL_SIZE
+from LizardTechCoverage import coverage_from_extent_table
+from LizardTechCoverage import coverage_hot_spots_frame
+from LizardTechCoverage import save_coverage
+from LizardTechEmailAnalytics import count_email_occurrences
+from LizardTechEmailAnalytics import determine_unique_email_extensions
+from LizardTechEmailAnalytics import extract_email_series_from_messages
+from LizardTechExportLatency import export_latency_frame
+from LizardTechExportLatency import write_export_latency_json
+from LizardTechExtentEngine import deduplicate_extents
+from LizardTechExtentEngine import extent_job_dates
+from LizardTechExtentEngine import extents_from_query_parameters
+from LizardTechExtentEngine import mappable_extents_frame
+from LizardTechExtentEngine import write_extent_files
+from LizardTechJobIndex import JobIndex
+from LizardTechLevelSummary import summarize_levels_by_job
+from LizardTechLevelSummary import widen_level_summary
+from LizardTechLogAggregator import LogAggregator
+from LizardTechOutputWriters import create_output_writer
+from LizardTechQueryParameters import LIDAR_QUERY_PARAMETER_NAMES
+from LizardTechQueryParameters import count_jobs_by_parameter_value
+from LizardTechQueryParameters import explode_query_parameters
+from LizardTechSpatialIndex import build_extent_index
+
+# Jobs with more than one value of these lidar query parameters are counted under one comma separated value
+LIDAR_JOINED_PARAMETERS = ("cat",)
+# Other Level values of the imagery logs are java error messages
+IMAGERY_LEVELS = ("INFO", "ERROR")
+IMAGERY_EMAIL_KEYWORD = "email"
+
+
+class OutputTable(NamedTuple):
+    """
+    A table of the analysis output, written as a sheet of the excel workbook or as a csv or parquet file
+    """
+    table_name: str
+    dataframe: pd.DataFrame
+    index: bool
+
+
+class JobAnalysis(NamedTuple):
+    """
+    The frames an analysis built, for the job facts database, and its output tables in sheet order.
+    log_rows_df is None in streaming mode. issuing_url_series, without duplicates, and query_parameters_df are None for
+    imagery, whose logs have no issuing urls.
+    """
+    job_index: JobIndex
+    log_rows_df: pd.DataFrame
+    level_summary_df: pd.DataFrame
+    emails_df: pd.DataFrame
+    issuing_url_series: pd.Series
+    query_parameters_df: pd.DataFrame
+    tables: list
+
+
+def extract_issuing_url_series(html_table_df: pd.DataFrame) -> pd.Series:
+    """
+    Examine the Messages column, identifying the 'Issuing URL: ' records, extract url, return a Series
+    :param html_table_df: dataframe of entire html table contents
+    :return: pandas series of Message content containing Issuing URL
+    """
+    df_no_na = html_table_df.dropna()
+    messages_df = df_no_na[["Message"]]
+    messages_df = messages_df[messages_df["Message"].str.startswith("Issuing URL: ")]
+    try:
+        url_series = messages_df["Message"].apply(func=lambda x: x[13:])
+    except (ValueError, IndexError):
+        return pd.Series()
+    else:
+        return url_series
+
+
+def _index_job_results(job_results, use_composite_job_id: bool, streaming: bool) -> tuple:
+    """
+    Add every job result to a job index, and in streaming mode to a log aggregator
+    :param job_results: iterable of JobResult, consumed once
+    :param use_composite_job_id: key rows and zips by composite job id rather than by the job folder name
+    :param streaming: also aggregate levels, emails and issuing urls
+    :return: tuple of (JobIndex, LogAggregator)
+    """
+    job_index = JobIndex(use_composite_job_id=use_composite_job_id)
+    log_aggregator = LogAggregator(use_composite_job_id=use_composite_job_id)
+    for job_result in job_results:
+        job_index.add_job_result(job_result=job_result)
+        if streaming:
+            log_aggregator.add_job_result(job_result=job_result)
+    if job_index.start_time_fallbacks:
+        print(f"{job_index.start_time_fallbacks} log start times did not fit the expected format and were parsed by "
+              f"the dateutil fallback")
+    if job_index.unparsable_start_times:
+        print(f"{job_index.unparsable_start_times} log start times were missing or could not be parsed, those jobs are "
+              f"left out of the export latency and concurrency")
+    return job_index, log_aggregator
+
+
+def _zip_sizes_frame(job_index: JobIndex) -> pd.DataFrame:
+    """
+    Build the zip size summary, or a one cell placeholder table when no zips were found
+    :param job_index: JobIndex of the analyzed jobs
+    :return: zip size summary dataframe
+    """
+    master_zip_stats_df = job_index.zip_sizes_frame()
+    if master_zip_stats_df.empty:
+        print("No .zip files found.")
+        master_zip_stats_df = pd.DataFrame(data={"No Zip Files Found": [0]})
+    return master_zip_stats_df
+
+
+def _email_tables(emails_df: pd.DataFrame, instrument) -> tuple:
+    """
+    Count the emails and their top-level domains
+    :param emails_df: dataframe of JOB_ID and Email columns
+    :param instrument: RunInstrument of the run
+    :return: tuple of (email counts dataframe, top-level domains dataframe)
+    """
+    #   process email occurrences
+    email_counts_df = count_email_occurrences(emails_dataframe=emails_df)
+
+    #   process emails for the unique extensions (gov, com, edu, etc) that occur
+    unique_email_extensions_df = determine_unique_email_extensions(unique_emails_df=email_counts_df)
+    instrument.count(name="emails_found", amount=len(emails_df))
+    return email_counts_df, unique_email_extensions_df
+
+
+def _concurrency_tables(job_index: JobIndex, file_path_stem: str, instrument, saturation_jobs: int = None) -> tuple:
+    """
+    Sweep the job run times into the number of jobs running each minute, writing the minute series to a parquet file
+    :param job_index: JobIndex of the analyzed jobs
+    :param file_path_stem: output file path without extension
+    :param instrument: RunInstrument of the run
+    :param saturation_jobs: running jobs at which the server is saturated, by default the most seen
+    :return: tuple of (daily peaks dataframe, saturated hours dataframe)
+    """
+    # ___________________________
+    # CONCURRENT JOB LOAD
+    # Need the number of jobs running at once to size the server. A job runs from its log start to its last log row or
+    #   its zip, whichever is later. The minute series goes to a parquet file, daily peaks and saturated hours to
+    #   sheets.
+    instrument.mark(name="concurrency")
+    start_seconds, end_seconds = job_index.job_run_times()
+    job_timeline = concurrency_timeline(start_seconds=start_seconds, end_seconds=end_seconds)
+    print(f"{job_timeline.job_count} jobs in the concurrency timeline, {job_timeline.skipped_job_count} without an end "
+          f"skipped")
+    instrument.count(name="concurrency_jobs_skipped", amount=job_timeline.skipped_job_count)
+    concurrency_minutes_df = concurrency_minutes_frame(timeline=job_timeline)
+    daily_peaks_df = daily_peaks_frame(concurrency_minutes_df=concurrency_minutes_df)
+    saturated_hours_df = saturated_hours_frame(concurrency_minutes_df=concurrency_minutes_df,
+                                               saturation_jobs=saturation_jobs)
+    try:
+        write_concurrency_parquet(concurrency_minutes_df=concurrency_minutes_df,
+                                  file_path=f"{file_path_stem}.concurrency.parquet")
+    except ImportError as ie:
+        print(f"ImportError: concurrency minutes not written. {ie}")
+    return daily_peaks_df, saturated_hours_df
+
+
+def _date_range_frame(job_index: JobIndex) -> pd.DataFrame:
+    """
+    Build the one row table of the earliest and latest file modified times of the analyzed jobs
+    :param job_index: JobIndex of the analyzed jobs
+    :return: dataframe of MIN JOB DATE and MAX JOB DATE strings
+    """
+    return pd.DataFrame(data=[list(job_index.date_range())], columns=["MIN JOB DATE", "MAX JOB DATE"], dtype=str)
+
+
+def analyze_lidar_jobs(job_results, file_path_stem: str, instrument, streaming: bool = False,
+                       wide_levels: bool = False, coverage_cell_size: float = DEFAULT_CELL_SIZE,
+                       recent_days: int = 30, forecast_days: int = 90, saturation_jobs: int = None) -> JobAnalysis:
+    """
+    Run the sections of LizardTechJobAnalysis_lidar from the index of the job results to the output tables, writing
+    the latency, concurrency, extent, coverage and capacity side files
+    :param job_results: iterable of JobResult, ingested with summary_options of {} in streaming mode
+    :param file_path_stem: output file path without extension, the side files add their own
+    :param instrument: RunInstrument marking the sections
+    :param streaming: build the level summary, emails and issuing urls from a LogAggregator instead of the master
+        dataframe of every log row
+    :param wide_levels: write the level summary as one row per job and one column per level
+    :param coverage_cell_size: width of a download coverage cell, in the units of each extent's srs
+    :param recent_days: days of recent requests the storage forecast rate is taken from
+    :param forecast_days: days of export storage to forecast
+    :param saturation_jobs: running jobs at which the server is saturated, by default the most seen
+    :return: JobAnalysis
+    """
+    #   Need a single index of every job's html log rows, job date, zip size and file stats. Rows and zips are keyed by
+    #   the composite job id, which includes the job start time to avoid issues with situation where two different
+    #   jobs are named same exact name. Zips of the same job share the composite job id so the two join.
+    instrument.mark(name="index")
+    job_index, log_aggregator = _index_job_results(job_results=job_results, use_composite_job_id=True,
+                                                   streaming=streaming)
+
+    # ___________________________
+    #   JOB VALUES AS DATAFRAME
+    #   Need single master html content and zip content dataframes, built once from the index columns. Streaming mode
+    #   never builds the master html dataframe.
+    instrument.mark(name="frames")
+    if not job_index.records or all(record.job_date is None for record in job_index.records):
+        print("No .html files found.")
+    master_html_values_df = None if streaming else job_index.log_rows_frame()
+    master_zip_stats_df = _zip_sizes_frame(job_index=job_index)
+
+    job_to_date_df = job_index.job_dates_frame()
+    job_to_date_df = job_to_date_df[~job_to_date_df.index.duplicated()]
+    instrument.count(name="jobs_indexed", amount=len(job_index.records))
+    if not streaming:
+        instrument.count(name="log_rows", amount=len(master_html_values_df))
+
+    # ___________________________
+    #   LEVEL SUMMARY (INFO, ERROR)
+    instrument.mark(name="level_summary")
+    if streaming:
+        level_groupby_df = log_aggregator.level_summary_frame()
+    else:
+        level_groupby_df = summarize_levels_by_job(html_table_df=master_html_values_df)
+
+    # ___________________________
+    #   EMAIL PROCESSING
+    #   isolate the html file Message values that contain an '@'
+    instrument.mark(name="email_processing")
+    if streaming:
+        emails_df = log_aggregator.emails_frame()
+    else:
+        emails_df = (extract_email_series_from_messages(html_table_df=master_html_values_df)
+                     .to_frame(name="Email")
+                     .reset_index())
+    email_counts_df, unique_email_extensions_df = _email_tables(emails_df=emails_df, instrument=instrument)
+
+    # ___________________________
+    #   ISSUING URL PROCESSING
+    #   Issuing url query string value extraction
+    instrument.mark(name="issuing_url_processing")
+    if streaming:
+        issuing_url_series = log_aggregator.issuing_url_series()  # This series contains a job id index
+    else:
+        issuing_url_series = extract_issuing_url_series(html_table_df=master_html_values_df)  # job id index
+    issue_url_size_with_duplicates = issuing_url_series.size
+
+    # Need to remove duplicate issuing urls before continuing.
+    # NOTE: There is a getdem and a getcloud url that have identical query parameters so more duplicate extent removal
+    #   occurs later in this process.
+    issuing_url_df = issuing_url_series.to_frame()
+    issuing_url_df.drop_duplicates(inplace=True)
+    issuing_url_series_no_dup = issuing_url_df["Message"]
+    issue_url_size_without_duplicates = issuing_url_series_no_dup.size
+    print(f"{issue_url_size_with_duplicates - issue_url_size_without_duplicates} Issuing URLs Duplicates Removed ")
+    instrument.count(name="issuing_urls", amount=issue_url_size_with_duplicates)
+    instrument.count(name="issuing_url_duplicates_dropped",
+                     amount=issue_url_size_with_duplicates - issue_url_size_without_duplicates)
+    query_parameters_df = explode_query_parameters(issuing_url_series=issuing_url_series_no_dup)
+
+    # ___________________________
+    # QUERY PARAMETER EXAMINATION - MULTIPLE OUTPUTS GENERATED
+    # Explode the query parameters in the issuing url's in the html logs, simmer down to unique occurrences
+    #   by job, then get the overall number of times (number of unique jobs) that a value was used/requested by a user
+    # NOTE: The parameters and their sheet order are LIDAR_QUERY_PARAMETER_NAMES in LizardTechQueryParameters
+    instrument.mark(name="query_parameter_examination")
+
+    # Must get unique occurrence for each job, otherwise counts influenced by quantity of issuing url requests
+    # NOTE: Jobs with more than one catalog are counted under a single comma separated string of the catalog names
+    query_param_unique_dfs_dict = count_jobs_by_parameter_value(query_parameters_df=query_parameters_df,
+                                                                issuing_url_series=issuing_url_series_no_dup,
+                                                                parameter_names=LIDAR_QUERY_PARAMETER_NAMES,
+                                                                joined_parameters=LIDAR_JOINED_PARAMETERS)
+
+    # ___________________________
+    # EXPORT LATENCY
+    # Need each job's processing time, from the Time of its last log row, and time to first output, from its log start
+    #   to its first zip's modified time. Their p50, p95 and p99 by catalog, output format, data type and resolution
+    #   show where the server is slow. A job requesting several catalogs counts toward each of them.
+    instrument.mark(name="export_latency")
+    export_latency_df = export_latency_frame(job_latency_df=job_index.job_latency_frame(),
+                                             query_parameters_df=query_parameters_df)
+    write_export_latency_json(latency_df=export_latency_df, file_path=f"{file_path_stem}.latency.json")
+
+    daily_peaks_df, saturated_hours_df = _concurrency_tables(job_index=job_index, file_path_stem=file_path_stem,
+                                                             instrument=instrument, saturation_jobs=saturation_jobs)
+
+    # MAPPABLE EXPORT EXTENTS
+    # Need the spatial ref sys and export extent of every issuing url for mapping lidar downloads. The first srs and
+    #   bounds value of each url are parsed together into float64 coordinates and srs codes. Missing, malformed and
+    #   degenerate extents are labeled in the Extent Problem column.
+    instrument.mark(name="extents")
+    extent_table = extents_from_query_parameters(query_parameters_df=query_parameters_df,
+                                                 issuing_url_series=issuing_url_series_no_dup)
+
+    # Need to remove duplicate extents for jobs
+    mappable_extents_with_duplicates = len(extent_table.job_ids)
+    extent_table = deduplicate_extents(extent_table=extent_table)
+    mappable_extents_without_duplicates = len(extent_table.job_ids)
+    print(f"{mappable_extents_with_duplicates - mappable_extents_without_duplicates} Duplicate Mappable Extents "
+          f"Removed")
+    instrument.count(name="extent_duplicates_dropped",
+                     amount=mappable_extents_with_duplicates - mappable_extents_without_duplicates)
+
+    # Need the job date so can map extents with a time component. join job date table to mappable extents
+    mappable_extent_df = mappable_extents_frame(extent_table=extent_table, job_dates_df=job_to_date_df)
+
+    # ___________________________
+    # SPATIAL OUTPUT OF EXPORT EXTENT
+    # The valid extents are written as GeoJSON and as a spatially indexed GeoPackage beside the analysis output, and
+    #   as an index file for "which jobs touched this area" queries with LizardTechSpatialIndex
+    instrument.mark(name="spatial_output")
+    extent_dates = extent_job_dates(extent_table=extent_table, job_dates_df=job_to_date_df)
+    print(write_extent_files(extent_table=extent_table, file_path_stem=file_path_stem, job_dates=extent_dates))
+    build_extent_index(extent_table=extent_table, job_dates=extent_dates).save(
+        file_path=f"{file_path_stem}.extents.npz")
+
+    # DOWNLOAD COVERAGE
+    # The valid extents are counted over each cell of a grid, with the zip bytes of their jobs, and saved as an array
+    #   file. The most downloaded cells make the hot spots sheet.
+    instrument.mark(name="coverage")
+    try:
+        coverage_grids = coverage_from_extent_table(extent_table=extent_table,
+                                                    job_zip_bytes=job_index.job_zip_bytes(),
+                                                    cell_size=coverage_cell_size)
+    except ValueError as ve:
+        #   One far flung extent can stretch a grid past its cell limit. Skip the coverage rather than lose the run.
+        print(f"ValueError: download coverage skipped. {ve}")
+        coverage_grids = {}
+    else:
+        save_coverage(coverage_grids=coverage_grids, file_path=f"{file_path_stem}.npz")
+    coverage_hot_spots_df = coverage_hot_spots_frame(coverage_grids=coverage_grids)
+
+    # EXPORT SIZE CAPACITY MODEL
+    # Need to know how much disk the coming requests will take. Each job's zip bytes are fit, per catalog, to the
+    #   bounds area, res, thinningFactor, class and oif of its issuing urls, and the recent jobs' estimated sizes are
+    #   projected forward. The coefficients are saved so a new request can be sized without rerunning the analysis.
+    instrument.mark(name="capacity_model")
+    size_features_df = export_size_features(query_parameters_df=query_parameters_df,
+                                            issuing_url_series=issuing_url_series_no_dup)
+    capacity_model = fit_capacity_model(features_df=size_features_df, job_zip_bytes=job_index.job_zip_bytes())
+    save_capacity_model(capacity_model=capacity_model, file_path=f"{file_path_stem}.capacity.json")
+    capacity_model_df = capacity_model_frame(capacity_model=capacity_model)
+    storage_forecast_df = storage_forecast_frame(capacity_model=capacity_model, features_df=size_features_df,
+                                                 job_dates_df=job_to_date_df, recent_days=recent_days,
+                                                 forecast_days=forecast_days)
+
+    # ___________________________
+    # DATE RANGE EVALUATION
+    date_range_df = _date_range_frame(job_index=job_index)
+
+    # ___________________________
+    #   OUTPUT TABLES
+    #   Various final contents, each to a unique sheet in excel file or a unique file for the csv and parquet formats
+    tables = [OutputTable(table_name="Date Range of Jobs in Analysis", dataframe=date_range_df, index=False),
+              OutputTable(table_name="Mappable Extents", dataframe=mappable_extent_df, index=True),
+              OutputTable(table_name="Coverage Hot Spots", dataframe=coverage_hot_spots_df, index=False),
+              OutputTable(table_name="Export Latency", dataframe=export_latency_df, index=False),
+              OutputTable(table_name="Capacity Model", dataframe=capacity_model_df, index=False),
+              OutputTable(table_name="Storage Forecast", dataframe=storage_forecast_df, index=False),
+              OutputTable(table_name="Daily Peak Concurrency", dataframe=daily_peaks_df, index=False),
+              OutputTable(table_name="Saturated Hours", dataframe=saturated_hours_df, index=False),
+              OutputTable(table_name="Unique Emails Summary", dataframe=email_counts_df, index=False),
+              OutputTable(table_name="Top-Level Domains Summary", dataframe=unique_email_extensions_df, index=False),
+              OutputTable(table_name="Level Type Summary by Job",
+                          dataframe=(widen_level_summary(level_summary_df=level_groupby_df) if wide_levels
+                                     else level_groupby_df),
+                          index=True),
+              OutputTable(table_name="Job .zip Size Summary", dataframe=master_zip_stats_df, index=False)]
+    tables.extend(OutputTable(table_name=f"QP - {query_param_key}", dataframe=value_ser, index=False)
+                  for query_param_key, value_ser in query_param_unique_dfs_dict.items())
+
+    return JobAnalysis(job_index=job_index, log_rows_df=master_html_values_df, level_summary_df=level_groupby_df,
+                       emails_df=emails_df, issuing_url_series=issuing_url_series_no_dup,
+                       query_parameters_df=query_parameters_df, tables=tables)
+
+
+def analyze_imagery_jobs(job_results, file_path_stem: str, instrument, streaming: bool = False,
+                         wide_levels: bool = False, saturation_jobs: int = None) -> JobAnalysis:
+    """
+    Run the sections of LizardTechJobAnalysis_imagery from the index of the job results to the output tables, writing
+    the concurrency side file. The job results are indexed in the caller's current section, so a generator of job
+    folders being ingested is walked, ingested and indexed one job folder at a time.
+    :param job_results: iterable of JobResult, ingested with IMAGERY_LEVELS and IMAGERY_EMAIL_KEYWORD summary options in
+        streaming mode
+    :param file_path_stem: output file path without extension, the side files add their own
+    :param instrument: RunInstrument marking the sections
+    :param streaming: build the level summary and emails from a LogAggregator instead of the master dataframe of every
+        log row
+    :param wide_levels: write the level summary as one row per job and one column per level
+    :param saturation_jobs: running jobs at which the server is saturated, by default the most seen
+    :return: JobAnalysis
+    """
+    #   Imagery rows and zips are keyed by the job folder name
+    job_index, log_aggregator = _index_job_results(job_results=job_results, use_composite_job_id=False,
+                                                   streaming=streaming)
+
+    # ___________________________
+    #   ALL JOB VALUES AS DATAFRAME
+    #   Need single master html content and zip content dataframes, built once from the index columns. Streaming mode
+    #   never builds the master html dataframe.
+    instrument.mark(name="frames")
+    if not job_index.records or all(record.job_date is None for record in job_index.records):
+        print("No .html files found.")
+    master_html_values_df = None
+    if not streaming:
+        master_html_values_df = job_index.log_rows_frame()
+
+        # ___________________________
+        #   Remove java error messages from Level column in master html dataframe
+        master_html_values_df = master_html_values_df[master_html_values_df["Level"].isin(IMAGERY_LEVELS)]
+
+    master_zip_stats_df = _zip_sizes_frame(job_index=job_index)
+    instrument.count(name="jobs_indexed", amount=len(job_index.records))
+    if not streaming:
+        instrument.count(name="log_rows", amount=len(master_html_values_df))
+
+    # ___________________________
+    #   LEVEL SUMMARY (INFO, ERROR)
+    instrument.mark(name="level_summary")
+    if streaming:
+        level_groupby_df = log_aggregator.level_summary_frame()
+    else:
+        level_groupby_df = summarize_levels_by_job(html_table_df=master_html_values_df, levels=IMAGERY_LEVELS)
+
+    # ___________________________
+    #   EMAIL PROCESSING
+    #   isolate the html file Message values that contain an '@'
+    instrument.mark(name="email_processing")
+    if streaming:
+        emails_df = log_aggregator.emails_frame()
+    else:
+        emails_df = (extract_email_series_from_messages(html_table_df=master_html_values_df,
+                                                        email_keyword=IMAGERY_EMAIL_KEYWORD)
+                     .to_frame(name="Email")
+                     .reset_index())
+    email_counts_df, unique_email_extensions_df = _email_tables(emails_df=emails_df, instrument=instrument)
+
+    daily_peaks_df, saturated_hours_df = _concurrency_tables(job_index=job_index, file_path_stem=file_path_stem,
+                                                             instrument=instrument, saturation_jobs=saturation_jobs)
+
+    # ___________________________
+    #   ISSUING URL PROCESSING AND QUERY PARAMETER EXAMINATION
+    # Doesn't exist in Imagery. Imagery lacks an Issuing URL, see the lidar analysis if need the code.
+
+    # ___________________________
+    # DATE RANGE EVALUATION
+    date_range_df = _date_range_frame(job_index=job_index)
+
+    # ___________________________
+    #   OUTPUT TABLES
+    #   Various final contents, each to a unique sheet in excel file or a unique file for the csv and parquet formats
+    tables = [OutputTable(table_name="Date Range of Jobs in Analysis", dataframe=date_range_df, index=False),
+              OutputTable(table_name="Daily Peak Concurrency", dataframe=daily_peaks_df, index=False),
+              OutputTable(table_name="Saturated Hours", dataframe=saturated_hours_df, index=False),
+              OutputTable(table_name="Unique Emails Summary", dataframe=email_counts_df, index=False),
+              OutputTable(table_name="Top-Level Domains Summary", dataframe=unique_email_extensions_df, index=False),
+              OutputTable(table_name="Level Type Summary by Job",
+                          dataframe=(widen_level_summary(level_summary_df=level_groupby_df) if wide_levels
+                                     else level_groupby_df),
+                          index=True),
+              OutputTable(table_name="Job .zip Size Summary", dataframe=master_zip_stats_df, index=False)]
+
+    return JobAnalysis(job_index=job_index, log_rows_df=master_html_values_df, level_summary_df=level_groupby_df,
+                       emails_df=emails_df, issuing_url_series=None, query_parameters_df=None, tables=tables)
+
+
+def write_output_tables(tables: list, output_format: str, output_file_path: str):
+    """
+    Write the output tables of an analysis in sheet order
+    :param tables: list of OutputTable
+    :param output_format: one of the OUTPUT_WRITERS keys, excel, csv or parquet
+    :param output_file_path: output file path without extension
+    :return: the closed OutputWriter, for its report and output location
+    """
+    with create_output_writer(output_format=output_format, output_file_path=output_file_path) as output_writer:
+        for output_table in tables:
+            output_writer.write_table(dataframe=output_table.dataframe, table_name=output_table.table_name,
+                                      index=output_table.index)
+    return output_writer
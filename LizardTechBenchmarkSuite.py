@@ -0,0 +1,397 @@
+"""
+End to end benchmark of the LizardTech lidar and imagery pipelines on synthetic job folders.
+Each module has its own benchmark of the step it replaced, but nothing timed the whole nightly scrape, so a change
+that made one stage faster and another slower went unnoticed. This suite writes seeded job folders with
+LizardTechSyntheticJobs and runs each analysis script's sections on them through LizardTechAnalysisStages, the code
+the script itself runs, timing every section the script marks as a stage. The script's walk is split into a scan and
+an ingest stage:
+  lidar - scan, ingest, index, frames, level_summary, email_processing, issuing_url_processing,
+          query_parameter_examination, export_latency, concurrency, extents, spatial_output, coverage,
+          capacity_model, output_write
+  imagery - scan, ingest, index, frames, level_summary, email_processing, concurrency, output_write
+Each pipeline runs several times and a stage's time is its fastest run, which is the least disturbed by other work on
+the machine. Results are saved as JSON with the settings and environment, and can be compared to a stored baseline
+run with the same settings. A stage regresses when it is slower than the baseline by more than the tolerance and by
+more than the noise floor, and the command exits with status 1 so a scheduled run can flag it.
+The stages do not read or write the job manifest, archive or database, so every run parses every job folder.
+Before timing, the suite checks that a log with a table but no start time is left out of the export latency and the
+concurrency timeline, rather than run from 1970 over decades of minutes.
+
+Run this module directly to benchmark the pipelines, save a baseline or compare to one.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import tempfile
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from LizardTechAnalysisStages import IMAGERY_EMAIL_KEYWORD
+from LizardTechAnalysisStages import IMAGERY_LEVELS
+from LizardTechAnalysisStages import analyze_imagery_jobs
+from LizardTechAnalysisStages import analyze_lidar_jobs
+from LizardTechAnalysisStages import write_output_tables
+from LizardTechConcurrency import concurrency_timeline
+from LizardTechDirectoryScanner import scan_job_folders
+from LizardTechInstrumentation import RunInstrument
+from LizardTechJobIndex import JobIndex
+from LizardTechJobIngest import ingest_job_folders
+from LizardTechOutputWriters import peak_rss_bytes
+from LizardTechSyntheticJobs import IMAGERY
+from LizardTechSyntheticJobs import LIDAR
+from LizardTechSyntheticJobs import PRODUCTS
+from LizardTechSyntheticJobs import generate_export_dir
+
+# Version 2 stages are the section names of the analysis scripts
+RESULTS_VERSION = 2
+DEFAULT_TOLERANCE = 0.2
+DEFAULT_NOISE_SECONDS = 0.05
+
+# Settings that change the work done, so runs with different values can not be compared
+COMPARABLE_SETTINGS = ("jobs", "seed", "streaming", "workers", "output_format")
+
+
+class StageComparison(NamedTuple):
+    """
+    A stage's time against the baseline. ratio is seconds over baseline seconds.
+    """
+    pipeline: str
+    stage: str
+    baseline_seconds: float
+    seconds: float
+    ratio: float
+    is_regression: bool
+
+
+def _stage_seconds(instrument: RunInstrument) -> dict:
+    """
+    Wall clock time of each top-level section of a pipeline run, in the order the sections ran
+    :param instrument: closed RunInstrument of the run
+    :return: dictionary of section name to seconds
+    """
+    stage_seconds = {}
+    for section in instrument.sections:
+        if section is not None and section["depth"] == 0:
+            stage_seconds[section["name"]] = stage_seconds.get(section["name"], 0.0) + section["wall_seconds"]
+    return stage_seconds
+
+
+def _ingest_jobs_folder(jobs_folder: str, instrument: RunInstrument, worker_count: int,
+                        summary_options: dict = None) -> list:
+    """
+    Scan and ingest every job folder, each as its own stage
+    :param jobs_folder: folder of job folders
+    :param instrument: RunInstrument marking the stages
+    :param worker_count: worker processes for ingesting
+    :param summary_options: summary options of the ingest, None for the master dataframe mode
+    :return: list of JobResult
+    """
+    instrument.mark(name="scan")
+    job_folder_records = list(scan_job_folders(jobs_folder=jobs_folder))
+    instrument.mark(name="ingest")
+    return ingest_job_folders(job_folders_and_stats=[(record.job_folder, record.file_stats)
+                                                     for record in job_folder_records],
+                              worker_count=worker_count, summary_options=summary_options)
+
+
+def run_lidar_pipeline(jobs_folder: str, output_folder: str, instrument: RunInstrument, streaming: bool = False,
+                       worker_count: int = 1, output_format: str = "excel"):
+    """
+    Run the sections of LizardTechJobAnalysis_lidar on a jobs folder, through analyze_lidar_jobs as the script does
+    :param jobs_folder: folder of job folders
+    :param output_folder: folder for the output files
+    :param instrument: RunInstrument that records the stage times
+    :param streaming: aggregate levels, emails and issuing urls while parsing, as --streaming does
+    :param worker_count: worker processes for ingesting, as --workers does
+    :param output_format: output writer format, as --output-format sets
+    :return: None
+    """
+    file_path_stem = os.path.join(output_folder, "LizardTechAnalysis_lidar_benchmark")
+    job_results = _ingest_jobs_folder(jobs_folder=jobs_folder, instrument=instrument, worker_count=worker_count,
+                                      summary_options={} if streaming else None)
+    job_analysis = analyze_lidar_jobs(job_results=job_results, file_path_stem=file_path_stem, instrument=instrument,
+                                      streaming=streaming)
+    instrument.mark(name="output_write")
+    write_output_tables(tables=job_analysis.tables, output_format=output_format, output_file_path=file_path_stem)
+
+
+def run_imagery_pipeline(jobs_folder: str, output_folder: str, instrument: RunInstrument, streaming: bool = False,
+                         worker_count: int = 1, output_format: str = "excel"):
+    """
+    Run the sections of LizardTechJobAnalysis_imagery on a jobs folder, through analyze_imagery_jobs as the script
+    does. The script walks, ingests and indexes one job folder at a time in its walk section, here each is a stage.
+    :param jobs_folder: folder of job folders
+    :param output_folder: folder for the output files
+    :param instrument: RunInstrument that records the stage times
+    :param streaming: aggregate levels and emails while parsing, as --streaming does
+    :param worker_count: worker processes for ingesting. The imagery script ingests serially, 1 matches it
+    :param output_format: output writer format, as --output-format sets
+    :return: None
+    """
+    file_path_stem = os.path.join(output_folder, "LizardTechAnalysis_imagery_benchmark")
+    summary_options = None
+    if streaming:
+        summary_options = {"level_filter": IMAGERY_LEVELS, "email_keyword": IMAGERY_EMAIL_KEYWORD}
+    job_results = _ingest_jobs_folder(jobs_folder=jobs_folder, instrument=instrument, worker_count=worker_count,
+                                      summary_options=summary_options)
+    instrument.mark(name="index")
+    job_analysis = analyze_imagery_jobs(job_results=job_results, file_path_stem=file_path_stem,
+                                        instrument=instrument, streaming=streaming)
+    instrument.mark(name="output_write")
+    write_output_tables(tables=job_analysis.tables, output_format=output_format, output_file_path=file_path_stem)
+
+
+PIPELINES = {LIDAR: run_lidar_pipeline, IMAGERY: run_imagery_pipeline}
+
+
+def _environment() -> dict:
+    return {"python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpu_count": os.cpu_count()}
+
+
+def check_startless_log(work_folder: str):
+    """
+    Check that a job whose log has a table but no start time is skipped by the export latency and the concurrency
+    timeline. One job folder with a start time and one without are written and indexed.
+    :param work_folder: folder for the two job folders
+    :return: None
+    :raises ValueError: when the startless job reaches the latency or the timeline
+    """
+    job_folder_records = []
+    for folder_name, startless_fraction in (("startless_check_dated", 0.0), ("startless_check_startless", 1.0)):
+        jobs_folder = os.path.join(work_folder, folder_name)
+        if not os.path.isdir(jobs_folder):
+            generate_export_dir(export_dir=jobs_folder, job_count=1, failed_fraction=0.0,
+                                startless_fraction=startless_fraction, zip_fraction=1.0)
+        job_folder_records.extend(scan_job_folders(jobs_folder=jobs_folder))
+    job_index = JobIndex()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for job_result in ingest_job_folders(job_folders_and_stats=[(record.job_folder, record.file_stats)
+                                                                    for record in job_folder_records]):
+            job_index.add_job_result(job_result=job_result)
+    start_seconds, end_seconds = job_index.job_run_times()
+    job_timeline = concurrency_timeline(start_seconds=start_seconds, end_seconds=end_seconds)
+    latency_job_count = len(job_index.job_latency_frame())
+    # The dated job runs for at most an hour
+    if (job_timeline.job_count, job_timeline.skipped_job_count, latency_job_count) != (1, 1, 1) \
+            or len(job_timeline.running_jobs) > 61:
+        raise ValueError(f"A log without a start time reached the timeline or latency: {job_timeline.job_count} "
+                         f"jobs and {job_timeline.skipped_job_count} skipped over {len(job_timeline.running_jobs)} "
+                         f"minutes, {latency_job_count} jobs with a latency")
+
+
+def suite_settings(job_count: int, seed: int, repeat: int, streaming: bool, worker_count: int,
+                   output_format: str) -> dict:
+    """
+    Settings of a suite run as saved in its results
+    :param job_count: number of job folders of each product
+    :param seed: random seed of the job folders
+    :param repeat: runs of each pipeline
+    :param streaming: streaming mode
+    :param worker_count: worker processes for ingesting
+    :param output_format: output writer format
+    :return: settings dictionary
+    """
+    return {"jobs": job_count, "seed": seed, "repeat": repeat, "streaming": streaming, "workers": worker_count,
+            "output_format": output_format}
+
+
+def check_comparable_settings(settings: dict, baseline: dict):
+    """
+    Check that a run with these settings can be compared to a baseline
+    :param settings: settings of the run, from suite_settings
+    :param baseline: earlier results of run_benchmark_suite
+    :return: None
+    :raises ValueError: when the baseline has other stage names or was run with different COMPARABLE_SETTINGS
+    """
+    if baseline.get("version") != RESULTS_VERSION:
+        raise ValueError(f"The baseline is results version {baseline.get('version')}, whose stage names differ from "
+                         f"version {RESULTS_VERSION}")
+    mismatched = [name for name in COMPARABLE_SETTINGS if settings.get(name) != baseline["settings"].get(name)]
+    if mismatched:
+        raise ValueError(f"The baseline was run with different {', '.join(mismatched)} settings")
+
+
+def run_benchmark_suite(work_folder: str, job_count: int = 2000, seed: int = 0, repeat: int = 3,
+                        pipelines: tuple = PRODUCTS, streaming: bool = False, worker_count: int = 1,
+                        output_format: str = "excel") -> dict:
+    """
+    Generate synthetic job folders, when not already in the work folder, and time each pipeline's stages
+    :param work_folder: folder for the generated job folders and the pipeline outputs. Job folders generated with the
+        same product, job count and seed are reused.
+    :param job_count: number of job folders of each product
+    :param seed: random seed of the job folders
+    :param repeat: runs of each pipeline, the fastest time of each stage is kept
+    :param pipelines: products whose pipelines are run
+    :param streaming: run the pipelines in streaming mode
+    :param worker_count: worker processes for ingesting
+    :param output_format: output writer format
+    :return: results dictionary, ready for json
+    :raises ValueError: when check_startless_log fails
+    """
+    check_startless_log(work_folder=work_folder)
+    results = {"version": RESULTS_VERSION,
+               "created": datetime.datetime.now().isoformat(timespec="seconds"),
+               "settings": suite_settings(job_count=job_count, seed=seed, repeat=repeat, streaming=streaming,
+                                          worker_count=worker_count, output_format=output_format),
+               "environment": _environment(),
+               "generated": {},
+               "pipelines": {}}
+    for product in pipelines:
+        jobs_folder = os.path.join(work_folder, f"export_dir_{product}_{job_count}_{seed}")
+        if not os.path.isdir(jobs_folder):
+            synthetic_export_dir = generate_export_dir(export_dir=jobs_folder, job_count=job_count, product=product,
+                                                       seed=seed)
+            print(synthetic_export_dir)
+            results["generated"][product] = synthetic_export_dir._asdict()
+        output_folder = os.path.join(work_folder, f"output_{product}")
+        os.makedirs(output_folder, exist_ok=True)
+
+        fastest_seconds = {}
+        run_totals = []
+        for _ in range(repeat):
+            instrument = RunInstrument()
+            # The pipelines print per job messages, such as each failed log, that would bury the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                PIPELINES[product](jobs_folder=jobs_folder, output_folder=output_folder, instrument=instrument,
+                                   streaming=streaming, worker_count=worker_count, output_format=output_format)
+            instrument.close()
+            stage_seconds = _stage_seconds(instrument=instrument)
+            run_totals.append(sum(stage_seconds.values()))
+            for stage_name, seconds in stage_seconds.items():
+                fastest_seconds[stage_name] = min(seconds, fastest_seconds.get(stage_name, seconds))
+        results["pipelines"][product] = {"stages": fastest_seconds,
+                                         "total": sum(fastest_seconds.values()),
+                                         "run_totals": run_totals}
+    results["peak_rss_bytes"] = peak_rss_bytes()
+    return results
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE,
+                        noise_seconds: float = DEFAULT_NOISE_SECONDS) -> list:
+    """
+    Compare each stage time to the baseline
+    :param results: results of run_benchmark_suite
+    :param baseline: earlier results of run_benchmark_suite
+    :param tolerance: fraction a stage may be slower than the baseline before it regresses
+    :param noise_seconds: a stage also has to be this many seconds slower to regress
+    :return: list of StageComparison, stages missing from either side are left out
+    :raises ValueError: when the runs were made with different settings
+    """
+    check_comparable_settings(settings=results["settings"], baseline=baseline)
+    comparisons = []
+    for pipeline, pipeline_results in results["pipelines"].items():
+        baseline_pipeline = baseline["pipelines"].get(pipeline)
+        if baseline_pipeline is None:
+            continue
+        baseline_seconds_by_stage = dict(baseline_pipeline["stages"], total=baseline_pipeline["total"])
+        for stage_name, seconds in list(pipeline_results["stages"].items()) + [("total", pipeline_results["total"])]:
+            baseline_seconds = baseline_seconds_by_stage.get(stage_name)
+            if baseline_seconds is None:
+                continue
+            comparisons.append(StageComparison(
+                pipeline=pipeline, stage=stage_name, baseline_seconds=baseline_seconds, seconds=seconds,
+                ratio=seconds / baseline_seconds if baseline_seconds else float("inf"),
+                is_regression=(seconds > baseline_seconds * (1 + tolerance)
+                               and seconds - baseline_seconds > noise_seconds)))
+    return comparisons
+
+
+def print_results(results: dict, comparisons: list = None):
+    """
+    Print each pipeline's stage times, against the baseline when comparisons are given
+    :param results: results of run_benchmark_suite
+    :param comparisons: optional list of StageComparison
+    :return: None
+    """
+    comparisons_by_stage = {(comparison.pipeline, comparison.stage): comparison for comparison in comparisons or []}
+    settings = results["settings"]
+    print(f"{settings['jobs']} jobs per pipeline, seed {settings['seed']}, fastest of {settings['repeat']} runs, "
+          f"{'streaming' if settings['streaming'] else 'full'} mode, {settings['workers']} workers, "
+          f"{settings['output_format']} output")
+    for pipeline, pipeline_results in results["pipelines"].items():
+        print(f"{pipeline}:")
+        for stage_name, seconds in list(pipeline_results["stages"].items()) + [("total", pipeline_results["total"])]:
+            comparison = comparisons_by_stage.get((pipeline, stage_name))
+            line = f"\t{stage_name:<28}{seconds:>9.3f}s"
+            if comparison is not None:
+                line += (f"  baseline {comparison.baseline_seconds:>8.3f}s  {comparison.ratio:>5.2f}x"
+                         + ("  REGRESSION" if comparison.is_regression else ""))
+            print(line)
+    if results.get("peak_rss_bytes"):
+        print(f"Peak RSS {results['peak_rss_bytes'] / 2 ** 20:.1f} MB")
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from LizardTechOutputWriters import OUTPUT_WRITERS
+
+    argument_parser = argparse.ArgumentParser(description="Time each stage of the lidar and imagery pipelines on "
+                                                          "synthetic job folders")
+    argument_parser.add_argument("--jobs", type=int, default=2000, help="job folders of each product")
+    argument_parser.add_argument("--seed", type=int, default=0, help="random seed of the job folders")
+    argument_parser.add_argument("--repeat", type=int, default=3, help="runs of each pipeline, the fastest is kept")
+    argument_parser.add_argument("--pipelines", choices=PRODUCTS, nargs="+", default=list(PRODUCTS),
+                                 help="pipelines to run")
+    argument_parser.add_argument("--streaming", action="store_true", help="run the pipelines in streaming mode")
+    argument_parser.add_argument("--workers", type=int, default=1, help="worker processes for ingesting")
+    argument_parser.add_argument("--output-format", choices=list(OUTPUT_WRITERS), default="excel",
+                                 help="output writer format")
+    argument_parser.add_argument("--work-folder",
+                                 help="keep the generated job folders and outputs here and reuse them on later runs, "
+                                      "a temporary folder is used otherwise")
+    argument_parser.add_argument("--output", help="write the results to this json file")
+    argument_parser.add_argument("--baseline", help="compare to the results in this json file")
+    argument_parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                                 help="fraction a stage may be slower than the baseline")
+    argument_parser.add_argument("--noise-seconds", type=float, default=DEFAULT_NOISE_SECONDS,
+                                 help="seconds a stage also has to be slower than the baseline to regress")
+    arguments = argument_parser.parse_args()
+
+    # A baseline run with other settings is rejected before minutes of benchmarking, not after
+    suite_baseline = None
+    if arguments.baseline:
+        with open(arguments.baseline) as baseline_file:
+            suite_baseline = json.load(baseline_file)
+        try:
+            check_comparable_settings(settings=suite_settings(job_count=arguments.jobs, seed=arguments.seed,
+                                                              repeat=arguments.repeat, streaming=arguments.streaming,
+                                                              worker_count=arguments.workers,
+                                                              output_format=arguments.output_format),
+                                      baseline=suite_baseline)
+        except ValueError as error:
+            argument_parser.error(str(error))
+
+    with contextlib.ExitStack() as exit_stack:
+        work_folder = arguments.work_folder or exit_stack.enter_context(tempfile.TemporaryDirectory())
+        suite_results = run_benchmark_suite(work_folder=work_folder, job_count=arguments.jobs, seed=arguments.seed,
+                                            repeat=arguments.repeat, pipelines=tuple(arguments.pipelines),
+                                            streaming=arguments.streaming, worker_count=arguments.workers,
+                                            output_format=arguments.output_format)
+    stage_comparisons = None
+    if suite_baseline is not None:
+        stage_comparisons = compare_to_baseline(results=suite_results, baseline=suite_baseline,
+                                                tolerance=arguments.tolerance, noise_seconds=arguments.noise_seconds)
+    print_results(results=suite_results, comparisons=stage_comparisons)
+    if arguments.output:
+        with open(arguments.output, "w") as results_file:
+            json.dump(suite_results, results_file, indent=2)
+        print(f"Results written to {arguments.output}")
+    if stage_comparisons and any(comparison.is_regression for comparison in stage_comparisons):
+        print(f"{sum(comparison.is_regression for comparison in stage_comparisons)} stages regressed")
+        sys.exit(1)
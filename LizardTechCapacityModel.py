@@ -0,0 +1,438 @@
+"""
+Export size capacity model of the LizardTech lidar jobs, for sizing the export volume.
+The Job .zip Size Summary lists the zips on disk but can not say how much the next month of requests will need. Each
+job's zip bytes are joined to what its issuing urls asked for and fit, per catalog, to the log-linear model
+  log(zip bytes) = Intercept + a * log(area) + b * log(res) + c * log(thinningFactor) + d * class count + Format terms
+Area is the bounds area in square metres, summed over the job's urls. Bounds are in the units of the request's srs,
+US survey feet for the Maryland State Plane ftUS systems, so the srs codes of SRS_METRES_PER_UNIT are converted and a
+url in any other srs has no area. The other values come from the job's first url: res, thinningFactor (1 when
+missing), the number of classes in class (0 when missing) and oif, each output format but the most common getting its
+own Format term. Every catalog is fit at once: the normal equations of all catalogs are summed with one bincount per
+pair of features and solved together with a batched pseudo-inverse, the least squares solution numpy.linalg.lstsq
+gives one catalog at a time. A catalog with fewer than
+MIN_CATALOG_JOBS sized jobs uses the All Catalogs fit. Estimates are scaled by each fit's smearing factor, the mean of
+exp(residual), to undo the bias of fitting logs.
+Future storage is estimated from the recent request volume: the jobs requested in the last days of the analysis,
+their sizes estimated by the model whether or not their zips are still on disk, projected forward at the same rate.
+The fitted coefficients are saved as JSON, and CapacityModel.estimate_bytes sizes a new request in microseconds.
+
+Run this module directly to time the fit against a per catalog numpy.linalg.lstsq loop on synthetic jobs.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+from LizardTechExtentEngine import MAX_X
+from LizardTechExtentEngine import MAX_Y
+from LizardTechExtentEngine import MIN_X
+from LizardTechExtentEngine import MIN_Y
+from LizardTechExtentEngine import parse_bounds
+from LizardTechExtentEngine import parse_srs_codes
+from LizardTechQueryParameters import NULL_VALUE_LABEL
+
+MODEL_VERSION = 1
+MIN_CATALOG_JOBS = 30
+ALL_CATALOGS_LABEL = "All Catalogs"
+SIZE_FEATURE_COLUMNS = ["Catalog", "Area", "Resolution", "Thinning Factor", "Class Count", "Output Format"]
+BASE_FEATURE_NAMES = ("Intercept", "Log Area", "Log Resolution", "Log Thinning Factor", "Class Count")
+STORAGE_FORECAST_COLUMNS = ["Catalog", "Recent Jobs", "Sized Jobs", "Jobs per Day", "Mean Estimated MB",
+                            "Estimated GB per Day", "Forecast Days", "Forecast GB"]
+
+# Metres per coordinate unit of the projected srs codes requests are made in. Without a projection library, an srs
+#   missing here can not be converted and its urls have no area.
+SRS_METRES_PER_UNIT = {26985: 1.0,  # NAD83 / Maryland
+                       2248: 1200 / 3937,  # NAD83 / Maryland (ftUS)
+                       2804: 1.0,  # NAD83(HARN) / Maryland
+                       2893: 1200 / 3937,  # NAD83(HARN) / Maryland (ftUS)
+                       3559: 1.0,  # NAD83(NSRS2007) / Maryland
+                       3582: 1200 / 3937,  # NAD83(NSRS2007) / Maryland (ftUS)
+                       6487: 1.0,  # NAD83(2011) / Maryland
+                       6488: 1200 / 3937,  # NAD83(2011) / Maryland (ftUS)
+                       26918: 1.0,  # NAD83 / UTM zone 18N
+                       3857: 1.0,  # WGS 84 / Pseudo-Mercator
+                       }
+
+# Query parameters the model reads from the first url of each job
+_SIZE_PARAMETERS = ("cat", "srs", "bounds", "res", "thinningFactor", "class", "oif")
+
+
+def _first_values(query_parameters_df: pd.DataFrame, parameter: str, url_count: int) -> np.ndarray:
+    parameter_df = query_parameters_df[(query_parameters_df["Parameter"] == parameter)
+                                       & (query_parameters_df["Position"] == 0)]
+    values = np.full(url_count, None, dtype=object)
+    values[parameter_df["URL_ID"].to_numpy()] = parameter_df["Value"].astype(object).to_numpy()
+    return values
+
+
+def export_size_features(query_parameters_df: pd.DataFrame, issuing_url_series: pd.Series) -> pd.DataFrame:
+    """
+    Gather the size model features of every job with an issuing url
+    :param query_parameters_df: long table from LizardTechQueryParameters.explode_query_parameters
+    :param issuing_url_series: series of issuing urls indexed by JOB_ID, the long table was exploded from
+    :return: dataframe with the SIZE_FEATURE_COLUMNS indexed by unique JOB_ID. Area is in square metres, NaN for jobs
+        without a url of positive area in an srs of SRS_METRES_PER_UNIT. Resolution is NaN where res is missing or
+        not a number.
+    """
+    url_count = issuing_url_series.size
+    first_values = {parameter: _first_values(query_parameters_df=query_parameters_df, parameter=parameter,
+                                             url_count=url_count)
+                    for parameter in _SIZE_PARAMETERS}
+    extents = parse_bounds(bounds_values=first_values["bounds"])
+    metres_per_unit = pd.Series(parse_srs_codes(srs_values=first_values["srs"])).map(SRS_METRES_PER_UNIT).to_numpy(
+        dtype=np.float64, na_value=np.nan)
+    url_areas = (extents[:, MAX_X] - extents[:, MIN_X]) * (extents[:, MAX_Y] - extents[:, MIN_Y]) * metres_per_unit ** 2
+    url_areas[~(url_areas > 0)] = np.nan
+
+    job_ids = issuing_url_series.index.to_numpy()
+    is_first_url = ~pd.Index(job_ids).duplicated()
+    class_values = pd.Series(first_values["class"][is_first_url], dtype=object)
+    features_df = pd.DataFrame(
+        data={"Catalog": pd.Series(first_values["cat"][is_first_url], dtype=object).fillna(NULL_VALUE_LABEL).to_numpy(),
+              "Area": pd.Series(url_areas).groupby(by=job_ids, sort=False).sum(min_count=1).to_numpy(),
+              "Resolution": pd.to_numeric(pd.Series(first_values["res"][is_first_url], dtype=object),
+                                          errors="coerce").to_numpy(dtype=np.float64),
+              "Thinning Factor": pd.to_numeric(pd.Series(first_values["thinningFactor"][is_first_url], dtype=object),
+                                               errors="coerce").fillna(1.0).to_numpy(dtype=np.float64),
+              "Class Count": class_values.str.split(",").map(
+                  lambda classes: sum(bool(value.strip()) for value in classes), na_action="ignore")
+              .fillna(0).to_numpy(dtype=np.float64),
+              "Output Format": first_values["oif"][is_first_url]},
+        index=pd.Index(job_ids[is_first_url], name="JOB_ID"))
+    return features_df
+
+
+def _design_matrix(features_df: pd.DataFrame, output_formats: tuple) -> np.ndarray:
+    """
+    Model features of each job, one column per feature name of the model
+    :param features_df: dataframe from export_size_features
+    :param output_formats: output formats of the model, the first the baseline without a Format column
+    :return: float64 array of shape (job count, feature count), NaN or -inf rows where a value is missing
+    """
+    output_format_values = features_df["Output Format"].to_numpy(dtype=object)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        columns = [np.ones(len(features_df)),
+                   np.log(features_df["Area"].to_numpy(dtype=np.float64)),
+                   np.log(features_df["Resolution"].to_numpy(dtype=np.float64)),
+                   np.log(features_df["Thinning Factor"].to_numpy(dtype=np.float64)),
+                   features_df["Class Count"].to_numpy(dtype=np.float64)]
+    columns.extend((output_format_values == output_format).astype(np.float64)
+                   for output_format in output_formats[1:])
+    return np.column_stack(columns)
+
+
+def grouped_least_squares(group_codes: np.ndarray, design: np.ndarray, targets: np.ndarray,
+                          group_count: int) -> np.ndarray:
+    """
+    Least squares coefficients of every group at once. The normal equations of each group are summed with one
+    bincount per pair of features and solved with a batched pseudo-inverse, giving numpy.linalg.lstsq's minimum norm
+    solution when a group's features are collinear, such as a catalog only ever exported at one res.
+    :param group_codes: integer group of each row, from 0 to group_count - 1
+    :param design: float64 array of shape (row count, feature count)
+    :param targets: float64 array of the value to fit for each row
+    :param group_count: number of groups
+    :return: float64 array of shape (group_count, feature count), zeros for groups without rows
+    """
+    feature_count = design.shape[1]
+    gram = np.empty((group_count, feature_count, feature_count))
+    for row in range(feature_count):
+        for column in range(row, feature_count):
+            gram[:, row, column] = gram[:, column, row] = np.bincount(group_codes,
+                                                                      weights=design[:, row] * design[:, column],
+                                                                      minlength=group_count)
+    moments = np.column_stack([np.bincount(group_codes, weights=design[:, column] * targets, minlength=group_count)
+                               for column in range(feature_count)])
+    # The gram matrix squares the condition number of the design, so its cutoff is the square of lstsq's
+    return np.einsum("gij,gj->gi", np.linalg.pinv(gram, rcond=1e-12, hermitian=True), moments)
+
+
+class CapacityModel:
+    """
+    Fitted export size model of each catalog and of All Catalogs
+    :param feature_names: names of the model features, BASE_FEATURE_NAMES then a "Format <oif>" name per extra format
+    :param output_formats: output formats seen in the fit, most common first. The first is the baseline format.
+    :param catalogs: catalog names of the fits, ALL_CATALOGS_LABEL first
+    :param coefficients: float64 array of shape (catalog count, feature count)
+    :param smearing: float64 array of each fit's smearing factor, NaN for a fit without jobs
+    :param job_counts: int array of the jobs each fit was fit to
+    :param r_squared: float64 array of each fit's R squared of log zip bytes
+    """
+
+    def __init__(self, feature_names: tuple, output_formats: tuple, catalogs: tuple, coefficients: np.ndarray,
+                 smearing: np.ndarray, job_counts: np.ndarray, r_squared: np.ndarray):
+        self.feature_names = tuple(feature_names)
+        self.output_formats = tuple(output_formats)
+        self.catalogs = tuple(catalogs)
+        self.coefficients = np.asarray(coefficients, dtype=np.float64)
+        self.smearing = np.asarray(smearing, dtype=np.float64)
+        self.job_counts = np.asarray(job_counts, dtype=np.int64)
+        self.r_squared = np.asarray(r_squared, dtype=np.float64)
+        # Plain python floats, so estimate_bytes needs no numpy call
+        self._catalog_terms = {catalog: (self.coefficients[position].tolist(), float(self.smearing[position]))
+                               for position, catalog in enumerate(self.catalogs)}
+        self._format_columns = {output_format: len(BASE_FEATURE_NAMES) + position
+                                for position, output_format in enumerate(self.output_formats[1:])}
+
+    def estimate_bytes(self, catalog: str, area: float, resolution: float, thinning_factor: float = 1.0,
+                       class_count: int = 0, output_format: str = None) -> float:
+        """
+        Estimate the zip bytes of one export request
+        :param catalog: catalog requested, cat. Catalogs without their own fit use All Catalogs.
+        :param area: bounds area, in square metres
+        :param resolution: res requested
+        :param thinning_factor: thinningFactor requested
+        :param class_count: number of classes requested in class
+        :param output_format: oif requested. Formats not seen in the fit are estimated as the baseline format.
+        :return: estimated zip bytes, NaN when the model was fit to no jobs
+        """
+        coefficients, smearing = self._catalog_terms.get(catalog) or self._catalog_terms[ALL_CATALOGS_LABEL]
+        log_bytes = (coefficients[0] + coefficients[1] * math.log(area) + coefficients[2] * math.log(resolution)
+                     + coefficients[3] * math.log(thinning_factor) + coefficients[4] * class_count)
+        format_column = self._format_columns.get(output_format)
+        if format_column is not None:
+            log_bytes += coefficients[format_column]
+        return math.exp(log_bytes) * smearing
+
+    def estimate_bytes_array(self, features_df: pd.DataFrame) -> np.ndarray:
+        """
+        Estimate the zip bytes of many jobs at once
+        :param features_df: dataframe from export_size_features
+        :return: float64 array of estimated zip bytes, NaN for jobs missing an area or res
+        """
+        catalog_positions = pd.Index(self.catalogs).get_indexer(features_df["Catalog"].to_numpy(dtype=object))
+        catalog_positions[catalog_positions < 0] = self.catalogs.index(ALL_CATALOGS_LABEL)
+        design = _design_matrix(features_df=features_df, output_formats=self.output_formats)
+        with np.errstate(invalid="ignore"):
+            log_bytes = np.einsum("nf,nf->n", design, self.coefficients[catalog_positions])
+        log_bytes[~np.isfinite(log_bytes)] = np.nan
+        return np.exp(log_bytes) * self.smearing[catalog_positions]
+
+
+def fit_capacity_model(features_df: pd.DataFrame, job_zip_bytes: dict,
+                       min_catalog_jobs: int = MIN_CATALOG_JOBS) -> CapacityModel:
+    """
+    Fit the export size model of All Catalogs and of every catalog with enough sized jobs
+    :param features_df: dataframe from export_size_features
+    :param job_zip_bytes: dictionary of JOB_ID to the job's zip bytes, from JobIndex.job_zip_bytes
+    :param min_catalog_jobs: fewest sized jobs for a catalog to get its own fit
+    :return: CapacityModel, its catalogs after All Catalogs in order of most sized jobs
+    """
+    zip_bytes = pd.Series(features_df.index, dtype=object).map(job_zip_bytes).to_numpy(dtype=np.float64,
+                                                                                      na_value=np.nan)
+    output_formats = tuple(features_df["Output Format"][zip_bytes > 0].dropna().value_counts().index)
+    output_formats = output_formats or (None,)
+    design = _design_matrix(features_df=features_df, output_formats=output_formats)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        targets = np.log(zip_bytes)
+    is_sized = np.isfinite(design).all(axis=1) & np.isfinite(targets)
+    design = design[is_sized]
+    targets = targets[is_sized]
+
+    catalog_counts = features_df["Catalog"][is_sized].value_counts(sort=True)
+    catalog_counts = catalog_counts[catalog_counts >= max(min_catalog_jobs, 1)]
+    catalogs = (ALL_CATALOGS_LABEL,) + tuple(catalog_counts.index)
+    catalog_positions = pd.Index(catalogs).get_indexer(features_df["Catalog"][is_sized].to_numpy(dtype=object))
+    has_catalog_fit = catalog_positions > 0
+
+    # Group 0 is All Catalogs, fit to every sized job, followed by one group per catalog with its own fit
+    group_codes = np.concatenate((np.zeros(len(targets), dtype=np.int64), catalog_positions[has_catalog_fit]))
+    design = np.concatenate((design, design[has_catalog_fit]))
+    targets = np.concatenate((targets, targets[has_catalog_fit]))
+    group_count = len(catalogs)
+    coefficients = grouped_least_squares(group_codes=group_codes, design=design, targets=targets,
+                                         group_count=group_count)
+
+    residuals = targets - np.einsum("nf,nf->n", design, coefficients[group_codes])
+    job_counts = np.bincount(group_codes, minlength=group_count)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        target_means = np.bincount(group_codes, weights=targets, minlength=group_count) / job_counts
+        total_squares = np.bincount(group_codes, weights=(targets - target_means[group_codes]) ** 2,
+                                    minlength=group_count)
+        r_squared = 1 - np.bincount(group_codes, weights=residuals ** 2, minlength=group_count) / total_squares
+        smearing = np.bincount(group_codes, weights=np.exp(residuals), minlength=group_count) / job_counts
+    r_squared[~np.isfinite(r_squared)] = np.nan
+    feature_names = BASE_FEATURE_NAMES + tuple(f"Format {output_format}" for output_format in output_formats[1:])
+    return CapacityModel(feature_names=feature_names, output_formats=output_formats, catalogs=catalogs,
+                         coefficients=coefficients, smearing=smearing, job_counts=job_counts, r_squared=r_squared)
+
+
+def capacity_model_frame(capacity_model: CapacityModel) -> pd.DataFrame:
+    """
+    Build the "Capacity Model" sheet, one row per fit
+    :param capacity_model: CapacityModel
+    :return: dataframe with Catalog, Job Count, R Squared and Smearing columns and a column per feature coefficient
+    """
+    capacity_model_df = pd.DataFrame(data=capacity_model.coefficients, columns=list(capacity_model.feature_names))
+    capacity_model_df.insert(loc=0, column="Catalog", value=list(capacity_model.catalogs))
+    capacity_model_df.insert(loc=1, column="Job Count", value=capacity_model.job_counts)
+    capacity_model_df.insert(loc=2, column="R Squared", value=capacity_model.r_squared)
+    capacity_model_df.insert(loc=3, column="Smearing", value=capacity_model.smearing)
+    return capacity_model_df
+
+
+def storage_forecast_frame(capacity_model: CapacityModel, features_df: pd.DataFrame, job_dates_df: pd.DataFrame,
+                           recent_days: int = 30, forecast_days: int = 90) -> pd.DataFrame:
+    """
+    Forecast the export storage of the coming days from the jobs requested in the most recent days of the analysis.
+    The recent window ends at the latest job date and is cut short when the analysis covers fewer days.
+    :param capacity_model: CapacityModel from fit_capacity_model
+    :param features_df: dataframe from export_size_features
+    :param job_dates_df: dataframe with a Job_Date column indexed by JOB_ID
+    :param recent_days: days of recent requests the rate is taken from
+    :param forecast_days: days to forecast
+    :return: dataframe with the STORAGE_FORECAST_COLUMNS, one row per catalog requested in the window, most storage
+        first, then an All Catalogs total row. Empty when no job is dated.
+    """
+    job_dates = job_dates_df["Job_Date"][~job_dates_df.index.duplicated()].dropna()
+    if job_dates.empty:
+        return pd.DataFrame(columns=STORAGE_FORECAST_COLUMNS)
+    latest_date = job_dates.max()
+    window_days = max(min(float(recent_days), (latest_date - job_dates.min()) / pd.Timedelta(days=1)), 1.0)
+    recent_job_ids = job_dates.index[job_dates > latest_date - pd.Timedelta(days=window_days)]
+    recent_df = features_df[features_df.index.isin(recent_job_ids)]
+    estimated_megabytes = capacity_model.estimate_bytes_array(features_df=recent_df) / 1e6
+
+    catalogs = recent_df["Catalog"].to_numpy(dtype=object)
+    forecast_df = pd.DataFrame(data={"Recent Jobs": pd.Series(catalogs).value_counts(),
+                                     "Sized Jobs": pd.Series(~np.isnan(estimated_megabytes)).groupby(
+                                         by=catalogs).sum(),
+                                     "Mean Estimated MB": pd.Series(estimated_megabytes).groupby(by=catalogs).mean()})
+    total_df = pd.DataFrame(data={"Recent Jobs": [len(recent_df)],
+                                  "Sized Jobs": [int(np.count_nonzero(~np.isnan(estimated_megabytes)))],
+                                  "Mean Estimated MB": [np.nanmean(estimated_megabytes)
+                                                        if np.any(~np.isnan(estimated_megabytes)) else np.nan]},
+                            index=[ALL_CATALOGS_LABEL])
+    forecast_df = pd.concat([forecast_df, total_df])
+    forecast_df["Jobs per Day"] = forecast_df["Recent Jobs"] / window_days
+    forecast_df["Estimated GB per Day"] = forecast_df["Jobs per Day"] * forecast_df["Mean Estimated MB"] / 1000
+    forecast_df["Forecast Days"] = forecast_days
+    forecast_df["Forecast GB"] = forecast_df["Estimated GB per Day"] * forecast_days
+    row_order = np.lexsort((-forecast_df["Forecast GB"].fillna(-1).to_numpy(),
+                            forecast_df.index == ALL_CATALOGS_LABEL))
+    return forecast_df.iloc[row_order].rename_axis("Catalog").reset_index()[STORAGE_FORECAST_COLUMNS]
+
+
+def save_capacity_model(capacity_model: CapacityModel, file_path: str):
+    """
+    Save the fitted coefficients as JSON
+    :param capacity_model: CapacityModel
+    :param file_path: path of the json file
+    :return: None
+    """
+    fits = {}
+    for position, catalog in enumerate(capacity_model.catalogs):
+        r_squared = float(capacity_model.r_squared[position])
+        smearing = float(capacity_model.smearing[position])
+        fits[catalog] = {"job_count": int(capacity_model.job_counts[position]),
+                         "r_squared": None if math.isnan(r_squared) else r_squared,
+                         "smearing": None if math.isnan(smearing) else smearing,
+                         "coefficients": capacity_model.coefficients[position].tolist()}
+    with open(file_path, "w") as model_file:
+        json.dump({"version": MODEL_VERSION,
+                   "feature_names": list(capacity_model.feature_names),
+                   "output_formats": list(capacity_model.output_formats),
+                   "fits": fits}, model_file, indent=2)
+
+
+def load_capacity_model(file_path: str) -> CapacityModel:
+    """
+    Load a model saved by save_capacity_model
+    :param file_path: path of the json file
+    :return: CapacityModel
+    """
+    with open(file_path) as model_file:
+        model_json = json.load(model_file)
+    fits = model_json["fits"]
+    return CapacityModel(feature_names=model_json["feature_names"], output_formats=model_json["output_formats"],
+                         catalogs=list(fits),
+                         coefficients=np.array([fit["coefficients"] for fit in fits.values()], dtype=np.float64),
+                         smearing=np.array([np.nan if fit["smearing"] is None else fit["smearing"]
+                                            for fit in fits.values()], dtype=np.float64),
+                         job_counts=np.array([fit["job_count"] for fit in fits.values()], dtype=np.int64),
+                         r_squared=np.array([np.nan if fit["r_squared"] is None else fit["r_squared"]
+                                             for fit in fits.values()], dtype=np.float64))
+
+
+def benchmark_capacity_model(job_count: int = 100_000, catalog_count: int = 40, estimate_count: int = 100_000,
+                             seed: int = 0) -> dict:
+    """
+    Time fit_capacity_model against a numpy.linalg.lstsq call per catalog on synthetic jobs whose zip bytes follow
+    the model, and time estimate_bytes
+    :param job_count: number of synthetic jobs
+    :param catalog_count: number of synthetic catalogs
+    :param estimate_count: number of estimate_bytes calls to time
+    :param seed: random seed for the synthetic jobs
+    :return: dictionary of seconds, the largest coefficient difference of the two fits and microseconds per estimate
+    """
+    import time
+
+    random_generator = np.random.default_rng(seed)
+    catalogs = np.array([f"Catalog_{catalog_index}" for catalog_index in range(catalog_count)], dtype=object)
+    output_formats = np.array(["laz", "las", "tif"], dtype=object)
+    features_df = pd.DataFrame(data={"Catalog": catalogs[random_generator.integers(0, catalog_count, size=job_count)],
+                                     "Area": random_generator.lognormal(14, 1, size=job_count),
+                                     "Resolution": random_generator.choice([1.0, 2.0, 5.0], size=job_count),
+                                     "Thinning Factor": random_generator.integers(1, 5, size=job_count).astype(float),
+                                     "Class Count": random_generator.integers(1, 3, size=job_count).astype(float),
+                                     "Output Format": output_formats[random_generator.integers(0, 3, size=job_count)]},
+                               index=pd.Index([f"job_{job_index}" for job_index in range(job_count)], name="JOB_ID"))
+    catalog_intercepts = dict(zip(catalogs, random_generator.normal(0, 1, size=catalog_count)))
+    log_bytes = (features_df["Catalog"].map(catalog_intercepts).to_numpy(dtype=np.float64)
+                 + np.log(features_df["Area"].to_numpy()) - 2 * np.log(features_df["Resolution"].to_numpy())
+                 - np.log(features_df["Thinning Factor"].to_numpy()) + 0.3 * features_df["Class Count"].to_numpy()
+                 + np.where(features_df["Output Format"].to_numpy() == "las", 1.5, 0.0)
+                 + random_generator.normal(0, 0.2, size=job_count))
+    job_zip_bytes = dict(zip(features_df.index, np.exp(log_bytes)))
+
+    start = time.perf_counter()
+    capacity_model = fit_capacity_model(features_df=features_df, job_zip_bytes=job_zip_bytes)
+    vectorized_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    design = _design_matrix(features_df=features_df, output_formats=capacity_model.output_formats)
+    catalog_values = features_df["Catalog"].to_numpy(dtype=object)
+    loop_coefficients = [np.linalg.lstsq(design[catalog_values == catalog], log_bytes[catalog_values == catalog],
+                                         rcond=None)[0]
+                         for catalog in capacity_model.catalogs[1:]]
+    loop_seconds = time.perf_counter() - start
+
+    estimate_arguments = list(zip(catalog_values[:estimate_count], features_df["Area"][:estimate_count],
+                                  features_df["Resolution"][:estimate_count],
+                                  features_df["Thinning Factor"][:estimate_count],
+                                  features_df["Class Count"][:estimate_count],
+                                  features_df["Output Format"][:estimate_count]))
+    estimate_bytes = capacity_model.estimate_bytes
+    start = time.perf_counter()
+    for catalog, area, resolution, thinning_factor, class_count, output_format in estimate_arguments:
+        estimate_bytes(catalog, area, resolution, thinning_factor, class_count, output_format)
+    estimate_seconds = time.perf_counter() - start
+
+    return {"jobs": job_count,
+            "catalogs": catalog_count,
+            "vectorized_seconds": vectorized_seconds,
+            "lstsq_loop_seconds": loop_seconds,
+            "largest_coefficient_difference": float(np.abs(capacity_model.coefficients[1:]
+                                                           - np.array(loop_coefficients)).max()),
+            "estimate_microseconds": estimate_seconds / max(len(estimate_arguments), 1) * 1e6}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argument_parser = argparse.ArgumentParser(description="Time the export size capacity model fit against a per "
+                                                          "catalog lstsq loop")
+    argument_parser.add_argument("--jobs", type=int, default=100_000, help="number of synthetic jobs")
+    argument_parser.add_argument("--catalogs", type=int, default=40, help="number of synthetic catalogs")
+    arguments = argument_parser.parse_args()
+
+    benchmark_results = benchmark_capacity_model(job_count=arguments.jobs, catalog_count=arguments.catalogs)
+    print(f"Jobs: {benchmark_results['jobs']}  Catalogs: {benchmark_results['catalogs']}")
+    print(f"      vectorized: {benchmark_results['vectorized_seconds']:.3f}s")
+    print(f"     lstsq loop: {benchmark_results['lstsq_loop_seconds']:.3f}s  "
+          f"(largest coefficient difference {benchmark_results['largest_coefficient_difference']:.2e})")
+    print(f"  estimate_bytes: {benchmark_results['estimate_microseconds']:.2f} microseconds per request")
@@ -0,0 +1,369 @@
+"""
+Plan and run the removal of old LizardTech job folders and files from export_dir.
+The cleanup tool used to walk export_dir and delete each old item as it found it, one at a time, printing a line for
+every file and folder it looked at. This module splits cleanup into a plan and its execution. The plan is built from a
+single scandir pass with LizardTechDirectoryScanner, which gives every entry's modified time and the total size of every
+folder from the cached stat values. Two policies can be combined:
+  age - remove every folder and file last modified more than a maximum age ago, the original 20 day rule
+  quota - after the age rule, remove whole job folders, oldest first by their latest modified time, until export_dir
+          fits under a byte budget
+A folder in the plan is pruned: nothing inside it is planned or visited again, since removing the folder removes it.
+The planned removals never overlap, so they are run on a bounded thread pool. A dry run prints the plan and removes
+nothing.
+
+Run this module directly to print the plan of a cleanup without removing anything, or to benchmark it against the
+original walk and delete loop. Job folders are removed only by LizardTechJobFileCleanup, which archives them to the
+LizardTechJobArchive first, so a job folder nobody archived can not be lost through this module.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import concurrent.futures
+import datetime
+import os
+import shutil
+import time
+from typing import NamedTuple
+
+from LizardTechDirectoryScanner import FolderNode
+from LizardTechDirectoryScanner import scan_folder_tree
+
+AGE_POLICY = "age"
+QUOTA_POLICY = "quota"
+
+
+class CleanupAction(NamedTuple):
+    """
+    A planned removal. size is the total size in bytes of a folder's files, or the file's size. mtime is the entry's
+    own modified time for the age policy, and the latest modified time in the folder for the quota policy.
+    """
+    path: str
+    is_dir: bool
+    mtime: float
+    size: int
+    policy: str
+
+
+class CleanupResult(NamedTuple):
+    """
+    Outcome of a planned removal. error is None when the item was removed, or was already gone.
+    """
+    action: CleanupAction
+    error: str
+
+
+class CleanupPlan:
+    """
+    Removals planned for a directory, with the sizes they were planned from
+    :param root: path to the directory that was scanned
+    :param now: timestamp the ages were measured from
+    """
+
+    def __init__(self, root: str, now: float):
+        self.root = root
+        self.now = now
+        self.actions = []
+        self.scanned_count = 0
+        self.total_size = 0
+        self.byte_budget = None
+        self.scan_seconds = 0.0
+
+    @property
+    def planned_size(self) -> int:
+        return sum(action.size for action in self.actions)
+
+    @property
+    def remaining_size(self) -> int:
+        return self.total_size - self.planned_size
+
+    def age(self, action: CleanupAction) -> datetime.timedelta:
+        """
+        Age of a planned item when the plan was made
+        :param action: CleanupAction of the plan
+        :return: timedelta since the item was modified
+        """
+        return datetime.timedelta(seconds=self.now - action.mtime)
+
+    def summary(self) -> str:
+        policy_counts = {policy: sum(1 for action in self.actions if action.policy == policy)
+                         for policy in (AGE_POLICY, QUOTA_POLICY)}
+        summary = (f"Cleanup Plan: {len(self.actions)} items to remove ({policy_counts[AGE_POLICY]} by age, "
+                   f"{policy_counts[QUOTA_POLICY]} by quota), {self.planned_size / 1e6:.1f} of "
+                   f"{self.total_size / 1e6:.1f} MB, {self.scanned_count} entries scanned in {self.scan_seconds:.2f}s")
+        if self.byte_budget is not None and self.remaining_size > self.byte_budget:
+            summary += (f". ALERT: {self.remaining_size / 1e6:.1f} MB remains over the "
+                        f"{self.byte_budget / 1e6:.1f} MB budget")
+        return summary
+
+
+def _count_entries(folder_node: FolderNode) -> int:
+    """
+    Count the files and folders inside a scanned folder, at any depth
+    :param folder_node: FolderNode from scan_folder_tree
+    :return: number of entries
+    """
+    entry_count = 0
+    pending_nodes = [folder_node]
+    while pending_nodes:
+        node = pending_nodes.pop()
+        entry_count += len(node.file_stats) + len(node.subfolders)
+        pending_nodes.extend(node.subfolders)
+    return entry_count
+
+
+def _plan_age_removals(folder_node: FolderNode, oldest_mtime: float, actions: list):
+    """
+    Plan the removal of every file and subfolder of a folder last modified before a time, at any depth. A planned
+    subfolder is removed whole, so it is pruned and nothing inside it is visited.
+    :param folder_node: FolderNode whose contents are checked
+    :param oldest_mtime: timestamp before which items are removed
+    :param actions: list the CleanupAction objects are appended to
+    :return: None
+    """
+    pending_nodes = [folder_node]
+    while pending_nodes:
+        node = pending_nodes.pop()
+        for subfolder in node.subfolders:
+            if subfolder.mtime < oldest_mtime:
+                actions.append(CleanupAction(path=subfolder.path, is_dir=True, mtime=subfolder.mtime,
+                                             size=subfolder.size, policy=AGE_POLICY))
+            else:
+                pending_nodes.append(subfolder)
+        for file_name, mtime, size in node.file_stats:
+            if mtime < oldest_mtime:
+                actions.append(CleanupAction(path=os.path.join(node.path, file_name), is_dir=False, mtime=mtime,
+                                             size=size, policy=AGE_POLICY))
+
+
+def plan_cleanup(root: str, max_age: datetime.timedelta = None, byte_budget: int = None,
+                 now: float = None) -> CleanupPlan:
+    """
+    Scan a directory once and plan the removals of the age and quota policies
+    :param root: path to export_dir
+    :param max_age: remove items last modified longer ago than this, or None to skip the age policy
+    :param byte_budget: remove the oldest job folders, the folders directly in root, until the directory's files total
+        at most this many bytes, or None to skip the quota policy
+    :param now: timestamp to measure ages from, defaults to the current time
+    :return: CleanupPlan
+    """
+    start = time.perf_counter()
+    plan = CleanupPlan(root=root, now=time.time() if now is None else now)
+    plan.byte_budget = byte_budget
+    root_node = scan_folder_tree(root=root)
+    plan.total_size = root_node.size
+    plan.scanned_count = _count_entries(folder_node=root_node)
+    oldest_mtime = None if max_age is None else plan.now - max_age.total_seconds()
+
+    # Age policy, with the removals kept per job folder so the quota policy can replace them
+    root_actions = []
+    job_folder_actions = {}
+    aged_job_folders = set()
+    for file_name, mtime, size in root_node.file_stats:
+        if oldest_mtime is not None and mtime < oldest_mtime:
+            root_actions.append(CleanupAction(path=os.path.join(root, file_name), is_dir=False, mtime=mtime,
+                                              size=size, policy=AGE_POLICY))
+    for job_folder_node in root_node.subfolders:
+        actions = job_folder_actions[job_folder_node.path] = []
+        if oldest_mtime is not None and job_folder_node.mtime < oldest_mtime:
+            actions.append(CleanupAction(path=job_folder_node.path, is_dir=True, mtime=job_folder_node.mtime,
+                                         size=job_folder_node.size, policy=AGE_POLICY))
+            aged_job_folders.add(job_folder_node.path)
+        elif oldest_mtime is not None:
+            _plan_age_removals(folder_node=job_folder_node, oldest_mtime=oldest_mtime, actions=actions)
+
+    # Quota policy. Whole job folders are evicted, oldest first by their latest modified time.
+    remaining_size = root_node.size - sum(action.size for action in root_actions) - sum(
+        action.size for actions in job_folder_actions.values() for action in actions)
+    if byte_budget is not None and remaining_size > byte_budget:
+        kept_job_folder_nodes = [job_folder_node for job_folder_node in root_node.subfolders
+                                 if job_folder_node.path not in aged_job_folders]
+        for job_folder_node in sorted(kept_job_folder_nodes, key=lambda x: (x.latest_mtime, x.path)):
+            if remaining_size <= byte_budget:
+                break
+            # The eviction replaces any age removals inside the job folder
+            actions = job_folder_actions[job_folder_node.path]
+            remaining_size -= job_folder_node.size - sum(action.size for action in actions)
+            actions[:] = [CleanupAction(path=job_folder_node.path, is_dir=True, mtime=job_folder_node.latest_mtime,
+                                        size=job_folder_node.size, policy=QUOTA_POLICY)]
+
+    plan.actions = root_actions + [action for actions in job_folder_actions.values() for action in actions]
+    plan.scan_seconds = time.perf_counter() - start
+    return plan
+
+
+def _remove(action: CleanupAction) -> CleanupResult:
+    """
+    Remove a planned folder with shutil.rmtree, or a planned file with os.remove
+    :param action: CleanupAction to carry out
+    :return: CleanupResult, never raises
+    """
+    try:
+        if action.is_dir:
+            shutil.rmtree(action.path)
+        else:
+            os.remove(action.path)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        return CleanupResult(action=action, error=str(e))
+    return CleanupResult(action=action, error=None)
+
+
+def execute_cleanup(plan: CleanupPlan, worker_count: int = 8) -> list:
+    """
+    Carry out the removals of a plan on a bounded thread pool. Removal is mostly waiting on the file system, so threads
+    overlap it well, and the planned items never contain one another.
+    :param plan: CleanupPlan from plan_cleanup
+    :param worker_count: number of threads. One or fewer removes serially
+    :return: list of CleanupResult in plan order
+    """
+    if worker_count <= 1 or len(plan.actions) <= 1:
+        return [_remove(action=action) for action in plan.actions]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=worker_count) as executor:
+        return list(executor.map(_remove, plan.actions))
+
+
+def print_plan(plan: CleanupPlan):
+    """
+    Print each planned removal with its age and size, then the plan summary
+    :param plan: CleanupPlan from plan_cleanup
+    :return: None
+    """
+    for action in plan.actions:
+        print("{} {}: {} , Age: {} , Size: {:.1f} KB".format(action.policy.upper(),
+                                                            "Folder" if action.is_dir else "File", action.path,
+                                                            plan.age(action=action), action.size / 1000))
+    print(plan.summary())
+
+
+def print_results(plan: CleanupPlan, results: list):
+    """
+    Print each removed item and an alert for each item that could not be removed
+    :param plan: CleanupPlan the results were run from
+    :param results: list of CleanupResult from execute_cleanup
+    :return: None
+    """
+    for result in results:
+        if result.error is None:
+            print("REMOVED {} - Age: {}".format(result.action.path, plan.age(action=result.action)))
+        else:
+            print("\tALERT: {} NOT REMOVED. EXCEPTION! {}".format(result.action.path, result.error))
+    removed_results = [result for result in results if result.error is None]
+    print(f"Cleanup: {len(removed_results)} of {len(results)} items removed, "
+          f"{sum(result.action.size for result in removed_results) / 1e6:.1f} MB freed")
+
+
+def benchmark_cleanup(job_folder_count: int = 5_000, files_per_folder: int = 3, worker_count: int = 8) -> dict:
+    """
+    Build two identical synthetic export_dir trees, half of their job folders past the age limit, and time the
+    original walk, print and delete loop on one against planning and executing with this module on the other.
+    Printed lines go to an in-memory buffer so the console does not dominate either timing.
+    :param job_folder_count: number of job folders in each tree
+    :param files_per_folder: number of files in each job folder
+    :param worker_count: number of removal threads
+    :return: dictionary of timings and counts
+    """
+    import contextlib
+    import io
+    import tempfile
+
+    max_age = datetime.timedelta(days=20)
+    now = time.time()
+    old_mtime = now - 2 * max_age.total_seconds()
+
+    def build_tree(tree_root):
+        for folder_index in range(job_folder_count):
+            job_folder = os.path.join(tree_root, f"job_{folder_index:07d}")
+            os.mkdir(job_folder)
+            for file_index in range(files_per_folder):
+                file_path = os.path.join(job_folder, f"file_{file_index}.html")
+                with open(file_path, 'wb') as file_handler:
+                    file_handler.write(b"x" * 1000)
+                if folder_index % 2 == 0:
+                    os.utime(file_path, (old_mtime, old_mtime))
+            if folder_index % 2 == 0:
+                os.utime(job_folder, (old_mtime, old_mtime))
+
+    def walk_and_delete(tree_root):
+        for root, dirs, files in os.walk(tree_root):
+            for folder in dirs:
+                full_folder_path = os.path.join(root, folder)
+                try:
+                    age = datetime.timedelta(seconds=now - os.path.getmtime(full_folder_path))
+                except FileNotFoundError:
+                    continue
+                print("Folder: {} , Age: {}".format(full_folder_path, age))
+                if age > max_age:
+                    shutil.rmtree(full_folder_path)
+                    print("REMOVED {} - Age: {}\n".format(full_folder_path, age))
+            for file in files:
+                full_file_path = os.path.join(root, file)
+                age = datetime.timedelta(seconds=now - os.path.getmtime(full_file_path))
+                print("File: {} , Age: {}".format(full_file_path, age))
+                if age > max_age:
+                    os.remove(full_file_path)
+                    print("REMOVED {} - Age: {}\n".format(full_file_path, age))
+
+    benchmark_root = tempfile.mkdtemp(prefix="lizardtech_cleanup_benchmark_")
+    try:
+        walk_root = os.path.join(benchmark_root, "walk")
+        engine_root = os.path.join(benchmark_root, "engine")
+        for tree_root in (walk_root, engine_root):
+            os.mkdir(tree_root)
+            build_tree(tree_root=tree_root)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            walk_and_delete(tree_root=walk_root)
+            walk_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            plan = plan_cleanup(root=engine_root, max_age=max_age, now=now)
+            results = execute_cleanup(plan=plan, worker_count=worker_count)
+            print_results(plan=plan, results=results)
+            engine_seconds = time.perf_counter() - start
+
+        return {"job_folders": job_folder_count,
+                "removed": len(results),
+                "walk_seconds": walk_seconds,
+                "plan_seconds": plan.scan_seconds,
+                "engine_seconds": engine_seconds,
+                "walk_remaining": len(os.listdir(walk_root)),
+                "engine_remaining": len(os.listdir(engine_root))}
+    finally:
+        shutil.rmtree(benchmark_root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argument_parser = argparse.ArgumentParser(description="Plan a cleanup of the LizardTech export_dir without "
+                                                          "removing anything, LizardTechJobFileCleanup archives and "
+                                                          "removes")
+    argument_parser.add_argument("root", nargs="?", help="path to export_dir")
+    argument_parser.add_argument("--max-age-days", type=float, default=20,
+                                 help="remove items older than this many days, 0 to skip the age policy")
+    argument_parser.add_argument("--byte-budget", type=int, default=None,
+                                 help="evict the oldest job folders until export_dir fits in this many bytes")
+    argument_parser.add_argument("--workers", type=int, default=8, help="number of removal threads of the benchmark")
+    argument_parser.add_argument("--benchmark", action="store_true",
+                                 help="time the original walk and delete loop against this module on synthetic trees")
+    argument_parser.add_argument("--job-folders", type=int, default=5_000, help="number of synthetic job folders")
+    arguments = argument_parser.parse_args()
+
+    if arguments.benchmark:
+        benchmark_results = benchmark_cleanup(job_folder_count=arguments.job_folders, worker_count=arguments.workers)
+        print(f"Job folders: {benchmark_results['job_folders']}, removed: {benchmark_results['removed']}")
+        print(f"    walk: {benchmark_results['walk_seconds']:.3f}s, {benchmark_results['walk_remaining']} remaining")
+        print(f"  engine: {benchmark_results['engine_seconds']:.3f}s (plan {benchmark_results['plan_seconds']:.3f}s), "
+              f"{benchmark_results['engine_remaining']} remaining")
+        print(f"Speedup: {benchmark_results['walk_seconds'] / max(benchmark_results['engine_seconds'], 1e-9):.1f}x")
+    elif arguments.root is None:
+        argument_parser.error("root is required unless --benchmark is given")
+    else:
+        cleanup_plan = plan_cleanup(root=arguments.root,
+                                    max_age=datetime.timedelta(days=arguments.max_age_days)
+                                    if arguments.max_age_days > 0 else None,
+                                    byte_budget=arguments.byte_budget)
+        print_plan(plan=cleanup_plan)
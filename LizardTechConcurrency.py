@@ -0,0 +1,209 @@
+"""
+Concurrent job load of the LizardTech Express Server, from the start and end of every job.
+Sizing the server needs to know how many exports ran at the same time. Each job becomes two events, +1 at its start
+and -1 at its end, and one sort of the events followed by a cumulative sum gives the number of jobs running after every
+event, a sweep line costing O(n log n) for n jobs. An end sorts before a start at the same moment, so back to back jobs
+do not overlap. The sweep is then binned to minutes:
+  Running Jobs - the most jobs running at any moment of the minute
+  Jobs Started - the jobs that started in the minute
+Minutes are labeled in US Eastern local time, as Job_Date is. The minute series is summarized as the peak of each day
+and as the hours in which the server was saturated, running at least a given number of jobs. A server with a fixed
+number of export slots never runs more jobs than it has slots, so by default saturation is the highest number of
+running jobs seen. The minute series is written to parquet and the summaries to sheets.
+
+Run this module directly to time the timeline of a synthetic year of jobs.
+
+Date Created: 20261016
+Revisions:
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from LizardTechTimestamps import EASTERN_TIME_ZONE
+
+MINUTE_SECONDS = 60
+CONCURRENCY_MINUTE_COLUMNS = ["Minute", "Running Jobs", "Jobs Started"]
+DAILY_PEAK_COLUMNS = ["Date", "Peak Running Jobs", "Peak Minute", "Busy Minutes", "Jobs Started"]
+SATURATED_HOUR_COLUMNS = ["Hour", "Peak Running Jobs", "Saturated Minutes", "Jobs Started"]
+
+
+class ConcurrencyTimeline(NamedTuple):
+    """
+    Jobs running and started in every minute from the minute of the first job start to the minute of the last job end.
+    first_minute is that first minute in minutes since the epoch. Jobs without a known end are left out and counted in
+    skipped_job_count.
+    """
+    first_minute: int
+    running_jobs: np.ndarray
+    started_jobs: np.ndarray
+    job_count: int
+    skipped_job_count: int
+
+
+def concurrency_timeline(start_seconds: np.ndarray, end_seconds: np.ndarray) -> ConcurrencyTimeline:
+    """
+    Sweep the job start and end events into the number of jobs running in every minute
+    :param start_seconds: float64 job starts in seconds since the epoch
+    :param end_seconds: float64 job ends in seconds since the epoch, NaN when unknown
+    :return: ConcurrencyTimeline
+    """
+    known = ~np.isnan(start_seconds) & ~np.isnan(end_seconds) & (end_seconds >= start_seconds)
+    start_seconds = start_seconds[known]
+    end_seconds = end_seconds[known]
+    job_count = len(start_seconds)
+    skipped_job_count = int(np.count_nonzero(~known))
+    if not job_count:
+        return ConcurrencyTimeline(first_minute=0, running_jobs=np.zeros(0, dtype=np.int32),
+                                   started_jobs=np.zeros(0, dtype=np.int32), job_count=0,
+                                   skipped_job_count=skipped_job_count)
+
+    # Ends come first in the event arrays, so the stable sort puts an end before a start at the same moment
+    event_seconds = np.concatenate((end_seconds, start_seconds))
+    event_order = np.argsort(event_seconds, kind="stable")
+    running_after_events = np.cumsum(np.repeat(np.array([-1, 1], dtype=np.int32), job_count)[event_order],
+                                     dtype=np.int32)
+    event_seconds = event_seconds[event_order]
+    event_minutes = np.floor(event_seconds / MINUTE_SECONDS).astype(np.int64)
+    first_minute = int(event_minutes[0])
+    event_minutes -= first_minute
+    minute_count = int(event_minutes[-1]) + 1
+
+    # Each minute with events peaks at the most running after any moment's events, or at the count it opened with when
+    #   that count lasted for a moment before the first event. Counts part way through the events of one moment never
+    #   held, so they are left out.
+    is_last_at_moment = np.concatenate((event_seconds[1:] != event_seconds[:-1], [True]))
+    settled_running = np.where(is_last_at_moment, running_after_events, 0)
+    run_starts = np.flatnonzero(np.concatenate(([True], event_minutes[1:] != event_minutes[:-1])))
+    event_minute_numbers = event_minutes[run_starts]
+    event_minute_peaks = np.maximum.reduceat(settled_running, run_starts)
+    event_minute_closes = running_after_events[np.concatenate((run_starts[1:] - 1, [len(event_minutes) - 1]))]
+
+    # A minute closes with the count left by the last event at or before it, and opens with the close of the minute
+    #   before it
+    last_event_minute = np.full(minute_count, -1, dtype=np.int64)
+    last_event_minute[event_minute_numbers] = np.arange(len(event_minute_numbers))
+    last_event_minute = np.maximum.accumulate(last_event_minute)
+    minute_closes = event_minute_closes[last_event_minute]
+    minute_opens = np.concatenate(([0], minute_closes[:-1])).astype(np.int32)
+    opens_before_events = event_seconds[run_starts] > (event_minute_numbers + first_minute) * MINUTE_SECONDS
+    running_jobs = minute_opens.copy()
+    running_jobs[event_minute_numbers] = np.where(opens_before_events,
+                                                  np.maximum(minute_opens[event_minute_numbers], event_minute_peaks),
+                                                  event_minute_peaks)
+
+    start_minutes = np.floor(start_seconds / MINUTE_SECONDS).astype(np.int64) - first_minute
+    started_jobs = np.bincount(start_minutes, minlength=minute_count).astype(np.int32)
+    return ConcurrencyTimeline(first_minute=first_minute, running_jobs=running_jobs, started_jobs=started_jobs,
+                               job_count=job_count, skipped_job_count=skipped_job_count)
+
+
+def concurrency_minutes_frame(timeline: ConcurrencyTimeline) -> pd.DataFrame:
+    """
+    Build the minute series of a timeline, each minute labeled with its naive US Eastern local time
+    :param timeline: ConcurrencyTimeline
+    :return: dataframe with the CONCURRENCY_MINUTE_COLUMNS
+    """
+    minute_seconds = (timeline.first_minute + np.arange(len(timeline.running_jobs), dtype=np.int64)) * MINUTE_SECONDS
+    minutes = (pd.to_datetime(minute_seconds, unit="s", utc=True)
+               .tz_convert(EASTERN_TIME_ZONE)
+               .tz_localize(None))
+    return pd.DataFrame(data={"Minute": minutes,
+                              "Running Jobs": timeline.running_jobs,
+                              "Jobs Started": timeline.started_jobs})
+
+
+def daily_peaks_frame(concurrency_minutes_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Summarize the minute series by US Eastern day
+    :param concurrency_minutes_df: dataframe from concurrency_minutes_frame
+    :return: dataframe with the DAILY_PEAK_COLUMNS, one row per day. Peak Minute is the first minute at the peak and
+        Busy Minutes the minutes with any job running.
+    """
+    days = concurrency_minutes_df["Minute"].dt.floor("D")
+    grouped = concurrency_minutes_df.groupby(by=days.rename("Date"), sort=True)
+    peak_positions = grouped["Running Jobs"].idxmax()
+    daily_peaks_df = pd.DataFrame(data={"Peak Running Jobs": grouped["Running Jobs"].max(),
+                                        "Peak Minute": concurrency_minutes_df["Minute"].to_numpy()[
+                                            peak_positions.to_numpy()],
+                                        "Busy Minutes": (concurrency_minutes_df["Running Jobs"] > 0).groupby(
+                                            by=days.rename("Date"), sort=True).sum(),
+                                        "Jobs Started": grouped["Jobs Started"].sum()})
+    return daily_peaks_df.reset_index()[DAILY_PEAK_COLUMNS]
+
+
+def saturated_hours_frame(concurrency_minutes_df: pd.DataFrame, saturation_jobs: int = None) -> pd.DataFrame:
+    """
+    List the US Eastern hours with minutes in which the server was saturated
+    :param concurrency_minutes_df: dataframe from concurrency_minutes_frame
+    :param saturation_jobs: running jobs at which the server is saturated, by default the most running jobs seen
+    :return: dataframe with the SATURATED_HOUR_COLUMNS, one row per hour with a saturated minute
+    """
+    if concurrency_minutes_df.empty:
+        return pd.DataFrame(columns=SATURATED_HOUR_COLUMNS)
+    running_jobs = concurrency_minutes_df["Running Jobs"]
+    if saturation_jobs is None:
+        saturation_jobs = int(running_jobs.max())
+    hours = concurrency_minutes_df["Minute"].dt.floor("H").rename("Hour")
+    hourly_df = pd.DataFrame(data={"Peak Running Jobs": running_jobs.groupby(by=hours, sort=True).max(),
+                                   "Saturated Minutes": (running_jobs >= max(saturation_jobs, 1)).groupby(
+                                       by=hours, sort=True).sum(),
+                                   "Jobs Started": concurrency_minutes_df["Jobs Started"].groupby(
+                                       by=hours, sort=True).sum()})
+    return hourly_df[hourly_df["Saturated Minutes"] > 0].reset_index()[SATURATED_HOUR_COLUMNS]
+
+
+def write_concurrency_parquet(concurrency_minutes_df: pd.DataFrame, file_path: str):
+    """
+    Write the minute series as a parquet file
+    :param concurrency_minutes_df: dataframe from concurrency_minutes_frame
+    :param file_path: path of the parquet file
+    :return: None
+    :raises ImportError: when neither pyarrow nor fastparquet is installed
+    """
+    concurrency_minutes_df.to_parquet(file_path, index=False)
+
+
+def benchmark_concurrency(job_count: int = 100_000, day_count: int = 365, seed: int = 0) -> dict:
+    """
+    Time the sweep and its summaries on synthetic jobs starting at random over a number of days
+    :param job_count: number of synthetic jobs
+    :param day_count: days the job starts are spread over
+    :param seed: random seed for the synthetic starts and durations
+    :return: dictionary of the minute count, peak and timings
+    """
+    import time
+
+    random_generator = np.random.default_rng(seed)
+    start_seconds = 1_546_300_800 + random_generator.uniform(0, day_count * 86_400, size=job_count)
+    end_seconds = start_seconds + random_generator.lognormal(5, 1, size=job_count)
+
+    start = time.perf_counter()
+    timeline = concurrency_timeline(start_seconds=start_seconds, end_seconds=end_seconds)
+    sweep_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    concurrency_minutes_df = concurrency_minutes_frame(timeline=timeline)
+    daily_peaks_frame(concurrency_minutes_df=concurrency_minutes_df)
+    saturated_hours_frame(concurrency_minutes_df=concurrency_minutes_df)
+    summary_seconds = time.perf_counter() - start
+    return {"jobs": job_count,
+            "minutes": len(timeline.running_jobs),
+            "peak_running_jobs": int(timeline.running_jobs.max()),
+            "sweep_seconds": sweep_seconds,
+            "summary_seconds": summary_seconds}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argument_parser = argparse.ArgumentParser(description="Time the concurrent job timeline of synthetic jobs")
+    argument_parser.add_argument("--jobs", type=int, default=100_000, help="number of synthetic jobs")
+    argument_parser.add_argument("--days", type=int, default=365, help="days the synthetic jobs are spread over")
+    arguments = argument_parser.parse_args()
+
+    benchmark_results = benchmark_concurrency(job_count=arguments.jobs, day_count=arguments.days)
+    print(f"{benchmark_results['jobs']} jobs over {benchmark_results['minutes']} minutes, peak "
+          f"{benchmark_results['peak_running_jobs']} running: sweep {benchmark_results['sweep_seconds']:.3f}s, "
+          f"minute series and summaries {benchmark_results['summary_seconds']:.3f}s")
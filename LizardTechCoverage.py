@@ -0,0 +1,277 @@
+"""
+Download coverage rasters of the LizardTech lidar export extents.
+Which parts of the state are downloaded most is answered by rasterizing every export extent onto a grid of square
+cells and counting the extents over each cell. Rather than looping over the cells of each extent, every extent adds
+its weight at the four corners of a 2-D difference array, in one bincount over all extents, and two cumulative sums
+turn the difference array into the per cell totals. The cost grows with the number of extents plus the number of
+cells, not with their product. A cell is covered by an extent when the two overlap with positive area.
+Each cell gets:
+  Job Count - the number of export extents over the cell. A job whose extents overlap counts once per extent there.
+  Zip Bytes - optionally, each job's zip bytes, shared equally among its extents and spread evenly over each extent's
+              cells, so the grid sums to the zip bytes of the mapped jobs
+Extents in different spatial reference systems can not share a grid, so there is one grid per srs code. Grids are
+saved as a compressed .npz array file, and the most downloaded cells are summarized in a hot spot table.
+
+Run this module directly to time the accumulation of synthetic extents on a fine grid.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import math
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from LizardTechExtentEngine import ExtentTable
+from LizardTechExtentEngine import MAX_X
+from LizardTechExtentEngine import MAX_Y
+from LizardTechExtentEngine import MIN_X
+from LizardTechExtentEngine import MIN_Y
+from LizardTechExtentEngine import SRS_CODE
+
+DEFAULT_CELL_SIZE = 250.0
+DEFAULT_MAX_CELLS = 50_000_000
+HOT_SPOT_COLUMNS = ["Rank", "SRS Code", "Cell Min X", "Cell Min Y", "Cell Max X", "Cell Max Y", "Job Count",
+                    "Zip MB"]
+
+
+class CoverageGrid(NamedTuple):
+    """
+    Coverage of one spatial reference system. Row 0 of the arrays is the southernmost row of cells and column 0 the
+    westernmost, so cell (row, column) spans origin_x + column * cell_size to origin_x + (column + 1) * cell_size, and
+    likewise in y. zip_bytes is None when zip bytes were not accumulated.
+    """
+    srs_code: int
+    origin_x: float
+    origin_y: float
+    cell_size: float
+    job_counts: np.ndarray
+    zip_bytes: np.ndarray
+
+
+def _accumulate(cell_ranges: np.ndarray, weights: np.ndarray, shape: tuple) -> np.ndarray:
+    """
+    Sum a weight over every cell of each cell range with a 2-D difference array
+    :param cell_ranges: int64 array of (first row, first column, end row, end column) rows, the ends exclusive
+    :param weights: float64 weight per cell of each range
+    :param shape: (rows, columns) of the grid
+    :return: float64 array of the grid shape with the summed weights
+    """
+    row_count, column_count = shape
+    first_rows, first_columns, end_rows, end_columns = cell_ranges.T
+    corner_indices = np.concatenate([first_rows * (column_count + 1) + first_columns,
+                                     first_rows * (column_count + 1) + end_columns,
+                                     end_rows * (column_count + 1) + first_columns,
+                                     end_rows * (column_count + 1) + end_columns])
+    corner_weights = np.concatenate([weights, -weights, -weights, weights])
+    difference = np.bincount(corner_indices, weights=corner_weights, minlength=(row_count + 1) * (column_count + 1))
+    difference = difference.reshape(row_count + 1, column_count + 1)
+    return difference.cumsum(axis=0).cumsum(axis=1)[:row_count, :column_count]
+
+
+def accumulate_coverage(extents: np.ndarray, cell_size: float = DEFAULT_CELL_SIZE, extent_zip_bytes: np.ndarray = None,
+                        max_cells: int = DEFAULT_MAX_CELLS) -> dict:
+    """
+    Rasterize valid extents onto one grid per srs code, each grid snapped to multiples of the cell size around its
+    extents
+    :param extents: float64 array of (minx, miny, maxx, maxy, srs code) rows of valid extents, from
+        LizardTechExtentEngine
+    :param cell_size: width and height of a cell, in the units of the srs
+    :param extent_zip_bytes: optional float64 array of the zip bytes credited to each extent
+    :param max_cells: largest number of cells allowed in one grid
+    :return: dictionary of srs code to CoverageGrid
+    :raises ValueError: when a grid would have more than max_cells cells
+    """
+    coverage_grids = {}
+    srs_codes = extents[:, SRS_CODE]
+    for srs_code in np.unique(srs_codes):
+        srs_rows = np.flatnonzero(srs_codes == srs_code)
+        srs_extents = extents[srs_rows]
+        origin_x = math.floor(srs_extents[:, MIN_X].min() / cell_size) * cell_size
+        origin_y = math.floor(srs_extents[:, MIN_Y].min() / cell_size) * cell_size
+        column_count = max(1, math.ceil((srs_extents[:, MAX_X].max() - origin_x) / cell_size))
+        row_count = max(1, math.ceil((srs_extents[:, MAX_Y].max() - origin_y) / cell_size))
+        if row_count * column_count > max_cells:
+            raise ValueError(f"A {row_count} x {column_count} coverage grid for srs {int(srs_code)} exceeds "
+                             f"{max_cells} cells, use a larger cell size")
+
+        first_columns = np.floor((srs_extents[:, MIN_X] - origin_x) / cell_size).astype(np.int64)
+        first_rows = np.floor((srs_extents[:, MIN_Y] - origin_y) / cell_size).astype(np.int64)
+        end_columns = np.maximum(np.ceil((srs_extents[:, MAX_X] - origin_x) / cell_size).astype(np.int64),
+                                 first_columns + 1)
+        end_rows = np.maximum(np.ceil((srs_extents[:, MAX_Y] - origin_y) / cell_size).astype(np.int64), first_rows + 1)
+        cell_ranges = np.column_stack([first_rows, first_columns, np.minimum(end_rows, row_count),
+                                       np.minimum(end_columns, column_count)])
+
+        job_counts = _accumulate(cell_ranges=cell_ranges, weights=np.ones(len(srs_rows)),
+                                 shape=(row_count, column_count))
+        zip_bytes = None
+        if extent_zip_bytes is not None:
+            cells_per_extent = (cell_ranges[:, 2] - cell_ranges[:, 0]) * (cell_ranges[:, 3] - cell_ranges[:, 1])
+            zip_bytes = _accumulate(cell_ranges=cell_ranges,
+                                    weights=np.nan_to_num(extent_zip_bytes[srs_rows]) / cells_per_extent,
+                                    shape=(row_count, column_count)).astype(np.float32)
+        coverage_grids[int(srs_code)] = CoverageGrid(srs_code=int(srs_code), origin_x=origin_x, origin_y=origin_y,
+                                                     cell_size=cell_size,
+                                                     job_counts=np.rint(job_counts).astype(np.uint32),
+                                                     zip_bytes=zip_bytes)
+    return coverage_grids
+
+
+def extent_zip_bytes(job_ids: np.ndarray, job_zip_bytes: dict) -> np.ndarray:
+    """
+    Share each job's zip bytes equally among its extents
+    :param job_ids: array of the JOB_ID of each extent
+    :param job_zip_bytes: dictionary of JOB_ID to the job's zip bytes, None or missing when it has no zip
+    :return: float64 array of the zip bytes credited to each extent, 0.0 for jobs without a zip
+    """
+    job_ids_series = pd.Series(job_ids, dtype=object)
+    extents_per_job = job_ids_series.map(job_ids_series.value_counts()).to_numpy(dtype=np.float64)
+    zip_bytes = job_ids_series.map(job_zip_bytes).to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.nan_to_num(zip_bytes) / extents_per_job
+
+
+def coverage_from_extent_table(extent_table: ExtentTable, job_zip_bytes: dict = None,
+                               cell_size: float = DEFAULT_CELL_SIZE, max_cells: int = DEFAULT_MAX_CELLS) -> dict:
+    """
+    Rasterize the valid extents of an extent table
+    :param extent_table: ExtentTable from LizardTechExtentEngine
+    :param job_zip_bytes: optional dictionary of JOB_ID to zip bytes, to also accumulate zip bytes
+    :param cell_size: width and height of a cell, in the units of each srs
+    :param max_cells: largest number of cells allowed in one grid
+    :return: dictionary of srs code to CoverageGrid, empty when no extent is valid
+    """
+    valid_table = extent_table.take(extent_table.valid)
+    if not len(valid_table.job_ids):
+        return {}
+    return accumulate_coverage(extents=valid_table.extents, cell_size=cell_size,
+                               extent_zip_bytes=None if job_zip_bytes is None
+                               else extent_zip_bytes(job_ids=valid_table.job_ids, job_zip_bytes=job_zip_bytes),
+                               max_cells=max_cells)
+
+
+def save_coverage(coverage_grids: dict, file_path: str):
+    """
+    Save coverage grids to one compressed .npz file. Each grid's arrays are stored under its srs code, such as
+    job_counts_26985, zip_bytes_26985 and origin_26985, an array of (origin x, origin y, cell size).
+    :param coverage_grids: dictionary of srs code to CoverageGrid
+    :param file_path: path of the .npz file
+    :return: None
+    """
+    arrays = {}
+    for srs_code, coverage_grid in coverage_grids.items():
+        arrays[f"job_counts_{srs_code}"] = coverage_grid.job_counts
+        arrays[f"origin_{srs_code}"] = np.array([coverage_grid.origin_x, coverage_grid.origin_y,
+                                                 coverage_grid.cell_size])
+        if coverage_grid.zip_bytes is not None:
+            arrays[f"zip_bytes_{srs_code}"] = coverage_grid.zip_bytes
+    np.savez_compressed(file_path, **arrays)
+
+
+def load_coverage(file_path: str) -> dict:
+    """
+    Load coverage grids saved by save_coverage
+    :param file_path: path of the .npz file
+    :return: dictionary of srs code to CoverageGrid
+    """
+    coverage_grids = {}
+    with np.load(file_path) as arrays:
+        for name in arrays.files:
+            if not name.startswith("origin_"):
+                continue
+            srs_code = int(name[len("origin_"):])
+            origin_x, origin_y, cell_size = arrays[name].tolist()
+            zip_bytes_name = f"zip_bytes_{srs_code}"
+            coverage_grids[srs_code] = CoverageGrid(srs_code=srs_code, origin_x=origin_x, origin_y=origin_y,
+                                                    cell_size=cell_size, job_counts=arrays[f"job_counts_{srs_code}"],
+                                                    zip_bytes=arrays[zip_bytes_name] if zip_bytes_name in arrays.files
+                                                    else None)
+    return coverage_grids
+
+
+def coverage_hot_spots_frame(coverage_grids: dict, top_count: int = 25) -> pd.DataFrame:
+    """
+    Build the "Coverage Hot Spots" sheet, the cells with the highest job counts across all grids, ties broken by zip
+    bytes
+    :param coverage_grids: dictionary of srs code to CoverageGrid
+    :param top_count: number of cells to list
+    :return: dataframe with the HOT_SPOT_COLUMNS, empty when nothing was covered
+    """
+    candidate_frames = []
+    for coverage_grid in coverage_grids.values():
+        job_counts = coverage_grid.job_counts.ravel()
+        # Only the top cells of each grid can make the overall top, so each grid is partitioned rather than sorted
+        candidate_count = min(top_count, np.count_nonzero(job_counts))
+        if not candidate_count:
+            continue
+        cell_indices = np.argpartition(-job_counts.astype(np.int64), candidate_count - 1)[:candidate_count]
+        rows, columns = np.unravel_index(cell_indices, coverage_grid.job_counts.shape)
+        zip_bytes = (coverage_grid.zip_bytes.ravel()[cell_indices].astype(np.float64)
+                     if coverage_grid.zip_bytes is not None else np.full(candidate_count, np.nan))
+        candidate_frames.append(pd.DataFrame(data={
+            "SRS Code": coverage_grid.srs_code,
+            "Cell Min X": coverage_grid.origin_x + columns * coverage_grid.cell_size,
+            "Cell Min Y": coverage_grid.origin_y + rows * coverage_grid.cell_size,
+            "Cell Max X": coverage_grid.origin_x + (columns + 1) * coverage_grid.cell_size,
+            "Cell Max Y": coverage_grid.origin_y + (rows + 1) * coverage_grid.cell_size,
+            "Job Count": job_counts[cell_indices].astype(np.int64),
+            "Zip MB": zip_bytes / 1e6}))
+    if not candidate_frames:
+        return pd.DataFrame(columns=HOT_SPOT_COLUMNS)
+    hot_spots_df = (pd.concat(candidate_frames, ignore_index=True)
+                    .sort_values(by=["Job Count", "Zip MB", "SRS Code", "Cell Min Y", "Cell Min X"],
+                                 ascending=[False, False, True, True, True], kind="stable")
+                    .head(top_count)
+                    .reset_index(drop=True))
+    hot_spots_df.insert(loc=0, column="Rank", value=np.arange(1, len(hot_spots_df) + 1))
+    return hot_spots_df
+
+
+def benchmark_coverage(extent_count: int = 100_000, cell_size: float = 50.0, seed: int = 0) -> dict:
+    """
+    Time accumulate_coverage on synthetic 1000 x 1500 extents spread over a 200 km x 100 km area
+    :param extent_count: number of extents
+    :param cell_size: cell size of the grid
+    :param seed: random seed for the synthetic extents
+    :return: dictionary of the grid shape and timings
+    """
+    import time
+
+    random_generator = np.random.default_rng(seed)
+    minimum_xs = random_generator.uniform(300_000, 500_000, size=extent_count)
+    minimum_ys = random_generator.uniform(100_000, 200_000, size=extent_count)
+    extents = np.column_stack([minimum_xs, minimum_ys, minimum_xs + 1000, minimum_ys + 1500,
+                               np.full(extent_count, 26985.0)])
+    zip_bytes = random_generator.uniform(1e6, 1e8, size=extent_count)
+
+    start = time.perf_counter()
+    coverage_grids = accumulate_coverage(extents=extents, cell_size=cell_size, extent_zip_bytes=zip_bytes)
+    accumulate_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    coverage_hot_spots_frame(coverage_grids=coverage_grids)
+    hot_spot_seconds = time.perf_counter() - start
+
+    coverage_grid = coverage_grids[26985]
+    return {"extents": extent_count,
+            "shape": coverage_grid.job_counts.shape,
+            "accumulate_seconds": accumulate_seconds,
+            "hot_spot_seconds": hot_spot_seconds,
+            "zip_bytes_error": abs(float(coverage_grid.zip_bytes.sum(dtype=np.float64)) - zip_bytes.sum())
+                               / zip_bytes.sum()}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argument_parser = argparse.ArgumentParser(description="Time the coverage accumulation of synthetic export extents")
+    argument_parser.add_argument("--extents", type=int, default=100_000, help="number of synthetic extents")
+    argument_parser.add_argument("--cell-size", type=float, default=50.0, help="grid cell size in metres")
+    arguments = argument_parser.parse_args()
+
+    benchmark_results = benchmark_coverage(extent_count=arguments.extents, cell_size=arguments.cell_size)
+    print(f"{benchmark_results['extents']} extents on a {benchmark_results['shape'][0]} x "
+          f"{benchmark_results['shape'][1]} grid: accumulate {benchmark_results['accumulate_seconds']:.3f}s, "
+          f"hot spots {benchmark_results['hot_spot_seconds']:.3f}s, "
+          f"zip bytes relative error {benchmark_results['zip_bytes_error']:.1e}")
@@ -0,0 +1,282 @@
+"""
+Shared os.scandir based directory scanning for the LizardTech export_dir tools.
+os.walk followed by separate os.path.getmtime and os.path.getsize calls costs several system calls per file, which is
+very slow when export_dir is on a network share. This module scans each directory once with os.scandir and keeps the
+single cached DirEntry stat result for every entry. On Windows the stat values come with the directory listing for
+free, elsewhere it is one stat per entry. Scans yield typed records: ScannedEntry for every file and folder, and
+JobFolderRecord for every job folder (a folder directly containing files), or build a FolderNode tree with the total
+size and latest modified time of every folder.
+
+Run this module directly to benchmark os.walk plus getmtime/getsize against the scanner on a synthetic tree.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import os
+from typing import NamedTuple
+
+
+class ScannedEntry(NamedTuple):
+    """
+    A file or folder found during a scan, with its cached stat values
+    """
+    path: str
+    name: str
+    is_dir: bool
+    mtime: float
+    size: int
+    depth: int
+
+
+class JobFolderRecord(NamedTuple):
+    """
+    A job folder with the paths of its html log and zip file, if present, and its combined stat values.
+    mtime is the latest modified time among the folder's files and size is their total size in bytes.
+    file_stats holds a (file name, mtime, size) tuple for every file in the folder.
+    """
+    job_id: str
+    job_folder: str
+    html_path: str
+    zip_path: str
+    mtime: float
+    size: int
+    file_stats: list
+
+
+class FolderNode:
+    """
+    A folder in a scanned tree. file_stats holds a (file name, mtime, size) tuple for every file directly in the folder.
+    size is the total size in bytes of every file in the folder and its subfolders, and latest_mtime the latest
+    modified time among them, with a folder holding no files counting its own modified time instead.
+    """
+    __slots__ = ("path", "mtime", "depth", "file_stats", "subfolders", "size", "latest_mtime")
+
+    def __init__(self, path: str, mtime: float, depth: int):
+        self.path = path
+        self.mtime = mtime
+        self.depth = depth
+        self.file_stats = []
+        self.subfolders = []
+        self.size = 0
+        self.latest_mtime = None
+
+
+def scan_folder_tree(root: str) -> FolderNode:
+    """
+    Scan a directory tree once into FolderNode objects, summing file sizes and modified times up the tree.
+    The root node has the root's own modified time, or 0.0 when it can not be read.
+    :param root: path to the directory to scan
+    :return: FolderNode for the root
+    """
+    try:
+        root_mtime = os.stat(root).st_mtime
+    except OSError:
+        root_mtime = 0.0
+    root_node = FolderNode(path=root, mtime=root_mtime, depth=0)
+    scanned_nodes = []
+    pending_nodes = [root_node]
+    while pending_nodes:
+        node = pending_nodes.pop()
+        scanned_nodes.append(node)
+        try:
+            with os.scandir(node.path) as directory_iterator:
+                entries = list(directory_iterator)
+        except FileNotFoundError:
+            continue
+        except PermissionError as pe:
+            print(f"PermissionError: {pe}")
+            continue
+
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+                stat_result = entry.stat()
+            except FileNotFoundError:
+                continue
+            if is_dir:
+                node.subfolders.append(FolderNode(path=entry.path, mtime=stat_result.st_mtime, depth=node.depth + 1))
+            else:
+                node.file_stats.append((entry.name, stat_result.st_mtime, stat_result.st_size))
+        pending_nodes.extend(reversed(node.subfolders))
+
+    # Nodes were scanned parents first, so in reverse every subfolder is totalled before its parent
+    for node in reversed(scanned_nodes):
+        mtimes = [file_stat[1] for file_stat in node.file_stats]
+        mtimes.extend(subfolder.latest_mtime for subfolder in node.subfolders)
+        node.size = sum(file_stat[2] for file_stat in node.file_stats) + sum(subfolder.size
+                                                                             for subfolder in node.subfolders)
+        node.latest_mtime = max(mtimes) if mtimes else node.mtime
+    return root_node
+
+
+def scan_tree(root: str):
+    """
+    Walk a directory tree top down, yielding every file and folder with one cached stat per entry.
+    All entries of a folder are yielded before its subfolders are scanned. A subfolder removed by the caller in the
+    meantime, as the cleanup tool does, is skipped rather than scanned.
+    :param root: path to the directory to scan
+    :return: generator of ScannedEntry
+    """
+    pending_folders = [(root, 0)]
+    while pending_folders:
+        folder_path, depth = pending_folders.pop()
+        try:
+            with os.scandir(folder_path) as directory_iterator:
+                entries = list(directory_iterator)
+        except FileNotFoundError:
+            continue
+        except PermissionError as pe:
+            print(f"PermissionError: {pe}")
+            continue
+
+        subfolders = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+                stat_result = entry.stat()
+            except FileNotFoundError:
+                continue
+            yield ScannedEntry(path=entry.path, name=entry.name, is_dir=is_dir, mtime=stat_result.st_mtime,
+                               size=stat_result.st_size, depth=depth + 1)
+            if is_dir:
+                subfolders.append(entry.path)
+
+        # Reverse so subfolders are popped, and so scanned, in directory listing order
+        pending_folders.extend((subfolder, depth + 1) for subfolder in reversed(subfolders))
+
+
+def scan_files(root: str):
+    """
+    Yield only the files found by scan_tree
+    :param root: path to the directory to scan
+    :return: generator of ScannedEntry for files
+    """
+    return (entry for entry in scan_tree(root=root) if not entry.is_dir)
+
+
+def scan_job_folders(jobs_folder: str):
+    """
+    Yield a JobFolderRecord for every folder, at any depth, that directly contains files. In Prod, the folder name is
+    the job id. Folders are scanned directly, without building a ScannedEntry per file, since this is the hot path for
+    the analysis scripts.
+    :param jobs_folder: path to the folder containing the job folders
+    :return: generator of JobFolderRecord
+    """
+    pending_folders = [jobs_folder]
+    while pending_folders:
+        job_folder = pending_folders.pop()
+        try:
+            with os.scandir(job_folder) as directory_iterator:
+                entries = list(directory_iterator)
+        except FileNotFoundError:
+            continue
+        except PermissionError as pe:
+            print(f"PermissionError: {pe}")
+            continue
+
+        subfolders = []
+        file_stats = []
+        html_path = None
+        zip_path = None
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    subfolders.append(entry.path)
+                    continue
+                stat_result = entry.stat()
+            except FileNotFoundError:
+                continue
+            name = entry.name
+            file_stats.append((name, stat_result.st_mtime, stat_result.st_size))
+            if html_path is None and name.endswith(".html"):
+                html_path = entry.path
+            elif zip_path is None and name.endswith(".zip"):
+                zip_path = entry.path
+
+        if file_stats:
+            yield JobFolderRecord(job_id=os.path.basename(job_folder),
+                                  job_folder=job_folder,
+                                  html_path=html_path,
+                                  zip_path=zip_path,
+                                  mtime=max(file_stat[1] for file_stat in file_stats),
+                                  size=sum(file_stat[2] for file_stat in file_stats),
+                                  file_stats=file_stats)
+        pending_folders.extend(reversed(subfolders))
+
+
+def benchmark_scanners(file_count: int = 100_000, files_per_folder: int = 2, repeat: int = 3) -> dict:
+    """
+    Build a synthetic jobs tree and time os.walk plus getmtime/getsize against scan_job_folders.
+    os.stat calls made through the os module are counted for each approach. The scanner makes none, its single stat
+    per entry comes from the cached DirEntry.
+    :param file_count: number of files in the synthetic tree
+    :param files_per_folder: number of files in each job folder
+    :param repeat: number of timed passes, the best pass is reported
+    :return: dictionary of timings and stat call counts
+    """
+    import shutil
+    import tempfile
+    import time
+
+    stat_call_count = [0]
+    original_stat = os.stat
+
+    def counting_stat(*args, **kwargs):
+        stat_call_count[0] += 1
+        return original_stat(*args, **kwargs)
+
+    def walk_with_getmtime_getsize(jobs_folder):
+        for root, dirs, files in os.walk(jobs_folder):
+            for file in files:
+                full_file_path = os.path.join(root, file)
+                os.path.getmtime(full_file_path)
+                os.path.getsize(full_file_path)
+
+    def scan_with_scanner(jobs_folder):
+        for record in scan_job_folders(jobs_folder=jobs_folder):
+            pass
+
+    synthetic_root = tempfile.mkdtemp(prefix="lizardtech_scan_benchmark_")
+    try:
+        for file_index in range(file_count):
+            job_folder = os.path.join(synthetic_root, f"job_{file_index // files_per_folder:07d}")
+            if file_index % files_per_folder == 0:
+                os.mkdir(job_folder)
+            file_ext = ".html" if file_index % files_per_folder == 0 else ".zip"
+            with open(os.path.join(job_folder, f"file_{file_index}{file_ext}"), 'wb'):
+                pass
+
+        results = {"files": file_count}
+        for label, function in (("walk", walk_with_getmtime_getsize), ("scandir", scan_with_scanner)):
+            best = float("inf")
+            for _ in range(repeat):
+                stat_call_count[0] = 0
+                os.stat = counting_stat
+                try:
+                    start = time.perf_counter()
+                    function(synthetic_root)
+                    best = min(best, time.perf_counter() - start)
+                finally:
+                    os.stat = original_stat
+            results[f"{label}_seconds"] = best
+            results[f"{label}_os_stat_calls"] = stat_call_count[0]
+        return results
+    finally:
+        shutil.rmtree(synthetic_root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argument_parser = argparse.ArgumentParser(description="Benchmark os.walk against the scandir based scanner")
+    argument_parser.add_argument("--files", type=int, default=100_000, help="number of files in the synthetic tree")
+    argument_parser.add_argument("--repeat", type=int, default=3, help="number of timed passes")
+    arguments = argument_parser.parse_args()
+
+    benchmark_results = benchmark_scanners(file_count=arguments.files, repeat=arguments.repeat)
+    print(f"Files: {benchmark_results['files']}")
+    for approach in ("walk", "scandir"):
+        print(f"{approach:>8}: {benchmark_results[f'{approach}_seconds']:.3f}s, "
+              f"{benchmark_results[f'{approach}_os_stat_calls']} os.stat calls")
+    print(f"Speedup: {benchmark_results['walk_seconds'] / max(benchmark_results['scandir_seconds'], 1e-9):.1f}x")
@@ -0,0 +1,240 @@
+"""
+Server side export latency of the LizardTech jobs, mined from the log row times and the zip modified times.
+The analysis scripts read only the log session start time and ignored the Time column of the log rows, the milliseconds
+since the session start of each logged event. Two latencies are measured for each job:
+  Processing Seconds - Time of the log's last row, how long the server worked on the export
+  First Output Seconds - from the log session start to the modified time of the job's first zip
+The latencies are joined to the catalog, output format (oif), data type (dt) and resolution (res) each job requested
+in its issuing urls, and the p50, p95 and p99 of each value come out of a single grouped quantile, not a loop over the
+groups. A job requesting several catalogs counts toward each of them. The All Jobs row covers every dated job.
+
+Run this module directly to benchmark the grouped quantiles against a per group loop on synthetic jobs.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+LATENCY_QUANTILES = (0.5, 0.95, 0.99)
+LATENCY_MEASURES = ("Processing Seconds", "First Output Seconds")
+ALL_JOBS_LABEL = "All Jobs"
+DIMENSION_COLUMN = "Dimension"
+VALUE_COLUMN = "Value"
+JOB_COUNT_COLUMN = "Job Count"
+
+# Query parameters the latency is broken down by and their names on the latency sheet, in sheet order
+LATENCY_PARAMETER_NAMES = {"cat": "Catalog",
+                           "oif": "Output Format",
+                           "dt": "Data Type",
+                           "res": "Resolution",
+                           }
+
+
+def quantile_label(quantile: float) -> str:
+    """
+    Percentile label of a quantile
+    :param quantile: quantile between 0 and 1, such as 0.95
+    :return: label such as "p95"
+    """
+    return f"p{quantile * 100:g}"
+
+
+def grouped_quantiles(group_codes: np.ndarray, values: np.ndarray, group_count: int, quantiles: tuple) -> np.ndarray:
+    """
+    Quantiles of the values of every group at once, from a single sort by group and value. Quantiles interpolate
+    linearly between the closest ranks, as numpy and pandas do by default. NaN values are skipped.
+    :param group_codes: integer group of each value, from 0 to group_count - 1
+    :param values: float values
+    :param group_count: number of groups
+    :param quantiles: quantiles between 0 and 1
+    :return: float64 array of shape (group_count, len(quantiles)), NaN for groups without values
+    """
+    valid = ~np.isnan(values)
+    values = values[valid]
+    group_codes = group_codes[valid]
+    # Sorting by value, then stably by group, is several times faster than np.lexsort on the two keys
+    value_order = np.argsort(values)
+    sorted_values = values[value_order[np.argsort(group_codes[value_order], kind="stable")]]
+    value_counts = np.bincount(group_codes, minlength=group_count)
+    group_starts = np.concatenate(([0], np.cumsum(value_counts)[:-1]))
+
+    group_quantiles = np.full((group_count, len(quantiles)), np.nan)
+    has_values = value_counts > 0
+    group_starts = group_starts[has_values]
+    last_ranks = value_counts[has_values] - 1
+    for column, quantile in enumerate(quantiles):
+        ranks = last_ranks * quantile
+        lower_ranks = np.floor(ranks).astype(np.int64)
+        upper_ranks = np.minimum(lower_ranks + 1, last_ranks)
+        lower_values = sorted_values[group_starts + lower_ranks]
+        upper_values = sorted_values[group_starts + upper_ranks]
+        group_quantiles[has_values, column] = lower_values + (upper_values - lower_values) * (ranks - lower_ranks)
+    return group_quantiles
+
+
+def export_latency_frame(job_latency_df: pd.DataFrame, query_parameters_df: pd.DataFrame,
+                         parameter_names: dict = None, quantiles: tuple = LATENCY_QUANTILES) -> pd.DataFrame:
+    """
+    Compute the latency quantiles of all jobs and of the jobs requesting each value of each query parameter.
+    Only the first value of a parameter in each url is used, and a job counts once per unique value. Jobs whose urls
+    lack a parameter are left out of that parameter's rows. Missing latencies are skipped by the quantiles.
+    :param job_latency_df: dataframe from JobIndex.job_latency_frame, indexed by JOB_ID
+    :param query_parameters_df: long table from LizardTechQueryParameters.explode_query_parameters
+    :param parameter_names: dictionary of query parameter key to dimension name, in output order.
+        Defaults to LATENCY_PARAMETER_NAMES.
+    :param quantiles: quantiles to compute for each latency measure
+    :return: dataframe with Dimension, Value and Job Count columns and a column for each measure and quantile, such
+        as "Processing Seconds p95". Rows are in dimension order, most requested value first.
+    """
+    parameter_names = LATENCY_PARAMETER_NAMES if parameter_names is None else parameter_names
+    job_latency_df = job_latency_df[~job_latency_df.index.duplicated()]
+    job_count = len(job_latency_df)
+
+    values_df = query_parameters_df[(query_parameters_df["Position"] == 0)
+                                    & query_parameters_df["Parameter"].isin(list(parameter_names))]
+    job_id_codes = values_df["JOB_ID"].astype("category")
+    parameter_codes = values_df["Parameter"].astype("category")
+    value_codes = values_df["Value"].astype("category")
+
+    # Jobs, parameters and values are all matched by their category codes, never by comparing strings row by row
+    job_positions = job_latency_df.index.get_indexer(job_id_codes.cat.categories)[job_id_codes.cat.codes.to_numpy()]
+    value_category_count = max(len(value_codes.cat.categories), 1)
+    pair_keys = (parameter_codes.cat.codes.to_numpy().astype(np.int64) * value_category_count
+                 + value_codes.cat.codes.to_numpy())
+    known_jobs = job_positions >= 0
+    # A job counts once per (parameter, value) pair however many of its urls requested it
+    pair_job_keys = np.unique(pair_keys[known_jobs] * max(job_count, 1) + job_positions[known_jobs])
+    unique_pairs, pair_groups = np.unique(pair_job_keys // max(job_count, 1), return_inverse=True)
+
+    # Group 0 is All Jobs, followed by one group per (parameter, value) pair
+    group_codes = np.concatenate((np.zeros(job_count, dtype=np.int64), pair_groups.astype(np.int64) + 1))
+    row_positions = np.concatenate((np.arange(job_count), pair_job_keys % max(job_count, 1)))
+    group_count = len(unique_pairs) + 1
+
+    pair_parameters = parameter_codes.cat.categories.to_numpy(dtype=object)[unique_pairs // value_category_count]
+    latency_columns = {DIMENSION_COLUMN: [ALL_JOBS_LABEL] + [parameter_names[parameter]
+                                                             for parameter in pair_parameters],
+                       VALUE_COLUMN: [ALL_JOBS_LABEL] + value_codes.cat.categories.to_numpy(dtype=object)[
+                           unique_pairs % value_category_count].tolist(),
+                       JOB_COUNT_COLUMN: np.bincount(group_codes, minlength=group_count)}
+    for measure in LATENCY_MEASURES:
+        measure_quantiles = grouped_quantiles(group_codes=group_codes,
+                                              values=job_latency_df[measure].to_numpy(dtype=np.float64)[row_positions],
+                                              group_count=group_count, quantiles=quantiles)
+        for column, quantile in enumerate(quantiles):
+            latency_columns[f"{measure} {quantile_label(quantile=quantile)}"] = measure_quantiles[:, column]
+    latency_df = pd.DataFrame(data=latency_columns)
+
+    dimension_ranks = {dimension_name: rank
+                       for rank, dimension_name in enumerate([ALL_JOBS_LABEL] + list(parameter_names.values()))}
+    row_order = np.lexsort((-latency_df[JOB_COUNT_COLUMN].to_numpy(),
+                            latency_df[DIMENSION_COLUMN].map(dimension_ranks).to_numpy()))
+    return latency_df.iloc[row_order].reset_index(drop=True)
+
+
+def export_latency_report(latency_df: pd.DataFrame) -> dict:
+    """
+    Arrange the latency quantiles for JSON, one list of values per dimension
+    :param latency_df: dataframe from export_latency_frame
+    :return: dictionary of dimension name to a list of value dictionaries with the job count and, per measure, the
+        seconds at each quantile. Missing quantiles are None.
+    """
+    quantile_columns = {}
+    for measure in LATENCY_MEASURES:
+        quantile_columns[measure] = [column for column in latency_df.columns if column.startswith(f"{measure} p")]
+
+    latency_report = {}
+    for row in latency_df.to_dict(orient="records"):
+        value_report = {"value": row[VALUE_COLUMN], "job_count": int(row[JOB_COUNT_COLUMN])}
+        for measure, columns in quantile_columns.items():
+            value_report[measure.lower().replace(" ", "_")] = {
+                column[len(measure) + 1:]: None if math.isnan(row[column]) else row[column] for column in columns}
+        latency_report.setdefault(row[DIMENSION_COLUMN], []).append(value_report)
+    return latency_report
+
+
+def write_export_latency_json(latency_df: pd.DataFrame, file_path: str):
+    """
+    Write the latency quantiles as JSON
+    :param latency_df: dataframe from export_latency_frame
+    :param file_path: path of the json file
+    :return: None
+    """
+    with open(file_path, "w") as latency_file:
+        json.dump(export_latency_report(latency_df=latency_df), latency_file, indent=2)
+
+
+def benchmark_export_latency(job_count: int = 100_000, urls_per_job: int = 2, include_loop: bool = True,
+                             seed: int = 0) -> dict:
+    """
+    Time export_latency_frame against a per group loop of quantiles on synthetic jobs and issuing urls
+    :param job_count: number of synthetic jobs
+    :param urls_per_job: number of issuing urls per synthetic job
+    :param include_loop: time the per group loop too
+    :param seed: random seed for the synthetic latencies and parameter values
+    :return: dictionary of seconds for each approach
+    """
+    import time
+
+    from LizardTechQueryParameters import explode_query_parameters
+
+    random_generator = np.random.default_rng(seed)
+    catalogs = np.array([f"Catalog_{catalog_index}" for catalog_index in range(40)], dtype=object)
+    output_formats = np.array(["las", "laz", "tif", "jp2"], dtype=object)
+    url_count = job_count * urls_per_job
+    job_keys = np.array([f"job_{job_index}" for job_index in range(job_count)], dtype=object)
+    catalog_choices = catalogs[random_generator.integers(0, len(catalogs), size=url_count)]
+    format_choices = output_formats[random_generator.integers(0, len(output_formats), size=url_count)]
+    resolutions = random_generator.integers(1, 4, size=url_count)
+    urls = [f"http://host/getcloud?cat={catalog}&res={resolution}&dt=las&oif={output_format}"
+            for catalog, resolution, output_format in zip(catalog_choices, resolutions, format_choices)]
+    issuing_url_series = pd.Series(data=urls, index=pd.Index(np.repeat(job_keys, urls_per_job), name="JOB_ID"))
+    query_parameters_df = explode_query_parameters(issuing_url_series=issuing_url_series)
+    job_latency_df = pd.DataFrame(data={"Processing Seconds": random_generator.lognormal(4, 1, size=job_count),
+                                        "First Output Seconds": random_generator.lognormal(4.5, 1, size=job_count)},
+                                  index=pd.Index(job_keys, name="JOB_ID"))
+
+    def per_group_loop():
+        values_df = query_parameters_df[query_parameters_df["Position"] == 0].drop_duplicates(
+            subset=["JOB_ID", "Parameter", "Value"])
+        group_rows = []
+        for (parameter, value), group in values_df.groupby(by=["Parameter", "Value"], observed=True):
+            group_latency_df = job_latency_df.loc[group["JOB_ID"].astype(object)]
+            group_rows.append((parameter, value, len(group),
+                               *np.nanquantile(group_latency_df.to_numpy(), LATENCY_QUANTILES, axis=0).ravel()))
+        return group_rows
+
+    approaches = [("vectorized", lambda: export_latency_frame(job_latency_df=job_latency_df,
+                                                              query_parameters_df=query_parameters_df))]
+    if include_loop:
+        approaches.append(("per_group_loop", per_group_loop))
+
+    results = {"jobs": job_count, "urls": url_count}
+    for label, function in approaches:
+        start = time.perf_counter()
+        function()
+        results[f"{label}_seconds"] = time.perf_counter() - start
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argument_parser = argparse.ArgumentParser(description="Benchmark the grouped export latency quantiles against a "
+                                                          "per group loop")
+    argument_parser.add_argument("--jobs", type=int, default=100_000, help="number of synthetic jobs")
+    argument_parser.add_argument("--urls-per-job", type=int, default=2, help="issuing urls per synthetic job")
+    argument_parser.add_argument("--skip-loop", action="store_true", help="do not time the per group loop")
+    arguments = argument_parser.parse_args()
+
+    benchmark_results = benchmark_export_latency(job_count=arguments.jobs, urls_per_job=arguments.urls_per_job,
+                                                 include_loop=not arguments.skip_loop)
+    print(f"Jobs: {benchmark_results['jobs']}  URLs: {benchmark_results['urls']}")
+    for approach in ("per_group_loop", "vectorized"):
+        if f"{approach}_seconds" in benchmark_results:
+            print(f"{approach:>16}: {benchmark_results[f'{approach}_seconds']:.3f}s")
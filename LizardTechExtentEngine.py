@@ -0,0 +1,429 @@
+"""
+Vectorized engine for the export extents requested in the LizardTech lidar issuing urls.
+The "Mappable Extents" sheet used to hold each url's bounds as a tuple of strings, and ProcessExportingExtentsToSpatial
+re-read the workbook and split every string with .apply to drop the z values at fixed positions. Here the first srs and
+bounds value of every issuing url are parsed in one vectorized step into a float64 array of (minx, miny, maxx, maxy,
+srs code) rows. Bounds come as "minx,miny,z,maxx,maxy,z", or as "minx,miny,maxx,maxy" without z values. Every extent
+is validated and given a problem code: missing or malformed bounds, a missing srs, a box of zero area, or a box whose
+maximum is below its minimum. The valid extents are written straight from the analysis run as:
+  GeoJSON - one polygon feature per extent, in the coordinates of its srs. Without a projection library the extents
+            can not be transformed to WGS84, so when every extent shares one srs the collection names it in the
+            pre-RFC 7946 "crs" member, which GIS software still honors.
+  GeoPackage - one feature table per srs with an R*Tree spatial index, written with sqlite3 and no GIS dependency
+Run this module directly to report the parse cost at increasing extent counts.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import datetime
+import json
+import os
+import sqlite3
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# Problem codes of an extent, in the order they are checked. Only the first problem found is kept.
+VALID_EXTENT = 0
+MISSING_BOUNDS = 1
+MALFORMED_BOUNDS = 2
+MISSING_SRS = 3
+ZERO_AREA = 4
+INVERTED_BOUNDS = 5
+EXTENT_PROBLEM_LABELS = ("", "Missing Bounds", "Malformed Bounds", "Missing SRS", "Zero Area", "Inverted Bounds")
+
+# Columns of the extent array
+MIN_X, MIN_Y, MAX_X, MAX_Y, SRS_CODE = range(5)
+EXTENT_COLUMNS = ["Min X", "Min Y", "Max X", "Max Y", "SRS Code"]
+
+_GEOPACKAGE_APPLICATION_ID = 0x47504B47
+_GEOPACKAGE_USER_VERSION = 10200
+_WGS84_DEFINITION = ('GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563]],'
+                     'PRIMEM["Greenwich",0],UNIT["degree",0.0174532925199433],AUTHORITY["EPSG","4326"]]')
+
+# GeoPackage geometry blob of a rectangle: the GP header with its little endian [minx, maxx, miny, maxy] envelope,
+#   then the little endian WKB polygon of one closed ring of five points. The fields are packed, 133 bytes per blob.
+_POLYGON_BLOB_DTYPE = np.dtype([("magic", "S2"), ("version", "u1"), ("flags", "u1"), ("srs_id", "<i4"),
+                                ("envelope", "<f8", (4,)), ("byte_order", "u1"), ("geometry_type", "<u4"),
+                                ("ring_count", "<u4"), ("point_count", "<u4"), ("points", "<f8", (5, 2))])
+_ENVELOPE_XY_FLAGS = 0b00000011
+_WKB_POLYGON = 3
+
+
+class ExtentTable(NamedTuple):
+    """
+    Parsed export extents, one row per issuing url. extents is a float64 array of shape (n, 5) with the columns
+    MIN_X, MIN_Y, MAX_X, MAX_Y and SRS_CODE, NaN where a value is missing or malformed. problems holds the problem
+    code of each row, VALID_EXTENT for extents that can be mapped.
+    """
+    job_ids: np.ndarray
+    srs_names: np.ndarray
+    extents: np.ndarray
+    problems: np.ndarray
+
+    @property
+    def valid(self) -> np.ndarray:
+        return self.problems == VALID_EXTENT
+
+    def take(self, mask_or_indices) -> "ExtentTable":
+        """
+        Select rows of the table
+        :param mask_or_indices: boolean mask or integer positions
+        :return: ExtentTable of the selected rows
+        """
+        return ExtentTable(job_ids=self.job_ids[mask_or_indices], srs_names=self.srs_names[mask_or_indices],
+                           extents=self.extents[mask_or_indices], problems=self.problems[mask_or_indices])
+
+
+def _parse_floats(fields: list) -> np.ndarray:
+    """
+    Convert number strings to float64 in one step, falling back to a coercing conversion only when a field is malformed
+    :param fields: list of number strings
+    :return: float64 array, NaN for malformed fields
+    """
+    try:
+        return np.array(fields, dtype=np.float64)
+    except ValueError:
+        return pd.to_numeric(pd.Series(fields, dtype=object).str.strip(), errors="coerce").to_numpy(dtype=np.float64)
+
+
+def parse_bounds(bounds_values: np.ndarray) -> np.ndarray:
+    """
+    Parse bounds strings into a float64 array of (minx, miny, maxx, maxy) rows. Strings with six fields hold a z value
+    after each corner, strings with four fields have none. The values of every string with the same field count are
+    joined, split and converted to floats together.
+    :param bounds_values: object array of bounds strings, None or NaN where a url has no bounds
+    :return: float64 array of shape (n, 4), rows of NaN where the bounds are missing or malformed
+    """
+    bounds_values = np.asarray(bounds_values, dtype=object)
+    parsed_bounds = np.full((len(bounds_values), 4), np.nan)
+    present_rows = np.flatnonzero(pd.notna(bounds_values))
+    present_values = bounds_values[present_rows].tolist()
+    field_counts = np.array([bounds_value.count(",") + 1 for bounds_value in present_values], dtype=np.int64)
+    for field_count, corner_columns in ((6, [0, 1, 3, 4]), (4, [0, 1, 2, 3])):
+        value_positions = np.flatnonzero(field_counts == field_count)
+        if not len(value_positions):
+            continue
+        fields = ",".join([present_values[position] for position in value_positions.tolist()]).split(",")
+        values = _parse_floats(fields=fields).reshape(len(value_positions), field_count)
+        parsed_bounds[present_rows[value_positions]] = values[:, corner_columns]
+    return parsed_bounds
+
+
+def parse_srs_codes(srs_values: np.ndarray) -> np.ndarray:
+    """
+    Parse the numeric code of spatial reference systems such as "EPSG:26985". A run uses only a handful of distinct
+    srs values, so each distinct value is parsed once.
+    :param srs_values: object array of srs strings, None where a url has no srs
+    :return: float64 array of codes, NaN where the srs is missing or has no trailing number
+    """
+    srs_value_codes, unique_srs_values = pd.factorize(pd.Series(srs_values, dtype=object))
+    unique_codes = pd.to_numeric(pd.Series(unique_srs_values, dtype=object).astype(str)
+                                 .str.extract(r"(\d+)\s*$", expand=False), errors="coerce").to_numpy(dtype=np.float64)
+    # factorize gives missing values the code -1, which picks the NaN appended to the codes
+    return np.append(unique_codes, np.nan)[srs_value_codes]
+
+
+def parse_extents(job_ids: np.ndarray, srs_values: np.ndarray, bounds_values: np.ndarray) -> ExtentTable:
+    """
+    Parse and validate the srs and bounds of every issuing url
+    :param job_ids: array of the JOB_ID of each url
+    :param srs_values: object array of each url's first srs value, None where missing
+    :param bounds_values: object array of each url's first bounds value, None where missing
+    :return: ExtentTable
+    """
+    bounds_values = np.asarray(bounds_values, dtype=object)
+    extents = np.column_stack([parse_bounds(bounds_values=bounds_values), parse_srs_codes(srs_values=srs_values)])
+    missing_bounds = pd.isna(bounds_values)
+    width = extents[:, MAX_X] - extents[:, MIN_X]
+    height = extents[:, MAX_Y] - extents[:, MIN_Y]
+    problems = np.select(condlist=[missing_bounds,
+                                   np.isnan(extents[:, :SRS_CODE]).any(axis=1) | ~np.isfinite(width * height),
+                                   np.isnan(extents[:, SRS_CODE]),
+                                   (width == 0) | (height == 0),
+                                   (width < 0) | (height < 0)],
+                         choicelist=[MISSING_BOUNDS, MALFORMED_BOUNDS, MISSING_SRS, ZERO_AREA, INVERTED_BOUNDS],
+                         default=VALID_EXTENT).astype(np.uint8)
+    return ExtentTable(job_ids=np.asarray(job_ids, dtype=object), srs_names=np.asarray(srs_values, dtype=object),
+                       extents=extents, problems=problems)
+
+
+def extents_from_query_parameters(query_parameters_df: pd.DataFrame, issuing_url_series: pd.Series) -> ExtentTable:
+    """
+    Parse the extents of every issuing url from the long query parameter table
+    :param query_parameters_df: long table from LizardTechQueryParameters.explode_query_parameters
+    :param issuing_url_series: series of issuing urls indexed by JOB_ID, the long table was exploded from
+    :return: ExtentTable with one row per url, in url order
+    """
+    url_count = issuing_url_series.size
+    first_values = {}
+    for parameter in ("srs", "bounds"):
+        parameter_df = query_parameters_df[(query_parameters_df["Parameter"] == parameter)
+                                           & (query_parameters_df["Position"] == 0)]
+        values = np.full(url_count, None, dtype=object)
+        values[parameter_df["URL_ID"].to_numpy()] = parameter_df["Value"].astype(object).to_numpy()
+        first_values[parameter] = values
+    return parse_extents(job_ids=issuing_url_series.index.to_numpy(), srs_values=first_values["srs"],
+                         bounds_values=first_values["bounds"])
+
+
+def deduplicate_extents(extent_table: ExtentTable) -> ExtentTable:
+    """
+    Drop rows repeating the srs and extent of an earlier row, whatever their job, as the analysis always has
+    :param extent_table: ExtentTable
+    :return: ExtentTable of the first occurrence of each srs and extent
+    """
+    extents_df = pd.DataFrame(data=extent_table.extents)
+    extents_df["srs"] = extent_table.srs_names
+    return extent_table.take(~extents_df.duplicated().to_numpy())
+
+
+def mappable_extents_frame(extent_table: ExtentTable, job_dates_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Build the "Mappable Extents" sheet from parsed extents
+    :param extent_table: ExtentTable, deduplicated as it should appear on the sheet
+    :param job_dates_df: dataframe with a Job_Date column indexed by unique JOB_ID
+    :return: dataframe indexed by JOB_ID with Spatial Ref Sys, the float columns of EXTENT_COLUMNS, Extent Problem
+        and Job_Date columns
+    """
+    extents_df = pd.DataFrame(data=extent_table.extents, columns=EXTENT_COLUMNS,
+                              index=pd.Index(extent_table.job_ids, name="JOB_ID"))
+    extents_df.insert(loc=0, column="Spatial Ref Sys", value=extent_table.srs_names)
+    extents_df["Extent Problem"] = np.array(EXTENT_PROBLEM_LABELS, dtype=object)[extent_table.problems]
+    return extents_df.join(other=job_dates_df, how="left")
+
+
+def extent_job_dates(extent_table: ExtentTable, job_dates_df: pd.DataFrame) -> np.ndarray:
+    """
+    Job date of each row of an extent table, for the spatial file writers
+    :param extent_table: ExtentTable
+    :param job_dates_df: dataframe with a Job_Date column indexed by unique JOB_ID
+    :return: datetime64 array aligned with the table rows, NaT where a job has no date
+    """
+    return job_dates_df["Job_Date"].reindex(extent_table.job_ids).to_numpy()
+
+
+def _job_date_strings(job_dates) -> list:
+    """
+    ISO strings of the job dates of mapped extents
+    :param job_dates: sequence of datetimes or NaT, or None
+    :return: list of ISO strings, None for missing dates
+    """
+    if job_dates is None:
+        return None
+    return [None if pd.isna(job_date) else pd.Timestamp(job_date).isoformat() for job_date in job_dates]
+
+
+def _polygon_rings(extents: np.ndarray) -> np.ndarray:
+    """
+    Closed counterclockwise rings of rectangles
+    :param extents: float64 array of extent rows
+    :return: float64 array of shape (n, 5, 2)
+    """
+    x_columns = [MIN_X, MAX_X, MAX_X, MIN_X, MIN_X]
+    y_columns = [MIN_Y, MIN_Y, MAX_Y, MAX_Y, MIN_Y]
+    return np.stack([extents[:, x_columns], extents[:, y_columns]], axis=2)
+
+
+def write_extents_geojson(extent_table: ExtentTable, file_path: str, job_dates=None) -> int:
+    """
+    Write the valid extents as a GeoJSON feature collection of polygons with JOB_ID, Spatial Ref Sys and Job_Date
+    properties
+    :param extent_table: ExtentTable
+    :param file_path: path of the .geojson file to write
+    :param job_dates: optional sequence of the job date of each row of the table
+    :return: number of features written
+    """
+    valid = extent_table.valid
+    mapped_table = extent_table.take(valid)
+    date_strings = _job_date_strings(job_dates=None if job_dates is None else np.asarray(job_dates)[valid])
+    rings = _polygon_rings(extents=mapped_table.extents).tolist()
+    if date_strings is None:
+        date_strings = [None] * len(rings)
+    features = [{"type": "Feature",
+                 "properties": {"JOB_ID": str(job_id), "Spatial Ref Sys": srs_name, "Job_Date": date_string},
+                 "geometry": {"type": "Polygon", "coordinates": [ring]}}
+                for job_id, srs_name, date_string, ring in zip(mapped_table.job_ids, mapped_table.srs_names,
+                                                               date_strings, rings)]
+    feature_collection = {"type": "FeatureCollection", "features": features}
+    srs_codes = np.unique(mapped_table.extents[:, SRS_CODE])
+    if len(srs_codes) == 1:
+        feature_collection["crs"] = {"type": "name",
+                                     "properties": {"name": f"urn:ogc:def:crs:EPSG::{int(srs_codes[0])}"}}
+    with open(file_path, 'w') as geojson_file:
+        json.dump(feature_collection, geojson_file)
+    return len(features)
+
+
+def _polygon_blobs(extents: np.ndarray, srs_id: int) -> list:
+    """
+    GeoPackage geometry blobs of rectangles, built together in one structured array
+    :param extents: float64 array of extent rows
+    :param srs_id: srs_id of the feature table
+    :return: list of bytes, one blob per row
+    """
+    records = np.zeros(len(extents), dtype=_POLYGON_BLOB_DTYPE)
+    records["magic"] = b"GP"
+    records["flags"] = _ENVELOPE_XY_FLAGS
+    records["srs_id"] = srs_id
+    records["envelope"] = extents[:, [MIN_X, MAX_X, MIN_Y, MAX_Y]]
+    records["byte_order"] = 1
+    records["geometry_type"] = _WKB_POLYGON
+    records["ring_count"] = 1
+    records["point_count"] = 5
+    records["points"] = _polygon_rings(extents=extents)
+    blob_size = _POLYGON_BLOB_DTYPE.itemsize
+    buffer = records.tobytes()
+    return [buffer[start:start + blob_size] for start in range(0, len(buffer), blob_size)]
+
+
+def write_extents_geopackage(extent_table: ExtentTable, file_path: str, job_dates=None) -> dict:
+    """
+    Write the valid extents to a GeoPackage, one polygon feature table named extents_<srs code> per spatial reference
+    system, each with an R*Tree spatial index. The file is written once, so the index is filled directly and the
+    triggers that keep it current through later edits are not created.
+    :param extent_table: ExtentTable
+    :param file_path: path of the .gpkg file to write, replaced when it exists
+    :param job_dates: optional sequence of the job date of each row of the table
+    :return: dictionary of feature table name to number of features written
+    """
+    valid = extent_table.valid
+    mapped_table = extent_table.take(valid)
+    date_strings = _job_date_strings(job_dates=None if job_dates is None else np.asarray(job_dates)[valid])
+    temporary_path = file_path + ".tmp"
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+    connection = sqlite3.connect(temporary_path)
+    feature_counts = {}
+    try:
+        with connection:
+            connection.execute(f"PRAGMA application_id = {_GEOPACKAGE_APPLICATION_ID}")
+            connection.execute(f"PRAGMA user_version = {_GEOPACKAGE_USER_VERSION}")
+            connection.execute("CREATE TABLE gpkg_spatial_ref_sys (srs_name TEXT NOT NULL, srs_id INTEGER PRIMARY KEY, "
+                               "organization TEXT NOT NULL, organization_coordsys_id INTEGER NOT NULL, "
+                               "definition TEXT NOT NULL, description TEXT)")
+            connection.execute("CREATE TABLE gpkg_contents (table_name TEXT NOT NULL PRIMARY KEY, "
+                               "data_type TEXT NOT NULL, identifier TEXT UNIQUE, description TEXT DEFAULT '', "
+                               "last_change DATETIME NOT NULL, min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, "
+                               "max_y DOUBLE, srs_id INTEGER REFERENCES gpkg_spatial_ref_sys(srs_id))")
+            connection.execute("CREATE TABLE gpkg_geometry_columns (table_name TEXT NOT NULL, "
+                               "column_name TEXT NOT NULL, geometry_type_name TEXT NOT NULL, srs_id INTEGER NOT NULL, "
+                               "z TINYINT NOT NULL, m TINYINT NOT NULL, PRIMARY KEY (table_name, column_name))")
+            connection.execute("CREATE TABLE gpkg_extensions (table_name TEXT, column_name TEXT, "
+                               "extension_name TEXT NOT NULL, definition TEXT NOT NULL, scope TEXT NOT NULL, "
+                               "UNIQUE (table_name, column_name, extension_name))")
+            connection.executemany("INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)",
+                                   [("Undefined cartesian SRS", -1, "NONE", -1, "undefined", None),
+                                    ("Undefined geographic SRS", 0, "NONE", 0, "undefined", None),
+                                    ("WGS 84 geodetic", 4326, "EPSG", 4326, _WGS84_DEFINITION, None)])
+
+            last_change = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="milliseconds")
+            last_change = last_change.replace("+00:00", "Z")
+            srs_codes = mapped_table.extents[:, SRS_CODE].astype(np.int64)
+            for srs_code in np.unique(srs_codes):
+                srs_code = int(srs_code)
+                rows = np.flatnonzero(srs_codes == srs_code)
+                srs_table = mapped_table.take(rows)
+                table_name = f"extents_{srs_code}"
+                if srs_code != 4326:
+                    connection.execute("INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)",
+                                       (f"EPSG:{srs_code}", srs_code, "EPSG", srs_code, "undefined", None))
+                connection.execute(f"CREATE TABLE {table_name} (fid INTEGER PRIMARY KEY AUTOINCREMENT, "
+                                   f"geom POLYGON, job_id TEXT, srs TEXT, job_date DATETIME)")
+                connection.executemany(f"INSERT INTO {table_name} (fid, geom, job_id, srs, job_date) "
+                                       f"VALUES (?, ?, ?, ?, ?)",
+                                       zip(range(1, len(rows) + 1),
+                                           _polygon_blobs(extents=srs_table.extents, srs_id=srs_code),
+                                           (str(job_id) for job_id in srs_table.job_ids),
+                                           srs_table.srs_names.tolist(),
+                                           [None] * len(rows) if date_strings is None
+                                           else [date_strings[row] for row in rows]))
+                connection.execute(f"CREATE VIRTUAL TABLE rtree_{table_name}_geom USING rtree(id, minx, maxx, miny, "
+                                   f"maxy)")
+                connection.executemany(f"INSERT INTO rtree_{table_name}_geom VALUES (?, ?, ?, ?, ?)",
+                                       zip(range(1, len(rows) + 1),
+                                           *(srs_table.extents[:, column].tolist()
+                                             for column in (MIN_X, MAX_X, MIN_Y, MAX_Y))))
+                connection.execute("INSERT INTO gpkg_contents VALUES (?, 'features', ?, '', ?, ?, ?, ?, ?, ?)",
+                                   (table_name, table_name, last_change, float(srs_table.extents[:, MIN_X].min()),
+                                    float(srs_table.extents[:, MIN_Y].min()), float(srs_table.extents[:, MAX_X].max()),
+                                    float(srs_table.extents[:, MAX_Y].max()), srs_code))
+                connection.execute("INSERT INTO gpkg_geometry_columns VALUES (?, 'geom', 'POLYGON', ?, 0, 0)",
+                                   (table_name, srs_code))
+                connection.execute("INSERT INTO gpkg_extensions VALUES (?, 'geom', 'gpkg_rtree_index', "
+                                   "'http://www.geopackage.org/spec120/#extension_rtree', 'write-only')",
+                                   (table_name,))
+                feature_counts[table_name] = len(rows)
+    finally:
+        connection.close()
+    os.replace(temporary_path, file_path)
+    return feature_counts
+
+
+def write_extent_files(extent_table: ExtentTable, file_path_stem: str, job_dates=None) -> str:
+    """
+    Write the valid extents as GeoJSON and as a GeoPackage
+    :param extent_table: ExtentTable
+    :param file_path_stem: output path without extension, .geojson and .gpkg are added
+    :param job_dates: optional sequence of the job date of each row of the table
+    :return: summary line of the extents written and skipped
+    """
+    feature_count = write_extents_geojson(extent_table=extent_table, file_path=f"{file_path_stem}.geojson",
+                                          job_dates=job_dates)
+    write_extents_geopackage(extent_table=extent_table, file_path=f"{file_path_stem}.gpkg", job_dates=job_dates)
+    problem_counts = np.bincount(extent_table.problems, minlength=len(EXTENT_PROBLEM_LABELS))
+    skipped = ", ".join(f"{count} {label}" for label, count in zip(EXTENT_PROBLEM_LABELS[1:], problem_counts[1:])
+                        if count)
+    return (f"Extents: {feature_count} mapped to {file_path_stem}.geojson and .gpkg"
+            + (f", skipped {skipped}" if skipped else ""))
+
+
+def benchmark_extent_parsing(extent_counts: list, seed: int = 0) -> list:
+    """
+    Time parse_extents against the .apply split and pop of each bounds string it replaced, followed by the float
+    conversion mapping needs, on synthetic bounds
+    :param extent_counts: list of extent counts to time
+    :param seed: random seed for the synthetic bounds
+    :return: list of (extent count, apply seconds, engine seconds) tuples
+    """
+    import time
+
+    def process_raw_extent_value(val):
+        val_list = val.split(",")
+        val_list.pop(5)
+        val_list.pop(2)
+        return val_list
+
+    random_generator = np.random.default_rng(seed)
+    timing_results = []
+    for extent_count in extent_counts:
+        minimum_xs = random_generator.integers(400000, 450000, size=extent_count)
+        minimum_ys = random_generator.integers(100000, 150000, size=extent_count)
+        bounds_values = np.array([f"{minimum_x},{minimum_y},0,{minimum_x + 1000},{minimum_y + 1500},0"
+                                  for minimum_x, minimum_y in zip(minimum_xs, minimum_ys)], dtype=object)
+        srs_values = np.full(extent_count, "EPSG:26985", dtype=object)
+
+        start = time.perf_counter()
+        np.array(pd.Series(bounds_values).apply(process_raw_extent_value).tolist(), dtype=np.float64)
+        apply_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        parse_extents(job_ids=np.arange(extent_count), srs_values=srs_values, bounds_values=bounds_values)
+        engine_seconds = time.perf_counter() - start
+        timing_results.append((extent_count, apply_seconds, engine_seconds))
+    return timing_results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argument_parser = argparse.ArgumentParser(description="Report the extent parse cost against the .apply split")
+    argument_parser.add_argument("--extents", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                                 help="extent counts to time")
+    arguments = argument_parser.parse_args()
+
+    for count, apply_time, engine_time in benchmark_extent_parsing(extent_counts=arguments.extents):
+        print(f"{count:>9} extents: apply split {apply_time:.3f}s, engine {engine_time:.3f}s (validated), "
+              f"{apply_time / max(engine_time, 1e-9):.1f}x")
@@ -0,0 +1,324 @@
+"""
+Instrumentation of the sections of the LizardTech analysis scripts, written out as a JSON run report.
+A slow nightly run left only a few print lines to go on. A RunInstrument records, for every section of main():
+  wall_seconds and cpu_seconds - elapsed and process CPU time of the section. CPU time well below wall time points at
+                                 file system waits, above it at worker processes.
+  peak_rss_bytes - the process's peak resident set size at the end of the section, and peak_rss_growth_bytes how much
+                   the section raised it
+  traced_peak_bytes - with tracemalloc on, the peak of Python allocations during the section
+Sections follow one another with mark(), one line at the top of each section of main(), or nest with the section()
+context manager. A section's times include its nested sections. Counters record what the run saw: files, logs
+parsed, logs skipped for having no table, duplicates dropped and so on. Timers add up time spent inside the ingest
+workers, parsing html and reading zip central directories, which with several workers can exceed the wall time.
+cProfile and tracemalloc can be turned on for the whole run, their stats dumped to files for pstats and
+tracemalloc.Snapshot.load. A disabled instrument returns at once from every call, so the scripts keep their calls in
+place at no measurable cost.
+
+Run this module directly to print a run report.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import contextlib
+import datetime
+import json
+import os
+import sys
+import time
+
+from LizardTechOutputWriters import peak_rss_bytes
+
+REPORT_VERSION = 1
+
+_NULL_SECTION = contextlib.nullcontext()
+
+
+class _OpenSection:
+    """
+    Measurements at the start of a section that has not ended
+    """
+    __slots__ = ("name", "parent", "depth", "position", "wall_start", "cpu_start", "peak_rss_start", "traced_peak")
+
+    def __init__(self, name: str, parent, depth: int, position: int):
+        self.name = name
+        self.parent = parent
+        self.depth = depth
+        self.position = position
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.peak_rss_start = peak_rss_bytes()
+        self.traced_peak = 0
+
+
+class RunInstrument:
+    """
+    Section times, memory and counters of one analysis run
+    :param enabled: record anything at all. A disabled instrument ignores every call.
+    :param profile_path: optional path of a cProfile stats file for the whole run
+    :param tracemalloc_path: optional path of a tracemalloc snapshot taken at the end of the run. Also records the
+        traced peak of every section. Tracing slows allocation heavy code severalfold.
+    """
+
+    def __init__(self, enabled: bool = True, profile_path: str = None, tracemalloc_path: str = None):
+        self.enabled = enabled or bool(profile_path or tracemalloc_path)
+        self.profile_path = profile_path
+        self.tracemalloc_path = tracemalloc_path
+        self.started = datetime.datetime.now()
+        self.sections = []
+        self.counters = {}
+        self.timers = {}
+        self._open_sections = []
+        self._marked_section = None
+        self._profiler = None
+        self._tracemalloc = None
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        if not self.enabled:
+            return
+        if tracemalloc_path:
+            import tracemalloc
+            self._tracemalloc = tracemalloc
+            tracemalloc.start()
+        if profile_path:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def _begin(self, name: str):
+        parent = self._open_sections[-1] if self._open_sections else None
+        if self._tracemalloc is not None:
+            if parent is not None:
+                parent.traced_peak = max(parent.traced_peak, self._tracemalloc.get_traced_memory()[1])
+            self._tracemalloc.reset_peak()
+        # Sections are reported in the order they started, so a slot is kept until the section ends
+        self._open_sections.append(_OpenSection(name=name, parent=parent.name if parent is not None else None,
+                                                depth=len(self._open_sections), position=len(self.sections)))
+        self.sections.append(None)
+
+    def _end(self):
+        open_section = self._open_sections.pop()
+        peak_rss = peak_rss_bytes()
+        section = {"name": open_section.name,
+                   "parent": open_section.parent,
+                   "depth": open_section.depth,
+                   "wall_seconds": time.perf_counter() - open_section.wall_start,
+                   "cpu_seconds": time.process_time() - open_section.cpu_start,
+                   "peak_rss_bytes": peak_rss,
+                   "peak_rss_growth_bytes": (peak_rss - open_section.peak_rss_start
+                                             if peak_rss is not None and open_section.peak_rss_start is not None
+                                             else None)}
+        if self._tracemalloc is not None:
+            traced_peak = max(open_section.traced_peak, self._tracemalloc.get_traced_memory()[1])
+            section["traced_peak_bytes"] = traced_peak
+            if self._open_sections:
+                self._open_sections[-1].traced_peak = max(self._open_sections[-1].traced_peak, traced_peak)
+            self._tracemalloc.reset_peak()
+        self.sections[open_section.position] = section
+
+    def mark(self, name: str):
+        """
+        End the section started by the previous mark, with any sections still open inside it, and start the next
+        :param name: section name
+        :return: None
+        """
+        if not self.enabled:
+            return
+        self._end_marked_section()
+        self._begin(name=name)
+        self._marked_section = self._open_sections[-1]
+
+    def _end_marked_section(self):
+        if self._marked_section is None:
+            return
+        while self._open_sections:
+            is_marked_section = self._open_sections[-1] is self._marked_section
+            self._end()
+            if is_marked_section:
+                break
+        self._marked_section = None
+
+    def section(self, name: str):
+        """
+        Context manager timing a block as a section nested in the current section
+        :param name: section name
+        :return: context manager
+        """
+        if not self.enabled:
+            return _NULL_SECTION
+        return self._section(name=name)
+
+    @contextlib.contextmanager
+    def _section(self, name: str):
+        self._begin(name=name)
+        open_section = self._open_sections[-1]
+        try:
+            yield
+        finally:
+            if open_section in self._open_sections:
+                while self._open_sections[-1] is not open_section:
+                    self._end()
+                self._end()
+
+    def count(self, name: str, amount: int = 1):
+        """
+        Add to a counter
+        :param name: counter name
+        :param amount: amount to add
+        :return: None
+        """
+        if not self.enabled:
+            return
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, name: str, seconds: float):
+        """
+        Add to a timer, for time measured elsewhere such as in worker processes
+        :param name: timer name
+        :param seconds: seconds to add
+        :return: None
+        """
+        if not self.enabled:
+            return
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    def add_job_result(self, job_result):
+        """
+        Count the files, logs and zips of a freshly ingested job folder and add its parse and zip inspection times
+        :param job_result: JobResult from LizardTechJobIngest
+        :return: None
+        """
+        if not self.enabled:
+            return
+        self.count(name="job_folders_ingested")
+        self.count(name="files_seen", amount=len(job_result.file_mtimes))
+        self.count(name="html_logs_parsed", amount=len(job_result.html_logs))
+        self.count(name="html_parse_failures", amount=job_result.parse_failures)
+        self.count(name="start_time_fallbacks", amount=job_result.start_time_fallbacks)
+        self.count(name="unparsable_start_times", amount=job_result.unparsable_start_times)
+        self.count(name="zip_files_inspected", amount=len(job_result.zip_inspections))
+        self.count(name="zip_inspection_errors",
+                   amount=sum(zip_inspection.error is not None for zip_inspection in job_result.zip_inspections))
+        self.add_time(name="html_parse", seconds=job_result.html_parse_seconds)
+        self.add_time(name="zip_inspect", seconds=job_result.zip_inspect_seconds)
+
+    def instrument_ingest_function(self, ingest_function):
+        """
+        Wrap an ingest function, such as ingest_job_folders passed to the job manifest or archive, to time it as the
+        ingest section and count its results
+        :param ingest_function: callable returning a list of JobResult
+        :return: the wrapped callable, or ingest_function itself when disabled
+        """
+        if not self.enabled:
+            return ingest_function
+
+        def instrumented_ingest_function(*args, **kwargs):
+            with self.section(name="ingest"):
+                job_results = ingest_function(*args, **kwargs)
+            for job_result in job_results:
+                self.add_job_result(job_result=job_result)
+            return job_results
+        return instrumented_ingest_function
+
+    def instrument_job_results(self, job_results):
+        """
+        Count each JobResult of an iterable of freshly ingested job results as it is consumed
+        :param job_results: iterable of JobResult
+        :return: iterable of the same JobResult, or job_results itself when disabled
+        """
+        if not self.enabled:
+            return job_results
+        return self._counted_job_results(job_results=job_results)
+
+    def _counted_job_results(self, job_results):
+        for job_result in job_results:
+            self.add_job_result(job_result=job_result)
+            yield job_result
+
+    def close(self):
+        """
+        End the open sections and write the cProfile and tracemalloc dumps
+        :return: None
+        """
+        if not self.enabled:
+            return
+        self._end_marked_section()
+        while self._open_sections:
+            self._end()
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_path)
+            self._profiler = None
+        if self._tracemalloc is not None:
+            self._tracemalloc.take_snapshot().dump(self.tracemalloc_path)
+            self._tracemalloc.stop()
+            self._tracemalloc = None
+
+    def report(self, script_name: str = None, arguments: dict = None) -> dict:
+        """
+        Build the run report
+        :param script_name: name of the script that ran
+        :param arguments: command line arguments of the run
+        :return: dictionary ready for json
+        """
+        return {"version": REPORT_VERSION,
+                "script": script_name,
+                "started": self.started.isoformat(timespec="seconds"),
+                "arguments": {name: value if isinstance(value, (bool, int, float, str, type(None))) else str(value)
+                              for name, value in (arguments or {}).items()},
+                "python": sys.version.split()[0],
+                "pid": os.getpid(),
+                "wall_seconds": time.perf_counter() - self._wall_start,
+                "cpu_seconds": time.process_time() - self._cpu_start,
+                "peak_rss_bytes": peak_rss_bytes(),
+                "sections": [section for section in self.sections if section is not None],
+                "counters": self.counters,
+                "timers": self.timers,
+                "profile_path": self.profile_path,
+                "tracemalloc_path": self.tracemalloc_path}
+
+    def write_report(self, report_path: str, script_name: str = None, arguments: dict = None):
+        """
+        Close the instrument and write the run report as JSON
+        :param report_path: path of the json file
+        :param script_name: name of the script that ran
+        :param arguments: command line arguments of the run
+        :return: None
+        """
+        self.close()
+        with open(report_path, "w") as report_file:
+            json.dump(self.report(script_name=script_name, arguments=arguments), report_file, indent=2)
+
+
+def format_report(report: dict) -> str:
+    """
+    Format a run report as text, sections indented under their parents
+    :param report: run report dictionary
+    :return: report text
+    """
+    lines = [f"{report['script']} started {report['started']}: {report['wall_seconds']:.2f}s wall, "
+             f"{report['cpu_seconds']:.2f}s CPU"
+             + (f", peak RSS {report['peak_rss_bytes'] / 2 ** 20:.1f} MB" if report.get("peak_rss_bytes") else "")]
+    for section in report["sections"]:
+        indent = "  " * section["depth"]
+        line = (f"\t{indent}{section['name']:<{32 - len(indent)}}{section['wall_seconds']:>9.3f}s wall"
+                f"{section['cpu_seconds']:>9.3f}s CPU")
+        if section.get("peak_rss_growth_bytes") is not None:
+            line += f"  +{section['peak_rss_growth_bytes'] / 2 ** 20:.1f} MB peak RSS"
+        if section.get("traced_peak_bytes") is not None:
+            line += f"  {section['traced_peak_bytes'] / 2 ** 20:.1f} MB traced peak"
+        lines.append(line)
+    lines.extend(f"\t{name:<32}{seconds:>9.3f}s" for name, seconds in report["timers"].items())
+    lines.extend(f"\t{name:<32}{count:>10}" for name, count in report["counters"].items())
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argument_parser = argparse.ArgumentParser(description="Print a run report written by an analysis script")
+    argument_parser.add_argument("report_path", help="json run report")
+    arguments = argument_parser.parse_args()
+
+    with open(arguments.report_path) as run_report_file:
+        print(format_report(report=json.load(run_report_file)))
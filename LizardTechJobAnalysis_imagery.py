@@ -13,6 +13,38 @@ and the LIDAR Logs are not the same. Imagery lacks an Issuing URL so a lot of in
 20190530, CJuice: The zip file assessment was never written out, forgot to add the functionality so revised script
 to write zip file assessment results to output file. Also, when no zip files found, there was no dataframe to write.
 When no zips, now a basically blank dataframe is created to avoid raising exception.
+20261016: Replaced the double read of each log (start time line scan plus pd.read_html) with the single pass parser
+in LizardTechLogParser. The parser returns the true headers and drops the strange "Unnamed: 5" column of garbage.
+20261016: Replaced os.walk plus os.path.getmtime and os.path.getsize with the scandir based LizardTechDirectoryScanner.
+20261016: Job folders are ingested by LizardTechJobIngest into the LizardTechJobIndex, which builds the master
+dataframes once from compact columns instead of concatenating a dataframe per html and zip file. Logs from failed jobs
+with no table are now skipped instead of stopping the run.
+20261016: Added --streaming option. Java error messages are filtered out and level counts and emails are aggregated by
+LizardTechLogAggregator while each log is parsed, and the master html dataframe of every log row is never built.
+20261016: Moved the email functions to LizardTechEmailAnalytics, which extracts emails and top-level domains with
+vectorized string methods on categoricals. Malformed addresses are counted under one label in the domains sheet.
+20261016: Replaced the per job value_counts loop with LizardTechLevelSummary, which counts levels in one grouped
+operation. Added --wide-levels option to write one row per job and one column per level.
+20261016: Log start times are parsed by LizardTechTimestamps into timezone aware datetimes, EST and EDT each with their
+own offset, replacing the EDT to EST swap and the .replace(tzinfo=...) call whose result was discarded.
+20261016: Replaced pd.ExcelWriter with the LizardTechOutputWriters backends. The excel backend streams rows with
+xlsxwriter in constant memory mode and splits sheets past the excel row limit. Added --output-format option for csv or
+parquet output instead. The write time and peak memory are reported.
+20261016: Added --archive-folder, --start-date and --end-date options. New or changed job folders are archived to the
+LizardTechJobArchive parquet store and the analysis runs over the archived jobs in the date range, including jobs whose
+folders the cleanup tool has since removed, without parsing any html.
+20261016: Added --database option to also write the analysis tables to the indexed SQLite LizardTechJobDatabase, from
+which the same sheets and ad hoc reports can be produced with SQL without rerunning the scrape.
+20261016: The zip size summary adds each zip's uncompressed size, compression ratio, entry count and largest member,
+read from the zip's central directory by LizardTechZipInspector without extracting anything.
+20261016: Added --report option to write a JSON run report from LizardTechInstrumentation with the wall time, CPU time
+and peak memory of every section, time spent parsing html and reading zips, and counts of files seen and parse
+failures. Added --profile and --tracemalloc options to dump cProfile and tracemalloc stats.
+20261016: Added Daily Peak Concurrency and Saturated Hours sheets and a .concurrency.parquet minute series from
+LizardTechConcurrency, which sweeps the job start and end times into the number of jobs running each minute. Added
+--saturation-jobs option.
+20261017: The sections from the frames through the output tables moved to LizardTechAnalysisStages so the benchmark
+suite times the same code this script runs instead of its own copy.
 
 """
 
@@ -20,13 +52,21 @@ When no zips, now a basically blank dataframe is created to avoid raising except
 def main():
 
     # IMPORTS
+    import argparse
     import datetime
-    import dateutil
-    import dateutil.tz
-    import numpy as np
     import os
-    import pandas as pd
-    import re
+
+    from LizardTechAnalysisStages import IMAGERY_EMAIL_KEYWORD
+    from LizardTechAnalysisStages import IMAGERY_LEVELS
+    from LizardTechAnalysisStages import analyze_imagery_jobs
+    from LizardTechAnalysisStages import write_output_tables
+    from LizardTechDirectoryScanner import scan_job_folders
+    from LizardTechInstrumentation import RunInstrument
+    from LizardTechJobArchive import JobArchive
+    from LizardTechJobDatabase import write_job_database
+    from LizardTechJobIngest import ingest_job_folder
+    from LizardTechJobIngest import ingest_job_folders
+    from LizardTechOutputWriters import OUTPUT_WRITERS
 
     # VARIABLES
     # jobs_folder = r'export_dir_imagery'   # TESTING
@@ -34,271 +74,123 @@ def main():
     jobs_folder = r'D:\Program Files\LizardTech\Express Server\ImageServer\var\export_dir'  # Production
     output_folder = r'D:\Scripts\GrabLizardTechOutputLogInfo\AnalysisProcessOutputs'  # Production
 
-    # FUNCTIONS
-    def convert_start_date_time_to_datetime(start_dt_str):
-        """
-        Parse string value for start date and time from html table to a datetime object and return object
-        :param start_dt_str: string repre
-        :return: datetime object
-        """
-        start_dt_str = start_dt_str.strip()
-        if "EDT" in start_dt_str:
-            replacement_result = start_dt_str.replace("EDT", "EST")
-            result = dateutil.parser.parse(replacement_result) - datetime.timedelta(hours=1)
-        else:
-            result = dateutil.parser.parse(start_dt_str)
-        return result
-
-    def count_email_occurrences(emails_dataframe: pd.DataFrame) -> pd.DataFrame:
-        """
-        Process a dataframe of emails and return the count of occurrences for each unique email
-        :param emails_dataframe: pandas dataframe containing emails from html log files
-        :return: pandas dataframe of unique emails and count of occurrences among processed job log files
-        """
-        #   count email occurrences
-        email_counts_series = emails_dataframe["Email"].value_counts(normalize=False, sort=True, ascending=True, dropna=False)
-        email_counts_dframe = email_counts_series.to_frame()
-        email_counts_dframe.reset_index(inplace=True)
-        email_counts_dframe.rename(columns={"Email": "Count", "index": "Email"}, inplace=True)
-        email_counts_dframe.sort_values(by=["Count"], ascending=False, inplace=True)
-        return email_counts_dframe
+    argument_parser = argparse.ArgumentParser(description="Analyze LizardTech imagery job logs and zip files")
+    argument_parser.add_argument("--streaming", action="store_true",
+                                 help="aggregate levels and emails while parsing instead of building the master html "
+                                      "dataframe of every log row")
+    argument_parser.add_argument("--wide-levels", action="store_true",
+                                 help="write the level summary as one row per job and one column per level")
+    argument_parser.add_argument("--output-format", choices=list(OUTPUT_WRITERS), default="excel",
+                                 help="write the tables to an excel workbook, or to a folder of csv or parquet files")
+    argument_parser.add_argument("--archive-folder",
+                                 help="archive new or changed job folders to this job archive and analyze the archived "
+                                      "jobs instead of only the job folders still present")
+    argument_parser.add_argument("--start-date", type=datetime.date.fromisoformat,
+                                 help="with --archive-folder, first job date to analyze, as YYYY-MM-DD")
+    argument_parser.add_argument("--end-date", type=datetime.date.fromisoformat,
+                                 help="with --archive-folder, last job date to analyze, as YYYY-MM-DD")
+    argument_parser.add_argument("--database",
+                                 help="also write the analysis tables to this SQLite job facts database")
+    argument_parser.add_argument("--saturation-jobs", type=int,
+                                 help="running jobs at which the server is saturated, by default the most seen")
+    argument_parser.add_argument("--report",
+                                 help="write a JSON run report of section times, memory and counters to this path")
+    argument_parser.add_argument("--profile",
+                                 help="profile the run with cProfile and write the stats to this path")
+    argument_parser.add_argument("--tracemalloc",
+                                 help="trace memory allocations and write a tracemalloc snapshot to this path")
+    arguments = argument_parser.parse_args()
+    if (arguments.start_date or arguments.end_date) and not arguments.archive_folder:
+        argument_parser.error("--start-date and --end-date need --archive-folder")
+
+    #   The manifest creates the output folder, but the archive mode has no manifest and writes side files before the
+    #   output writer
+    os.makedirs(output_folder, exist_ok=True)
+
+    #   Section times, memory and counters. Without --report, --profile or --tracemalloc every call returns at once.
+    instrument = RunInstrument(enabled=bool(arguments.report), profile_path=arguments.profile,
+                               tracemalloc_path=arguments.tracemalloc)
 
-    def create_output_file_path(extension: str) -> str:
+    # FUNCTIONS
+    def create_output_file_path(extension: str = None) -> str:
         """
         Create the output file path string incorporating the date and return string
-        :param extension: file extension to be appended on end of string
+        :param extension: file extension to be appended on end of string, none when the output writer adds its own
         :return: string to be used in naming output file
         """
         date_string = f"{datetime.datetime.today().year}-{datetime.datetime.today().month}-{datetime.datetime.today().day}"
-        return os.path.join(output_folder, f"LizardTechAnalysis_imagery_{date_string}.{extension}")
-
-    def determine_unique_email_extensions(unique_emails_df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Count the number of occurrences of unique email extensions such as .gov or .com and return dataframe
-        :param unique_emails_df: dataframe of unique emails from job logs
-        :return: dataframe of unique extensions
-        """
-        # count email types based on top-level domain values
-        # TODO: May need to build in protection for addresses that are bogus and don't have '@' or '.'
-        email_parts_series = unique_emails_df["Email"].apply(func=lambda x: x.split("@"))
-        domain_series = email_parts_series.apply(func=lambda x: x[-1])
-        top_level_domain_series = domain_series.apply(func=lambda x: x.split(".")[-1])
-        unique_values = top_level_domain_series.value_counts()
-        unique_values_df = unique_values.to_frame().reset_index()
-        unique_values_df.rename(columns={"index": "TopLevelDomain", "Email": "Count"}, inplace=True)
-        return unique_values_df
-
-    def extract_email_series_from_messages(html_table_df: pd.DataFrame) -> pd.Series:
-        """
-        Extract pandas series of email specific messages from the html job log table Messages column
-        :param html_table_df: dataframe of entire html table contents
-        :return: pandas series of email specific messages
-        """
-        df_no_na = html_table_df.dropna()
-        df_no_na = df_no_na[(df_no_na["Message"].str.contains("email")) & (df_no_na["Message"].str.contains("@"))]    #
-
-        try:
-            # NOTE: re.findall returns a list and I only observed one email per list in my test data
-            emails_series = df_no_na["Message"].apply(
-                func=lambda x: (re.findall(pattern=r'[\w.-]+@[\w.-]+', string=x))[0].lower())
-        except ValueError as ve:
-            return pd.Series()
-        except IndexError as id:
-            return pd.Series()
-        else:
-            return emails_series
-
-    def extract_job_start_date_time_line(file_path: str) -> str:
-        """
-        Open log file and extract the start time value from html content and return
-        :param file_path: path to job log html file
-        :return: string
-        """
-        key_phrase = "Log session start time"
-        break_tag = "<br>"
-        empty_string = ""
-        with open(file_path, 'r') as handler:
-            for line in handler:
-                line = line.strip()
-                if key_phrase in line:
-                    line = line.replace(key_phrase, empty_string)
-                    line = line.replace(break_tag, empty_string)
-                    return line
-                else:
-                    continue
-        return "NaN"
-
-    def process_level_summary_by_job(html_table_df: pd.DataFrame) -> list:
-        """
-        Extract the Level information from the html table and summarize value counts for types present, returning list
-        :param html_table_df: dataframe of entire html table contents
-        :return: list of dataframes for each job
-        """
-        level_summary_ls = []
-        level_grouped_df = html_table_df.groupby([html_table_df.index])
-        for name, group in level_grouped_df:
-            level_df = group["Level"].value_counts().to_frame()
-            level_df["JOB_ID"] = name
-            level_summary_ls.append(level_df)
-
-        return level_summary_ls
-
-    def setup_initial_dataframe(file_path: str) -> pd.DataFrame:
-        """
-        Process html file, containing a single table, into a dataframe with the same columns as the table
-        :param file_path: path to the html job log file to be examined
-        :return: dataframe of html table content
-        """
-        # Use pandas to create list of dataframes from tables in html. Should only be one per file so get zero index.
-        job_log_file_html_table_contents_df = pd.read_html(io=file_path)[0]
-
-        # For unknown reason, true table headers are in row 0. Grab them, use to rename columns, drop first row
-        #   Columns are given a 0 through 4 index instead of the header value. Need dict to rename them.
-        column_names_series = job_log_file_html_table_contents_df.iloc[0]
-        column_rename_dict = dict(zip(list(range(0, len(column_names_series))), column_names_series))
-        job_log_file_html_table_contents_df.rename(columns=column_rename_dict, inplace=True)
-        job_log_file_html_table_contents_df.drop([0], axis=0, inplace=True)  # drop first row, which is the headers
-        return job_log_file_html_table_contents_df
+        file_name = f"LizardTechAnalysis_imagery_{date_string}"
+        return os.path.join(output_folder, f"{file_name}.{extension}" if extension else file_name)
 
     # FUNCTIONALITY
-    #   Need two lists for storing dataframe from each/every file being inspected. Lists will then become a master df
-    master_html_df_list = []
-    master_zip_df_list = []
-    date_range_list = []
-
-    #   Need to walk the jobs folder and operate on the files within
-    for root, dirs, files in os.walk(jobs_folder):
-        for file in files:
-            full_file_path = os.path.join(root, file)
-            file_name, file_ext = os.path.splitext(file)
-            job_id = os.path.basename(os.path.dirname(full_file_path))
-            time_file_last_modified = os.path.getmtime(full_file_path)
-            date_range_list.append(datetime.datetime.fromtimestamp(time_file_last_modified))
-
-            if file_ext == ".html":
-
-                # Extract values such as job start date and time
-                start_dt_string = extract_job_start_date_time_line(file_path=full_file_path)
-                start_dtobj_utc = convert_start_date_time_to_datetime(start_dt_str=start_dt_string)
-                # from_zone = dateutil.tz.tzutc()
-                to_zone = dateutil.tz.tzlocal()
-                start_dtobj_utc.replace(tzinfo=to_zone)  # Not sure how will be affected by time changes on my puter
-
-                # Need master list of all dataframes, each containing the extracted html file values
-                html_df = setup_initial_dataframe(file_path=full_file_path)
-
-                # Need to add a unique job id field to be able to group message content and also relate dataframes
-                #   Set this job id as the index and store the dataframe for this html file in the master list
-                html_df["JOB_ID"] = job_id
-                master_html_df_list.append(html_df)
-
-            elif file_ext == ".zip":
-
-                # What is the compressed job size of the .zip file, if .zip is present. Create dataframe for this .zip
-                #   file and store in the master list
-                byte_size = os.path.getsize(full_file_path) / 1000
-                data = {"Name": [job_id], "ZIP Size KB": [byte_size]}
-                master_zip_df_list.append(pd.DataFrame(data=data, dtype=str))
-
-            else:
-                # Not interested in any other file types, if they happen to exist
-                continue
-
-    # ___________________________
-    #   ALL JOB VALUES AS DATAFRAME
-    #   Need to make single master html content dataframe, and single zip file content dataframe from list of
-    #       individual file dataframes
-    try:
-        master_html_values_df = pd.DataFrame(pd.concat(objs=master_html_df_list, sort=False))
-        master_html_values_df.set_index(keys="JOB_ID", drop=True, inplace=True)
-        master_html_values_df.drop(columns=["Unnamed: 5"], inplace=True)  # Strange column of garbage with few values
-    except ValueError:
-        print("No .html files found.")
-
-    try:
-        #   Original zip df set to dtype of str so numeric job names would not change if had leading zeros etc. But,
-        #       need to cast the size values to float before writing to excel
-        master_zip_stats_df = pd.DataFrame(pd.concat(objs=master_zip_df_list))
-        master_zip_stats_df.reset_index(drop=True, inplace=True)
-        master_zip_stats_df["ZIP Size KB"] = pd.to_numeric(master_zip_stats_df["ZIP Size KB"])
-    except ValueError:
-        print("No .zip files found.")
-        master_zip_stats_df = pd.DataFrame(data={"No Zip Files Found": [0]})
+    #   Need to walk the jobs folder and ingest each job folder's html log and zip file into a single index. The
+    #   scanner provides each file's modified time and size from a single cached stat. Imagery rows and zips are keyed
+    #   by the job folder name. In streaming mode the java error messages are filtered out and only each log's level
+    #   counts and emails are kept while it is parsed, not its rows.
+    #   Job folders are walked, ingested and indexed one at a time, so the walk section covers all three.
+    instrument.mark(name="walk")
+    summary_options = None
+    if arguments.streaming:
+        summary_options = {"level_filter": IMAGERY_LEVELS, "email_keyword": IMAGERY_EMAIL_KEYWORD}
+    if arguments.archive_folder:
+        #   Need to archive the job folders that are new or changed since they were last archived, with all their log
+        #   rows, then rebuild the results of the archived jobs in the date range from the archive alone.
+        job_archive = JobArchive(archive_folder=arguments.archive_folder)
+        if os.path.isdir(jobs_folder):
+            job_archive.archive_jobs_folder(jobs_folder=jobs_folder,
+                                            ingest_function=instrument.instrument_ingest_function(ingest_job_folders))
+            print(job_archive.summary())
+            instrument.count(name="job_folders_unchanged", amount=job_archive.unchanged_count)
+        with instrument.section(name="archive_load"):
+            job_results = job_archive.load_job_results(start_date=arguments.start_date, end_date=arguments.end_date,
+                                                       summary_options=summary_options)
+        print(f"{job_archive.loaded_count} archived jobs loaded")
+        instrument.count(name="archived_jobs_loaded", amount=job_archive.loaded_count)
+    else:
+        job_results = instrument.instrument_job_results(
+            ingest_job_folder(job_folder=job_folder_record.job_folder,
+                              file_stats=job_folder_record.file_stats,
+                              summary_options=summary_options)
+            for job_folder_record in scan_job_folders(jobs_folder=jobs_folder))
 
     # ___________________________
-    #   Remove java error messages from Level column in master html dataframe
-    master_html_values_df = master_html_values_df[(master_html_values_df["Level"] == "INFO") | (master_html_values_df["Level"] == "ERROR")]
-
-    # ___________________________
-    #   LEVEL SUMMARY (INFO, ERROR)
-    level_summary_list = process_level_summary_by_job(html_table_df=master_html_values_df)
-    master_level_df = pd.DataFrame(pd.concat(objs=level_summary_list))
-    master_level_df.reset_index(drop=False, inplace=True)
-    master_level_df.rename(columns={"index": "Level", "Level": "Count"}, inplace=True)
-    master_level_df = master_level_df[(master_level_df["Level"] == "ERROR") | (master_level_df["Level"] == "INFO")]
-    level_groupby_df = master_level_df.groupby(by=["JOB_ID", "Level"]).mean()
-
-    # ___________________________
-    #   EMAIL PROCESSING
-    #   isolate the html file Message values that contain an '@'
-    emails_df = (extract_email_series_from_messages(html_table_df=master_html_values_df)
-                 .to_frame(name="Email")
-                 .reset_index())
-
-    #   process email occurrences
-    email_counts_df = count_email_occurrences(emails_dataframe=emails_df)
-
-    #   process emails for the unique extensions (gov, com, edu, etc) that occur
-    unique_email_extensions_df = determine_unique_email_extensions(unique_emails_df=email_counts_df)
-
-    # ___________________________
-    #   ISSUING URL PROCESSING
-    #   Issuing url query string value extraction
-    # Doesn't exist in Imagery. See LIDAR script if need the code.
-
-    # ___________________________
-    # QUERY PARAMETER EXAMINATION - MULTIPLE OUTPUTS GENERATED
-    # Iterate over the query parameters in the issuing url's in the html logs, simmer down to unique occurrences
-    #   by job, then get the overall number of times (number of unique jobs) that a value was used/requested by a user
-    # Doesn't exist in Imagery. See LIDAR script if need the code.
-
-    # ___________________________
-    # DATE RANGE EVALUATION
-    date_range_df = pd.DataFrame(data=[[np.min(date_range_list), np.max(date_range_list)]],
-                                 columns=["MIN JOB DATE", "MAX JOB DATE"],
-                                 dtype=str)
+    #   ANALYSIS
+    #   The frames, level summary, email and concurrency sections are in LizardTechAnalysisStages, which the benchmark
+    #   suite also runs. The job results are indexed as they are walked, within the walk section.
+    output_file_path = create_output_file_path()
+    job_analysis = analyze_imagery_jobs(job_results=job_results,
+                                        file_path_stem=output_file_path,
+                                        instrument=instrument,
+                                        streaming=arguments.streaming,
+                                        wide_levels=arguments.wide_levels,
+                                        saturation_jobs=arguments.saturation_jobs)
 
     # ___________________________
     #   OUTPUT THE EVALUATIONS
-    #   Output various final contents to a unique sheet in excel file
-    with pd.ExcelWriter(create_output_file_path(extension="xlsx")) as xlsx_writer:
-        date_range_df.to_excel(excel_writer=xlsx_writer,
-                               sheet_name="Date Range of Jobs in Analysis",
-                               na_rep=np.NaN,
-                               header=True,
-                               index=False)
-        email_counts_df.to_excel(excel_writer=xlsx_writer,
-                                 sheet_name="Unique Emails Summary",
-                                 na_rep=np.NaN,
-                                 header=True,
-                                 index=False)
-        unique_email_extensions_df.to_excel(excel_writer=xlsx_writer,
-                                            sheet_name="Top-Level Domains Summary",
-                                            na_rep=np.NaN,
-                                            header=True,
-                                            index=False)
-        level_groupby_df.to_excel(excel_writer=xlsx_writer,
-                                  sheet_name="Level Type Summary by Job",
-                                  na_rep=np.NaN,
-                                  header=True,
-                                  index=True)
-        master_zip_stats_df.to_excel(excel_writer=xlsx_writer,
-                                     sheet_name="Job .zip Size Summary",
-                                     na_rep=np.NaN,
-                                     header=True,
-                                     index=False)
+    #   Output various final contents to a unique sheet in excel file, or a unique file for the csv and parquet formats
+    instrument.mark(name="output_write")
+    output_writer = write_output_tables(tables=job_analysis.tables, output_format=arguments.output_format,
+                                        output_file_path=output_file_path)
+    print(output_writer.report())
 
-        print(f"Process Complete. See output file {create_output_file_path(extension='xlsx')}")
+    # ___________________________
+    #   JOB FACTS DATABASE
+    #   Normalized, indexed tables of the values behind every sheet, for ad hoc reports without rerunning the scrape
+    if arguments.database:
+        instrument.mark(name="database")
+        write_job_database(database_path=arguments.database,
+                           analysis_name="imagery",
+                           job_index=job_analysis.job_index,
+                           level_summary_df=job_analysis.level_summary_df,
+                           emails_df=job_analysis.emails_df,
+                           log_rows_df=job_analysis.log_rows_df)
+        print(f"Job facts database written to {arguments.database}")
+    if arguments.report:
+        instrument.write_report(report_path=arguments.report, script_name="imagery", arguments=vars(arguments))
+        print(f"Run report written to {arguments.report}")
+    else:
+        instrument.close()
+    print(f"Process Complete. See output {output_writer.output_location}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,405 @@
+"""
+Append-only columnar archive of ingested LizardTech jobs, kept after the cleanup tool removes the job folders.
+The cleanup tool deletes job folders older than a few weeks, and with them the only copy of each job's log. Before that
+happens each job folder is archived as parquet files, zstd compressed, in two tables partitioned by job date:
+  jobs - one row per archived job folder with its signature, zip sizes, modified times and inspections, file stats
+         and, per html log, the composite job id, job date, start time string, file path and table headers
+  log_rows - one row per log table row with a column per log table header
+Partitions are hive style folders such as jobs/job_date=2019-03-06, named for the US Eastern date of the job's first
+log, or of the folder's latest file modified time when it has no log. Every archive run adds new files and never
+rewrites old ones. A job folder that changes after it was archived is archived again, and loading keeps only its
+latest version. Loading a date range reads only the partitions in the range and rebuilds the JobResult objects the
+analysis scripts use, so a date range can be analyzed without the job folders and without parsing any html.
+Needs pyarrow.
+
+Run this module directly to archive a jobs folder.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import datetime
+import os
+import time
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from LizardTechDirectoryScanner import scan_job_folders
+from LizardTechJobIngest import JobResult
+from LizardTechLogAggregator import JobLogSummary
+from LizardTechLogParser import ParsedJobLog
+from LizardTechTimestamps import EASTERN_TIME_ZONE
+from LizardTechZipInspector import ZipInspection
+
+JOBS_TABLE = "jobs"
+LOG_ROWS_TABLE = "log_rows"
+PARTITION_COLUMN = "job_date"
+
+# Log row columns added to the log table headers. The prefix keeps them clear of any header name.
+ARCHIVE_JOB_FOLDER_COLUMN = "archive_job_folder"
+ARCHIVE_VERSION_COLUMN = "archive_version"
+ARCHIVE_LOG_INDEX_COLUMN = "archive_log_index"
+
+_PARTITIONING = ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive")
+_WRITE_OPTIONS = ds.ParquetFileFormat().make_write_options(compression="zstd")
+
+_JOBS_SCHEMA = pa.schema([("job_folder", pa.string()),
+                          ("job_id", pa.string()),
+                          ("mtime", pa.float64()),
+                          ("size", pa.int64()),
+                          (ARCHIVE_VERSION_COLUMN, pa.int64()),
+                          ("total_size", pa.int64()),
+                          ("start_time_fallbacks", pa.int64()),
+                          ("unparsable_start_times", pa.int64()),
+                          ("zip_sizes_kb", pa.list_(pa.float64())),
+                          ("zip_mtimes", pa.list_(pa.float64())),
+                          ("zip_paths", pa.list_(pa.string())),
+                          ("zip_uncompressed_sizes", pa.list_(pa.int64())),
+                          ("zip_entry_counts", pa.list_(pa.int64())),
+                          ("zip_largest_members", pa.list_(pa.string())),
+                          ("zip_largest_member_sizes", pa.list_(pa.int64())),
+                          ("zip_errors", pa.list_(pa.string())),
+                          ("file_mtimes", pa.list_(pa.float64())),
+                          ("composite_job_ids", pa.list_(pa.string())),
+                          ("job_dates", pa.list_(pa.timestamp("us", tz="UTC"))),
+                          ("start_times", pa.list_(pa.string())),
+                          ("html_paths", pa.list_(pa.string())),
+                          ("log_headers", pa.list_(pa.list_(pa.string()))),
+                          (PARTITION_COLUMN, pa.string())])
+
+
+def _zip_inspections(job_row: dict) -> list:
+    """
+    Rebuild the zip inspections of an archived job row
+    :param job_row: dict of jobs table column values for one job folder
+    :return: list of ZipInspection, one per zip size
+    """
+    return [ZipInspection(path=path, size=round(zip_size_kb * 1000), uncompressed_size=uncompressed_size,
+                          entry_count=entry_count, largest_member=largest_member,
+                          largest_member_size=largest_member_size, error=error)
+            for path, zip_size_kb, uncompressed_size, entry_count, largest_member, largest_member_size, error in zip(
+                job_row["zip_paths"], job_row["zip_sizes_kb"], job_row["zip_uncompressed_sizes"],
+                job_row["zip_entry_counts"], job_row["zip_largest_members"], job_row["zip_largest_member_sizes"],
+                job_row["zip_errors"])]
+
+
+def job_partition_date(job_result: JobResult) -> str:
+    """
+    Partition date of a job folder: the US Eastern date of its first log's job date, or of its latest file modified
+    time when no log could be parsed
+    :param job_result: JobResult from LizardTechJobIngest
+    :return: ISO date string such as "2019-03-06"
+    """
+    if job_result.html_logs:
+        job_date = job_result.html_logs[0][1]
+    else:
+        job_date = datetime.datetime.fromtimestamp(max(job_result.file_mtimes, default=0.0), tz=EASTERN_TIME_ZONE)
+    return job_date.astimezone(EASTERN_TIME_ZONE).date().isoformat()
+
+
+def _date_filter(start_date: datetime.date = None, end_date: datetime.date = None):
+    """
+    Build a partition filter for an inclusive job date range
+    :param start_date: first job date to include, or None for no lower bound
+    :param end_date: last job date to include, or None for no upper bound
+    :return: pyarrow dataset expression, or None for no filter
+    """
+    date_filter = None
+    if start_date is not None:
+        date_filter = ds.field(PARTITION_COLUMN) >= start_date.isoformat()
+    if end_date is not None:
+        end_filter = ds.field(PARTITION_COLUMN) <= end_date.isoformat()
+        date_filter = end_filter if date_filter is None else date_filter & end_filter
+    return date_filter
+
+
+class JobArchive:
+    """
+    Partitioned parquet archive of job results in an archive folder
+    :param archive_folder: folder holding the jobs and log_rows tables, created on the first write
+    """
+
+    def __init__(self, archive_folder: str):
+        self.archive_folder = archive_folder
+        self.archived_count = 0
+        self.unchanged_count = 0
+        self.archived_row_count = 0
+        self.loaded_count = 0
+        self.archive_seconds = 0.0
+
+    def _table_folder(self, table_name: str) -> str:
+        return os.path.join(self.archive_folder, table_name)
+
+    def _open_table(self, table_name: str):
+        """
+        Open one of the archive tables as a dataset. Log row files hold only the headers of the logs they archived,
+        so the schemas of every file are unified. Job files all have the jobs schema.
+        :param table_name: JOBS_TABLE or LOG_ROWS_TABLE
+        :return: pyarrow dataset, or None when nothing has been archived
+        """
+        table_folder = self._table_folder(table_name=table_name)
+        if not os.path.isdir(table_folder):
+            return None
+        dataset = ds.dataset(table_folder, format="parquet", partitioning=_PARTITIONING)
+        fragment_schemas = [fragment.physical_schema for fragment in dataset.get_fragments()]
+        if not fragment_schemas:
+            return None
+        schema = (_JOBS_SCHEMA if table_name == JOBS_TABLE
+                  else pa.unify_schemas(fragment_schemas + [_PARTITIONING.schema]))
+        return ds.dataset(table_folder, schema=schema, format="parquet", partitioning=_PARTITIONING)
+
+    def _latest_jobs(self, columns: list, date_filter=None) -> dict:
+        """
+        Read job rows, keeping only the latest archived version of each job folder
+        :param columns: jobs table columns to read, job_folder and archive_version are always read
+        :param date_filter: optional partition filter
+        :return: dictionary of job folder to dictionary of column values
+        """
+        jobs_dataset = self._open_table(table_name=JOBS_TABLE)
+        if jobs_dataset is None:
+            return {}
+        columns = list(dict.fromkeys(["job_folder", ARCHIVE_VERSION_COLUMN] + columns))
+        latest_jobs = {}
+        for batch in jobs_dataset.to_batches(columns=columns, filter=date_filter):
+            for job_row in batch.to_pylist():
+                latest_job_row = latest_jobs.get(job_row["job_folder"])
+                if latest_job_row is None or latest_job_row[ARCHIVE_VERSION_COLUMN] < job_row[ARCHIVE_VERSION_COLUMN]:
+                    latest_jobs[job_row["job_folder"]] = job_row
+        return latest_jobs
+
+    def archived_signatures(self) -> dict:
+        """
+        Signatures of the latest archived version of every job folder
+        :return: dictionary of job folder path to (mtime, size) tuple
+        """
+        return {job_folder: (job_row["mtime"], job_row["size"])
+                for job_folder, job_row in self._latest_jobs(columns=["mtime", "size"]).items()}
+
+    def append_job_results(self, job_results: list, signatures: list) -> int:
+        """
+        Write job results, parsed with their log rows, as new files in the archive
+        :param job_results: list of JobResult ingested without summary options
+        :param signatures: list of (mtime, size) tuples of the job folders, in the same order
+        :return: number of log rows archived
+        """
+        if not job_results:
+            return 0
+        archive_version = time.time_ns()
+        job_rows = {name: [] for name in _JOBS_SCHEMA.names}
+        log_headers = []
+        log_columns = {}
+        log_row_count = 0
+        for job_result, (mtime, size) in zip(job_results, signatures):
+            partition_date = job_partition_date(job_result=job_result)
+            job_rows["job_folder"].append(job_result.job_folder)
+            job_rows["job_id"].append(job_result.job_id)
+            job_rows["mtime"].append(mtime)
+            job_rows["size"].append(size)
+            job_rows[ARCHIVE_VERSION_COLUMN].append(archive_version)
+            job_rows["total_size"].append(job_result.total_size)
+            job_rows["start_time_fallbacks"].append(job_result.start_time_fallbacks)
+            job_rows["unparsable_start_times"].append(job_result.unparsable_start_times)
+            job_rows["zip_sizes_kb"].append(job_result.zip_sizes_kb)
+            job_rows["zip_mtimes"].append(job_result.zip_mtimes)
+            job_rows["zip_paths"].append([inspection.path for inspection in job_result.zip_inspections])
+            job_rows["zip_uncompressed_sizes"].append([inspection.uncompressed_size
+                                                       for inspection in job_result.zip_inspections])
+            job_rows["zip_entry_counts"].append([inspection.entry_count for inspection in job_result.zip_inspections])
+            job_rows["zip_largest_members"].append([inspection.largest_member
+                                                    for inspection in job_result.zip_inspections])
+            job_rows["zip_largest_member_sizes"].append([inspection.largest_member_size
+                                                         for inspection in job_result.zip_inspections])
+            job_rows["zip_errors"].append([inspection.error for inspection in job_result.zip_inspections])
+            job_rows["file_mtimes"].append(job_result.file_mtimes)
+            job_rows["composite_job_ids"].append([composite_job_id for composite_job_id, _, _ in job_result.html_logs])
+            job_rows["job_dates"].append([job_date for _, job_date, _ in job_result.html_logs])
+            job_rows["start_times"].append([parsed_log.start_time for _, _, parsed_log in job_result.html_logs])
+            job_rows["html_paths"].append([parsed_log.file_path for _, _, parsed_log in job_result.html_logs])
+            job_rows["log_headers"].append([parsed_log.headers for _, _, parsed_log in job_result.html_logs])
+            job_rows[PARTITION_COLUMN].append(partition_date)
+
+            for log_index, (_, _, parsed_log) in enumerate(job_result.html_logs):
+                if not isinstance(parsed_log, ParsedJobLog):
+                    raise TypeError(f"{job_result.job_folder} was ingested with summary options, its log rows can not "
+                                    f"be archived")
+                row_count = len(parsed_log)
+                for header in parsed_log.headers:
+                    if header not in log_columns:
+                        log_headers.append(header)
+                        log_columns[header] = [None] * log_row_count
+                    log_columns[header].extend(parsed_log.columns[header])
+                for header in log_headers:
+                    if header not in parsed_log.columns:
+                        log_columns[header].extend([None] * row_count)
+                log_columns.setdefault(ARCHIVE_JOB_FOLDER_COLUMN, []).extend([job_result.job_folder] * row_count)
+                log_columns.setdefault(ARCHIVE_LOG_INDEX_COLUMN, []).extend([log_index] * row_count)
+                log_columns.setdefault(PARTITION_COLUMN, []).extend([partition_date] * row_count)
+                log_row_count += row_count
+
+        # Log rows first, so a job row is never written without its rows
+        if log_row_count:
+            log_rows_table = pa.table({**{header: pa.array(log_columns[header], type=pa.string())
+                                          for header in log_headers},
+                                       ARCHIVE_JOB_FOLDER_COLUMN: pa.array(log_columns[ARCHIVE_JOB_FOLDER_COLUMN],
+                                                                           type=pa.string()),
+                                       ARCHIVE_VERSION_COLUMN: pa.array([archive_version] * log_row_count,
+                                                                        type=pa.int64()),
+                                       ARCHIVE_LOG_INDEX_COLUMN: pa.array(log_columns[ARCHIVE_LOG_INDEX_COLUMN],
+                                                                          type=pa.int64()),
+                                       PARTITION_COLUMN: pa.array(log_columns[PARTITION_COLUMN], type=pa.string())})
+            self._write_table(table=log_rows_table, table_name=LOG_ROWS_TABLE, archive_version=archive_version)
+        jobs_table = pa.table(job_rows, schema=_JOBS_SCHEMA)
+        self._write_table(table=jobs_table, table_name=JOBS_TABLE, archive_version=archive_version)
+        return log_row_count
+
+    def _write_table(self, table: pa.Table, table_name: str, archive_version: int):
+        """
+        Write a table as new files in its date partitions, leaving files from earlier runs untouched
+        :param table: rows to write, including the partition column
+        :param table_name: JOBS_TABLE or LOG_ROWS_TABLE
+        :param archive_version: version of this archive run, used in the file names
+        :return: None
+        """
+        ds.write_dataset(table, self._table_folder(table_name=table_name), format="parquet",
+                         partitioning=_PARTITIONING, file_options=_WRITE_OPTIONS,
+                         basename_template=f"part-{archive_version}-{{i}}.parquet",
+                         existing_data_behavior="overwrite_or_ignore")
+
+    def archive_jobs_folder(self, jobs_folder: str, ingest_function) -> int:
+        """
+        Stat the jobs folder tree and archive the job folders that are new or changed since they were last archived
+        :param jobs_folder: path to the folder containing the job folders
+        :param ingest_function: function taking a list of (job folder path, list of (file name, mtime, size)) tuples
+            and returning a list of JobResult, ingested without summary options, in the same order
+        :return: number of job folders archived
+        """
+        start = time.perf_counter()
+        archived_signatures = self.archived_signatures()
+        pending_signatures = []
+        pending_folders_and_stats = []
+        self.unchanged_count = 0
+        for job_folder_record in sorted(scan_job_folders(jobs_folder=jobs_folder), key=lambda x: x.job_folder):
+            signature = (job_folder_record.mtime, job_folder_record.size)
+            if archived_signatures.get(job_folder_record.job_folder) == signature:
+                self.unchanged_count += 1
+                continue
+            pending_signatures.append(signature)
+            pending_folders_and_stats.append((job_folder_record.job_folder, job_folder_record.file_stats))
+
+        job_results = ingest_function(pending_folders_and_stats)
+        self.archived_row_count = self.append_job_results(job_results=job_results, signatures=pending_signatures)
+        self.archived_count = len(job_results)
+        self.archive_seconds = time.perf_counter() - start
+        return self.archived_count
+
+    def load_job_results(self, start_date: datetime.date = None, end_date: datetime.date = None,
+                         summary_options: dict = None) -> list:
+        """
+        Rebuild the job results of every job archived in a job date range, from the latest version of each job folder
+        :param start_date: first job date to load, inclusive, or None for no lower bound
+        :param end_date: last job date to load, inclusive, or None for no upper bound
+        :param summary_options: when given, keyword arguments for a JobLogSummary that each log's rows are passed to
+            instead of being kept, as when ingesting with summary options
+        :return: list of JobResult in job folder path order
+        """
+        date_filter = _date_filter(start_date=start_date, end_date=end_date)
+        latest_jobs = self._latest_jobs(columns=[name for name in _JOBS_SCHEMA.names if name != PARTITION_COLUMN],
+                                        date_filter=date_filter)
+
+        # Each log gets its headers now and its rows as the log row batches are read
+        job_results = {}
+        logs = {}
+        for job_folder, job_row in latest_jobs.items():
+            job_result = JobResult(job_folder=job_folder, job_id=job_row["job_id"])
+            job_result.zip_sizes_kb = job_row["zip_sizes_kb"]
+            job_result.zip_mtimes = job_row["zip_mtimes"]
+            job_result.zip_inspections = _zip_inspections(job_row=job_row)
+            job_result.file_mtimes = job_row["file_mtimes"]
+            job_result.total_size = job_row["total_size"]
+            job_result.start_time_fallbacks = job_row["start_time_fallbacks"]
+            job_result.unparsable_start_times = job_row["unparsable_start_times"]
+            for log_index, (composite_job_id, job_date, start_time, html_path, headers) in enumerate(zip(
+                    job_row["composite_job_ids"], job_row["job_dates"], job_row["start_times"], job_row["html_paths"],
+                    job_row["log_headers"])):
+                if summary_options is not None:
+                    log = JobLogSummary(**summary_options)
+                    log.file_path = html_path
+                    log.start_time = start_time
+                else:
+                    log = ParsedJobLog(file_path=html_path, start_time=start_time, headers=headers,
+                                       columns={header: [] for header in headers})
+                job_result.html_logs.append((composite_job_id, job_date.astimezone(EASTERN_TIME_ZONE), log))
+                logs[(job_folder, job_row[ARCHIVE_VERSION_COLUMN], log_index)] = (headers, log)
+            job_results[job_folder] = job_result
+
+        log_rows_dataset = self._open_table(table_name=LOG_ROWS_TABLE) if logs else None
+        if log_rows_dataset is not None:
+            for batch in log_rows_dataset.to_batches(filter=date_filter):
+                batch_columns = batch.to_pydict()
+                row_keys = zip(batch_columns[ARCHIVE_JOB_FOLDER_COLUMN], batch_columns[ARCHIVE_VERSION_COLUMN],
+                               batch_columns[ARCHIVE_LOG_INDEX_COLUMN])
+                row_start = 0
+                # Rows of one log are stored together, so each run of equal keys is handled at once
+                for row_key, row_count in _run_lengths(row_keys):
+                    row_stop = row_start + row_count
+                    if row_key in logs:
+                        headers, log = logs[row_key]
+                        header_values = [batch_columns[header][row_start:row_stop] for header in headers]
+                        if isinstance(log, ParsedJobLog):
+                            for header, values in zip(headers, header_values):
+                                log.columns[header].extend(values)
+                        else:
+                            for row in zip(*header_values):
+                                log(headers, list(row))
+                    row_start = row_stop
+
+        self.loaded_count = len(job_results)
+        return [job_results[job_folder] for job_folder in sorted(job_results)]
+
+    def summary(self) -> str:
+        """
+        Describe the outcome of the latest archive run
+        :return: string summary of job folder and log row counts
+        """
+        return (f"Job Archive: {self.archived_count} archived with {self.archived_row_count} log rows, "
+                f"{self.unchanged_count} unchanged, {self.archive_seconds:.2f}s")
+
+
+def _run_lengths(keys):
+    """
+    Group consecutive equal keys
+    :param keys: iterable of hashable keys
+    :return: generator of (key, count of consecutive repeats) tuples
+    """
+    current_key = None
+    count = 0
+    for key in keys:
+        if count and key == current_key:
+            count += 1
+            continue
+        if count:
+            yield current_key, count
+        current_key = key
+        count = 1
+    if count:
+        yield current_key, count
+
+
+if __name__ == "__main__":
+    import argparse
+    import functools
+
+    from LizardTechJobIngest import ingest_job_folders
+
+    argument_parser = argparse.ArgumentParser(description="Archive new or changed LizardTech job folders")
+    argument_parser.add_argument("jobs_folder", help="folder containing LizardTech job folders")
+    argument_parser.add_argument("archive_folder", help="folder holding the job archive")
+    argument_parser.add_argument("--workers", type=int, default=1, help="worker processes for parsing job folders")
+    arguments = argument_parser.parse_args()
+
+    job_archive = JobArchive(archive_folder=arguments.archive_folder)
+    job_archive.archive_jobs_folder(jobs_folder=arguments.jobs_folder,
+                                    ingest_function=functools.partial(ingest_job_folders,
+                                                                      worker_count=arguments.workers))
+    print(job_archive.summary())
@@ -0,0 +1,571 @@
+"""
+Indexed SQLite database of LizardTech job facts, with a query API that produces the analysis sheets.
+Every new question about the jobs meant editing main() of an analysis script and rerunning the whole scrape into a new
+workbook. The analysis scripts can instead fill a local SQLite database with normalized tables:
+  jobs - one row per job log, or per job folder without a parsable log, with its job date, log start, last row Time,
+         folder, sizes and first zip modified time
+  log_rows - every log table row kept by the analysis, one column per log table header
+  level_counts - the number of log rows of each Level per job
+  emails - every email found in the log messages, with its top-level domain
+  issuing_urls - every distinct issuing url, keyed by its url_id
+  query_parameters - one row per (url, parameter, value), as exploded by LizardTechQueryParameters
+  parameter_names - the query parameters reported on, with their sheet names and order
+  zip_sizes - the compressed and uncompressed size, entry count and largest member of every zip file
+  metadata - the analysis name and the range of file modified times
+Every table is indexed on job_key, the JOB_ID of the sheets, and jobs, emails and query_parameters are also indexed on
+job date, email and parameter name, so ad hoc reports come back in milliseconds. The JobDatabase query API and the
+report command build the same sheets as the analysis script from SQL. Value ties in the email and domain count sheets
+are ordered by value and in the query parameter sheets by first appearance, as the analysis script orders them.
+
+Run this module directly to write the analysis sheets from a database or to run an ad hoc query.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import datetime
+import math
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from LizardTechCapacityModel import capacity_model_frame
+from LizardTechCapacityModel import export_size_features
+from LizardTechCapacityModel import fit_capacity_model
+from LizardTechCapacityModel import storage_forecast_frame
+from LizardTechConcurrency import concurrency_minutes_frame
+from LizardTechConcurrency import concurrency_timeline
+from LizardTechConcurrency import daily_peaks_frame
+from LizardTechConcurrency import saturated_hours_frame
+from LizardTechCoverage import DEFAULT_CELL_SIZE
+from LizardTechCoverage import coverage_from_extent_table
+from LizardTechCoverage import coverage_hot_spots_frame
+from LizardTechEmailAnalytics import extract_top_level_domains
+from LizardTechExportLatency import export_latency_frame
+from LizardTechExtentEngine import ExtentTable
+from LizardTechExtentEngine import deduplicate_extents
+from LizardTechExtentEngine import mappable_extents_frame
+from LizardTechExtentEngine import parse_extents
+from LizardTechJobIndex import job_latency_seconds
+from LizardTechJobIndex import job_run_seconds
+from LizardTechJobIndex import job_start_seconds
+from LizardTechLevelSummary import LEVEL_COUNT_COLUMN
+from LizardTechLevelSummary import widen_level_summary
+from LizardTechQueryParameters import JOB_COUNT_COLUMN
+from LizardTechQueryParameters import NULL_VALUE_LABEL
+from LizardTechTimestamps import to_eastern_wall_time
+
+_SCHEMA_STATEMENTS = (
+    "CREATE TABLE metadata (name TEXT PRIMARY KEY, value TEXT)",
+    "CREATE TABLE jobs (job_number INTEGER PRIMARY KEY, job_key TEXT NOT NULL, job_id TEXT NOT NULL, "
+    "composite_job_id TEXT, job_folder TEXT NOT NULL, job_date TEXT, job_timestamp REAL, html_path TEXT, "
+    "zip_bytes REAL, mtime REAL, size INTEGER, row_count INTEGER, last_row_time_ms REAL, first_zip_mtime REAL)",
+    "CREATE TABLE level_counts (job_key TEXT NOT NULL, level TEXT NOT NULL, count INTEGER NOT NULL)",
+    "CREATE TABLE emails (email_number INTEGER PRIMARY KEY, job_key TEXT NOT NULL, email TEXT NOT NULL, "
+    "top_level_domain TEXT NOT NULL)",
+    "CREATE TABLE issuing_urls (url_id INTEGER PRIMARY KEY, job_key TEXT NOT NULL, url TEXT NOT NULL)",
+    "CREATE TABLE query_parameters (url_id INTEGER NOT NULL, job_key TEXT NOT NULL, parameter TEXT NOT NULL, "
+    "value TEXT NOT NULL, position INTEGER NOT NULL)",
+    "CREATE TABLE parameter_names (parameter TEXT PRIMARY KEY, name TEXT NOT NULL, sheet_order INTEGER NOT NULL, "
+    "joined INTEGER NOT NULL)",
+    "CREATE TABLE zip_sizes (zip_number INTEGER PRIMARY KEY, job_key TEXT NOT NULL, zip_size_kb REAL NOT NULL, "
+    "uncompressed_size_kb REAL, compression_ratio REAL, entry_count INTEGER, largest_member TEXT, "
+    "largest_member_kb REAL)",
+)
+
+# Created once the tables are filled, which is faster than updating them on every insert
+_INDEX_STATEMENTS = (
+    "CREATE INDEX jobs_job_key ON jobs (job_key)",
+    "CREATE INDEX jobs_job_date ON jobs (job_date)",
+    "CREATE INDEX log_rows_job_key ON log_rows (job_key)",
+    "CREATE INDEX level_counts_job_key ON level_counts (job_key, level)",
+    "CREATE INDEX emails_job_key ON emails (job_key)",
+    "CREATE INDEX emails_email ON emails (email)",
+    "CREATE INDEX issuing_urls_job_key ON issuing_urls (job_key)",
+    "CREATE INDEX query_parameters_job_key ON query_parameters (job_key)",
+    "CREATE INDEX query_parameters_parameter ON query_parameters (parameter, value)",
+    "CREATE INDEX query_parameters_url_id ON query_parameters (url_id, parameter, position, value)",
+    "CREATE INDEX zip_sizes_job_key ON zip_sizes (job_key)",
+)
+
+_JOB_VALUES_QUERY = """
+    SELECT issuing_urls.job_key, COALESCE(query_parameters.value, :null_value) AS value,
+        MIN(issuing_urls.url_id) AS first_url_id
+    FROM issuing_urls
+    LEFT JOIN query_parameters ON query_parameters.url_id = issuing_urls.url_id
+        AND query_parameters.parameter = :parameter AND query_parameters.position = 0
+    GROUP BY issuing_urls.job_key, value
+"""
+
+# A job's values for a joined parameter are joined in order of first appearance, as count_jobs_by_parameter_value does
+_JOINED_JOB_VALUES_QUERY = f"""
+    SELECT DISTINCT job_key,
+        group_concat(value, ', ') OVER (PARTITION BY job_key ORDER BY first_url_id
+                                        ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) AS value,
+        MIN(first_url_id) OVER (PARTITION BY job_key) AS first_url_id
+    FROM ({_JOB_VALUES_QUERY})
+"""
+
+
+def _quote_identifier(name: str) -> str:
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def _column_values(series: pd.Series) -> list:
+    """
+    Values of a column as a list with None for missing values, as sqlite3 expects
+    :param series: dataframe column
+    :return: list of values
+    """
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def _none_if_nan(value: float):
+    return None if math.isnan(value) else value
+
+
+def write_job_database(database_path: str, analysis_name: str, job_index, level_summary_df: pd.DataFrame,
+                       emails_df: pd.DataFrame, log_rows_df: pd.DataFrame = None, issuing_url_series: pd.Series = None,
+                       query_parameters_df: pd.DataFrame = None, parameter_names: dict = None,
+                       joined_parameters: tuple = ()):
+    """
+    Write the analysis tables to a new SQLite database, replacing the previous database only once the new one is fully
+    written
+    :param database_path: path of the database file
+    :param analysis_name: name of the analysis, lidar or imagery, which decides the sheets of the report
+    :param job_index: JobIndex of the analyzed jobs
+    :param level_summary_df: level summary indexed by JOB_ID and Level, from summarize_levels_by_job
+    :param emails_df: dataframe of JOB_ID and Email columns
+    :param log_rows_df: optional master dataframe of log rows indexed by JOB_ID, not available in streaming mode
+    :param issuing_url_series: optional series of distinct issuing urls indexed by JOB_ID
+    :param query_parameters_df: optional long table from explode_query_parameters of the issuing url series
+    :param parameter_names: optional dictionary of query parameter key to sheet name, in sheet order
+    :param joined_parameters: query parameter keys whose unique values per job are joined into one value
+    :return: None
+    """
+    database_folder = os.path.dirname(database_path)
+    if database_folder:
+        os.makedirs(database_folder, exist_ok=True)
+    temporary_path = f"{database_path}.tmp"
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+
+    connection = sqlite3.connect(temporary_path)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        with connection:
+            for statement in _SCHEMA_STATEMENTS:
+                connection.execute(statement)
+            log_headers = list(log_rows_df.columns) if log_rows_df is not None else []
+            connection.execute("CREATE TABLE log_rows (row_number INTEGER PRIMARY KEY, job_key TEXT NOT NULL{})".format(
+                "".join(f", {_quote_identifier(header)} TEXT" for header in log_headers)))
+
+            file_mtimes = job_index.file_mtimes
+            metadata = {"analysis": analysis_name,
+                        "created": datetime.datetime.now().isoformat(sep=" ", timespec="seconds"),
+                        "min_file_mtime": repr(min(file_mtimes)) if file_mtimes else None,
+                        "max_file_mtime": repr(max(file_mtimes)) if file_mtimes else None}
+            connection.executemany("INSERT INTO metadata VALUES (?, ?)", metadata.items())
+
+            # job_timestamp is the log session start, NULL for a log without a parsable start time
+            connection.executemany(
+                "INSERT INTO jobs (job_key, job_id, composite_job_id, job_folder, job_date, job_timestamp, html_path, "
+                "zip_bytes, mtime, size, row_count, last_row_time_ms, first_zip_mtime) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((job_index.record_key(record=record), record.job_id, record.composite_job_id, record.job_folder,
+                  to_eastern_wall_time(record.job_date).isoformat(sep=" ") if record.job_date is not None else None,
+                  _none_if_nan(value=job_start_seconds(job_date=record.job_date)),
+                  record.html_path, record.zip_bytes, record.mtime, record.size, record.row_count,
+                  record.last_row_time_ms, record.first_zip_mtime)
+                 for record in job_index.records))
+
+            if log_rows_df is not None:
+                connection.executemany(
+                    "INSERT INTO log_rows (job_key{}) VALUES (?{})".format(
+                        "".join(f", {_quote_identifier(header)}" for header in log_headers),
+                        ", ?" * len(log_headers)),
+                    zip(log_rows_df.index.tolist(), *(_column_values(log_rows_df[header]) for header in log_headers)))
+
+            level_counts = level_summary_df[LEVEL_COUNT_COLUMN]
+            connection.executemany("INSERT INTO level_counts VALUES (?, ?, ?)",
+                                   zip(level_counts.index.get_level_values("JOB_ID").tolist(),
+                                       level_counts.index.get_level_values("Level").tolist(),
+                                       level_counts.astype(int).tolist()))
+
+            connection.executemany("INSERT INTO emails (job_key, email, top_level_domain) VALUES (?, ?, ?)",
+                                   zip(emails_df["JOB_ID"].tolist(), emails_df["Email"].tolist(),
+                                       extract_top_level_domains(email_series=emails_df["Email"]).tolist()))
+
+            if issuing_url_series is not None:
+                connection.executemany("INSERT INTO issuing_urls VALUES (?, ?, ?)",
+                                       zip(range(issuing_url_series.size), issuing_url_series.index.tolist(),
+                                           issuing_url_series.tolist()))
+            if query_parameters_df is not None:
+                connection.executemany("INSERT INTO query_parameters VALUES (?, ?, ?, ?, ?)",
+                                       zip(query_parameters_df["URL_ID"].tolist(),
+                                           query_parameters_df["JOB_ID"].astype(object).tolist(),
+                                           query_parameters_df["Parameter"].astype(object).tolist(),
+                                           query_parameters_df["Value"].astype(object).tolist(),
+                                           query_parameters_df["Position"].tolist()))
+            if parameter_names is not None:
+                connection.executemany("INSERT INTO parameter_names VALUES (?, ?, ?, ?)",
+                                       ((parameter, name, sheet_order, int(parameter in joined_parameters))
+                                        for sheet_order, (parameter, name) in enumerate(parameter_names.items())))
+
+            zip_sizes_df = job_index.zip_sizes_frame()
+            # Sizes and counts of zips whose central directory could not be read are stored as NULL
+            connection.executemany("INSERT INTO zip_sizes (job_key, zip_size_kb, uncompressed_size_kb, "
+                                   "compression_ratio, entry_count, largest_member, largest_member_kb) "
+                                   "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                   zip(zip_sizes_df["Name"], zip_sizes_df["ZIP Size KB"],
+                                       _column_values(series=zip_sizes_df["Uncompressed Size KB"]),
+                                       _column_values(series=zip_sizes_df["Compression Ratio"]),
+                                       _column_values(series=zip_sizes_df["Entry Count"]),
+                                       zip_sizes_df["Largest Member"],
+                                       _column_values(series=zip_sizes_df["Largest Member KB"])))
+
+            for statement in _INDEX_STATEMENTS:
+                connection.execute(statement)
+        connection.execute("ANALYZE")
+    finally:
+        connection.close()
+    os.replace(temporary_path, database_path)
+
+
+class JobDatabase:
+    """
+    Query API over a job facts database written by write_job_database
+    :param database_path: path of the database file
+    """
+
+    def __init__(self, database_path: str):
+        if not os.path.isfile(database_path):
+            raise FileNotFoundError(f"No job database at {database_path}")
+        self.database_path = database_path
+        self.connection = sqlite3.connect(database_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def close(self):
+        self.connection.close()
+
+    def query(self, sql: str, parameters=()) -> pd.DataFrame:
+        """
+        Run an ad hoc query
+        :param sql: SQL select statement
+        :param parameters: sequence or dictionary of values for the statement's placeholders
+        :return: dataframe of the result rows
+        """
+        return pd.read_sql_query(sql, self.connection, params=parameters)
+
+    def metadata(self) -> dict:
+        """
+        The analysis name, creation time and file modified time range of the database
+        :return: dictionary of metadata name to value
+        """
+        return dict(self.connection.execute("SELECT name, value FROM metadata").fetchall())
+
+    def date_range_frame(self) -> pd.DataFrame:
+        """
+        Build the "Date Range of Jobs in Analysis" sheet from the earliest and latest file modified times
+        :return: dataframe with MIN JOB DATE and MAX JOB DATE columns
+        """
+        metadata = self.metadata()
+        date_range = [str(datetime.datetime.fromtimestamp(float(metadata[name])))
+                      if metadata.get(name) is not None else None
+                      for name in ("min_file_mtime", "max_file_mtime")]
+        return pd.DataFrame(data=[date_range], columns=["MIN JOB DATE", "MAX JOB DATE"], dtype=str)
+
+    def email_counts_frame(self) -> pd.DataFrame:
+        """
+        Build the "Unique Emails Summary" sheet
+        :return: dataframe of Email and Count, sorted by descending count
+        """
+        return self.query("SELECT email AS Email, COUNT(*) AS Count FROM emails GROUP BY email "
+                          "ORDER BY Count DESC, Email")
+
+    def top_level_domains_frame(self) -> pd.DataFrame:
+        """
+        Build the "Top-Level Domains Summary" sheet, the number of unique emails of each top-level domain
+        :return: dataframe of TopLevelDomain and Count, sorted by descending count
+        """
+        return self.query("SELECT top_level_domain AS TopLevelDomain, COUNT(DISTINCT email) AS Count FROM emails "
+                          "GROUP BY top_level_domain ORDER BY Count DESC, TopLevelDomain")
+
+    def level_summary_frame(self, wide: bool = False) -> pd.DataFrame:
+        """
+        Build the "Level Type Summary by Job" sheet
+        :param wide: return one row per job and one column per Level instead of one row per (JOB_ID, Level)
+        :return: dataframe of float counts indexed by JOB_ID and Level, or by JOB_ID in the wide layout
+        """
+        level_summary_df = self.query(f"SELECT job_key AS JOB_ID, level AS Level, count AS {LEVEL_COUNT_COLUMN} "
+                                      f"FROM level_counts ORDER BY job_key, level")
+        level_summary_df[LEVEL_COUNT_COLUMN] = level_summary_df[LEVEL_COUNT_COLUMN].astype(float)
+        level_summary_df.set_index(["JOB_ID", "Level"], inplace=True)
+        return widen_level_summary(level_summary_df=level_summary_df) if wide else level_summary_df
+
+    def zip_sizes_frame(self) -> pd.DataFrame:
+        """
+        Build the "Job .zip Size Summary" sheet
+        :return: dataframe of the job key Name, ZIP Size KB, Uncompressed Size KB, Compression Ratio, Entry Count,
+            Largest Member and Largest Member KB of every zip, empty when no zips were found
+        """
+        zip_sizes_df = self.query('SELECT job_key AS Name, zip_size_kb AS "ZIP Size KB", '
+                                  'uncompressed_size_kb AS "Uncompressed Size KB", '
+                                  'compression_ratio AS "Compression Ratio", entry_count AS "Entry Count", '
+                                  'largest_member AS "Largest Member", largest_member_kb AS "Largest Member KB" '
+                                  'FROM zip_sizes ORDER BY zip_number')
+        # Columns that are NULL in every row read back as object columns of None
+        for column in ("Uncompressed Size KB", "Compression Ratio", "Entry Count", "Largest Member KB"):
+            zip_sizes_df[column] = zip_sizes_df[column].astype("float64")
+        return zip_sizes_df
+
+    def issuing_url_series(self) -> pd.Series:
+        """
+        Read back the distinct issuing urls
+        :return: series of issuing urls indexed by JOB_ID, in url_id order
+        """
+        issuing_urls_df = self.query("SELECT job_key AS JOB_ID, url AS Message FROM issuing_urls ORDER BY url_id")
+        return issuing_urls_df.set_index("JOB_ID")["Message"]
+
+    def query_parameters_frame(self) -> pd.DataFrame:
+        """
+        Read back the query parameter long table of the issuing urls
+        :return: dataframe with URL_ID, JOB_ID, Parameter, Value and Position columns, as from explode_query_parameters
+        """
+        query_parameters_df = self.query("SELECT url_id AS URL_ID, job_key AS JOB_ID, parameter AS Parameter, "
+                                         "value AS Value, position AS Position FROM query_parameters ORDER BY rowid")
+        for column in ("JOB_ID", "Parameter", "Value"):
+            query_parameters_df[column] = pd.Categorical(query_parameters_df[column])
+        return query_parameters_df
+
+    def parameter_job_counts_frames(self) -> dict:
+        """
+        Build the "QP - <name>" sheets, the number of jobs that requested each value of each reported query parameter.
+        Only the first value of a parameter in each url is used and a url without the parameter counts as
+        NULL_VALUE_LABEL. Jobs with several values of a joined parameter count once under the values joined with ", ".
+        Values with equal counts are in order of first appearance in the issuing urls.
+        :return: dictionary of sheet name to dataframe of values and job counts, in sheet order
+        """
+        job_counts_by_parameter = {}
+        parameter_rows = self.connection.execute(
+            "SELECT parameter, name, joined FROM parameter_names ORDER BY sheet_order").fetchall()
+        for parameter, name, joined in parameter_rows:
+            job_values_query = _JOINED_JOB_VALUES_QUERY if joined else _JOB_VALUES_QUERY
+            # Values with equal counts are in order of first appearance, as count_jobs_by_parameter_value orders them
+            counts_df = self.query(f"SELECT value, COUNT(*) AS job_count FROM ({job_values_query}) GROUP BY value "
+                                   f"ORDER BY job_count DESC, MIN(first_url_id)",
+                                   parameters={"parameter": parameter, "null_value": NULL_VALUE_LABEL})
+            counts_df.columns = [name, JOB_COUNT_COLUMN]
+            job_counts_by_parameter[name] = counts_df
+        return job_counts_by_parameter
+
+    def extent_table(self) -> ExtentTable:
+        """
+        Parse the first srs and bounds value of every issuing url
+        :return: ExtentTable from LizardTechExtentEngine, one row per url in url order
+        """
+        extent_values_df = self.query(
+            "SELECT issuing_urls.job_key, srs.value AS srs, bounds.value AS bounds FROM issuing_urls "
+            "LEFT JOIN query_parameters AS srs ON srs.url_id = issuing_urls.url_id AND srs.parameter = 'srs' "
+            "AND srs.position = 0 "
+            "LEFT JOIN query_parameters AS bounds ON bounds.url_id = issuing_urls.url_id "
+            "AND bounds.parameter = 'bounds' AND bounds.position = 0 "
+            "ORDER BY issuing_urls.url_id")
+        return parse_extents(job_ids=extent_values_df["job_key"].to_numpy(dtype=object),
+                             srs_values=extent_values_df["srs"].to_numpy(dtype=object),
+                             bounds_values=extent_values_df["bounds"].to_numpy(dtype=object))
+
+    def job_dates_frame(self) -> pd.DataFrame:
+        """
+        Job date of the first dated record of each job, as the analysis scripts use
+        :return: dataframe with a Job_Date column indexed by JOB_ID
+        """
+        job_dates_df = self.query("SELECT job_key AS JOB_ID, job_date AS Job_Date, MIN(job_number) FROM jobs "
+                                  "WHERE job_date IS NOT NULL GROUP BY job_key")
+        job_dates_df = job_dates_df.set_index("JOB_ID")[["Job_Date"]]
+        job_dates_df["Job_Date"] = pd.to_datetime(job_dates_df["Job_Date"])
+        return job_dates_df
+
+    def mappable_extents_frame(self) -> pd.DataFrame:
+        """
+        Build the "Mappable Extents" sheet, the spatial reference system and parsed export extent of every issuing url
+        with the job date, duplicate extents removed
+        :return: dataframe indexed by JOB_ID with Spatial Ref Sys, Min X, Min Y, Max X, Max Y, SRS Code, Extent Problem
+            and Job_Date columns
+        """
+        return mappable_extents_frame(extent_table=deduplicate_extents(extent_table=self.extent_table()),
+                                      job_dates_df=self.job_dates_frame())
+
+    def _job_times(self, condition: str) -> tuple:
+        """
+        Log session starts, last row Times and first zip modified times of the job rows meeting a condition
+        :param condition: SQL condition on the jobs table
+        :return: tuple of (job keys, start seconds, last row times ms, first zip mtimes), the times as float64 arrays
+            with NaN where unknown, in job order
+        """
+        job_times_df = self.query(f"SELECT job_key, job_timestamp, last_row_time_ms, first_zip_mtime FROM jobs "
+                                  f"WHERE {condition} ORDER BY job_number")
+        # Columns that are NULL in every row read back as object columns of None
+        return (job_times_df["job_key"].tolist(),
+                *(job_times_df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+                  for column in ("job_timestamp", "last_row_time_ms", "first_zip_mtime")))
+
+    def job_latency_frame(self) -> pd.DataFrame:
+        """
+        Export latency of each job log with a parsable start time, as JobIndex.job_latency_frame builds it
+        :return: dataframe with Processing Seconds and First Output Seconds columns indexed by JOB_ID
+        """
+        job_keys, start_seconds, last_row_times_ms, first_zip_mtimes = self._job_times(
+            condition="job_timestamp IS NOT NULL")
+        processing_seconds, first_output_seconds = job_latency_seconds(
+            start_seconds=start_seconds, last_row_times_ms=last_row_times_ms, first_zip_mtimes=first_zip_mtimes)
+        return pd.DataFrame(data={"Processing Seconds": processing_seconds,
+                                  "First Output Seconds": first_output_seconds},
+                            index=pd.Index(job_keys, name="JOB_ID"))
+
+    def export_latency_frame(self) -> pd.DataFrame:
+        """
+        Build the "Export Latency" sheet, the latency quantiles of all jobs and of the jobs requesting each catalog,
+        output format, data type and resolution
+        :return: dataframe from LizardTechExportLatency.export_latency_frame
+        """
+        return export_latency_frame(job_latency_df=self.job_latency_frame(),
+                                    query_parameters_df=self.query_parameters_frame())
+
+    def job_run_times(self) -> tuple:
+        """
+        Start and end of each job log in seconds since the epoch, as JobIndex.job_run_times returns them
+        :return: tuple of float64 arrays (start seconds, end seconds), NaN starts for logs without a parsable start time
+        """
+        _, start_seconds, last_row_times_ms, first_zip_mtimes = self._job_times(condition="job_date IS NOT NULL")
+        return job_run_seconds(start_seconds=start_seconds, last_row_times_ms=last_row_times_ms,
+                               first_zip_mtimes=first_zip_mtimes)
+
+    def concurrency_minutes_frame(self) -> pd.DataFrame:
+        """
+        Build the minute series of the number of jobs running, from the job run times
+        :return: dataframe with the CONCURRENCY_MINUTE_COLUMNS of LizardTechConcurrency
+        """
+        start_seconds, end_seconds = self.job_run_times()
+        return concurrency_minutes_frame(timeline=concurrency_timeline(start_seconds=start_seconds,
+                                                                       end_seconds=end_seconds))
+
+    def job_zip_bytes(self) -> dict:
+        """
+        Total zip bytes of each job key with a zip
+        :return: dictionary of JOB_ID to zip bytes
+        """
+        return dict(self.connection.execute("SELECT job_key, SUM(zip_bytes) FROM jobs WHERE zip_bytes IS NOT NULL "
+                                            "GROUP BY job_key").fetchall())
+
+    def coverage_hot_spots_frame(self, cell_size: float = DEFAULT_CELL_SIZE) -> pd.DataFrame:
+        """
+        Build the "Coverage Hot Spots" sheet from the duplicate free extents and the zip bytes of their jobs
+        :param cell_size: width and height of a coverage cell, in the units of each srs
+        :return: dataframe with the HOT_SPOT_COLUMNS of LizardTechCoverage
+        """
+        coverage_grids = coverage_from_extent_table(extent_table=deduplicate_extents(extent_table=self.extent_table()),
+                                                    job_zip_bytes=self.job_zip_bytes(), cell_size=cell_size)
+        return coverage_hot_spots_frame(coverage_grids=coverage_grids)
+
+    def write_report(self, output_writer, wide_levels: bool = False, saturation_jobs: int = None,
+                     recent_days: int = 30, forecast_days: int = 90):
+        """
+        Write the sheets of the analysis that filled the database, in the analysis script's order
+        :param output_writer: OutputWriter from LizardTechOutputWriters
+        :param wide_levels: write the level summary as one row per job and one column per level
+        :param saturation_jobs: running jobs at which the server is saturated, by default the most seen
+        :param recent_days: days of recent requests the storage forecast rate is taken from
+        :param forecast_days: days of export storage to forecast
+        :return: None
+        """
+        is_lidar = self.metadata().get("analysis") == "lidar"
+        zip_sizes_df = self.zip_sizes_frame()
+        if zip_sizes_df.empty:
+            zip_sizes_df = pd.DataFrame(data={"No Zip Files Found": [0]})
+        concurrency_minutes_df = self.concurrency_minutes_frame()
+
+        output_writer.write_table(dataframe=self.date_range_frame(), table_name="Date Range of Jobs in Analysis",
+                                  index=False)
+        if is_lidar:
+            output_writer.write_table(dataframe=self.mappable_extents_frame(), table_name="Mappable Extents",
+                                      index=True)
+            output_writer.write_table(dataframe=self.coverage_hot_spots_frame(), table_name="Coverage Hot Spots",
+                                      index=False)
+            output_writer.write_table(dataframe=self.export_latency_frame(), table_name="Export Latency", index=False)
+            size_features_df = export_size_features(query_parameters_df=self.query_parameters_frame(),
+                                                    issuing_url_series=self.issuing_url_series())
+            capacity_model = fit_capacity_model(features_df=size_features_df, job_zip_bytes=self.job_zip_bytes())
+            output_writer.write_table(dataframe=capacity_model_frame(capacity_model=capacity_model),
+                                      table_name="Capacity Model", index=False)
+            output_writer.write_table(dataframe=storage_forecast_frame(capacity_model=capacity_model,
+                                                                       features_df=size_features_df,
+                                                                       job_dates_df=self.job_dates_frame(),
+                                                                       recent_days=recent_days,
+                                                                       forecast_days=forecast_days),
+                                      table_name="Storage Forecast", index=False)
+        output_writer.write_table(dataframe=daily_peaks_frame(concurrency_minutes_df=concurrency_minutes_df),
+                                  table_name="Daily Peak Concurrency", index=False)
+        output_writer.write_table(dataframe=saturated_hours_frame(concurrency_minutes_df=concurrency_minutes_df,
+                                                                  saturation_jobs=saturation_jobs),
+                                  table_name="Saturated Hours", index=False)
+        output_writer.write_table(dataframe=self.email_counts_frame(), table_name="Unique Emails Summary", index=False)
+        output_writer.write_table(dataframe=self.top_level_domains_frame(), table_name="Top-Level Domains Summary",
+                                  index=False)
+        output_writer.write_table(dataframe=self.level_summary_frame(wide=wide_levels),
+                                  table_name="Level Type Summary by Job", index=True)
+        output_writer.write_table(dataframe=zip_sizes_df, table_name="Job .zip Size Summary", index=False)
+        if is_lidar:
+            for name, counts_df in self.parameter_job_counts_frames().items():
+                output_writer.write_table(dataframe=counts_df, table_name=f"QP - {name}", index=False)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from LizardTechOutputWriters import OUTPUT_WRITERS
+    from LizardTechOutputWriters import create_output_writer
+
+    argument_parser = argparse.ArgumentParser(description="Report from or query a LizardTech job facts database")
+    subparsers = argument_parser.add_subparsers(dest="command", required=True)
+    report_parser = subparsers.add_parser("report", help="write the analysis sheets from the database")
+    report_parser.add_argument("database_path", help="job facts database written by an analysis script")
+    report_parser.add_argument("output_file_path", help="output file path, without extension")
+    report_parser.add_argument("--output-format", choices=list(OUTPUT_WRITERS), default="excel",
+                               help="write the tables to an excel workbook, or to a folder of csv or parquet files")
+    report_parser.add_argument("--wide-levels", action="store_true",
+                               help="write the level summary as one row per job and one column per level")
+    report_parser.add_argument("--saturation-jobs", type=int,
+                               help="running jobs at which the server is saturated, by default the most seen")
+    report_parser.add_argument("--recent-days", type=int, default=30,
+                               help="days of recent requests the storage forecast rate is taken from")
+    report_parser.add_argument("--forecast-days", type=int, default=90, help="days of export storage to forecast")
+    query_parser = subparsers.add_parser("query", help="run an ad hoc SQL query and print the result")
+    query_parser.add_argument("database_path", help="job facts database written by an analysis script")
+    query_parser.add_argument("sql", help="SQL select statement, with ? placeholders for any parameters")
+    query_parser.add_argument("parameters", nargs="*", help="values for the statement's placeholders")
+    arguments = argument_parser.parse_args()
+
+    with JobDatabase(database_path=arguments.database_path) as job_database:
+        start = time.perf_counter()
+        if arguments.command == "report":
+            with create_output_writer(output_format=arguments.output_format,
+                                      output_file_path=arguments.output_file_path) as output_writer:
+                job_database.write_report(output_writer=output_writer, wide_levels=arguments.wide_levels,
+                                          saturation_jobs=arguments.saturation_jobs,
+                                          recent_days=arguments.recent_days, forecast_days=arguments.forecast_days)
+            print(f"Report written to {output_writer.output_location}")
+        else:
+            with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", None):
+                print(job_database.query(sql=arguments.sql, parameters=arguments.parameters))
+        print(f"{(time.perf_counter() - start) * 1000:.1f} ms")
@@ -6,63 +6,71 @@ Date Created:
 Author: CJuice
 Revisions:
 NOTE: Forked from AGS_File_Bloat_Reduction
+20261016: Replaced os.walk and os.path.getmtime with the scandir based LizardTechDirectoryScanner. Folders removed
+    are no longer walked into, and file messages now print the file path instead of the last folder path.
+20261016: New or changed job folders are archived to the LizardTechJobArchive parquet store before anything is removed,
+    so the analysis scripts can still report on them. Nothing is removed when archiving fails.
+20261016: Removal is planned and run by LizardTechCleanupEngine. One scan plans every removal, folders planned for
+    removal are pruned from the plan, and the removals run on a thread pool with one line printed per removed item
+    instead of one per scanned item. Added --dry-run to print the plan only, --byte-budget to also evict the oldest job
+    folders until export_dir fits the budget, and --workers.
 
 """
 
 
 def main():
+    import argparse
     import datetime
     import os
-    import shutil
+
+    from LizardTechCleanupEngine import execute_cleanup
+    from LizardTechCleanupEngine import plan_cleanup
+    from LizardTechCleanupEngine import print_plan
+    from LizardTechCleanupEngine import print_results
+    from LizardTechJobArchive import JobArchive
+    from LizardTechJobIngest import ingest_job_folders
 
     # root_project_path = os.path.dirname(__file__)   # DEVELOPMENT
     # DIRECTORY_TO_EXAMINE = os.path.join(root_project_path, "export_dir2")    # DEVELOPMENT
     DIRECTORY_TO_EXAMINE = r'D:\Program Files\LizardTech\Express Server\ImageServer\var\export_dir'  # PRODUCTION
+    # ARCHIVE_FOLDER = os.path.join(root_project_path, "job_archive")    # DEVELOPMENT
+    ARCHIVE_FOLDER = r'D:\Scripts\GrabLizardTechOutputLogInfo\JobArchive'  # PRODUCTION
     AGE_COMPARISON_VALUE = datetime.timedelta(days=20)
-    now = datetime.datetime.now()
-
-    try:
-        for root, dirnames, files in os.walk(DIRECTORY_TO_EXAMINE):
 
-            # For each directory, look at the residing folders and files. Begin with folders first.
-            for folder in dirnames:
-                full_folder_path = os.path.join(root, folder)
-                time_dir_last_modified = os.path.getmtime(full_folder_path)
-                duration_since_folder_last_modified = now - datetime.datetime.fromtimestamp(time_dir_last_modified)
-                print("Folder: {} , Age: {}".format(full_folder_path, duration_since_folder_last_modified))
-                is_older_than_age_comparison_val = duration_since_folder_last_modified > AGE_COMPARISON_VALUE
-                if is_older_than_age_comparison_val:
-                    try:
-                        # Note: os.remove() supposedly doesn't work on folders. os.removedirs() doesn't work on
-                        #   non-empty folders. Use shutil.rmtree() to remove folders with content.
-                        shutil.rmtree(full_folder_path)
-                        print("REMOVED {} - Age: {}\n".format(full_folder_path, duration_since_folder_last_modified))
-                    except Exception as e:
-                        print("\tALERT: {} NOT REMOVED. EXCEPTION! {}\n".format(full_folder_path, e))
-
-            for file in files:
-
-                # For files in the directory, process them.
-                full_file_path = os.path.join(root, file)
-                time_file_last_modified = os.path.getmtime(full_file_path)
-                duration_since_file_last_modified = now - datetime.datetime.fromtimestamp(time_file_last_modified)
-                print("File: {} , Age: {}".format(full_folder_path, duration_since_file_last_modified))
-                is_older_than_age_comparison_val = duration_since_file_last_modified > AGE_COMPARISON_VALUE
-                if is_older_than_age_comparison_val:
-                    try:
-                        os.remove(full_file_path)
-                        print("REMOVED {} - Age: {}\n".format(full_file_path, duration_since_file_last_modified))
-                    except Exception as e:
-                        print("\tALERT: {} NOT REMOVED. EXCEPTION! {}\n".format(full_file_path, e))
+    argument_parser = argparse.ArgumentParser(description="Remove old LizardTech job folders and files")
+    argument_parser.add_argument("--dry-run", action="store_true",
+                                 help="print what would be removed, without archiving or removing anything")
+    argument_parser.add_argument("--byte-budget", type=int, default=None,
+                                 help="after the age rule, evict the oldest job folders until export_dir fits in this "
+                                      "many bytes")
+    argument_parser.add_argument("--workers", type=int, default=8, help="number of removal threads")
+    arguments = argument_parser.parse_args()
 
+    try:
+        # One scan of the directory plans every removal. A folder planned for removal is not looked into further.
+        cleanup_plan = plan_cleanup(root=DIRECTORY_TO_EXAMINE, max_age=AGE_COMPARISON_VALUE,
+                                    byte_budget=arguments.byte_budget)
     except IOError as io_err:
         print(io_err)
         exit()
     except Exception as e:
         print(e)
         exit()
+    print_plan(plan=cleanup_plan)
+    if arguments.dry_run or not cleanup_plan.actions:
+        return
+
+    # Archive every job folder not yet in the archive, or changed since, before any of them can be removed
+    try:
+        job_archive = JobArchive(archive_folder=ARCHIVE_FOLDER)
+        job_archive.archive_jobs_folder(jobs_folder=DIRECTORY_TO_EXAMINE, ingest_function=ingest_job_folders)
+        print(job_archive.summary())
+    except Exception as e:
+        print("\tALERT: JOB ARCHIVE FAILED, NOTHING REMOVED. EXCEPTION! {}\n".format(e))
+        exit()
+
+    print_results(plan=cleanup_plan, results=execute_cleanup(plan=cleanup_plan, worker_count=arguments.workers))
 
 
 if __name__ == "__main__":
     main()
-
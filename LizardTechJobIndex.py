@@ -0,0 +1,332 @@
+"""
+Lightweight in-memory index of ingested LizardTech jobs.
+Previously the analysis scripts built a one row dataframe for every zip file and a whole dataframe for every html log,
+then ran pd.concat over thousands of them, with zip sizes stored as strings and converted back with pd.to_numeric.
+The JobIndex instead keeps one compact __slots__ JobRecord per job, combining the html facts, zip size and file stats
+in one pass, and appends log rows to shared column lists and zip sizes to typed arrays. Dataframes are built once, at
+the end, from those columns. Zip sizes are keyed by the same job id as the html log rows, the composite job id when a
+log was parsed, so the two join.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import array
+import datetime
+import math
+
+from LizardTechLogParser import ParsedJobLog
+from LizardTechTimestamps import UNPARSABLE_START_TIME
+from LizardTechTimestamps import to_eastern_wall_time
+
+
+def _float_or_nan(value) -> float:
+    return float("nan") if value is None else float(value)
+
+
+def _kilobytes(size_bytes) -> float:
+    return float("nan") if size_bytes is None else size_bytes / 1000
+
+
+def job_start_seconds(job_date) -> float:
+    """
+    Log session start of a job log in seconds since the epoch
+    :param job_date: timezone aware job date of the log, or None
+    :return: float seconds, NaN when there is no log or its start time could not be parsed. A log without a parsable
+        start time is dated UNPARSABLE_START_TIME, which is no start at all.
+    """
+    return float("nan") if job_date is None or job_date == UNPARSABLE_START_TIME else job_date.timestamp()
+
+
+def job_latency_seconds(start_seconds, last_row_times_ms, first_zip_mtimes) -> tuple:
+    """
+    Export latency of job logs. Processing Seconds is the Time of the log's last row, from the log session start to
+    the last logged event. First Output Seconds is from the log session start to the modified time of the job's first
+    zip, NaN when the job has no zip or the zip is older than the log, as for a restored job folder.
+    :param start_seconds: float64 array of log session starts, from job_start_seconds
+    :param last_row_times_ms: float64 array of the Time of each log's last row in milliseconds, NaN when unknown
+    :param first_zip_mtimes: float64 array of the modified time of each job's first zip, NaN when it has no zip
+    :return: tuple of float64 arrays (processing seconds, first output seconds)
+    """
+    first_output_seconds = first_zip_mtimes - start_seconds
+    first_output_seconds[first_output_seconds < 0] = float("nan")
+    return last_row_times_ms / 1000, first_output_seconds
+
+
+def job_run_seconds(start_seconds, last_row_times_ms, first_zip_mtimes) -> tuple:
+    """
+    Start and end of job logs in seconds since the epoch. A job starts at its log session start and ends at its last
+    log row or its first zip's modified time, whichever is later. A zip older than the log is ignored, and the end is
+    NaN when neither is known.
+    :param start_seconds: float64 array of log session starts, from job_start_seconds
+    :param last_row_times_ms: float64 array of the Time of each log's last row in milliseconds, NaN when unknown
+    :param first_zip_mtimes: float64 array of the modified time of each job's first zip, NaN when it has no zip
+    :return: tuple of float64 arrays (start seconds, end seconds)
+    """
+    import numpy as np
+    zip_seconds = first_zip_mtimes.copy()
+    zip_seconds[zip_seconds < start_seconds] = np.nan
+    return start_seconds, np.fmax(start_seconds + last_row_times_ms / 1000, zip_seconds)
+
+
+class JobRecord:
+    """
+    Job level facts for a single job log, or for a job folder without a parsable log.
+    row_start and row_count locate the job's rows in the index log columns. zip_bytes is the total of the job folder's
+    zips, held only by the folder's first record, whose key the zips join to, so a folder with several logs counts its
+    zips once. first_zip_mtime is the earliest zip modified time of the folder. Both are None when there is no zip.
+    last_row_time_ms is the Time of the log's last row.
+    """
+    __slots__ = ("job_id", "composite_job_id", "job_folder", "job_date", "html_path", "zip_bytes", "mtime", "size",
+                 "row_start", "row_count", "last_row_time_ms", "first_zip_mtime")
+
+    def __init__(self, job_id: str, composite_job_id, job_folder: str, job_date, html_path, zip_bytes, mtime: float,
+                 size: int, row_start: int, row_count: int, last_row_time_ms=None, first_zip_mtime=None):
+        self.job_id = job_id
+        self.composite_job_id = composite_job_id
+        self.job_folder = job_folder
+        self.job_date = job_date
+        self.html_path = html_path
+        self.zip_bytes = zip_bytes
+        self.mtime = mtime
+        self.size = size
+        self.row_start = row_start
+        self.row_count = row_count
+        self.last_row_time_ms = last_row_time_ms
+        self.first_zip_mtime = first_zip_mtime
+
+
+class JobIndex:
+    """
+    Column oriented index of job records, log rows and zip sizes
+    :param use_composite_job_id: key rows and zips by composite job id (job name plus start time) rather than by the
+        job folder name
+    """
+
+    def __init__(self, use_composite_job_id: bool = True):
+        self.use_composite_job_id = use_composite_job_id
+        self.records = []
+        self.records_by_job_folder = {}
+        self.log_headers = []
+        self.log_columns = {}
+        self.log_row_keys = []
+        self.zip_keys = []
+        self.zip_sizes_kb = array.array("d")
+        self.zip_uncompressed_sizes_kb = array.array("d")
+        self.zip_entry_counts = array.array("d")
+        self.zip_largest_members = []
+        self.zip_largest_member_sizes_kb = array.array("d")
+        self.file_mtimes = array.array("d")
+        self.start_time_fallbacks = 0
+        self.unparsable_start_times = 0
+
+    @property
+    def log_row_count(self) -> int:
+        return len(self.log_row_keys)
+
+    def _record_key(self, job_id: str, composite_job_id) -> str:
+        return composite_job_id if self.use_composite_job_id and composite_job_id is not None else job_id
+
+    def record_key(self, record: JobRecord) -> str:
+        """
+        Job key of a record, the JOB_ID its log rows and zips are indexed by
+        :param record: JobRecord of the index
+        :return: composite job id or job folder name
+        """
+        return self._record_key(job_id=record.job_id, composite_job_id=record.composite_job_id)
+
+    def _append_log_columns(self, parsed_log, row_key: str):
+        """
+        Append a parsed log's columns to the index columns, padding columns missing from either side with None
+        :param parsed_log: ParsedJobLog for the job
+        :param row_key: job key repeated for each of the log's rows
+        :return: None
+        """
+        existing_row_count = self.log_row_count
+        row_count = len(parsed_log)
+        for header in parsed_log.headers:
+            if header not in self.log_columns:
+                self.log_headers.append(header)
+                self.log_columns[header] = [None] * existing_row_count
+            self.log_columns[header].extend(parsed_log.columns[header])
+        for header in self.log_headers:
+            if header not in parsed_log.columns:
+                self.log_columns[header].extend([None] * row_count)
+        self.log_row_keys.extend([row_key] * row_count)
+
+    def add_job_result(self, job_result):
+        """
+        Add the records, log rows and zip sizes of an ingested job folder
+        :param job_result: JobResult from LizardTechJobIngest
+        :return: None
+        """
+        self.file_mtimes.extend(job_result.file_mtimes)
+        self.start_time_fallbacks += job_result.start_time_fallbacks
+        self.unparsable_start_times += job_result.unparsable_start_times
+        mtime = max(job_result.file_mtimes) if job_result.file_mtimes else 0.0
+        zip_bytes = sum(job_result.zip_sizes_kb) * 1000 if job_result.zip_sizes_kb else None
+        first_zip_mtime = min(job_result.zip_mtimes) if job_result.zip_mtimes else None
+        first_record_position = len(self.records)
+
+        if not job_result.html_logs:
+            self.records.append(JobRecord(job_id=job_result.job_id, composite_job_id=None,
+                                          job_folder=job_result.job_folder, job_date=None, html_path=None,
+                                          zip_bytes=zip_bytes, mtime=mtime, size=job_result.total_size,
+                                          row_start=self.log_row_count, row_count=0, first_zip_mtime=first_zip_mtime))
+        for log_number, (composite_job_id, job_date, parsed_log) in enumerate(job_result.html_logs):
+            row_key = self._record_key(job_id=job_result.job_id, composite_job_id=composite_job_id)
+            self.records.append(JobRecord(job_id=job_result.job_id, composite_job_id=composite_job_id,
+                                          job_folder=job_result.job_folder, job_date=job_date,
+                                          html_path=parsed_log.file_path,
+                                          zip_bytes=zip_bytes if log_number == 0 else None, mtime=mtime,
+                                          size=job_result.total_size, row_start=self.log_row_count,
+                                          row_count=len(parsed_log), last_row_time_ms=parsed_log.last_row_time_ms,
+                                          first_zip_mtime=first_zip_mtime))
+            if isinstance(parsed_log, ParsedJobLog):
+                # Logs ingested as a JobLogSummary have no rows to append
+                self._append_log_columns(parsed_log=parsed_log, row_key=row_key)
+        self.records_by_job_folder.setdefault(job_result.job_folder, []).extend(self.records[first_record_position:])
+
+        # Zips join to the job's first log by its key, or to the folder name when no log could be parsed
+        self._append_zips(job_result=job_result,
+                          zip_key=self._record_key(job_id=job_result.job_id,
+                                                   composite_job_id=job_result.composite_job_id))
+
+    def add_late_zips(self, job_result):
+        """
+        Add zips that landed in a job folder after the folder was added. Their modified times are folded into the
+        folder's records, and their sizes into the folder's first record, whose log they join to as its other zips do.
+        :param job_result: JobResult from LizardTechJobIngest of the new zip files alone
+        :return: None
+        :raises KeyError: when the job folder was never added
+        """
+        folder_records = self.records_by_job_folder.get(job_result.job_folder)
+        if not folder_records:
+            raise KeyError(f"{job_result.job_folder} is not in the job index")
+        if not job_result.zip_sizes_kb:
+            return
+        self.file_mtimes.extend(job_result.file_mtimes)
+        folder_records[0].zip_bytes = (folder_records[0].zip_bytes or 0) + sum(job_result.zip_sizes_kb) * 1000
+        first_zip_mtime = min(job_result.zip_mtimes)
+        for record in folder_records:
+            if record.first_zip_mtime is None or first_zip_mtime < record.first_zip_mtime:
+                record.first_zip_mtime = first_zip_mtime
+            record.mtime = max([record.mtime] + job_result.file_mtimes)
+            record.size += job_result.total_size
+        self._append_zips(job_result=job_result, zip_key=self.record_key(record=folder_records[0]))
+
+    def _append_zips(self, job_result, zip_key: str):
+        """
+        Append the zip sizes and inspections of a job result to the index arrays
+        :param job_result: JobResult from LizardTechJobIngest
+        :param zip_key: job key the zips join to
+        :return: None
+        """
+        for zip_size_kb, zip_inspection in zip(job_result.zip_sizes_kb, job_result.zip_inspections):
+            self.zip_keys.append(zip_key)
+            self.zip_sizes_kb.append(zip_size_kb)
+            # Zips whose central directory could not be read have NaN sizes and counts
+            self.zip_uncompressed_sizes_kb.append(_kilobytes(zip_inspection.uncompressed_size))
+            self.zip_entry_counts.append(_float_or_nan(zip_inspection.entry_count))
+            self.zip_largest_members.append(zip_inspection.largest_member)
+            self.zip_largest_member_sizes_kb.append(_kilobytes(zip_inspection.largest_member_size))
+
+    def log_rows_frame(self):
+        """
+        Build the master dataframe of every log row, indexed by JOB_ID
+        :return: pandas dataframe with one column per log table header
+        """
+        import pandas as pd
+        log_rows_df = pd.DataFrame(data=self.log_columns, columns=self.log_headers)
+        log_rows_df.index = pd.Index(self.log_row_keys, name="JOB_ID")
+        return log_rows_df
+
+    def job_dates_frame(self):
+        """
+        Build a dataframe of job dates, one row per parsed job log, indexed by JOB_ID. Dates are naive US Eastern local
+        time, as written in the logs, since excel does not support timezone aware datetimes.
+        :return: pandas dataframe with a Job_Date column
+        """
+        import pandas as pd
+        dated_records = [record for record in self.records if record.job_date is not None]
+        return pd.DataFrame(data={"Job_Date": [to_eastern_wall_time(record.job_date) for record in dated_records]},
+                            index=pd.Index([self._record_key(record.job_id, record.composite_job_id)
+                                            for record in dated_records], name="JOB_ID"))
+
+    def _job_time_arrays(self, records: list) -> tuple:
+        """
+        Log session starts, last row Times and first zip modified times of job records
+        :param records: list of JobRecord
+        :return: tuple of float64 arrays (start seconds, last row times ms, first zip mtimes), NaN where unknown
+        """
+        import numpy as np
+        return (np.array([job_start_seconds(record.job_date) for record in records], dtype=np.float64),
+                np.array([_float_or_nan(record.last_row_time_ms) for record in records], dtype=np.float64),
+                np.array([_float_or_nan(record.first_zip_mtime) for record in records], dtype=np.float64))
+
+    def job_latency_frame(self):
+        """
+        Build a dataframe of the export latency of each parsed job log, indexed by JOB_ID, as in job_latency_seconds.
+        Logs without a parsable start time are left out.
+        :return: pandas dataframe with Processing Seconds and First Output Seconds columns
+        """
+        import pandas as pd
+        started_records = [record for record in self.records if not math.isnan(job_start_seconds(record.job_date))]
+        processing_seconds, first_output_seconds = job_latency_seconds(
+            *self._job_time_arrays(records=started_records))
+        return pd.DataFrame(data={"Processing Seconds": processing_seconds,
+                                  "First Output Seconds": first_output_seconds},
+                            index=pd.Index([self.record_key(record) for record in started_records], name="JOB_ID"))
+
+    def job_run_times(self) -> tuple:
+        """
+        Start and end of each parsed job log in seconds since the epoch, as in job_run_seconds. The start is NaN for a
+        log without a parsable start time, so the concurrency timeline skips the job rather than running it from 1970.
+        :return: tuple of float64 arrays (start seconds, end seconds), one value per parsed job log
+        """
+        dated_records = [record for record in self.records if record.job_date is not None]
+        return job_run_seconds(*self._job_time_arrays(records=dated_records))
+
+    def job_zip_bytes(self) -> dict:
+        """
+        Total zip bytes of each job key with a zip
+        :return: dictionary of JOB_ID to zip bytes
+        """
+        zip_bytes_by_job = {}
+        for record in self.records:
+            if record.zip_bytes is not None:
+                job_key = self.record_key(record)
+                zip_bytes_by_job[job_key] = zip_bytes_by_job.get(job_key, 0) + record.zip_bytes
+        return zip_bytes_by_job
+
+    def zip_sizes_frame(self):
+        """
+        Build the zip size summary dataframe with a Name column holding the job key, the float ZIP Size KB and
+        Uncompressed Size KB, the Compression Ratio of uncompressed to zip size, and the Entry Count, Largest Member and
+        Largest Member KB of each zip's central directory
+        :return: pandas dataframe, empty when no zips were found
+        """
+        import numpy as np
+        import pandas as pd
+        zip_sizes_kb = np.frombuffer(self.zip_sizes_kb, dtype=np.float64).copy()
+        uncompressed_sizes_kb = np.frombuffer(self.zip_uncompressed_sizes_kb, dtype=np.float64).copy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            compression_ratios = np.where(zip_sizes_kb > 0, uncompressed_sizes_kb / zip_sizes_kb, np.nan)
+        return pd.DataFrame(data={"Name": self.zip_keys,
+                                  "ZIP Size KB": zip_sizes_kb,
+                                  "Uncompressed Size KB": uncompressed_sizes_kb,
+                                  "Compression Ratio": compression_ratios,
+                                  "Entry Count": np.frombuffer(self.zip_entry_counts, dtype=np.float64).copy(),
+                                  "Largest Member": self.zip_largest_members,
+                                  "Largest Member KB": np.frombuffer(self.zip_largest_member_sizes_kb,
+                                                                     dtype=np.float64).copy()})
+
+    def date_range(self) -> tuple:
+        """
+        Earliest and latest file modified times across all indexed job folders
+        :return: tuple of (min datetime, max datetime), or (None, None) when no files were indexed
+        """
+        if not self.file_mtimes:
+            return None, None
+        return (datetime.datetime.fromtimestamp(min(self.file_mtimes)),
+                datetime.datetime.fromtimestamp(max(self.file_mtimes)))
@@ -0,0 +1,199 @@
+"""
+Ingest a single LizardTech job folder into a compact per job result.
+Each job folder contains an html log and likely a zip file. The html log is parsed once for its start date and time
+and table rows, and the zip file contributes its compressed size and, from its central directory, its uncompressed
+size and members. The JobResult holds only what the analysis scripts need so that it can be cached between runs by the
+job manifest. Job folders can be ingested in parallel across a process pool. Results are returned in the order the
+folders were given, so parallel and serial runs produce the same output.
+
+Run this module directly to report how ingestion throughput scales with the worker count.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import concurrent.futures
+import datetime
+import functools
+import os
+import time
+
+from LizardTechLogAggregator import JobLogSummary
+from LizardTechLogParser import parse_job_log
+from LizardTechTimestamps import FALLBACK
+from LizardTechTimestamps import UNPARSABLE
+from LizardTechTimestamps import parse_log_start_time
+from LizardTechTimestamps import start_time_parse_method
+from LizardTechZipInspector import inspect_zip
+
+
+class JobResult:
+    """
+    Parsed results for one job folder.
+    html_logs is a list of (composite job id, job date, log) tuples, one per html log in the folder. The job date is
+    timezone aware. The log is a ParsedJobLog, or a JobLogSummary when the folder was ingested with summary options.
+    zip_sizes_kb holds the compressed size of each zip file, zip_mtimes its modified time and zip_inspections the
+    ZipInspection of each zip file's central directory, in the same order. file_mtimes holds the modified time of every
+    file and total_size the combined size in bytes of every file. start_time_fallbacks counts the logs whose start time
+    did not fit the fixed format and was parsed by dateutil, and unparsable_start_times the logs whose start time could
+    not be parsed at all, or that have none. parse_failures counts the logs skipped for having no table.
+    html_parse_seconds and zip_inspect_seconds are the time spent parsing the logs and reading the zip central
+    directories.
+    """
+    __slots__ = ("job_folder", "job_id", "html_logs", "zip_sizes_kb", "zip_mtimes", "zip_inspections", "file_mtimes",
+                 "total_size", "start_time_fallbacks", "unparsable_start_times", "parse_failures", "html_parse_seconds",
+                 "zip_inspect_seconds")
+
+    def __init__(self, job_folder: str, job_id: str):
+        self.job_folder = job_folder
+        self.job_id = job_id
+        self.html_logs = []
+        self.zip_sizes_kb = []
+        self.zip_mtimes = []
+        self.zip_inspections = []
+        self.file_mtimes = []
+        self.total_size = 0
+        self.start_time_fallbacks = 0
+        self.unparsable_start_times = 0
+        self.parse_failures = 0
+        self.html_parse_seconds = 0.0
+        self.zip_inspect_seconds = 0.0
+
+    @property
+    def composite_job_id(self):
+        return self.html_logs[0][0] if self.html_logs else None
+
+
+def create_composite_job_id(job_id: str, job_date: datetime.datetime) -> str:
+    """
+    Combine the job folder name and the job start time so that two different jobs with the same name stay distinct
+    :param job_id: job folder name
+    :param job_date: timezone aware job start date and time
+    :return: composite job id string
+    """
+    return f"{job_id.replace(' ', '_')}_{int(job_date.timestamp())}"
+
+
+def ingest_job_folder(job_folder: str, file_stats: list, summary_options: dict = None) -> JobResult:
+    """
+    Parse the html logs and inspect the zip files of a job folder
+    :param job_folder: path to the job folder. In Prod, the folder name is the job id
+    :param file_stats: list of (file name, modified time, size in bytes) tuples for the files in the folder
+    :param summary_options: when given, keyword arguments for a JobLogSummary that aggregates each log's rows while
+        it is parsed. Only the summary is kept, not the rows.
+    :return: JobResult for the folder
+    """
+    job_result = JobResult(job_folder=job_folder, job_id=os.path.basename(job_folder))
+    for file_name, file_mtime, file_size in file_stats:
+        job_result.file_mtimes.append(file_mtime)
+        job_result.total_size += file_size
+        file_ext = os.path.splitext(file_name)[1]
+
+        if file_ext == ".html":
+            full_file_path = os.path.join(job_folder, file_name)
+            log_summary = JobLogSummary(**summary_options) if summary_options is not None else None
+
+            # Logs from failed jobs have no date or table and are skipped
+            parse_start = time.perf_counter()
+            try:
+                parsed_log = parse_job_log(file_path=full_file_path, row_handler=log_summary)
+            except ValueError as ve:
+                print(f"ValueError: {ve}")
+                job_result.parse_failures += 1
+                continue
+            finally:
+                job_result.html_parse_seconds += time.perf_counter() - parse_start
+
+            job_date = parse_log_start_time(start_time=parsed_log.start_time)
+            start_time_method = start_time_parse_method(start_time=parsed_log.start_time)
+            if start_time_method == FALLBACK:
+                job_result.start_time_fallbacks += 1
+            elif start_time_method == UNPARSABLE:
+                job_result.unparsable_start_times += 1
+            composite_job_id = create_composite_job_id(job_id=job_result.job_id, job_date=job_date)
+            if log_summary is not None:
+                log_summary.file_path = parsed_log.file_path
+                log_summary.start_time = parsed_log.start_time
+                job_result.html_logs.append((composite_job_id, job_date, log_summary))
+            else:
+                job_result.html_logs.append((composite_job_id, job_date, parsed_log))
+
+        elif file_ext == ".zip":
+            job_result.zip_sizes_kb.append(file_size / 1000)
+            job_result.zip_mtimes.append(file_mtime)
+            inspect_start = time.perf_counter()
+            job_result.zip_inspections.append(inspect_zip(path=os.path.join(job_folder, file_name), size=file_size))
+            job_result.zip_inspect_seconds += time.perf_counter() - inspect_start
+
+    return job_result
+
+
+def _ingest_job_folder_from_tuple(job_folder_and_stats: tuple, summary_options: dict = None) -> JobResult:
+    """
+    Unpack a (job folder, file stats) tuple for use with the process pool map
+    :param job_folder_and_stats: tuple of job folder path and list of (file name, mtime, size)
+    :param summary_options: optional JobLogSummary keyword arguments passed to ingest_job_folder
+    :return: JobResult for the folder
+    """
+    return ingest_job_folder(*job_folder_and_stats, summary_options=summary_options)
+
+
+def ingest_job_folders(job_folders_and_stats: list, worker_count: int = 1, chunk_size: int = 16,
+                       summary_options: dict = None) -> list:
+    """
+    Ingest many job folders, spreading them across a process pool when more than one worker is requested
+    :param job_folders_and_stats: list of (job folder path, list of (file name, mtime, size)) tuples
+    :param worker_count: number of worker processes. One or fewer ingests serially in this process
+    :param chunk_size: number of job folders sent to a worker at a time
+    :param summary_options: optional JobLogSummary keyword arguments passed to ingest_job_folder
+    :return: list of JobResult in the same order as the job folders given
+    """
+    if worker_count <= 1 or len(job_folders_and_stats) <= 1:
+        return [ingest_job_folder(job_folder, file_stats, summary_options=summary_options)
+                for job_folder, file_stats in job_folders_and_stats]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=worker_count) as executor:
+        return list(executor.map(functools.partial(_ingest_job_folder_from_tuple, summary_options=summary_options),
+                                 job_folders_and_stats,
+                                 chunksize=max(chunk_size, 1)))
+
+
+def benchmark_worker_scaling(jobs_folder: str, worker_counts: list, chunk_size: int = 16) -> list:
+    """
+    Time the ingestion of every job folder in the jobs folder for each worker count
+    :param jobs_folder: path to the folder containing the job folders
+    :param worker_counts: list of worker counts to time
+    :param chunk_size: number of job folders sent to a worker at a time
+    :return: list of (worker count, seconds, jobs per second) tuples
+    """
+    from LizardTechDirectoryScanner import scan_job_folders
+
+    job_folders_and_stats = sorted((job_folder_record.job_folder, job_folder_record.file_stats)
+                                   for job_folder_record in scan_job_folders(jobs_folder=jobs_folder))
+    scaling_results = []
+    for worker_count in worker_counts:
+        start = time.perf_counter()
+        ingest_job_folders(job_folders_and_stats=job_folders_and_stats, worker_count=worker_count,
+                           chunk_size=chunk_size)
+        seconds = time.perf_counter() - start
+        scaling_results.append((worker_count, seconds, len(job_folders_and_stats) / max(seconds, 1e-9)))
+    return scaling_results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argument_parser = argparse.ArgumentParser(description="Report job folder ingestion throughput by worker count")
+    argument_parser.add_argument("jobs_folder", help="folder containing LizardTech job folders")
+    argument_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+                                 help="worker counts to time")
+    argument_parser.add_argument("--chunk-size", type=int, default=16, help="job folders sent to a worker at a time")
+    arguments = argument_parser.parse_args()
+
+    baseline_seconds = None
+    for workers, elapsed_seconds, jobs_per_second in benchmark_worker_scaling(jobs_folder=arguments.jobs_folder,
+                                                                            worker_counts=arguments.workers,
+                                                                            chunk_size=arguments.chunk_size):
+        baseline_seconds = baseline_seconds or elapsed_seconds
+        print(f"Workers: {workers:>3}  Seconds: {elapsed_seconds:8.3f}  Jobs/s: {jobs_per_second:10.1f}  "
+              f"Speedup: {baseline_seconds / max(elapsed_seconds, 1e-9):5.2f}x")
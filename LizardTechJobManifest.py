@@ -0,0 +1,123 @@
+"""
+Persistent manifest of ingested job folders so that reruns of the analysis only parse new or changed jobs.
+The manifest is keyed by job folder path. Each entry records the folder's latest file modified time, total file size,
+composite job id, and the cached JobResult from ingestion. A refresh stats the jobs folder tree, ingests only the
+folders that are new or whose modified time or size changed, forgets folders that no longer exist, and returns the
+results for every current job. Run time then depends on the number of new jobs, not the number of jobs in the folder.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import os
+import pickle
+
+from LizardTechDirectoryScanner import scan_job_folders
+
+MANIFEST_VERSION = 7
+
+
+class ManifestEntry:
+    """
+    Signature and cached ingestion result for a single job folder
+    """
+    __slots__ = ("path", "mtime", "size", "composite_job_id", "result")
+
+    def __init__(self, path: str, mtime: float, size: int, composite_job_id, result):
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.composite_job_id = composite_job_id
+        self.result = result
+
+
+class JobManifest:
+    """
+    Job folder manifest persisted to a pickle file between runs
+    """
+
+    def __init__(self, manifest_path: str):
+        self.manifest_path = manifest_path
+        self.entries = {}
+        self.new_count = 0
+        self.changed_count = 0
+        self.unchanged_count = 0
+        self.removed_count = 0
+
+    def load(self):
+        """
+        Load entries from the manifest file. A missing, unreadable or out of date manifest starts empty.
+        :return: None
+        """
+        try:
+            with open(self.manifest_path, 'rb') as handler:
+                contents = pickle.load(handler)
+        except FileNotFoundError:
+            return
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as err:
+            print(f"Manifest {self.manifest_path} could not be read, all jobs will be parsed. {err}")
+            return
+        if contents.get("version") != MANIFEST_VERSION:
+            print(f"Manifest {self.manifest_path} is out of date, all jobs will be parsed.")
+            return
+        self.entries = contents["entries"]
+
+    def save(self):
+        """
+        Write entries to the manifest file, replacing the previous file only once the new one is fully written
+        :return: None
+        """
+        manifest_folder = os.path.dirname(self.manifest_path)
+        if manifest_folder:
+            os.makedirs(manifest_folder, exist_ok=True)
+        temporary_path = f"{self.manifest_path}.tmp"
+        with open(temporary_path, 'wb') as handler:
+            pickle.dump({"version": MANIFEST_VERSION, "entries": self.entries}, handler,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, self.manifest_path)
+
+    def refresh(self, jobs_folder: str, ingest_function) -> list:
+        """
+        Stat the jobs folder tree, ingest new or changed job folders, drop removed ones, and return all job results
+        :param jobs_folder: path to the folder containing the job folders
+        :param ingest_function: function taking a list of (job folder path, list of (file name, mtime, size)) tuples
+            and returning a list of results in the same order
+        :return: list of job results in job folder path order
+        """
+        self.new_count = self.changed_count = self.unchanged_count = self.removed_count = 0
+        current_entries = {}
+        pending_signatures = []
+        pending_folders_and_stats = []
+        for job_folder_record in sorted(scan_job_folders(jobs_folder=jobs_folder), key=lambda x: x.job_folder):
+            job_folder = job_folder_record.job_folder
+            mtime = job_folder_record.mtime
+            size = job_folder_record.size
+            entry = self.entries.get(job_folder)
+            if entry is not None and entry.mtime == mtime and entry.size == size:
+                self.unchanged_count += 1
+                current_entries[job_folder] = entry
+                continue
+            if entry is None:
+                self.new_count += 1
+            else:
+                self.changed_count += 1
+            pending_signatures.append((job_folder, mtime, size))
+            pending_folders_and_stats.append((job_folder, job_folder_record.file_stats))
+
+        # New and changed folders are ingested together so the ingest function can work on them in parallel
+        for (job_folder, mtime, size), result in zip(pending_signatures, ingest_function(pending_folders_and_stats)):
+            current_entries[job_folder] = ManifestEntry(path=job_folder, mtime=mtime, size=size,
+                                                        composite_job_id=result.composite_job_id, result=result)
+
+        self.removed_count = len(set(self.entries) - set(current_entries))
+        self.entries = current_entries
+        return [self.entries[job_folder].result for job_folder in sorted(self.entries)]
+
+    def summary(self) -> str:
+        """
+        Describe the outcome of the latest refresh
+        :return: string summary of job folder counts
+        """
+        return (f"Job Manifest: {self.new_count} new, {self.changed_count} changed, "
+                f"{self.unchanged_count} unchanged, {self.removed_count} removed")
+
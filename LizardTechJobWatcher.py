@@ -0,0 +1,363 @@
+"""
+Watch mode ingestion of the LizardTech jobs folder with rolling aggregates.
+The analysis scripts are batch runs over the whole jobs folder, and jobs that finish between runs can be removed by the
+cleanup tool before they are ever analyzed. The JobWatcher instead polls the jobs folder with the scandir based
+scanner and ingests each job folder as soon as it is complete. A job folder is complete once its latest file modified
+time and total size have not changed for the settle time, so a zip that is still being written is not read. Polling is
+used rather than inotify since production runs on Windows, and a poll is one scandir per job folder. A job folder that
+changes after it was ingested waits to settle again, and then any zip that landed since, under a new file name, is
+added to the zip aggregates. A log or zip rewritten in place after it was ingested is not folded back in, since the
+rows, emails, parameter counts and zip sizes already folded in can not be taken back out. Such folders are only counted
+in the changed_after_ingest metric, and the next batch run of an analysis script picks up their new contents.
+
+Each ingested job is parsed in streaming mode and folded into rolling aggregates: level counts, emails, issuing urls
+and zip sizes in a LogAggregator and JobIndex, plus running totals of levels, emails, zip bytes and, for lidar, the
+number of jobs requesting each query parameter value. Snapshots write the job facts database and the analysis sheets,
+with the same layout as the analysis scripts, from the aggregates. Metrics of ingest latency, the number of job
+folders waiting to settle and the rolling totals can be dumped to json at every poll. Job folders already in the jobs
+folder when the watcher starts are the backlog. They finished long before they were seen, so they are counted in the
+backlog_jobs metric and left out of the latencies, which are of the jobs the watcher saw arrive.
+
+Run this module directly to watch a jobs folder.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import collections
+import datetime
+import json
+import os
+import time
+
+import numpy as np
+
+from LizardTechDirectoryScanner import scan_job_folders
+from LizardTechJobDatabase import JobDatabase
+from LizardTechJobDatabase import write_job_database
+from LizardTechJobIndex import JobIndex
+from LizardTechJobIngest import ingest_job_folder
+from LizardTechJobIngest import ingest_job_folders
+from LizardTechLogAggregator import LogAggregator
+from LizardTechOutputWriters import create_output_writer
+from LizardTechQueryParameters import LIDAR_QUERY_PARAMETER_NAMES
+from LizardTechQueryParameters import count_jobs_by_parameter_value
+from LizardTechQueryParameters import explode_query_parameters
+
+ANALYSIS_SETTINGS = {
+    "lidar": {"use_composite_job_id": True,
+              "summary_options": {},
+              "parameter_names": LIDAR_QUERY_PARAMETER_NAMES,
+              "joined_parameters": ("cat",)},
+    "imagery": {"use_composite_job_id": False,
+                "summary_options": {"level_filter": ("INFO", "ERROR"), "email_keyword": "email"},
+                "parameter_names": None,
+                "joined_parameters": ()},
+}
+
+# Latencies of the most recently ingested jobs kept for the metrics percentiles
+LATENCY_WINDOW = 10_000
+
+
+class PendingJobFolder:
+    """
+    A job folder seen by the watcher that has not settled yet.
+    stable_since is when its signature last changed, or its latest file modified time when first seen. ingested is True
+    for a job folder that changed after it was ingested. backlog is True for a job folder found by the first poll.
+    """
+    __slots__ = ("job_folder", "file_stats", "signature", "first_seen", "stable_since", "ingested", "backlog")
+
+    def __init__(self, job_folder: str, file_stats: list, signature: tuple, first_seen: float, stable_since: float,
+                 ingested: bool = False, backlog: bool = False):
+        self.job_folder = job_folder
+        self.file_stats = file_stats
+        self.signature = signature
+        self.first_seen = first_seen
+        self.stable_since = stable_since
+        self.ingested = ingested
+        self.backlog = backlog
+
+
+class JobWatcher:
+    """
+    Polls a jobs folder and folds each completed job folder into rolling aggregates
+    :param jobs_folder: path to the folder containing the job folders
+    :param analysis: lidar or imagery, which decides the job keys, log filters and sheets as in the analysis scripts
+    :param settle_seconds: seconds a job folder's files must go unchanged before it is ingested
+    :param worker_count: worker processes for parsing the job folders that settle in the same poll
+    :param clock: function returning the current time in seconds since the epoch, the same clock as file mtimes
+    """
+
+    def __init__(self, jobs_folder: str, analysis: str = "lidar", settle_seconds: float = 60.0, worker_count: int = 1,
+                 clock=time.time):
+        self.jobs_folder = jobs_folder
+        self.analysis = analysis
+        self.settings = ANALYSIS_SETTINGS[analysis]
+        self.settle_seconds = settle_seconds
+        self.worker_count = worker_count
+        self.clock = clock
+
+        self.job_index = JobIndex(use_composite_job_id=self.settings["use_composite_job_id"])
+        self.log_aggregator = LogAggregator(use_composite_job_id=self.settings["use_composite_job_id"])
+        self.pending_job_folders = {}
+        self.ingested_signatures = {}
+        self.ingested_zip_names = {}
+
+        # Rolling totals
+        self.level_totals = collections.Counter()
+        self.email_totals = collections.Counter()
+        self.parameter_value_job_counts = {name: collections.Counter()
+                                           for name in (self.settings["parameter_names"] or {}).values()}
+        self.zip_bytes = 0.0
+        self.log_row_count = 0
+
+        # Metrics
+        self.started = self.clock()
+        self.poll_count = 0
+        self.backlog_count = 0
+        self.changed_after_ingest_count = 0
+        self.late_zip_count = 0
+        self.snapshot_count = 0
+        self.last_poll_seconds = 0.0
+        self.last_ingest_seconds = 0.0
+        self.detect_latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.completion_latencies = collections.deque(maxlen=LATENCY_WINDOW)
+
+    @property
+    def ingested_count(self) -> int:
+        return len(self.ingested_signatures)
+
+    def poll(self) -> int:
+        """
+        Scan the jobs folder once, track job folders that are new or still changing, and ingest those that settled
+        :return: number of job folders ingested
+        """
+        poll_start = time.perf_counter()
+        now = self.clock()
+        for job_folder_record in scan_job_folders(jobs_folder=self.jobs_folder):
+            job_folder = job_folder_record.job_folder
+            signature = (job_folder_record.mtime, job_folder_record.size)
+            ingested_signature = self.ingested_signatures.get(job_folder)
+            if ingested_signature == signature:
+                continue
+            pending = self.pending_job_folders.get(job_folder)
+            if pending is None:
+                self.pending_job_folders[job_folder] = PendingJobFolder(
+                    job_folder=job_folder, file_stats=job_folder_record.file_stats, signature=signature,
+                    first_seen=now, stable_since=min(job_folder_record.mtime, now),
+                    ingested=ingested_signature is not None, backlog=self.poll_count == 0)
+            elif pending.signature != signature:
+                pending.file_stats = job_folder_record.file_stats
+                pending.signature = signature
+                pending.stable_since = now
+
+        settled = sorted((pending for pending in self.pending_job_folders.values()
+                          if now - pending.stable_since >= self.settle_seconds), key=lambda x: x.job_folder)
+        if settled:
+            self._ingest(settled=settled)
+        self.poll_count += 1
+        self.last_poll_seconds = time.perf_counter() - poll_start
+        return len(settled)
+
+    def _ingest(self, settled: list):
+        """
+        Parse settled job folders and fold them into the rolling aggregates
+        :param settled: list of PendingJobFolder
+        :return: None
+        """
+        ingest_start = time.perf_counter()
+        new_folders = [pending for pending in settled if not pending.ingested]
+        job_results = ingest_job_folders(
+            job_folders_and_stats=[(pending.job_folder, pending.file_stats) for pending in new_folders],
+            worker_count=self.worker_count, summary_options=self.settings["summary_options"])
+
+        batch_aggregator = LogAggregator(use_composite_job_id=self.settings["use_composite_job_id"])
+        for job_result in job_results:
+            self.job_index.add_job_result(job_result=job_result)
+            self.log_aggregator.add_job_result(job_result=job_result)
+            batch_aggregator.add_job_result(job_result=job_result)
+            self.zip_bytes += sum(job_result.zip_sizes_kb) * 1000
+            for _, _, summary in job_result.html_logs:
+                self.log_row_count += len(summary)
+                self.level_totals.update(summary.level_counts)
+                self.email_totals.update(summary.emails)
+
+        # Jobs of different batches are different jobs, so the batch counts add to the rolling counts
+        if self.settings["parameter_names"] and batch_aggregator.issuing_urls:
+            issuing_url_series = batch_aggregator.issuing_url_series().to_frame().drop_duplicates()["Message"]
+            batch_counts = count_jobs_by_parameter_value(
+                query_parameters_df=explode_query_parameters(issuing_url_series=issuing_url_series),
+                issuing_url_series=issuing_url_series, parameter_names=self.settings["parameter_names"],
+                joined_parameters=self.settings["joined_parameters"])
+            for name, counts_df in batch_counts.items():
+                self.parameter_value_job_counts[name].update(dict(zip(counts_df.iloc[:, 0], counts_df.iloc[:, 1])))
+
+        for pending in settled:
+            if pending.ingested:
+                self._add_late_zips(pending=pending)
+
+        ingested_at = self.clock()
+        for pending in settled:
+            if pending.backlog and not pending.ingested:
+                self.backlog_count += 1
+            elif not pending.ingested:
+                self.detect_latencies.append(ingested_at - pending.first_seen)
+                self.completion_latencies.append(ingested_at - pending.signature[0])
+            self.ingested_signatures[pending.job_folder] = pending.signature
+            self.ingested_zip_names[pending.job_folder] = {file_name for file_name, _, _ in pending.file_stats
+                                                          if os.path.splitext(file_name)[1] == ".zip"}
+            del self.pending_job_folders[pending.job_folder]
+        self.last_ingest_seconds = time.perf_counter() - ingest_start
+
+    def _add_late_zips(self, pending: PendingJobFolder):
+        """
+        Fold the zips that landed in a job folder since it was ingested into the zip aggregates
+        :param pending: settled PendingJobFolder of an ingested job folder
+        :return: None
+        """
+        self.changed_after_ingest_count += 1
+        ingested_zip_names = self.ingested_zip_names[pending.job_folder]
+        late_zip_stats = [(file_name, file_mtime, file_size) for file_name, file_mtime, file_size in pending.file_stats
+                          if os.path.splitext(file_name)[1] == ".zip" and file_name not in ingested_zip_names]
+        if not late_zip_stats:
+            return
+        job_result = ingest_job_folder(job_folder=pending.job_folder, file_stats=late_zip_stats)
+        self.job_index.add_late_zips(job_result=job_result)
+        self.zip_bytes += sum(job_result.zip_sizes_kb) * 1000
+        self.late_zip_count += len(late_zip_stats)
+
+    def snapshot(self, output_folder: str, output_format: str = "excel") -> str:
+        """
+        Write the job facts database and the analysis sheets of every job ingested so far
+        :param output_folder: folder for the snapshot database and output
+        :param output_format: one of the OUTPUT_WRITERS keys, excel, csv or parquet
+        :return: path of the snapshot output workbook or folder
+        """
+        snapshot_name = f"LizardTechWatch_{self.analysis}_{datetime.datetime.now().strftime('%Y-%m-%d_%H%M%S')}"
+        database_path = os.path.join(output_folder, f"{snapshot_name}.sqlite")
+        issuing_url_series = self.log_aggregator.issuing_url_series().to_frame().drop_duplicates()["Message"]
+        has_parameters = self.settings["parameter_names"] is not None
+        write_job_database(database_path=database_path,
+                           analysis_name=self.analysis,
+                           job_index=self.job_index,
+                           level_summary_df=self.log_aggregator.level_summary_frame(),
+                           emails_df=self.log_aggregator.emails_frame(),
+                           issuing_url_series=issuing_url_series if has_parameters else None,
+                           query_parameters_df=(explode_query_parameters(issuing_url_series=issuing_url_series)
+                                                if has_parameters else None),
+                           parameter_names=self.settings["parameter_names"],
+                           joined_parameters=self.settings["joined_parameters"])
+        with JobDatabase(database_path=database_path) as job_database:
+            with create_output_writer(output_format=output_format,
+                                      output_file_path=os.path.join(output_folder, snapshot_name)) as output_writer:
+                job_database.write_report(output_writer=output_writer)
+        self.snapshot_count += 1
+        return output_writer.output_location
+
+    def metrics(self, top_count: int = 5) -> dict:
+        """
+        Current ingest latency, queue depth and rolling totals
+        :param top_count: number of most common values to report for levels, emails and query parameter values
+        :return: dictionary of metrics, json serializable
+        """
+        def latency_summary(latencies):
+            if not latencies:
+                return None
+            p50, p95 = np.percentile(np.fromiter(latencies, dtype=np.float64), [50, 95])
+            return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "max": round(max(latencies), 3)}
+
+        return {"time": datetime.datetime.now().isoformat(sep=" ", timespec="seconds"),
+                "uptime_seconds": round(self.clock() - self.started, 1),
+                "polls": self.poll_count,
+                "queue_depth": len(self.pending_job_folders),
+                "jobs_ingested": self.ingested_count,
+                "backlog_jobs": self.backlog_count,
+                "changed_after_ingest": self.changed_after_ingest_count,
+                "late_zips": self.late_zip_count,
+                "snapshots": self.snapshot_count,
+                "last_poll_seconds": round(self.last_poll_seconds, 3),
+                "last_ingest_seconds": round(self.last_ingest_seconds, 3),
+                "detect_latency_seconds": latency_summary(self.detect_latencies),
+                "completion_latency_seconds": latency_summary(self.completion_latencies),
+                "log_rows": self.log_row_count,
+                "zip_bytes": self.zip_bytes,
+                "levels": dict(self.level_totals.most_common(top_count)),
+                "emails": len(self.email_totals),
+                "top_emails": dict(self.email_totals.most_common(top_count)),
+                "query_parameter_values": {name: dict(counts.most_common(top_count))
+                                           for name, counts in self.parameter_value_job_counts.items()}}
+
+    def dump_metrics(self, metrics_path: str):
+        """
+        Write the current metrics to a json file, replacing the previous file only once the new one is fully written
+        :param metrics_path: path of the json file
+        :return: None
+        """
+        temporary_path = f"{metrics_path}.tmp"
+        with open(temporary_path, 'w') as handler:
+            json.dump(self.metrics(), handler, indent=2)
+        os.replace(temporary_path, metrics_path)
+
+    def run(self, poll_seconds: float, snapshot_seconds: float, output_folder: str, output_format: str = "excel",
+            max_polls: int = None):
+        """
+        Poll until interrupted, or for max_polls polls, with periodic snapshots and a metrics dump after every poll.
+        A final snapshot is written on the way out.
+        :param poll_seconds: seconds between the start of one poll and the next
+        :param snapshot_seconds: seconds between snapshots
+        :param output_folder: folder for the snapshots and the metrics json file
+        :param output_format: one of the OUTPUT_WRITERS keys, excel, csv or parquet
+        :param max_polls: optional number of polls after which to stop
+        :return: None
+        """
+        os.makedirs(output_folder, exist_ok=True)
+        metrics_path = os.path.join(output_folder, f"LizardTechWatch_{self.analysis}_metrics.json")
+        last_snapshot = time.monotonic()
+        try:
+            while max_polls is None or self.poll_count < max_polls:
+                poll_start = time.monotonic()
+                ingested = self.poll()
+                if ingested:
+                    print(f"{ingested} job folders ingested, {len(self.pending_job_folders)} waiting to settle")
+                if snapshot_seconds <= time.monotonic() - last_snapshot:
+                    snapshot_location = self.snapshot(output_folder=output_folder, output_format=output_format)
+                    print(f"Snapshot written to {snapshot_location}")
+                    last_snapshot = time.monotonic()
+                self.dump_metrics(metrics_path=metrics_path)
+                if max_polls is None or self.poll_count < max_polls:
+                    time.sleep(max(poll_seconds - (time.monotonic() - poll_start), 0.0))
+        except KeyboardInterrupt:
+            print("Watch stopped")
+        snapshot_location = self.snapshot(output_folder=output_folder, output_format=output_format)
+        print(f"Snapshot written to {snapshot_location}")
+        self.dump_metrics(metrics_path=metrics_path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from LizardTechOutputWriters import OUTPUT_WRITERS
+
+    argument_parser = argparse.ArgumentParser(description="Watch a LizardTech jobs folder and ingest jobs as they "
+                                                          "complete")
+    argument_parser.add_argument("jobs_folder", help="folder containing LizardTech job folders")
+    argument_parser.add_argument("output_folder", help="folder for the snapshots and metrics")
+    argument_parser.add_argument("--analysis", choices=list(ANALYSIS_SETTINGS), default="lidar",
+                                 help="job keys, log filters and sheets of the lidar or imagery analysis")
+    argument_parser.add_argument("--poll-seconds", type=float, default=10.0, help="seconds between polls")
+    argument_parser.add_argument("--settle-seconds", type=float, default=60.0,
+                                 help="seconds a job folder must go unchanged before it is ingested")
+    argument_parser.add_argument("--snapshot-seconds", type=float, default=3600.0, help="seconds between snapshots")
+    argument_parser.add_argument("--workers", type=int, default=1,
+                                 help="worker processes for parsing job folders that settle together")
+    argument_parser.add_argument("--output-format", choices=list(OUTPUT_WRITERS), default="excel",
+                                 help="write the snapshot tables to an excel workbook, or to a folder of csv or "
+                                      "parquet files")
+    argument_parser.add_argument("--max-polls", type=int, help="stop after this many polls")
+    arguments = argument_parser.parse_args()
+
+    job_watcher = JobWatcher(jobs_folder=arguments.jobs_folder, analysis=arguments.analysis,
+                             settle_seconds=arguments.settle_seconds, worker_count=arguments.workers)
+    job_watcher.run(poll_seconds=arguments.poll_seconds, snapshot_seconds=arguments.snapshot_seconds,
+                    output_folder=arguments.output_folder, output_format=arguments.output_format,
+                    max_polls=arguments.max_polls)
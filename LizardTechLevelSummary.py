@@ -0,0 +1,112 @@
+"""
+Vectorized Level summary for the LizardTech job logs.
+The analysis scripts looped over every job group of the master html dataframe, ran value_counts().to_frame() for each
+one, concatenated thousands of tiny frames and then reset, renamed and grouped the result again with .mean(). Here the
+"Level Type Summary by Job" table comes out of a single groupby size over (JOB_ID, Level). A wide layout, one row per
+job and one column per Level, is available for readers who prefer it to the long (JOB_ID, Level) layout.
+
+Run this module directly to benchmark the per job loop against the vectorized summary on synthetic job logs.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import pandas as pd
+
+LEVEL_COUNT_COLUMN = "Count"
+
+
+def summarize_levels_by_job(html_table_df: pd.DataFrame, levels: tuple = None, wide: bool = False) -> pd.DataFrame:
+    """
+    Count the Level values of each job's log rows.
+    Empty Level values are not counted, as value_counts did.
+    :param html_table_df: dataframe of entire html table contents, indexed by JOB_ID
+    :param levels: optional Level values to keep, such as ("INFO", "ERROR") to drop java error messages
+    :param wide: return one row per job and one column per Level instead of one row per (JOB_ID, Level)
+    :return: dataframe of float counts indexed by JOB_ID and Level, or by JOB_ID in the wide layout
+    """
+    level_series = html_table_df["Level"]
+    if levels is not None:
+        level_series = level_series[level_series.isin(levels)]
+    job_ids = level_series.index.rename("JOB_ID")
+    level_counts = (level_series.groupby(by=[job_ids, level_series.rename("Level")], sort=True, dropna=True)
+                    .size()
+                    .astype(float))
+    level_summary_df = level_counts.to_frame(name=LEVEL_COUNT_COLUMN)
+    return widen_level_summary(level_summary_df=level_summary_df) if wide else level_summary_df
+
+
+def widen_level_summary(level_summary_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pivot a (JOB_ID, Level) indexed level summary to one row per job and one column per Level, zero filled
+    :param level_summary_df: dataframe with a Count column indexed by JOB_ID and Level
+    :return: dataframe indexed by JOB_ID with a float column for each Level
+    """
+    wide_level_df = level_summary_df[LEVEL_COUNT_COLUMN].unstack(level="Level", fill_value=0.0)
+    wide_level_df.columns.name = None
+    return wide_level_df
+
+
+def benchmark_level_summary(job_count: int = 100_000, rows_per_job: int = 20, include_loop: bool = True,
+                            seed: int = 0) -> dict:
+    """
+    Time the previous per job value_counts loop against summarize_levels_by_job on synthetic log rows
+    :param job_count: number of synthetic jobs
+    :param rows_per_job: number of log rows per job
+    :param include_loop: time the per job loop too, which takes minutes at 100k jobs
+    :param seed: random seed for the synthetic Level values
+    :return: dictionary of seconds for each approach
+    """
+    import time
+    import numpy as np
+
+    random_generator = np.random.default_rng(seed)
+    level_values = np.array(["INFO", "DEBUG", "WARN", "ERROR"], dtype=object)
+    row_count = job_count * rows_per_job
+    job_ids = [f"job_{job_index}" for job_index in np.arange(row_count) // rows_per_job]
+    level_choices = level_values[random_generator.integers(0, len(level_values), size=row_count)]
+    html_table_df = pd.DataFrame(data={"Level": level_choices}, index=pd.Index(job_ids, name="JOB_ID"))
+
+    def per_job_loop():
+        level_summary_ls = []
+        for name, group in html_table_df.groupby([html_table_df.index]):
+            level_df = group["Level"].value_counts().to_frame()
+            level_df["JOB_ID"] = name
+            level_summary_ls.append(level_df)
+        master_level_df = pd.DataFrame(pd.concat(objs=level_summary_ls))
+        master_level_df.reset_index(drop=False, inplace=True)
+        master_level_df.rename(columns={"index": "Level", "Level": "Count"}, inplace=True)
+        return master_level_df.groupby(by=["JOB_ID", "Level"]).mean()
+
+    approaches = [("vectorized", lambda: summarize_levels_by_job(html_table_df=html_table_df)),
+                  ("vectorized_wide", lambda: summarize_levels_by_job(html_table_df=html_table_df, wide=True))]
+    if include_loop:
+        approaches.append(("per_job_loop", per_job_loop))
+
+    results = {"jobs": job_count, "rows": row_count}
+    for label, function in approaches:
+        start = time.perf_counter()
+        function()
+        results[f"{label}_seconds"] = time.perf_counter() - start
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argument_parser = argparse.ArgumentParser(description="Benchmark the per job level loop against the vectorized "
+                                                          "level summary")
+    argument_parser.add_argument("--jobs", type=int, default=100_000, help="number of synthetic jobs")
+    argument_parser.add_argument("--rows-per-job", type=int, default=20, help="log rows per synthetic job")
+    argument_parser.add_argument("--skip-loop", action="store_true", help="do not time the slow per job loop")
+    arguments = argument_parser.parse_args()
+
+    benchmark_results = benchmark_level_summary(job_count=arguments.jobs, rows_per_job=arguments.rows_per_job,
+                                                include_loop=not arguments.skip_loop)
+    print(f"Jobs: {benchmark_results['jobs']}  Rows: {benchmark_results['rows']}")
+    for approach in ("per_job_loop", "vectorized", "vectorized_wide"):
+        if f"{approach}_seconds" in benchmark_results:
+            print(f"{approach:>16}: {benchmark_results[f'{approach}_seconds']:.3f}s")
+    if "per_job_loop_seconds" in benchmark_results:
+        speedup = benchmark_results["per_job_loop_seconds"] / max(benchmark_results["vectorized_seconds"], 1e-9)
+        print(f"Speedup: {speedup:.1f}x")
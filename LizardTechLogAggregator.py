@@ -0,0 +1,154 @@
+"""
+Streaming aggregation of job log rows into the facts the analysis stages need.
+The master html dataframe held every row of every log, including java stack trace junk, but downstream stages only use
+Level counts, messages containing "@", and messages starting with "Issuing URL: ". A JobLogSummary is handed to the
+log parser as its row handler and applies those predicates while each log is parsed, so no rows are stored. The
+LogAggregator then combines the per job summaries into the level, email and issuing url tables, keeping memory flat
+no matter how many jobs are processed. Results match the master dataframe path of the analysis scripts.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import collections
+import re
+
+from LizardTechLogParser import LOG_TIME_HEADER
+from LizardTechLogParser import log_time_ms
+
+ISSUING_URL_PREFIX = "Issuing URL: "
+EMAIL_PATTERN = re.compile(r'[\w.-]+@[\w.-]+')
+
+
+class JobLogSummary:
+    """
+    Row handler for LizardTechLogParser.parse_job_log that keeps only the aggregated facts of one job log.
+    level_filter limits rows to the given Level values, as the imagery script removes java error messages.
+    email_keyword additionally requires a word in email messages, as the imagery script requires "email".
+    Rows with any empty cell are ignored for emails and issuing urls, as dropna() did on the master dataframe.
+    last_row_time_ms is the Time of the last row that has one, whatever its Level, as for a ParsedJobLog.
+    """
+    __slots__ = ("file_path", "start_time", "row_count", "level_counts", "emails", "issuing_urls", "last_row_time_ms",
+                 "level_filter", "email_keyword", "_headers", "_level_position", "_message_position",
+                 "_time_position")
+
+    def __init__(self, level_filter: tuple = None, email_keyword: str = None):
+        self.file_path = None
+        self.start_time = None
+        self.row_count = 0
+        self.level_counts = collections.Counter()
+        self.emails = []
+        self.issuing_urls = []
+        self.last_row_time_ms = None
+        self.level_filter = level_filter
+        self.email_keyword = email_keyword
+        self._headers = None
+        self._level_position = None
+        self._message_position = None
+        self._time_position = None
+
+    def __len__(self):
+        return self.row_count
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__ if not name.startswith("_")}
+
+    def __setstate__(self, state):
+        for name in self.__slots__:
+            setattr(self, name, state.get(name))
+
+    def __call__(self, headers: list, row: list):
+        if headers is not self._headers:
+            self._headers = headers
+            self._level_position = headers.index("Level") if "Level" in headers else None
+            self._message_position = headers.index("Message") if "Message" in headers else None
+            self._time_position = headers.index(LOG_TIME_HEADER) if LOG_TIME_HEADER in headers else None
+
+        if self._time_position is not None:
+            time_ms = log_time_ms(value=row[self._time_position])
+            if time_ms is not None:
+                self.last_row_time_ms = time_ms
+
+        level = row[self._level_position] if self._level_position is not None else None
+        if self.level_filter is not None and level not in self.level_filter:
+            return
+        self.row_count += 1
+        if level is not None:
+            self.level_counts[level] += 1
+
+        if self._message_position is None or None in row:
+            return
+        message = row[self._message_position]
+        if message.startswith(ISSUING_URL_PREFIX):
+            self.issuing_urls.append(message[len(ISSUING_URL_PREFIX):])
+        if "@" in message and (self.email_keyword is None or self.email_keyword in message):
+            # NOTE: only one email per message has been observed, so only the first match is kept
+            email_match = EMAIL_PATTERN.search(message)
+            if email_match is not None:
+                self.emails.append(email_match.group(0).lower())
+
+
+class LogAggregator:
+    """
+    Combines job log summaries into job keyed level counts, emails and issuing urls
+    :param use_composite_job_id: key by composite job id (job name plus start time) rather than by job folder name
+    """
+
+    def __init__(self, use_composite_job_id: bool = True):
+        self.use_composite_job_id = use_composite_job_id
+        self.level_counts = collections.Counter()
+        self.email_job_keys = []
+        self.emails = []
+        self.issuing_url_job_keys = []
+        self.issuing_urls = []
+
+    def add_summary(self, job_key: str, summary: JobLogSummary):
+        """
+        Fold one job log summary into the running aggregates
+        :param job_key: job id the summary belongs to
+        :param summary: JobLogSummary of the job log
+        :return: None
+        """
+        for level, count in summary.level_counts.items():
+            self.level_counts[(job_key, level)] += count
+        self.email_job_keys.extend([job_key] * len(summary.emails))
+        self.emails.extend(summary.emails)
+        self.issuing_url_job_keys.extend([job_key] * len(summary.issuing_urls))
+        self.issuing_urls.extend(summary.issuing_urls)
+
+    def add_job_result(self, job_result):
+        """
+        Fold the summaries of an ingested job folder into the running aggregates
+        :param job_result: JobResult from LizardTechJobIngest ingested with summary options
+        :return: None
+        """
+        for composite_job_id, job_date, summary in job_result.html_logs:
+            job_key = composite_job_id if self.use_composite_job_id else job_result.job_id
+            self.add_summary(job_key=job_key, summary=summary)
+
+    def level_summary_frame(self):
+        """
+        Build the level summary dataframe, indexed by JOB_ID and Level with a Count column
+        :return: pandas dataframe of level counts for each job
+        """
+        import pandas as pd
+        level_index = pd.MultiIndex.from_tuples(list(self.level_counts.keys()), names=["JOB_ID", "Level"])
+        level_df = pd.DataFrame(data={"Count": list(self.level_counts.values())}, index=level_index, dtype=float)
+        return level_df.sort_index()
+
+    def emails_frame(self):
+        """
+        Build the emails dataframe with JOB_ID and Email columns
+        :return: pandas dataframe of emails found in the job logs
+        """
+        import pandas as pd
+        return pd.DataFrame(data={"JOB_ID": self.email_job_keys, "Email": self.emails})
+
+    def issuing_url_series(self):
+        """
+        Build the issuing url series, indexed by JOB_ID and named Message as on the master dataframe
+        :return: pandas series of issuing urls
+        """
+        import pandas as pd
+        return pd.Series(data=self.issuing_urls, index=pd.Index(self.issuing_url_job_keys, name="JOB_ID"),
+                         name="Message", dtype=object)
@@ -0,0 +1,278 @@
+"""
+Incremental mirror of LizardTech job logs, used to snapshot production export_dir logs into a test area.
+The quick copier copied every html log with shutil.copy, one at a time on every run, into a single folder, so logs
+with the same name in different job folders overwrote each other. The mirror keeps each log under its job folder name,
+relative to the source root, and copies only logs that are missing from the destination or whose size or modified
+time differ. Copies keep the source modified time, so an unchanged log is skipped on the next run from the stat values
+of one scandir pass over each side. Logs are copied on a thread pool, in the kernel with os.copy_file_range or
+os.sendfile where the platform has them, through a temporary file that is renamed into place when complete.
+
+Run this module directly to mirror a folder, or to benchmark the mirror against the quick copier.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import concurrent.futures
+import os
+import shutil
+import time
+from typing import NamedTuple
+
+from LizardTechDirectoryScanner import scan_job_folders
+
+LOG_SUFFIXES = (".html",)
+PARTIAL_SUFFIX = ".partial"
+# Modified times set with os.utime can read back rounded to the file system's timestamp resolution
+MTIME_TOLERANCE_SECONDS = 0.001
+_COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class MirrorCopy(NamedTuple):
+    """
+    A log to copy, with the modified time and size in bytes of the source
+    """
+    source_path: str
+    destination_path: str
+    mtime: float
+    size: int
+
+
+class MirrorSummary(NamedTuple):
+    """
+    Counts and timings of a mirror run. failures holds a (source path, error message) tuple for every failed copy.
+    """
+    copied_count: int
+    copied_bytes: int
+    unchanged_count: int
+    failures: list
+    scan_seconds: float
+    copy_seconds: float
+
+    def __str__(self):
+        throughput = self.copied_bytes / 1e6 / self.copy_seconds if self.copy_seconds else 0.0
+        return (f"Log Mirror: {self.copied_count} copied ({self.copied_bytes / 1e6:.1f} MB at {throughput:.1f} MB/s), "
+                f"{self.unchanged_count} unchanged, {len(self.failures)} failed, scan {self.scan_seconds:.2f}s, "
+                f"copy {self.copy_seconds:.2f}s")
+
+
+def _file_signatures(root: str, suffixes: tuple) -> dict:
+    """
+    Modified time and size of every log under a folder, from one scandir pass
+    :param root: path to the folder to scan
+    :param suffixes: tuple of file name endings to include
+    :return: dictionary of file path relative to root to (mtime, size) tuple
+    """
+    signatures = {}
+    for job_folder_record in scan_job_folders(jobs_folder=root):
+        relative_folder = os.path.relpath(job_folder_record.job_folder, root)
+        for file_name, mtime, size in job_folder_record.file_stats:
+            if file_name.endswith(suffixes):
+                signatures[os.path.normpath(os.path.join(relative_folder, file_name))] = (mtime, size)
+    return signatures
+
+
+def plan_mirror(source_root: str, destination_root: str, suffixes: tuple = LOG_SUFFIXES) -> tuple:
+    """
+    Compare the logs under the source and destination folders and list the ones to copy
+    :param source_root: path to the folder containing the job folders, export_dir in Prod
+    :param destination_root: path to the mirror folder
+    :param suffixes: tuple of file name endings to mirror
+    :return: tuple of (list of MirrorCopy, number of unchanged logs)
+    """
+    source_signatures = _file_signatures(root=source_root, suffixes=suffixes)
+    destination_signatures = _file_signatures(root=destination_root, suffixes=suffixes)
+    mirror_copies = []
+    for relative_path, (mtime, size) in sorted(source_signatures.items()):
+        destination_mtime, destination_size = destination_signatures.get(relative_path, (None, None))
+        if destination_size == size and abs(destination_mtime - mtime) < MTIME_TOLERANCE_SECONDS:
+            continue
+        mirror_copies.append(MirrorCopy(source_path=os.path.join(source_root, relative_path),
+                                        destination_path=os.path.join(destination_root, relative_path),
+                                        mtime=mtime, size=size))
+    return mirror_copies, len(source_signatures) - len(mirror_copies)
+
+
+def _copy_file_contents(source_file, destination_file, size: int):
+    """
+    Copy the contents of one open file to another, in the kernel where the platform allows it. copy_file_range can fail
+    across file systems, and sendfile to a regular file is Linux only, so each falls back to the next.
+    :param source_file: source file object opened for binary reading
+    :param destination_file: destination file object opened for binary writing
+    :param size: number of bytes to copy
+    :return: None
+    """
+    source_descriptor = source_file.fileno()
+    destination_descriptor = destination_file.fileno()
+    for kernel_copy in (getattr(os, "copy_file_range", None), getattr(os, "sendfile", None)):
+        if kernel_copy is None:
+            continue
+        copied_bytes = 0
+        try:
+            while copied_bytes < size:
+                if kernel_copy is os.sendfile:
+                    sent_bytes = os.sendfile(destination_descriptor, source_descriptor, copied_bytes,
+                                             min(_COPY_CHUNK_SIZE, size - copied_bytes))
+                else:
+                    sent_bytes = os.copy_file_range(source_descriptor, destination_descriptor,
+                                                    min(_COPY_CHUNK_SIZE, size - copied_bytes))
+                if sent_bytes == 0:
+                    break
+                copied_bytes += sent_bytes
+        except OSError:
+            if copied_bytes:
+                raise
+            continue
+        if copied_bytes < size:
+            # The file grew or shrank while copying, copy whatever remains from the current position
+            os.lseek(source_descriptor, copied_bytes, os.SEEK_SET)
+            os.lseek(destination_descriptor, copied_bytes, os.SEEK_SET)
+            shutil.copyfileobj(source_file, destination_file, _COPY_CHUNK_SIZE)
+        return
+    shutil.copyfileobj(source_file, destination_file, _COPY_CHUNK_SIZE)
+
+
+def copy_log(mirror_copy: MirrorCopy):
+    """
+    Copy one log into the mirror, creating its job folder as needed, and give it the source modified time.
+    The copy is written to a .partial file first, so an interrupted run never leaves a truncated log that looks
+    complete.
+    :param mirror_copy: MirrorCopy to carry out
+    :return: error message, or None when the log was copied
+    """
+    partial_path = mirror_copy.destination_path + PARTIAL_SUFFIX
+    try:
+        os.makedirs(os.path.dirname(mirror_copy.destination_path), exist_ok=True)
+        with open(mirror_copy.source_path, 'rb') as source_file, open(partial_path, 'wb') as destination_file:
+            _copy_file_contents(source_file=source_file, destination_file=destination_file, size=mirror_copy.size)
+        os.utime(partial_path, (mirror_copy.mtime, mirror_copy.mtime))
+        os.replace(partial_path, mirror_copy.destination_path)
+    except OSError as e:
+        try:
+            os.remove(partial_path)
+        except OSError:
+            pass
+        return str(e)
+    return None
+
+
+def mirror_logs(source_root: str, destination_root: str, worker_count: int = 8,
+                suffixes: tuple = LOG_SUFFIXES) -> MirrorSummary:
+    """
+    Copy the new and changed logs under the source folder into the mirror folder on a thread pool
+    :param source_root: path to the folder containing the job folders, export_dir in Prod
+    :param destination_root: path to the mirror folder
+    :param worker_count: number of copy threads. One or fewer copies serially
+    :param suffixes: tuple of file name endings to mirror
+    :return: MirrorSummary
+    """
+    start = time.perf_counter()
+    mirror_copies, unchanged_count = plan_mirror(source_root=source_root, destination_root=destination_root,
+                                                 suffixes=suffixes)
+    scan_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if worker_count <= 1 or len(mirror_copies) <= 1:
+        errors = [copy_log(mirror_copy=mirror_copy) for mirror_copy in mirror_copies]
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=worker_count) as executor:
+            errors = list(executor.map(copy_log, mirror_copies))
+    copy_seconds = time.perf_counter() - start
+
+    failures = [(mirror_copy.source_path, error) for mirror_copy, error in zip(mirror_copies, errors)
+                if error is not None]
+    return MirrorSummary(copied_count=len(mirror_copies) - len(failures),
+                         copied_bytes=sum(mirror_copy.size for mirror_copy, error in zip(mirror_copies, errors)
+                                          if error is None),
+                         unchanged_count=unchanged_count,
+                         failures=failures,
+                         scan_seconds=scan_seconds,
+                         copy_seconds=copy_seconds)
+
+
+def benchmark_mirror(job_folder_count: int = 5_000, log_size: int = 20_000, worker_count: int = 8) -> dict:
+    """
+    Build a synthetic export_dir and time the quick copier's serial shutil.copy of every log against a first mirror
+    run, and against a second mirror run after a tenth of the logs changed
+    :param job_folder_count: number of job folders, each with one html log and one zip
+    :param log_size: size in bytes of each log
+    :param worker_count: number of copy threads
+    :return: dictionary of timings and counts
+    """
+    import tempfile
+
+    from LizardTechDirectoryScanner import scan_files
+
+    benchmark_root = tempfile.mkdtemp(prefix="lizardtech_mirror_benchmark_")
+    try:
+        source_root = os.path.join(benchmark_root, "export_dir")
+        for folder_index in range(job_folder_count):
+            job_folder = os.path.join(source_root, f"job_{folder_index:07d}")
+            os.makedirs(job_folder)
+            for file_name in ("log.html", "job.zip"):
+                with open(os.path.join(job_folder, file_name), 'wb') as file_handler:
+                    file_handler.write(os.urandom(log_size))
+
+        copier_destination = os.path.join(benchmark_root, "tempcopies")
+        os.mkdir(copier_destination)
+        start = time.perf_counter()
+        for entry in scan_files(root=source_root):
+            if entry.name.endswith(".html"):
+                shutil.copy(src=entry.path, dst=copier_destination)
+        copier_seconds = time.perf_counter() - start
+
+        mirror_root = os.path.join(benchmark_root, "mirror")
+        start = time.perf_counter()
+        first_summary = mirror_logs(source_root=source_root, destination_root=mirror_root, worker_count=worker_count)
+        first_seconds = time.perf_counter() - start
+
+        for folder_index in range(0, job_folder_count, 10):
+            with open(os.path.join(source_root, f"job_{folder_index:07d}", "log.html"), 'ab') as file_handler:
+                file_handler.write(b"<tr></tr>")
+        start = time.perf_counter()
+        second_summary = mirror_logs(source_root=source_root, destination_root=mirror_root, worker_count=worker_count)
+        second_seconds = time.perf_counter() - start
+
+        return {"logs": job_folder_count,
+                "copier_seconds": copier_seconds,
+                "copier_files": len(os.listdir(copier_destination)),
+                "first_seconds": first_seconds,
+                "first_copied": first_summary.copied_count,
+                "second_seconds": second_seconds,
+                "second_copied": second_summary.copied_count,
+                "second_unchanged": second_summary.unchanged_count}
+    finally:
+        shutil.rmtree(benchmark_root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argument_parser = argparse.ArgumentParser(description="Mirror new and changed LizardTech job logs")
+    argument_parser.add_argument("source_root", nargs="?", help="folder containing the job folders")
+    argument_parser.add_argument("destination_root", nargs="?", help="mirror folder")
+    argument_parser.add_argument("--workers", type=int, default=8, help="number of copy threads")
+    argument_parser.add_argument("--suffix", action="append", dest="suffixes",
+                                 help="file name ending to mirror, repeatable, default .html")
+    argument_parser.add_argument("--benchmark", action="store_true",
+                                 help="time the quick copier against the mirror on a synthetic export_dir")
+    argument_parser.add_argument("--job-folders", type=int, default=5_000, help="number of synthetic job folders")
+    arguments = argument_parser.parse_args()
+
+    if arguments.benchmark:
+        benchmark_results = benchmark_mirror(job_folder_count=arguments.job_folders, worker_count=arguments.workers)
+        print(f"Logs: {benchmark_results['logs']}")
+        print(f"     copier: {benchmark_results['copier_seconds']:.3f}s, "
+              f"{benchmark_results['copier_files']} files after flattening")
+        print(f"  mirror #1: {benchmark_results['first_seconds']:.3f}s, {benchmark_results['first_copied']} copied")
+        print(f"  mirror #2: {benchmark_results['second_seconds']:.3f}s, {benchmark_results['second_copied']} copied, "
+              f"{benchmark_results['second_unchanged']} unchanged")
+    elif arguments.destination_root is None:
+        argument_parser.error("source_root and destination_root are required unless --benchmark is given")
+    else:
+        mirror_summary = mirror_logs(source_root=arguments.source_root, destination_root=arguments.destination_root,
+                                     worker_count=arguments.workers,
+                                     suffixes=tuple(arguments.suffixes) if arguments.suffixes else LOG_SUFFIXES)
+        for source_path, error in mirror_summary.failures:
+            print(f"\tALERT: {source_path} NOT COPIED. {error}")
+        print(mirror_summary)
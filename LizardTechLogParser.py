@@ -0,0 +1,239 @@
+"""
+Single pass parser for the LizardTech job log html files.
+Each job log is a log4j html layout file containing a "Log session start time" line followed by a single table of
+log rows. Previously every log was opened twice, once line by line to find the start time and once by pd.read_html to
+build the table, which builds a full DOM and needs the header-row-0 rename and "Unnamed: 5" drop workarounds. This
+module reads each file once and splits only the table structure (rows and cells) to return the start time string
+and the table rows as compact columns keyed by the true table headers. A row handler can instead receive each row as
+it is parsed, so that callers aggregating rows never store them.
+
+Run this module directly to benchmark the parser against the pd.read_html path on a folder of job logs.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import html
+import re
+
+LOG_SESSION_START_PHRASE = "Log session start time"
+LOG_TIME_HEADER = "Time"
+MISSING_START_TIME = "NaN"
+
+_START_TIME_PATTERN = re.compile(re.escape(LOG_SESSION_START_PHRASE) + r"([^<\r\n]*)")
+_TABLE_START_PATTERN = re.compile(r"<table\b", re.IGNORECASE)
+_TABLE_END_PATTERN = re.compile(r"</table\s*>", re.IGNORECASE)
+_ROW_START_PATTERN = re.compile(r"<tr\b[^>]*>", re.IGNORECASE)
+_CELL_PATTERN = re.compile(r"<t[dh]\b([^>]*)>(.*?)(?=</t[dh]\s*>|<t[dh]\b|</?tr\b|\Z)",
+                           re.IGNORECASE | re.DOTALL)
+_INNER_TAG_PATTERN = re.compile(r"<[^>]*>")
+# pd.read_html reads a <br> as a line break, so a stack trace's "<br>&nbsp;&nbsp;at" becomes two spaces, not one
+_LINE_BREAK_PATTERN = re.compile(r"<br\b[^>]*>", re.IGNORECASE)
+_COLSPAN_PATTERN = re.compile(r"colspan\s*=\s*[\"']?(\d+)", re.IGNORECASE)
+
+# pd.read_html collapses line breaks and runs of whitespace in cell text to a single space. Matching it keeps the
+#   parsed values identical to the previous read_html path.
+_WHITESPACE_PATTERN = re.compile(r"[\r\n]+|\s{2,}")
+
+
+class ParsedJobLog:
+    """
+    Compact, column oriented contents of a single job log html file.
+    The columns dict maps each true table header to a list of cell values. Empty cells are None, as pd.read_html
+    would report them as NaN.
+    """
+    __slots__ = ("file_path", "start_time", "headers", "columns")
+
+    def __init__(self, file_path: str, start_time: str, headers: list, columns: dict):
+        self.file_path = file_path
+        self.start_time = start_time
+        self.headers = headers
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns[self.headers[0]]) if self.headers else 0
+
+    @property
+    def last_row_time_ms(self):
+        """
+        Time of the last log row that has one, in milliseconds since the log session start, or None
+        """
+        for value in reversed(self.columns.get(LOG_TIME_HEADER, [])):
+            time_ms = log_time_ms(value=value)
+            if time_ms is not None:
+                return time_ms
+        return None
+
+    def to_dataframe(self):
+        """
+        Build a dataframe of the table contents, equivalent to the cleaned up pd.read_html result
+        :return: pandas dataframe with one column per table header
+        """
+        import pandas as pd
+        return pd.DataFrame(data=self.columns, columns=self.headers)
+
+
+def log_time_ms(value):
+    """
+    Read the Time cell of a log row, the milliseconds elapsed since the log session start
+    :param value: cell text
+    :return: integer milliseconds, or None for empty cells and the java stack trace rows spanning every column
+    """
+    return int(value) if value is not None and value.isdigit() else None
+
+
+def _clean_cell_text(raw_text: str):
+    """
+    Convert the raw html between a cell's tags to the text pd.read_html would report, or None for an empty cell
+    :param raw_text: html content of a single td or th element
+    :return: cleaned string or None
+    """
+    if "<" in raw_text:
+        raw_text = _INNER_TAG_PATTERN.sub("", _LINE_BREAK_PATTERN.sub("\n", raw_text))
+    if "&" in raw_text:
+        raw_text = html.unescape(raw_text)
+    text = raw_text.strip()
+    if "\n" in text or "\r" in text or "  " in text or "\t" in text or "\xa0" in text:
+        text = _WHITESPACE_PATTERN.sub(" ", text)
+    return text if text else None
+
+
+def _iterate_table_rows(content: str, table_start: int):
+    """
+    Split the table starting at the given position into rows and cells, yielding each row as it is split.
+    Only the table structure is examined, no DOM is built. Log4j layouts never nest tables, so the first closing table
+    tag ends the table. A cell with a colspan repeats its text across the spanned columns, as pd.read_html does.
+    :param content: full html text of the job log
+    :param table_start: position just after the opening table tag
+    :return: generator of lists of cell values, header row first
+    """
+    table_end_match = _TABLE_END_PATTERN.search(content, table_start)
+    table_end = table_end_match.start() if table_end_match else len(content)
+
+    row_chunks = _ROW_START_PATTERN.split(content[table_start:table_end])
+    for row_chunk in row_chunks[1:]:
+        row = []
+        for cell_attributes, cell_text in _CELL_PATTERN.findall(row_chunk):
+            value = _clean_cell_text(cell_text)
+            colspan_match = _COLSPAN_PATTERN.search(cell_attributes) if cell_attributes else None
+            if colspan_match:
+                row.extend([value] * max(int(colspan_match.group(1)), 1))
+            else:
+                row.append(value)
+        if row:
+            yield row
+
+
+def parse_job_log(file_path: str, row_handler=None) -> ParsedJobLog:
+    """
+    Read a job log html file once and return the start time string and the table contents as columns.
+    Cells beyond the header count (colspan=6 java stack trace rows produced the "Unnamed: 5" column in read_html) are
+    dropped, and short rows are padded with None. When a row handler is given, each row is passed to it as it is
+    parsed instead of being stored, and the returned columns are empty.
+    :param file_path: path to job log html file
+    :param row_handler: optional callable taking (headers list, row list) for every data row
+    :return: ParsedJobLog of start time and table columns
+    :raises ValueError: when the log has no table, as seen for failed jobs. Matches pd.read_html behavior.
+    """
+    with open(file_path, 'r') as handler:
+        content = handler.read()
+
+    table_start_match = _TABLE_START_PATTERN.search(content)
+    if table_start_match is None:
+        raise ValueError(f"No tables found in {file_path}")
+
+    # The start time always precedes the table, so only search the text ahead of it
+    start_time_match = _START_TIME_PATTERN.search(content, 0, table_start_match.start())
+    start_time = start_time_match.group(1).strip() if start_time_match else MISSING_START_TIME
+
+    headers = None
+    header_count = 0
+    columns = {}
+    column_lists = []
+    for row in _iterate_table_rows(content=content, table_start=table_start_match.end()):
+        if headers is None:
+            # The first row holds the header values
+            headers = [value if value is not None else f"Unnamed: {index}" for index, value in enumerate(row)]
+            header_count = len(headers)
+            columns = {header: [] for header in headers}
+            column_lists = list(columns.values())
+            continue
+        if len(row) < header_count:
+            row = row + [None] * (header_count - len(row))
+        elif len(row) > header_count:
+            row = row[:header_count]
+        if row_handler is not None:
+            row_handler(headers, row)
+            continue
+        for index in range(header_count):
+            column_lists[index].append(row[index])
+
+    return ParsedJobLog(file_path=file_path, start_time=start_time, headers=headers or [], columns=columns)
+
+
+def read_html_job_log(file_path: str):
+    """
+    Previous pd.read_html based path, kept for benchmarking and comparison of results
+    :param file_path: path to job log html file
+    :return: dataframe of html table content
+    """
+    import pandas as pd
+    job_log_file_html_table_contents_df = pd.read_html(io=file_path)[0]
+    if all(isinstance(column, int) for column in job_log_file_html_table_contents_df.columns):
+        # Older pandas versions leave the true table headers in row 0
+        column_names_series = job_log_file_html_table_contents_df.iloc[0]
+        column_rename_dict = dict(zip(list(range(0, len(column_names_series))), column_names_series))
+        job_log_file_html_table_contents_df.rename(columns=column_rename_dict, inplace=True)
+        job_log_file_html_table_contents_df.drop([0], axis=0, inplace=True)
+    return job_log_file_html_table_contents_df
+
+
+def benchmark_parsers(jobs_folder: str, repeat: int = 3) -> dict:
+    """
+    Time the single pass parser against the pd.read_html path over every html log in a jobs folder
+    :param jobs_folder: path to the jobs folder to walk for html logs
+    :param repeat: number of timed passes over the logs, the best pass is reported
+    :return: dictionary of file count and best seconds for each approach
+    """
+    import os
+    import time
+
+    html_paths = []
+    for root, dirs, files in os.walk(jobs_folder):
+        html_paths.extend(os.path.join(root, file) for file in files if file.endswith(".html"))
+
+    def time_function(function):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for path in html_paths:
+                try:
+                    function(path)
+                except ValueError:
+                    pass
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    results = {"files": len(html_paths), "single_pass_seconds": time_function(parse_job_log)}
+    try:
+        results["read_html_seconds"] = time_function(read_html_job_log)
+    except ImportError as ie:
+        print(f"ImportError: read_html path unavailable. {ie}")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argument_parser = argparse.ArgumentParser(description="Benchmark the job log parser against pd.read_html")
+    argument_parser.add_argument("jobs_folder", help="folder containing LizardTech job folders")
+    argument_parser.add_argument("--repeat", type=int, default=3, help="number of timed passes")
+    arguments = argument_parser.parse_args()
+
+    benchmark_results = benchmark_parsers(jobs_folder=arguments.jobs_folder, repeat=arguments.repeat)
+    print(f"Files: {benchmark_results['files']}")
+    print(f"Single pass parser: {benchmark_results['single_pass_seconds']:.3f}s")
+    if "read_html_seconds" in benchmark_results:
+        print(f"pd.read_html: {benchmark_results['read_html_seconds']:.3f}s")
+        print(f"Speedup: "
+              f"{benchmark_results['read_html_seconds'] / max(benchmark_results['single_pass_seconds'], 1e-9):.1f}x")
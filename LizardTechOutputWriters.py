@@ -0,0 +1,304 @@
+"""
+Pluggable output backends for the LizardTech analysis tables.
+The analysis scripts wrote every sheet through pd.ExcelWriter, which holds the whole workbook in memory until it is
+saved and fails on any sheet past the excel row limit. Each backend here writes the same logical tables one at a time:
+  excel - xlsxwriter in constant memory mode, rows are streamed to disk as they are written and a table longer than
+          the excel row limit is split across numbered continuation sheets
+  csv - one .csv file per table in a folder next to where the workbook would be
+  parquet - one .parquet file per table in a folder next to where the workbook would be, needs pyarrow or fastparquet
+Every writer times its own writes and reports the time along with the peak resident memory of the process.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import abc
+import datetime
+import importlib
+import math
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Windows
+
+EXCEL_MAX_ROWS = 1_048_576
+EXCEL_MAX_SHEET_NAME_LENGTH = 31
+EXCEL_DATETIME_FORMAT = "yyyy-mm-dd hh:mm:ss"
+# xlsxwriter stamps the workbook properties with the current time unless a created time is set, so two runs over the
+#   same jobs would write different bytes
+EXCEL_CREATED = datetime.datetime(2000, 1, 1)
+
+
+def peak_rss_bytes():
+    """
+    Peak resident set size of this process so far
+    :return: bytes, or None when it cannot be determined on this platform
+    """
+    if resource is not None:
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory_info = psutil.Process().memory_info()
+    return getattr(memory_info, "peak_wset", memory_info.rss)
+
+
+def _table_file_name(table_name: str) -> str:
+    """
+    Make a file name safe version of a table name, such as QP_-_Catalog for "QP - Catalog"
+    :param table_name: table or sheet name
+    :return: file name without extension
+    """
+    return re.sub(r"[^\w.-]+", "_", table_name).strip("_")
+
+
+def _table_frame(dataframe: pd.DataFrame, index: bool) -> pd.DataFrame:
+    """
+    Flatten a table for writing, turning the index into leading columns when it is written
+    :param dataframe: table to write
+    :param index: write the index
+    :return: dataframe with a default index
+    """
+    return dataframe.reset_index() if index else dataframe.reset_index(drop=True)
+
+
+class OutputWriter(abc.ABC):
+    """
+    Base output backend. Use as a context manager and call write_table once per table.
+    :param output_file_path: path of the output file, without extension. Backends add their own extension or folder
+        suffix, and output_location is the resulting workbook or folder path.
+    """
+    name = None
+
+    def __init__(self, output_file_path: str):
+        self.output_file_path = output_file_path
+        self.output_location = output_file_path
+        self.output_paths = []
+        self.write_seconds = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def write_table(self, dataframe: pd.DataFrame, table_name: str, index: bool = False):
+        """
+        Write one table
+        :param dataframe: table contents
+        :param table_name: sheet or file name for the table
+        :param index: write the index as leading columns
+        :return: None
+        """
+        start = time.perf_counter()
+        self._write_table(table_df=_table_frame(dataframe=dataframe, index=index), table_name=table_name)
+        self.write_seconds += time.perf_counter() - start
+
+    def close(self):
+        """
+        Finish writing, timed along with the table writes
+        :return: None
+        """
+        start = time.perf_counter()
+        self._close()
+        self.write_seconds += time.perf_counter() - start
+
+    def report(self) -> str:
+        """
+        Summarize the write time and peak memory
+        :return: report string
+        """
+        peak_rss = peak_rss_bytes()
+        peak_rss_text = f"{peak_rss / 1_048_576:.1f} MB" if peak_rss is not None else "unavailable"
+        return f"Output Writer ({self.name}): {self.write_seconds:.2f}s writing, peak RSS {peak_rss_text}"
+
+    @abc.abstractmethod
+    def _write_table(self, table_df: pd.DataFrame, table_name: str):
+        """
+        Write one flattened table, each backend in its own way
+        :param table_df: table with a default index, the written index already turned into leading columns
+        :param table_name: sheet or file name for the table
+        :return: None
+        """
+
+    def _close(self):
+        pass
+
+
+class ExcelOutputWriter(OutputWriter):
+    """
+    Streams tables into an .xlsx workbook with xlsxwriter in constant memory mode, splitting tables longer than the
+    excel row limit across continuation sheets named "<table> (2)", "<table> (3)" and so on.
+    Missing values and the infinities excel can not hold are left as empty cells. Values are converted chunk_rows rows
+    at a time. The workbook's created property is a fixed time, so the same tables make the same bytes however and
+    whenever they were produced.
+    """
+    name = "excel"
+
+    def __init__(self, output_file_path: str, max_rows_per_sheet: int = EXCEL_MAX_ROWS, chunk_rows: int = 10_000,
+                 created: datetime.datetime = EXCEL_CREATED):
+        import xlsxwriter
+
+        super().__init__(output_file_path=output_file_path)
+        self.workbook_path = f"{output_file_path}.xlsx"
+        self.output_location = self.workbook_path
+        self.max_rows_per_sheet = max_rows_per_sheet
+        self.chunk_rows = chunk_rows
+        self.workbook = xlsxwriter.Workbook(self.workbook_path, {"constant_memory": True})
+        self.workbook.set_properties({"created": created})
+        self.header_format = self.workbook.add_format({"bold": True})
+        self.datetime_format = self.workbook.add_format({"num_format": EXCEL_DATETIME_FORMAT})
+        self.output_paths.append(self.workbook_path)
+
+    def _column_writer(self, worksheet, column_values: pd.Series):
+        """
+        Choose how a column's values are written, converting them once for the whole column
+        :param worksheet: xlsxwriter worksheet the column will be written to
+        :param column_values: column of the table
+        :return: tuple of (list of values with None for missing, function of (row, column, value))
+        """
+        if pd.api.types.is_bool_dtype(column_values.dtype):
+            return column_values.tolist(), worksheet.write_boolean
+        if pd.api.types.is_numeric_dtype(column_values.dtype):
+            values = [None if isinstance(value, float) and not math.isfinite(value) else value
+                      for value in column_values.tolist()]
+            return values, worksheet.write_number
+        if pd.api.types.is_datetime64_any_dtype(column_values.dtype):
+            values = [None if value is pd.NaT else value.to_pydatetime()
+                      for value in column_values.dt.tz_localize(None).tolist()]
+            return values, lambda row, column, value: worksheet.write_datetime(row, column, value,
+                                                                                 self.datetime_format)
+
+        def write_value(row, column, value):
+            if isinstance(value, str):
+                worksheet.write_string(row, column, value)
+            elif isinstance(value, (bool, np.bool_)):
+                worksheet.write_boolean(row, column, bool(value))
+            elif isinstance(value, (int, float, np.integer, np.floating)):
+                if math.isfinite(value):
+                    worksheet.write_number(row, column, value)
+            elif isinstance(value, datetime.datetime):
+                worksheet.write_datetime(row, column, value.replace(tzinfo=None), self.datetime_format)
+            else:
+                worksheet.write_string(row, column, str(value))
+
+        values = [None if pd.api.types.is_scalar(value) and pd.isna(value) else value
+                  for value in column_values.tolist()]
+        return values, write_value
+
+    def _sheet_name(self, table_name: str, part_number: int) -> str:
+        if part_number == 1:
+            return table_name[:EXCEL_MAX_SHEET_NAME_LENGTH]
+        suffix = f" ({part_number})"
+        return f"{table_name[:EXCEL_MAX_SHEET_NAME_LENGTH - len(suffix)]}{suffix}"
+
+    def _write_table(self, table_df: pd.DataFrame, table_name: str):
+        rows_per_sheet = self.max_rows_per_sheet - 1  # First row of every sheet is the header
+        row_count = len(table_df)
+        part_count = max(math.ceil(row_count / rows_per_sheet), 1)
+        if 1 < part_count:
+            print(f"{table_name}: {row_count} rows exceeds the excel row limit, split across {part_count} sheets")
+
+        headers = [str(column) for column in table_df.columns]
+        for part_index in range(part_count):
+            worksheet = self.workbook.add_worksheet(self._sheet_name(table_name=table_name,
+                                                                     part_number=part_index + 1))
+            worksheet.write_row(0, 0, headers, self.header_format)
+            part_start = part_index * rows_per_sheet
+            part_stop = min(part_start + rows_per_sheet, row_count)
+
+            # Values are converted a chunk of rows at a time so memory stays flat however long the table is
+            for chunk_start in range(part_start, part_stop, self.chunk_rows):
+                chunk_df = table_df.iloc[chunk_start:min(chunk_start + self.chunk_rows, part_stop)]
+                column_writers = [self._column_writer(worksheet=worksheet, column_values=chunk_df[column])
+                                  for column in chunk_df.columns]
+                first_row = chunk_start - part_start + 1
+                for row_offset in range(len(chunk_df)):
+                    row = first_row + row_offset
+                    for column, (values, write_function) in enumerate(column_writers):
+                        value = values[row_offset]
+                        if value is not None:
+                            write_function(row, column, value)
+
+    def _close(self):
+        self.workbook.close()
+
+
+class CsvOutputWriter(OutputWriter):
+    """
+    Writes each table to its own .csv file in a "<output file>_csv" folder
+    """
+    name = "csv"
+
+    def __init__(self, output_file_path: str):
+        super().__init__(output_file_path=output_file_path)
+        self.output_folder = f"{output_file_path}_csv"
+        self.output_location = self.output_folder
+        os.makedirs(self.output_folder, exist_ok=True)
+
+    def _write_table(self, table_df: pd.DataFrame, table_name: str):
+        table_path = os.path.join(self.output_folder, f"{_table_file_name(table_name=table_name)}.csv")
+        table_df.to_csv(table_path, index=False)
+        self.output_paths.append(table_path)
+
+
+class ParquetOutputWriter(OutputWriter):
+    """
+    Writes each table to its own .parquet file in a "<output file>_parquet" folder. Values in text columns that are not
+    strings, such as the export extent tuples, are written as their string form.
+    """
+    name = "parquet"
+
+    def __init__(self, output_file_path: str):
+        # Fail before any table is written, rather than after the analysis, when no parquet engine imports
+        for engine_name in ("pyarrow", "fastparquet"):
+            try:
+                importlib.import_module(engine_name)
+            except ImportError:
+                continue
+            self.engine = engine_name
+            break
+        else:
+            raise ImportError("The parquet output format needs pyarrow or fastparquet installed")
+        super().__init__(output_file_path=output_file_path)
+        self.output_folder = f"{output_file_path}_parquet"
+        self.output_location = self.output_folder
+        os.makedirs(self.output_folder, exist_ok=True)
+
+    def _write_table(self, table_df: pd.DataFrame, table_name: str):
+        table_df = table_df.copy()
+        table_df.columns = [str(column) for column in table_df.columns]
+        for column in table_df.columns:
+            if table_df[column].dtype == object:
+                table_df[column] = table_df[column].map(
+                    lambda value: value if value is None or isinstance(value, str)
+                    or (pd.api.types.is_scalar(value) and pd.isna(value)) else str(value))
+        table_path = os.path.join(self.output_folder, f"{_table_file_name(table_name=table_name)}.parquet")
+        table_df.to_parquet(table_path, engine=self.engine, index=False)
+        self.output_paths.append(table_path)
+
+
+OUTPUT_WRITERS = {ExcelOutputWriter.name: ExcelOutputWriter,
+                  CsvOutputWriter.name: CsvOutputWriter,
+                  ParquetOutputWriter.name: ParquetOutputWriter}
+
+
+def create_output_writer(output_format: str, output_file_path: str) -> OutputWriter:
+    """
+    Create the output backend for a format name
+    :param output_format: one of the OUTPUT_WRITERS keys, excel, csv or parquet
+    :param output_file_path: path of the output file, without extension
+    :return: OutputWriter for the format
+    """
+    return OUTPUT_WRITERS[output_format](output_file_path=output_file_path)
@@ -0,0 +1,210 @@
+"""
+Long format query parameter engine for the LizardTech issuing urls.
+The lidar analysis used to parse each issuing url into a parse_qs dict and then make a pass of .apply(x.get(key)) over
+the dicts for every parameter of interest, wrapping values in tuples so a groupby .unique() could run and rebuilding
+lists from the resulting ndarrays. Here each url's query string is parsed once and exploded into one row per
+(url, parameter, value) with categorical dtypes. Missing parameters are filled in with a null label, values are reduced
+to unique values per job and all the per job counts come out of a single grouped size. The cost grows linearly with
+the number of urls.
+
+Run this module directly to report the per url cost at increasing url counts.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import itertools
+import operator
+import urllib.parse as urlpar
+
+import numpy as np
+import pandas as pd
+
+NULL_VALUE_LABEL = "DoIT Detected NULL"
+JOB_COUNT_COLUMN = "Job Count"
+
+# Query parameters reported on by the lidar analysis and their sheet names.
+# NOTE: Changing the order of the dictionary values will change the order of the excel tabs
+LIDAR_QUERY_PARAMETER_NAMES = {"cat": "Catalog",
+                               "thinningFactor": "Thinning Factor",
+                               "srs": "Spatial Reference System",
+                               "class": "Classifications",
+                               "res": "Resolution",
+                               "dt": "Data Type",
+                               "oif": "Output Format",
+                               "bounds": "Exporting Extent",
+                               "item": "Unknown Meaning",
+                               }
+
+
+def _parse_query_string(url: str) -> list:
+    """
+    Split the query string of a url into (parameter, value) pairs with the same results as
+    parse_qsl(urlparse(url).query), blank values dropped, but without urlparse's full parse of the url and only
+    unquoting pairs that need it
+    :param url: issuing url
+    :return: list of (parameter, value) tuples
+    """
+    query = url.partition("?")[2].partition("#")[0]
+    if not query:
+        return []
+    query_pairs = []
+    for field in query.split("&"):
+        parameter, _, value = field.partition("=")
+        if not value:
+            continue
+        if "%" in field or "+" in field:
+            parameter = urlpar.unquote_plus(parameter)
+            value = urlpar.unquote_plus(value)
+        query_pairs.append((parameter, value))
+    return query_pairs
+
+
+def explode_query_parameters(issuing_url_series: pd.Series) -> pd.DataFrame:
+    """
+    Parse the query string of every issuing url once into a long table with one row per parameter value.
+    URL_ID is the position of the url in the series, Position the order of the value among the url's values for the
+    parameter. Blank values are dropped, as parse_qs did.
+    :param issuing_url_series: series of issuing urls indexed by JOB_ID
+    :return: dataframe with URL_ID, JOB_ID, Parameter, Value and Position columns
+    """
+    url_ids = []
+    parameters = []
+    values = []
+    for url_id, url in enumerate(issuing_url_series.tolist()):
+        for parameter, value in _parse_query_string(url=url):
+            url_ids.append(url_id)
+            parameters.append(parameter)
+            values.append(value)
+
+    url_id_array = np.array(url_ids, dtype=np.int64)
+    job_ids = issuing_url_series.index.to_numpy()
+    query_parameters_df = pd.DataFrame(data={"URL_ID": url_id_array,
+                                             "JOB_ID": pd.Categorical(job_ids[url_id_array]),
+                                             "Parameter": pd.Categorical(parameters),
+                                             "Value": pd.Categorical(values)})
+    query_parameters_df["Position"] = query_parameters_df.groupby(by=["URL_ID", "Parameter"],
+                                                                  observed=True, sort=False).cumcount()
+    return query_parameters_df
+
+
+def collect_parameter_values(query_parameters_df: pd.DataFrame, parameter: str,
+                             issuing_url_series: pd.Series) -> pd.Series:
+    """
+    Gather the values of one parameter back into a tuple per issuing url
+    :param query_parameters_df: long table from explode_query_parameters
+    :param parameter: query parameter key, such as "bounds"
+    :param issuing_url_series: series of issuing urls the long table was exploded from
+    :return: series of value tuples, NaN where the url lacks the parameter, with the issuing url index
+    """
+    parameter_df = query_parameters_df[query_parameters_df["Parameter"] == parameter]
+    value_tuples = parameter_df["Value"].astype(object).groupby(by=parameter_df["URL_ID"]).agg(tuple)
+    return pd.Series(data=value_tuples.reindex(np.arange(issuing_url_series.size)).to_numpy(),
+                     index=issuing_url_series.index, name=parameter)
+
+
+def count_jobs_by_parameter_value(query_parameters_df: pd.DataFrame, issuing_url_series: pd.Series,
+                                  parameter_names: dict, joined_parameters: tuple = ("cat",)) -> dict:
+    """
+    Count the number of jobs that requested each value of each query parameter.
+    Only the first value of a parameter in each url is used. A url without the parameter counts as NULL_VALUE_LABEL.
+    A job counts once per unique value, except for joined parameters where a job's unique values, such as several
+    catalogs, are joined with ", " into one value in order of first appearance.
+    :param query_parameters_df: long table from explode_query_parameters
+    :param issuing_url_series: series of issuing urls the long table was exploded from
+    :param parameter_names: dictionary of query parameter key to output name, in output order
+    :param joined_parameters: query parameter keys whose unique values per job are joined into one value
+    :return: dictionary of output name to dataframe of values and job counts, sorted by descending count. Values with
+        equal counts are in order of first appearance in the issuing urls.
+    """
+    parameter_keys = list(parameter_names)
+    url_count = issuing_url_series.size
+    first_values_df = query_parameters_df[(query_parameters_df["Position"] == 0)
+                                          & query_parameters_df["Parameter"].isin(parameter_keys)]
+
+    # Every url gets a row for every parameter of interest so missing parameters are counted as null
+    grid_index = pd.MultiIndex.from_product([np.arange(url_count), parameter_keys], names=["URL_ID", "Parameter"])
+    grid_values = (first_values_df.set_index(["URL_ID", "Parameter"])["Value"].astype(object)
+                   .reindex(grid_index).fillna(NULL_VALUE_LABEL))
+    values_df = grid_values.reset_index()
+    values_df["JOB_ID"] = issuing_url_series.index.to_numpy()[values_df["URL_ID"].to_numpy()]
+
+    # Unique values per job, each kept at its first url so values stay in order of first appearance
+    values_df = values_df.drop_duplicates(subset=["JOB_ID", "Parameter", "Value"])
+
+    # Only jobs with several values for a joined parameter need the string join, the rest keep their single value.
+    #   The joined value appears first at the job's first url.
+    joined_mask = values_df["Parameter"].isin(joined_parameters)
+    multiple_values_mask = joined_mask & values_df.duplicated(subset=["JOB_ID", "Parameter"], keep=False)
+    multiple_values_df = values_df[multiple_values_mask].sort_values(by=["Parameter", "JOB_ID"], kind="stable")
+    joined_rows = []
+    for (job_id, parameter), group_rows in itertools.groupby(
+            zip(multiple_values_df["URL_ID"].tolist(), multiple_values_df["JOB_ID"].tolist(),
+                multiple_values_df["Parameter"].tolist(), multiple_values_df["Value"].tolist()),
+            key=operator.itemgetter(1, 2)):
+        group_rows = list(group_rows)
+        joined_rows.append((group_rows[0][0], job_id, parameter, ", ".join(row[3] for row in group_rows)))
+    joined_df = pd.DataFrame(data=joined_rows, columns=["URL_ID", "JOB_ID", "Parameter", "Value"])
+    values_df = pd.concat([values_df.loc[~multiple_values_mask, ["URL_ID", "JOB_ID", "Parameter", "Value"]],
+                           joined_df], ignore_index=True).sort_values(by="URL_ID", kind="stable")
+    values_df["Parameter"] = pd.Categorical(values_df["Parameter"], categories=parameter_keys)
+    values_df["Value"] = values_df["Value"].astype("category")
+
+    # Groups come out in order of first appearance, which the stable sort below keeps for values with equal counts
+    job_counts = values_df.groupby(by=["Parameter", "Value"], observed=True, sort=False).size()
+
+    job_counts_by_parameter = {}
+    for parameter_key, parameter_name in parameter_names.items():
+        if parameter_key in job_counts.index.get_level_values("Parameter"):
+            parameter_counts = job_counts.xs(parameter_key, level="Parameter")
+        else:
+            parameter_counts = pd.Series(dtype=np.int64)
+        counts_df = pd.DataFrame(data={parameter_name: parameter_counts.index.astype(object),
+                                       JOB_COUNT_COLUMN: parameter_counts.to_numpy(dtype=np.int64)})
+        counts_df.sort_values(by=JOB_COUNT_COLUMN, ascending=False, kind="stable", inplace=True)
+        counts_df.reset_index(drop=True, inplace=True)
+        job_counts_by_parameter[parameter_name] = counts_df
+    return job_counts_by_parameter
+
+
+def benchmark_query_parameter_engine(url_counts: list, seed: int = 0) -> list:
+    """
+    Time explode_query_parameters plus count_jobs_by_parameter_value on synthetic issuing urls
+    :param url_counts: list of url counts to time
+    :param seed: random seed for the synthetic urls
+    :return: list of (url count, seconds, microseconds per url) tuples
+    """
+    import time
+
+    random_generator = np.random.default_rng(seed)
+    catalogs = np.array(["Garrett_2015", "Allegany_2013", "LidarCat", "Baltimore_2014"], dtype=object)
+    parameter_names = {"cat": "Catalog", "srs": "Spatial Reference System", "res": "Resolution",
+                       "bounds": "Exporting Extent", "item": "Unknown Meaning"}
+    scaling_results = []
+    for url_count in url_counts:
+        catalog_choices = catalogs[random_generator.integers(0, len(catalogs), size=url_count)]
+        minimum_xs = random_generator.integers(400000, 450000, size=url_count)
+        urls = [f"http://host/getcloud?cat={catalog}&srs=EPSG:26985&res={url_id % 2 + 1}"
+                f"&bounds={minimum_x},130000,0,{minimum_x + 1000},131500,0"
+                for url_id, (catalog, minimum_x) in enumerate(zip(catalog_choices, minimum_xs))]
+        issuing_url_series = pd.Series(data=urls, index=pd.Index(np.arange(url_count) // 3, name="JOB_ID"))
+
+        start = time.perf_counter()
+        query_parameters_df = explode_query_parameters(issuing_url_series=issuing_url_series)
+        count_jobs_by_parameter_value(query_parameters_df=query_parameters_df, issuing_url_series=issuing_url_series,
+                                      parameter_names=parameter_names)
+        seconds = time.perf_counter() - start
+        scaling_results.append((url_count, seconds, seconds / url_count * 1e6))
+    return scaling_results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argument_parser = argparse.ArgumentParser(description="Report the query parameter engine cost per issuing url")
+    argument_parser.add_argument("--urls", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                                 help="issuing url counts to time")
+    arguments = argument_parser.parse_args()
+
+    for urls, elapsed_seconds, microseconds_per_url in benchmark_query_parameter_engine(url_counts=arguments.urls):
+        print(f"URLs: {urls:>9}  Seconds: {elapsed_seconds:8.3f}  Microseconds/URL: {microseconds_per_url:6.2f}")
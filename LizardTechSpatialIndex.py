@@ -0,0 +1,333 @@
+"""
+In process spatial index of the LizardTech lidar export extents, for "which jobs touched this area" questions.
+Finding the jobs whose export extent overlapped a county or a tile meant scanning the Mappable Extents sheet. An
+ExtentIndex holds the valid extents with their JOB_ID and Job_Date in a Sort-Tile-Recursive packed R-tree, one tree
+per srs code. Packing sorts the extents into slices by the x of their centers and each slice by the y of its centers,
+so every run of NODE_CAPACITY extents is a compact leaf. Each level above is the bounding boxes of runs of
+NODE_CAPACITY nodes of the level below, so the children of node i are nodes i * NODE_CAPACITY onward and the tree is
+held as one array of boxes per level, with no pointers. A query tests the boxes of the candidate nodes of a level in
+one vectorized step and descends to their children, so it visits a few hundred boxes, not every extent.
+Box and point queries can be filtered by a job date range. Boxes that touch at an edge or corner overlap.
+An index is saved as a .npz file of the extents in packed order, and the upper levels are rebuilt on load.
+
+Run this module directly to build an index from a job facts database, to query an index, or to time queries on
+synthetic extents.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import datetime
+import math
+
+import numpy as np
+import pandas as pd
+
+from LizardTechExtentEngine import EXTENT_COLUMNS
+from LizardTechExtentEngine import ExtentTable
+from LizardTechExtentEngine import MAX_X
+from LizardTechExtentEngine import MAX_Y
+from LizardTechExtentEngine import MIN_X
+from LizardTechExtentEngine import MIN_Y
+from LizardTechExtentEngine import SRS_CODE
+
+NODE_CAPACITY = 16
+
+
+def _pack_order(boxes: np.ndarray, node_capacity: int) -> np.ndarray:
+    """
+    Sort-Tile-Recursive order of boxes of one srs
+    :param boxes: float64 array of (minx, miny, maxx, maxy) rows
+    :param node_capacity: boxes per leaf
+    :return: int64 positions of the boxes in packed order
+    """
+    leaf_count = math.ceil(len(boxes) / node_capacity)
+    slice_size = max(1, math.ceil(math.sqrt(leaf_count))) * node_capacity
+    x_order = np.argsort(boxes[:, 0] + boxes[:, 2], kind="stable")
+    slice_numbers = np.arange(len(boxes)) // slice_size
+    center_ys = boxes[x_order, 1] + boxes[x_order, 3]
+    return x_order[np.lexsort((center_ys, slice_numbers))]
+
+
+def _build_levels(boxes: np.ndarray, node_capacity: int) -> list:
+    """
+    Bounding boxes of every level of a packed tree
+    :param boxes: float64 array of (minx, miny, maxx, maxy) rows in packed order
+    :param node_capacity: children per node
+    :return: list of float64 box arrays, the boxes themselves first and the root level last
+    """
+    levels = [boxes]
+    while len(levels[-1]) > 1:
+        child_boxes = levels[-1]
+        starts = np.arange(0, len(child_boxes), node_capacity)
+        levels.append(np.column_stack([np.minimum.reduceat(child_boxes[:, 0], starts),
+                                       np.minimum.reduceat(child_boxes[:, 1], starts),
+                                       np.maximum.reduceat(child_boxes[:, 2], starts),
+                                       np.maximum.reduceat(child_boxes[:, 3], starts)]))
+    return levels
+
+
+class ExtentIndex:
+    """
+    Packed R-tree of valid export extents. extents, job_ids and job_dates are in packed order, the extents of each
+    srs code contiguous. Build one with build_extent_index or load one with load_extent_index.
+    :param job_ids: object array of the JOB_ID of each extent
+    :param extents: float64 array of (minx, miny, maxx, maxy, srs code) rows, sorted by srs code and packed
+    :param job_dates: datetime64[ns] array of the job date of each extent, NaT where a job has no date
+    :param node_capacity: children per node
+    """
+
+    def __init__(self, job_ids: np.ndarray, extents: np.ndarray, job_dates: np.ndarray,
+                 node_capacity: int = NODE_CAPACITY):
+        self.job_ids = job_ids
+        self.extents = extents
+        self.job_dates = job_dates
+        self.node_capacity = node_capacity
+        self.srs_trees = {}
+        srs_codes = extents[:, SRS_CODE]
+        boundaries = np.flatnonzero(np.diff(srs_codes)) + 1
+        for start, stop in zip(np.concatenate([[0], boundaries]), np.concatenate([boundaries, [len(srs_codes)]])):
+            if stop > start:
+                self.srs_trees[int(srs_codes[start])] = (int(start), _build_levels(
+                    boxes=np.ascontiguousarray(extents[start:stop, :SRS_CODE]), node_capacity=node_capacity))
+
+    def __len__(self):
+        return len(self.job_ids)
+
+    def _srs_tree(self, srs_code) -> tuple:
+        if srs_code is None:
+            if len(self.srs_trees) > 1:
+                raise ValueError(f"The index holds srs codes {sorted(self.srs_trees)}, choose one")
+            srs_code = next(iter(self.srs_trees), None)
+        return self.srs_trees.get(srs_code)
+
+    def search(self, min_x: float, min_y: float, max_x: float, max_y: float, srs_code: int = None,
+               start_date: datetime.date = None, end_date: datetime.date = None) -> np.ndarray:
+        """
+        Positions of the extents overlapping a box
+        :param min_x: minimum x of the box, in the units of the srs
+        :param min_y: minimum y of the box
+        :param max_x: maximum x of the box
+        :param max_y: maximum y of the box
+        :param srs_code: srs code of the box, may be None when the index holds a single srs
+        :param start_date: optional first job date, jobs without a date are left out when a date is given
+        :param end_date: optional last job date, inclusive
+        :return: int64 positions into the index arrays, in packed order
+        :raises ValueError: when srs_code is None and the index holds more than one srs
+        """
+        srs_tree = self._srs_tree(srs_code=srs_code)
+        if srs_tree is None:
+            return np.empty(0, dtype=np.int64)
+        offset, levels = srs_tree
+        child_offsets = np.arange(self.node_capacity)
+        nodes = np.arange(len(levels[-1]))
+        for level_number in range(len(levels) - 1, -1, -1):
+            boxes = levels[level_number][nodes]
+            nodes = nodes[(boxes[:, 0] <= max_x) & (boxes[:, 1] <= max_y) & (boxes[:, 2] >= min_x)
+                          & (boxes[:, 3] >= min_y)]
+            if not level_number or not len(nodes):
+                break
+            nodes = (nodes[:, None] * self.node_capacity + child_offsets).ravel()
+            nodes = nodes[nodes < len(levels[level_number - 1])]
+        positions = nodes + offset
+        if start_date is not None or end_date is not None:
+            job_dates = self.job_dates[positions]
+            in_range = ~np.isnat(job_dates)
+            if start_date is not None:
+                in_range &= job_dates >= np.datetime64(start_date, "ns")
+            if end_date is not None:
+                in_range &= job_dates < np.datetime64(end_date + datetime.timedelta(days=1), "ns")
+            positions = positions[in_range]
+        return positions
+
+    def search_point(self, x: float, y: float, srs_code: int = None, start_date: datetime.date = None,
+                     end_date: datetime.date = None) -> np.ndarray:
+        """
+        Positions of the extents containing a point, on their edges included
+        :param x: x of the point, in the units of the srs
+        :param y: y of the point
+        :param srs_code: srs code of the point, may be None when the index holds a single srs
+        :param start_date: optional first job date
+        :param end_date: optional last job date, inclusive
+        :return: int64 positions into the index arrays, in packed order
+        """
+        return self.search(min_x=x, min_y=y, max_x=x, max_y=y, srs_code=srs_code, start_date=start_date,
+                           end_date=end_date)
+
+    def jobs_frame(self, positions: np.ndarray) -> pd.DataFrame:
+        """
+        Build a Mappable Extents style dataframe of search results, ordered by job date and JOB_ID
+        :param positions: positions returned by search or search_point
+        :return: dataframe indexed by JOB_ID with the float columns of EXTENT_COLUMNS and a Job_Date column
+        """
+        jobs_df = pd.DataFrame(data=self.extents[positions], columns=EXTENT_COLUMNS,
+                               index=pd.Index(self.job_ids[positions], name="JOB_ID"))
+        jobs_df["Job_Date"] = self.job_dates[positions]
+        return jobs_df.sort_values(by=["Job_Date", "JOB_ID"], kind="stable")
+
+    def save(self, file_path: str):
+        """
+        Save the index as a .npz file of the extents in packed order
+        :param file_path: path of the .npz file
+        :return: None
+        """
+        np.savez_compressed(file_path, job_ids=self.job_ids.astype(str), extents=self.extents,
+                            job_dates=self.job_dates.astype("datetime64[ns]").view(np.int64),
+                            node_capacity=np.array(self.node_capacity))
+
+
+def load_extent_index(file_path: str) -> ExtentIndex:
+    """
+    Load an index saved by ExtentIndex.save, rebuilding the levels above the extents
+    :param file_path: path of the .npz file
+    :return: ExtentIndex
+    """
+    with np.load(file_path) as arrays:
+        return ExtentIndex(job_ids=arrays["job_ids"].astype(object), extents=arrays["extents"],
+                           job_dates=arrays["job_dates"].view("datetime64[ns]"),
+                           node_capacity=int(arrays["node_capacity"]))
+
+
+def build_extent_index(extent_table: ExtentTable, job_dates: np.ndarray = None,
+                       node_capacity: int = NODE_CAPACITY) -> ExtentIndex:
+    """
+    Index the valid extents of an extent table
+    :param extent_table: ExtentTable from LizardTechExtentEngine
+    :param job_dates: optional datetime64 array of the job date of each row of the table, from extent_job_dates
+    :param node_capacity: children per node
+    :return: ExtentIndex
+    """
+    valid = extent_table.valid
+    extents = extent_table.extents[valid]
+    job_ids = extent_table.job_ids[valid]
+    job_dates = (np.full(len(extents), np.datetime64("NaT"), dtype="datetime64[ns]") if job_dates is None
+                 else np.asarray(job_dates, dtype="datetime64[ns]")[valid])
+
+    srs_order = np.argsort(extents[:, SRS_CODE], kind="stable")
+    srs_codes = extents[srs_order, SRS_CODE]
+    boundaries = np.flatnonzero(np.diff(srs_codes)) + 1
+    packed_order = np.concatenate([srs_order[start:stop][_pack_order(boxes=extents[srs_order[start:stop], :SRS_CODE],
+                                                                     node_capacity=node_capacity)]
+                                   for start, stop in zip(np.concatenate([[0], boundaries]),
+                                                          np.concatenate([boundaries, [len(srs_codes)]]))]
+                                  or [np.empty(0, dtype=np.int64)])
+    return ExtentIndex(job_ids=job_ids[packed_order], extents=extents[packed_order], job_dates=job_dates[packed_order],
+                       node_capacity=node_capacity)
+
+
+def benchmark_extent_index(extent_count: int = 1_000_000, query_count: int = 1000, seed: int = 0) -> dict:
+    """
+    Time building an index of synthetic 1000 x 1500 extents spread over a 200 km x 100 km area, and box, point and
+    date filtered queries of it against a linear scan
+    :param extent_count: number of extents
+    :param query_count: number of queries of each kind
+    :param seed: random seed for the synthetic extents and queries
+    :return: dictionary of timings, query times are mean milliseconds per query
+    """
+    import time
+
+    random_generator = np.random.default_rng(seed)
+    minimum_xs = random_generator.uniform(300_000, 500_000, size=extent_count)
+    minimum_ys = random_generator.uniform(100_000, 200_000, size=extent_count)
+    extents = np.column_stack([minimum_xs, minimum_ys, minimum_xs + 1000, minimum_ys + 1500,
+                               np.full(extent_count, 26985.0)])
+    extent_table = ExtentTable(job_ids=np.array([f"job_{number}" for number in range(extent_count)], dtype=object),
+                               srs_names=np.full(extent_count, "EPSG:26985", dtype=object), extents=extents,
+                               problems=np.zeros(extent_count, dtype=np.int8))
+    job_dates = (np.datetime64("2019-01-01", "ns")
+                 + random_generator.integers(0, 365 * 86400, size=extent_count).astype("timedelta64[s]"))
+
+    start = time.perf_counter()
+    extent_index = build_extent_index(extent_table=extent_table, job_dates=job_dates)
+    build_seconds = time.perf_counter() - start
+
+    query_xs = random_generator.uniform(300_000, 500_000, size=query_count)
+    query_ys = random_generator.uniform(100_000, 200_000, size=query_count)
+    timings = {"extents": extent_count, "build_seconds": build_seconds}
+    start = time.perf_counter()
+    box_hits = 0
+    for x, y in zip(query_xs, query_ys):
+        box_hits += len(extent_index.search(min_x=x, min_y=y, max_x=x + 2000, max_y=y + 2000))
+    timings["box_ms"] = (time.perf_counter() - start) * 1000 / query_count
+    start = time.perf_counter()
+    for x, y in zip(query_xs, query_ys):
+        extent_index.search_point(x=x, y=y)
+    timings["point_ms"] = (time.perf_counter() - start) * 1000 / query_count
+    start = time.perf_counter()
+    for x, y in zip(query_xs, query_ys):
+        extent_index.search(min_x=x, min_y=y, max_x=x + 2000, max_y=y + 2000, start_date=datetime.date(2019, 3, 1),
+                            end_date=datetime.date(2019, 5, 31))
+    timings["dated_box_ms"] = (time.perf_counter() - start) * 1000 / query_count
+    timings["mean_box_hits"] = box_hits / query_count
+
+    scan_count = min(query_count, 20)
+    start = time.perf_counter()
+    for x, y in zip(query_xs[:scan_count], query_ys[:scan_count]):
+        np.flatnonzero((extents[:, MIN_X] <= x + 2000) & (extents[:, MIN_Y] <= y + 2000) & (extents[:, MAX_X] >= x)
+                       & (extents[:, MAX_Y] >= y))
+    timings["scan_ms"] = (time.perf_counter() - start) * 1000 / scan_count
+    return timings
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argument_parser = argparse.ArgumentParser(description="Build, query or time a spatial index of export extents")
+    subparsers = argument_parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="index the extents of a lidar job facts database")
+    build_parser.add_argument("database_path", help="job facts database written by the lidar analysis with --database")
+    build_parser.add_argument("index_path", help="index .npz file to write")
+    query_parser = subparsers.add_parser("query", help="list the jobs whose extents overlap a box or contain a point")
+    query_parser.add_argument("index_path", help="index .npz file")
+    query_location = query_parser.add_mutually_exclusive_group(required=True)
+    query_location.add_argument("--box", type=float, nargs=4, metavar=("MIN_X", "MIN_Y", "MAX_X", "MAX_Y"))
+    query_location.add_argument("--point", type=float, nargs=2, metavar=("X", "Y"))
+    query_parser.add_argument("--srs", type=int, help="srs code of the box or point, needed when the index holds more "
+                                                      "than one srs")
+    query_parser.add_argument("--start-date", type=datetime.date.fromisoformat,
+                              help="first job date to list, as YYYY-MM-DD")
+    query_parser.add_argument("--end-date", type=datetime.date.fromisoformat,
+                              help="last job date to list, as YYYY-MM-DD")
+    query_parser.add_argument("--csv", help="write the jobs to this csv file instead of printing them")
+    benchmark_parser = subparsers.add_parser("benchmark", help="time queries of synthetic extents")
+    benchmark_parser.add_argument("--extents", type=int, default=1_000_000, help="number of synthetic extents")
+    benchmark_parser.add_argument("--queries", type=int, default=1000, help="number of queries of each kind")
+    arguments = argument_parser.parse_args()
+
+    if arguments.command == "build":
+        from LizardTechExtentEngine import deduplicate_extents
+        from LizardTechExtentEngine import extent_job_dates
+        from LizardTechJobDatabase import JobDatabase
+
+        with JobDatabase(database_path=arguments.database_path) as job_database:
+            database_extents = deduplicate_extents(extent_table=job_database.extent_table())
+            database_index = build_extent_index(extent_table=database_extents,
+                                                job_dates=extent_job_dates(extent_table=database_extents,
+                                                                           job_dates_df=job_database.job_dates_frame()))
+        database_index.save(file_path=arguments.index_path)
+        print(f"{len(database_index)} extents indexed to {arguments.index_path}, srs codes "
+              f"{sorted(database_index.srs_trees)}")
+    elif arguments.command == "query":
+        extent_index = load_extent_index(file_path=arguments.index_path)
+        try:
+            if arguments.box:
+                query_min_x, query_min_y, query_max_x, query_max_y = arguments.box
+            else:
+                query_min_x, query_min_y = query_max_x, query_max_y = arguments.point
+            found_positions = extent_index.search(min_x=query_min_x, min_y=query_min_y, max_x=query_max_x,
+                                                  max_y=query_max_y, srs_code=arguments.srs,
+                                                  start_date=arguments.start_date, end_date=arguments.end_date)
+        except ValueError as error:
+            argument_parser.error(str(error))
+        found_jobs_df = extent_index.jobs_frame(positions=found_positions)
+        if arguments.csv:
+            found_jobs_df.to_csv(arguments.csv)
+        else:
+            print(found_jobs_df.to_string())
+        print(f"{len(found_jobs_df)} extents of {found_jobs_df.index.nunique()} jobs")
+    else:
+        benchmark_results = benchmark_extent_index(extent_count=arguments.extents, query_count=arguments.queries)
+        print(f"{benchmark_results['extents']} extents indexed in {benchmark_results['build_seconds']:.2f}s")
+        print(f"box query {benchmark_results['box_ms']:.3f} ms ({benchmark_results['mean_box_hits']:.1f} hits), "
+              f"point query {benchmark_results['point_ms']:.3f} ms, date filtered box query "
+              f"{benchmark_results['dated_box_ms']:.3f} ms, linear scan {benchmark_results['scan_ms']:.3f} ms")
@@ -0,0 +1,343 @@
+"""
+Seeded generator of synthetic LizardTech export_dir job folders, for benchmarks and for testing at any scale.
+Testing was done against the hand made export_dir2_lidar folder, too small and too uniform to show whether a change
+makes the nightly scrape faster or slower. This module writes job folders laid out as the Express Server writes them:
+  log.html - a log4j html layout log with the "Log session start time" line and a Time, Thread, Level, Category,
+             Message table. Start times are US Eastern, EST or EDT by the date. Lidar logs carry Issuing URL rows
+             with the cat, thinningFactor, srs, class, res, dt, oif, bounds and item query parameters, repeated as the
+             server retries them. Both products have Sending email rows, WARN and ERROR rows and java stack trace rows
+             spanning all columns. A few addresses are malformed and a few bounds are missing or degenerate.
+  job.zip - a zip of one export member, its compressed size drawn from a configurable range and its uncompressed size
+            about twice that
+Failed jobs get a log with no start time and no table, and no zip. A few logs have a table but no start time line.
+File modified times are set to the job's end time.
+The same seed and settings always produce the same folders.
+
+Run this module directly to generate an export_dir.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import datetime
+import html
+import os
+import time
+import zipfile
+from typing import NamedTuple
+
+import dateutil.tz
+import numpy as np
+
+LIDAR = "lidar"
+IMAGERY = "imagery"
+PRODUCTS = (LIDAR, IMAGERY)
+
+EASTERN_TIME_ZONE = dateutil.tz.gettz("America/New_York")
+CATALOGS = ("Allegany_2015", "AnneArundel_2014", "Baltimore_2015", "Calvert_2017", "Carroll_2015", "Frederick_2013",
+            "Garrett_2015", "Howard_2014", "Montgomery_2013", "Statewide_2013", "Washington_2015", "Worcester_2012")
+IMAGERY_CATALOGS = ("MD_SixInchImagery", "MD_NAIP_2015", "MD_NAIP_2017", "MD_ThreeInchImagery")
+EMAIL_DOMAINS = ("maryland.gov", "gmail.com", "umd.edu", "usda.gov", "yahoo.com", "esri.com", "towson.edu",
+                 "baltimorecountymd.gov", "outlook.com", "example.org")
+FIRST_NAMES = ("alex", "blair", "casey", "dana", "eli", "frankie", "gray", "harper", "jordan", "kai", "logan",
+               "morgan", "parker", "quinn", "riley", "sam", "taylor")
+LAST_NAMES = ("adams", "baker", "carter", "diaz", "evans", "foster", "garcia", "hughes", "kim", "lopez", "miller",
+              "nguyen", "patel", "reed", "smith", "turner", "walker")
+CATEGORY = "com.lizardtech.expressserver.export"
+
+_LOG_HEAD = """<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.01 Transitional//EN" "http://www.w3.org/TR/html4/loose.dtd">
+<html>
+<head>
+<title>Log4J Log Messages</title>
+<style type="text/css">
+<!--
+body, table {font-family: arial,sans-serif; font-size: x-small;}
+th {background: #336699; color: #FFFFFF; text-align: left;}
+-->
+</style>
+</head>
+<body bgcolor="#FFFFFF" topmargin="6" leftmargin="6">
+<hr size="1" noshade>
+"""
+_TABLE_HEAD = """<br>
+<table cellspacing="0" cellpadding="4" border="1" bordercolor="#224466" width="100%">
+<tr>
+<th>Time</th>
+<th>Thread</th>
+<th>Level</th>
+<th>Category</th>
+<th>Message</th>
+</tr>
+"""
+_ROW_TEMPLATE = """
+<tr>
+<td>{time}</td>
+<td title="{thread} thread">{thread}</td>
+<td title="Level">{level}</td>
+<td title="{category}">{category}</td>
+<td title="Message">{message}</td>
+</tr>"""
+_STACK_TRACE_TEMPLATE = """
+<tr><td bgcolor="#993300" style="color:White; font-size : xx-small;" colspan="6">{trace}</td></tr>"""
+_LOG_TAIL = """
+</table>
+</body></html>
+"""
+
+
+class SyntheticExportDir(NamedTuple):
+    """
+    Counts of what generate_export_dir wrote
+    """
+    export_dir: str
+    product: str
+    job_count: int
+    failed_count: int
+    startless_count: int
+    zip_count: int
+    log_row_count: int
+    issuing_url_count: int
+    email_count: int
+    log_bytes: int
+    zip_bytes: int
+    seconds: float
+
+    def __str__(self):
+        return (f"{self.job_count} {self.product} jobs ({self.failed_count} failed, {self.startless_count} without a "
+                f"start time, {self.zip_count} zips) written to {self.export_dir}: {self.log_row_count} log rows, "
+                f"{self.issuing_url_count} issuing urls, {self.email_count} emails, {self.log_bytes / 1e6:.1f} MB of "
+                f"logs, {self.zip_bytes / 1e6:.1f} MB of zips in {self.seconds:.2f}s")
+
+
+def format_start_time(timestamp: float) -> str:
+    """
+    Format a log session start time as the java Date string the logs hold, in US Eastern time
+    :param timestamp: POSIX timestamp
+    :return: string such as "Thu Nov 29 06:22:44 EST 2018"
+    """
+    eastern_time = datetime.datetime.fromtimestamp(timestamp, tz=EASTERN_TIME_ZONE)
+    return f"{eastern_time:%a %b %d %H:%M:%S} {eastern_time.tzname()} {eastern_time:%Y}"
+
+
+def _issuing_url(random_generator: np.random.Generator) -> str:
+    """
+    Build one lidar issuing url with a 1000 x 1500 metre export extent in Maryland state plane
+    :param random_generator: numpy random generator
+    :return: url string
+    """
+    min_x = int(random_generator.integers(190_000, 570_000))
+    min_y = int(random_generator.integers(30_000, 230_000))
+    extent_draw = random_generator.random()
+    if extent_draw < 0.01:
+        bounds = None
+    elif extent_draw < 0.02:
+        bounds = f"{min_x},{min_y},0,{min_x},{min_y + 1500},0"
+    else:
+        bounds = f"{min_x},{min_y},0,{min_x + 1000},{min_y + 1500},0"
+    is_dem = random_generator.random() < 0.25
+    parameters = [("cat", CATALOGS[random_generator.integers(len(CATALOGS))]),
+                  ("thinningFactor", str(random_generator.integers(1, 5))),
+                  ("srs", "EPSG:2248" if random_generator.random() < 0.05 else "EPSG:26985"),
+                  ("class", "2" if random_generator.random() < 0.7 else "1,2"),
+                  ("res", str(random_generator.choice([1, 2, 5]))),
+                  ("dt", "dem" if is_dem else "las"),
+                  ("oif", "tif" if is_dem else random_generator.choice(["laz", "las"]))]
+    if bounds is not None:
+        parameters.append(("bounds", bounds))
+    if random_generator.random() < 0.1:
+        parameters.append(("item", str(random_generator.integers(1, 20))))
+    service = "getdem" if is_dem else "getcloud"
+    return f"http://host/{service}?" + "&".join(f"{key}={value}" for key, value in parameters)
+
+
+def _stack_trace(random_generator: np.random.Generator) -> str:
+    """
+    Build the text of a java stack trace row
+    :param random_generator: numpy random generator
+    :return: html text of the trace, frames separated by line breaks
+    """
+    exception = random_generator.choice(["java.io.IOException: Broken pipe",
+                                         "java.net.SocketTimeoutException: Read timed out",
+                                         "java.lang.NullPointerException"])
+    frames = "".join(f"<br>&nbsp;&nbsp;&nbsp;&nbsp;at {CATEGORY}.ExportTask.step{frame}(ExportTask.java:{100 + frame})"
+                     for frame in range(int(random_generator.integers(2, 6))))
+    return f"{exception}{frames}"
+
+
+def _job_rows(product: str, random_generator: np.random.Generator, email: str, row_count: int) -> tuple:
+    """
+    Build the table rows of a job log
+    :param product: LIDAR or IMAGERY
+    :param random_generator: numpy random generator
+    :param email: address the job's notification is sent to
+    :param row_count: number of rows before the email row
+    :return: tuple of (rows html, number of table rows, number of issuing url rows)
+    """
+    url_count = int(random_generator.integers(1, 4)) if product == LIDAR else 0
+    issuing_urls = [_issuing_url(random_generator=random_generator) for _ in range(url_count)]
+    rows = []
+    table_row_count = 0
+    issuing_url_count = 0
+    elapsed_ms = int(random_generator.integers(5, 40))
+    thread = "main" if product == LIDAR else f"pool-1-thread-{random_generator.integers(1, 9)}"
+    for row_number in range(row_count):
+        elapsed_ms += int(random_generator.integers(50, 4000))
+        level = "INFO"
+        draw = random_generator.random()
+        if issuing_urls and (row_number < len(issuing_urls) * 2 or draw < 0.15):
+            message = f"Issuing URL: {issuing_urls[row_number % len(issuing_urls)]}"
+            issuing_url_count += 1
+        elif draw < 0.2:
+            level = "WARN"
+            message = "Export request took longer than expected, retrying"
+        elif draw < 0.23:
+            level = "ERROR"
+            message = "Export step failed, see stack trace"
+        elif product == IMAGERY:
+            message = (f"Exporting {IMAGERY_CATALOGS[random_generator.integers(len(IMAGERY_CATALOGS))]} tile "
+                       f"{random_generator.integers(1, 5000)}")
+        else:
+            message = f"Wrote {random_generator.integers(10_000, 5_000_000)} points"
+        rows.append(_ROW_TEMPLATE.format(time=elapsed_ms, thread=thread, level=level, category=CATEGORY,
+                                         message=html.escape(message, quote=False)))
+        table_row_count += 1
+        if level == "ERROR":
+            rows.append(_STACK_TRACE_TEMPLATE.format(trace=_stack_trace(random_generator=random_generator)))
+            table_row_count += 1
+    email_message = f"Sending email to {email}" if product == LIDAR else f"Sending email notification to {email}"
+    rows.append(_ROW_TEMPLATE.format(time=elapsed_ms + int(random_generator.integers(50, 400)), thread=thread,
+                                     level="INFO", category=CATEGORY, message=html.escape(email_message, quote=False)))
+    return "".join(rows), table_row_count + 1, issuing_url_count
+
+
+def _write_zip(file_path: str, product: str, zip_size: int, timestamp: float,
+               random_generator: np.random.Generator) -> int:
+    """
+    Write a job zip of one member, half random bytes and half zeros, so its size is about zip_size
+    :param file_path: path of the zip file
+    :param product: LIDAR or IMAGERY, which names the member
+    :param zip_size: compressed size to aim for, in bytes
+    :param timestamp: POSIX timestamp of the member, so the zip does not depend on when it was written
+    :param random_generator: numpy random generator
+    :return: size of the zip file in bytes
+    """
+    member_info = zipfile.ZipInfo(filename="export_points.laz" if product == LIDAR else "export_image.tif",
+                                  date_time=datetime.datetime.fromtimestamp(timestamp, tz=EASTERN_TIME_ZONE)
+                                  .timetuple()[:6])
+    member_info.compress_type = zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(file_path, "w") as zip_file:
+        zip_file.writestr(member_info, random_generator.bytes(zip_size) + bytes(zip_size), compresslevel=1)
+    return os.path.getsize(file_path)
+
+
+def generate_export_dir(export_dir: str, job_count: int, product: str = LIDAR, seed: int = 0,
+                        start_date: datetime.date = datetime.date(2018, 1, 1), day_count: int = 365,
+                        failed_fraction: float = 0.05, startless_fraction: float = 0.01, zip_fraction: float = 0.65,
+                        zip_size_kb: tuple = (4, 64), rows_per_job: tuple = (4, 40),
+                        user_count: int = None) -> SyntheticExportDir:
+    """
+    Write synthetic job folders "job 0" to "job {job_count - 1}" into an export_dir
+    :param export_dir: folder to write the job folders into, created when missing
+    :param job_count: number of job folders
+    :param product: LIDAR or IMAGERY logs
+    :param seed: random seed, the same seed and settings write the same folders
+    :param start_date: first day of the job start times
+    :param day_count: number of days the job start times are spread over
+    :param failed_fraction: fraction of jobs that failed, with a log that has no table and no zip
+    :param startless_fraction: fraction of jobs whose log has a table but no start time line
+    :param zip_fraction: fraction of the other jobs that have a zip
+    :param zip_size_kb: (smallest, largest) compressed zip size in KB
+    :param rows_per_job: (fewest, most) log rows before the email row of a job
+    :param user_count: number of distinct email addresses, one per five jobs by default
+    :return: SyntheticExportDir
+    :raises ValueError: for an unknown product
+    """
+    if product not in PRODUCTS:
+        raise ValueError(f"Unknown product {product}, expected one of {PRODUCTS}")
+    start = time.perf_counter()
+    random_generator = np.random.default_rng(seed)
+    user_count = user_count or max(20, job_count // 5)
+    emails = [f"{FIRST_NAMES[number % len(FIRST_NAMES)]}.{LAST_NAMES[number // len(FIRST_NAMES) % len(LAST_NAMES)]}"
+              f"{number // (len(FIRST_NAMES) * len(LAST_NAMES)) or ''}@{EMAIL_DOMAINS[number % len(EMAIL_DOMAINS)]}"
+              for number in range(user_count)]
+    emails[-1] = "bad-address@nowhere"
+    first_timestamp = datetime.datetime.combine(start_date, datetime.time(), tzinfo=EASTERN_TIME_ZONE).timestamp()
+    start_timestamps = np.sort(random_generator.uniform(first_timestamp, first_timestamp + day_count * 86400,
+                                                        size=job_count))
+
+    os.makedirs(export_dir, exist_ok=True)
+    failed_count = startless_count = zip_count = log_row_count = issuing_url_count = email_count = 0
+    log_bytes = zip_bytes = 0
+    for job_number, start_timestamp in enumerate(start_timestamps.tolist()):
+        job_folder = os.path.join(export_dir, f"job {job_number}")
+        os.makedirs(job_folder, exist_ok=True)
+        end_timestamp = start_timestamp + float(random_generator.uniform(30, 3600))
+        # One draw decides both, so the same seed writes the same other jobs whatever the startless fraction
+        failure_draw = random_generator.random()
+        is_failed = failure_draw < failed_fraction
+        is_startless = not is_failed and failure_draw < failed_fraction + startless_fraction
+        if is_failed:
+            failed_count += 1
+            log_content = _LOG_HEAD + "</body></html>\n"
+        else:
+            rows, row_count, url_count = _job_rows(product=product, random_generator=random_generator,
+                                                   email=emails[int(random_generator.zipf(1.5)) % user_count],
+                                                   row_count=int(random_generator.integers(rows_per_job[0],
+                                                                                           rows_per_job[1] + 1)))
+            log_row_count += row_count
+            issuing_url_count += url_count
+            email_count += 1
+            if is_startless:
+                startless_count += 1
+                log_content = f"{_LOG_HEAD}{_TABLE_HEAD}{rows}{_LOG_TAIL}"
+            else:
+                log_content = (f"{_LOG_HEAD}Log session start time {format_start_time(timestamp=start_timestamp)}"
+                               f"{_TABLE_HEAD}{rows}{_LOG_TAIL}")
+        log_path = os.path.join(job_folder, "log.html")
+        with open(log_path, "w") as handler:
+            handler.write(log_content)
+        log_bytes += len(log_content)
+        os.utime(log_path, (end_timestamp, end_timestamp))
+
+        if not is_failed and random_generator.random() < zip_fraction:
+            zip_path = os.path.join(job_folder, "job.zip")
+            zip_bytes += _write_zip(file_path=zip_path, product=product, timestamp=end_timestamp,
+                                    zip_size=int(random_generator.integers(zip_size_kb[0], zip_size_kb[1] + 1)) * 1000,
+                                    random_generator=random_generator)
+            os.utime(zip_path, (end_timestamp, end_timestamp))
+            zip_count += 1
+
+    return SyntheticExportDir(export_dir=export_dir, product=product, job_count=job_count, failed_count=failed_count,
+                              startless_count=startless_count, zip_count=zip_count, log_row_count=log_row_count,
+                              issuing_url_count=issuing_url_count,
+                              email_count=email_count, log_bytes=log_bytes, zip_bytes=zip_bytes,
+                              seconds=time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argument_parser = argparse.ArgumentParser(description="Write synthetic LizardTech job folders")
+    argument_parser.add_argument("export_dir", help="folder to write the job folders into")
+    argument_parser.add_argument("--jobs", type=int, default=1000, help="number of job folders")
+    argument_parser.add_argument("--product", choices=PRODUCTS, default=LIDAR, help="lidar or imagery logs")
+    argument_parser.add_argument("--seed", type=int, default=0, help="random seed")
+    argument_parser.add_argument("--start-date", type=datetime.date.fromisoformat, default=datetime.date(2018, 1, 1),
+                                 help="first day of the job start times, as YYYY-MM-DD")
+    argument_parser.add_argument("--days", type=int, default=365, help="days the job start times are spread over")
+    argument_parser.add_argument("--failed-fraction", type=float, default=0.05, help="fraction of failed jobs")
+    argument_parser.add_argument("--startless-fraction", type=float, default=0.01,
+                                 help="fraction of jobs whose log has a table but no start time")
+    argument_parser.add_argument("--zip-fraction", type=float, default=0.65,
+                                 help="fraction of the other jobs with a zip")
+    argument_parser.add_argument("--zip-size-kb", type=int, nargs=2, default=(4, 64), metavar=("MIN", "MAX"),
+                                 help="range of compressed zip sizes in KB")
+    argument_parser.add_argument("--rows-per-job", type=int, nargs=2, default=(4, 40), metavar=("MIN", "MAX"),
+                                 help="range of log rows per job")
+    arguments = argument_parser.parse_args()
+
+    print(generate_export_dir(export_dir=arguments.export_dir, job_count=arguments.jobs, product=arguments.product,
+                              seed=arguments.seed, start_date=arguments.start_date, day_count=arguments.days,
+                              failed_fraction=arguments.failed_fraction,
+                              startless_fraction=arguments.startless_fraction, zip_fraction=arguments.zip_fraction,
+                              zip_size_kb=tuple(arguments.zip_size_kb), rows_per_job=tuple(arguments.rows_per_job)))
@@ -0,0 +1,169 @@
+"""
+Parsing of the LizardTech log session start times.
+Every job log opens with a java Date string such as "Thu Nov 29 06:22:44 EST 2018". The analysis scripts sent these
+through the general purpose dateutil.parser.parse, handled EDT by swapping in EST and subtracting an hour, and then
+called .replace(tzinfo=...) without keeping the result, so the job dates stayed naive and the composite job id
+timestamp depended on the time zone of the machine running the analysis. Here the fixed java format is split directly
+into a timezone aware datetime, EST and EDT each with their own offset. Results are cached since the same start time
+string is parsed again on reruns and for logs copied between folders. Only strings that do not fit the fixed format
+fall back to dateutil, and the number of fallbacks is counted.
+
+Run this module directly to benchmark the fast path against dateutil.
+
+Date Created: 20261016
+Revisions:
+"""
+
+import collections
+import datetime
+import functools
+
+import dateutil.parser
+import dateutil.tz
+
+FAST_PATH = "fast_path"
+FALLBACK = "fallback"
+UNPARSABLE = "unparsable"
+
+EASTERN_STANDARD_TIME = datetime.timezone(datetime.timedelta(hours=-5), "EST")
+EASTERN_DAYLIGHT_TIME = datetime.timezone(datetime.timedelta(hours=-4), "EDT")
+EASTERN_TIME_ZONE = dateutil.tz.gettz("America/New_York")
+
+# Used for logs with no start time, as the 1970/01/01 substitute always was
+UNPARSABLE_START_TIME = datetime.datetime(1970, 1, 1, tzinfo=EASTERN_STANDARD_TIME)
+
+# Parse counts by method for this process
+start_time_parse_counts = collections.Counter()
+
+_MONTH_NUMBERS = {month_name: month_number for month_number, month_name in
+                  enumerate(("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"),
+                            start=1)}
+_TIME_ZONES = {"EST": EASTERN_STANDARD_TIME,
+               "EDT": EASTERN_DAYLIGHT_TIME,
+               "UTC": datetime.timezone.utc,
+               "GMT": datetime.timezone.utc}
+
+
+@functools.lru_cache(maxsize=16384)
+def _parse_start_time(start_time: str) -> tuple:
+    """
+    Parse a start time string, trying the fixed java Date format before dateutil
+    :param start_time: start time string from the job log
+    :return: tuple of (timezone aware datetime, parse method)
+    """
+    parts = start_time.split()
+    if len(parts) == 6:
+        parts = parts[1:]  # Weekday name, not needed for the date
+    if len(parts) == 5:
+        month_name, day, clock, zone_name, year = parts
+        month = _MONTH_NUMBERS.get(month_name)
+        time_zone = _TIME_ZONES.get(zone_name)
+        clock_parts = clock.split(":")
+        if month is not None and time_zone is not None and len(clock_parts) == 3:
+            try:
+                return (datetime.datetime(int(year), month, int(day), int(clock_parts[0]), int(clock_parts[1]),
+                                          int(clock_parts[2]), tzinfo=time_zone),
+                        FAST_PATH)
+            except ValueError:
+                pass
+
+    try:
+        result = dateutil.parser.parse(start_time, tzinfos=_TIME_ZONES)
+    except (ValueError, OverflowError) as ve:
+        print(f"ValueError during dateutil.parser.parse(start_time). {ve}")
+        return UNPARSABLE_START_TIME, UNPARSABLE
+    if result.tzinfo is None:
+        # Logs are written on the Eastern time server, so times without a zone are Eastern local time
+        result = result.replace(tzinfo=EASTERN_TIME_ZONE)
+    return result, FALLBACK
+
+
+def parse_log_start_time(start_time: str) -> datetime.datetime:
+    """
+    Parse a log session start time string to a timezone aware datetime, counting the parse method used
+    :param start_time: start time string from the job log, such as "Thu Nov 29 06:22:44 EST 2018"
+    :return: timezone aware datetime, or UNPARSABLE_START_TIME when the string is not a date
+    """
+    result, parse_method = _parse_start_time(start_time.strip())
+    start_time_parse_counts[parse_method] += 1
+    return result
+
+
+def start_time_parse_method(start_time: str) -> str:
+    """
+    Report how a start time string is parsed, without counting it
+    :param start_time: start time string from the job log
+    :return: FAST_PATH, FALLBACK or UNPARSABLE
+    """
+    return _parse_start_time(start_time.strip())[1]
+
+
+def to_eastern_wall_time(job_date: datetime.datetime) -> datetime.datetime:
+    """
+    Convert a timezone aware job date to naive US Eastern local time, as written in the logs, for excel output
+    :param job_date: timezone aware datetime
+    :return: naive datetime in US Eastern local time
+    """
+    return job_date.astimezone(EASTERN_TIME_ZONE).replace(tzinfo=None)
+
+
+def benchmark_start_time_parsing(start_time_count: int = 100_000, unique_fraction: float = 1.0, seed: int = 0) -> dict:
+    """
+    Time the previous dateutil based conversion against parse_log_start_time on synthetic start time strings
+    :param start_time_count: number of start time strings
+    :param unique_fraction: fraction of the strings that are distinct, the rest repeat
+    :param seed: random seed for the synthetic start times
+    :return: dictionary of seconds for each approach
+    """
+    import random
+    import time
+
+    random_generator = random.Random(seed)
+    first_start_time = datetime.datetime(2018, 1, 1)
+    unique_count = max(int(start_time_count * unique_fraction), 1)
+    unique_start_times = []
+    for _ in range(unique_count):
+        start_dt = first_start_time + datetime.timedelta(seconds=random_generator.randrange(3 * 365 * 86400))
+        zone_name = "EDT" if EASTERN_TIME_ZONE.dst(start_dt) else "EST"
+        unique_start_times.append(start_dt.strftime(f"%a %b %d %H:%M:%S {zone_name} %Y"))
+    start_times = [unique_start_times[index % unique_count] for index in range(start_time_count)]
+
+    def dateutil_based():
+        for start_dt_str in start_times:
+            if "EDT" in start_dt_str:
+                dateutil.parser.parse(start_dt_str.replace("EDT", "EST")) - datetime.timedelta(hours=1)
+            else:
+                dateutil.parser.parse(start_dt_str)
+
+    def fast_path():
+        _parse_start_time.cache_clear()
+        for start_dt_str in start_times:
+            parse_log_start_time(start_time=start_dt_str)
+
+    results = {"start_times": start_time_count, "unique_start_times": unique_count}
+    for label, function in (("dateutil", dateutil_based), ("fast_path", fast_path)):
+        start = time.perf_counter()
+        function()
+        results[f"{label}_seconds"] = time.perf_counter() - start
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import warnings
+
+    argument_parser = argparse.ArgumentParser(description="Benchmark log start time parsing against dateutil")
+    argument_parser.add_argument("--start-times", type=int, default=100_000, help="number of start time strings")
+    argument_parser.add_argument("--unique-fraction", type=float, default=1.0,
+                                 help="fraction of start time strings that are distinct")
+    arguments = argument_parser.parse_args()
+
+    # dateutil warns about the unknown EST abbreviation on every call in the previous approach
+    warnings.simplefilter("ignore", category=dateutil.parser.UnknownTimezoneWarning)
+    benchmark_results = benchmark_start_time_parsing(start_time_count=arguments.start_times,
+                                                     unique_fraction=arguments.unique_fraction)
+    print(f"Start times: {benchmark_results['start_times']}  Unique: {benchmark_results['unique_start_times']}")
+    print(f"dateutil: {benchmark_results['dateutil_seconds']:.3f}s")
+    print(f"Fast path: {benchmark_results['fast_path_seconds']:.3f}s")
+    speedup = benchmark_results["dateutil_seconds"] / max(benchmark_results["fast_path_seconds"], 1e-9)
+    print(f"Speedup: {speedup:.1f}x  Parse counts: {dict(start_time_parse_counts)}")
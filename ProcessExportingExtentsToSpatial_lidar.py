@@ -1,23 +1,25 @@
 """
-
+Write the export extents of a lidar job facts database as GeoJSON and a GeoPackage, without reading any workbook.
+The extents used to be re-read from the xlsx and split with .apply. They are now parsed by LizardTechExtentEngine
+straight from the database the lidar analysis writes with --database.
+Revisions:
+20261016: Replaced the xlsx read and per value split with LizardTechExtentEngine on a LizardTechJobDatabase.
 """
-import pandas as pd
-import numpy as np
-
-file_to_examine = r"GrabLizardTechOutputLogInfo\ForSpatialTest.xlsx"
-sheet_to_examine = "QP - Exporting Extent"
-
-def process_raw_extent_value(val):
-    val_list = val.split(",")
-    val_list.pop(5)
-    val_list.pop(2)
-    return val_list
-
-
-exporting_extent_df = pd.read_excel(io=file_to_examine, sheet_name=sheet_to_examine, header=0)
-
-exporting_extent_df["Exporting Extent"] = exporting_extent_df["Exporting Extent"].apply(process_raw_extent_value)
-
-print(exporting_extent_df)
-
-# For real implementation, need EPSG so the coordinates can be interpreted
\ No newline at end of file
+import argparse
+
+from LizardTechExtentEngine import deduplicate_extents
+from LizardTechExtentEngine import extent_job_dates
+from LizardTechExtentEngine import write_extent_files
+from LizardTechJobDatabase import JobDatabase
+
+argument_parser = argparse.ArgumentParser(description="Write the export extents of a lidar job database as GeoJSON and "
+                                                      "a GeoPackage")
+argument_parser.add_argument("database_path", help="job facts database written by the lidar analysis with --database")
+argument_parser.add_argument("file_path_stem", help="output path without extension, .geojson and .gpkg are added")
+arguments = argument_parser.parse_args()
+
+job_database = JobDatabase(database_path=arguments.database_path)
+extent_table = deduplicate_extents(extent_table=job_database.extent_table())
+print(write_extent_files(extent_table=extent_table, file_path_stem=arguments.file_path_stem,
+                         job_dates=extent_job_dates(extent_table=extent_table,
+                                                    job_dates_df=job_database.job_dates_frame())))
@@ -1,12 +1,9 @@
-import shutil
-import os
-
+from LizardTechLogMirror import mirror_logs
 
+# Copies only new or changed html logs, each under its job folder name so same named logs no longer overwrite each other
 job_folder = r"D:\Program Files\LizardTech\Express Server\ImageServer\var\export_dir"
 destination = r"D:\Program Files\LizardTech\Express Server\ImageServer\var\tempcopies"
-for dirname, dirs, files in os.walk(job_folder):
-    for file in files:
-        if file.endswith(".html"):
-            src = os.path.join(dirname, file)
-            shutil.copy(src=src, dst=destination)
-            print(src)
+mirror_summary = mirror_logs(source_root=job_folder, destination_root=destination)
+for src, error in mirror_summary.failures:
+    print(f"\tALERT: {src} NOT COPIED. {error}")
+print(mirror_summary)
@@ -0,0 +1,219 @@
+"""
+Equivalence checks of the LizardTech analysis on a seeded LizardTechSyntheticJobs export_dir.
+Several of the analysis changes promise the same output as the code or mode they replaced: the single pass log parser
+and pd.read_html, a manifest rerun and a full run, streaming and the master dataframe, a parallel and a serial ingest,
+an archive run and a direct run, and the job database report and the analysis script. These tests build the synthetic
+job folders once per product and compare the outputs the promises are about.
+
+Run with pytest.
+
+Date Created: 20261017
+Revisions:
+"""
+
+import os
+import shutil
+import time
+
+import pandas as pd
+import pytest
+
+from LizardTechAnalysisStages import IMAGERY_EMAIL_KEYWORD
+from LizardTechAnalysisStages import IMAGERY_LEVELS
+from LizardTechAnalysisStages import LIDAR_JOINED_PARAMETERS
+from LizardTechAnalysisStages import analyze_imagery_jobs
+from LizardTechAnalysisStages import analyze_lidar_jobs
+from LizardTechAnalysisStages import write_output_tables
+from LizardTechDirectoryScanner import scan_job_folders
+from LizardTechInstrumentation import RunInstrument
+from LizardTechJobArchive import JobArchive
+from LizardTechJobDatabase import JobDatabase
+from LizardTechJobDatabase import write_job_database
+from LizardTechJobIngest import ingest_job_folders
+from LizardTechJobManifest import JobManifest
+from LizardTechLogParser import parse_job_log
+from LizardTechLogParser import read_html_job_log
+from LizardTechOutputWriters import create_output_writer
+from LizardTechQueryParameters import LIDAR_QUERY_PARAMETER_NAMES
+from LizardTechSyntheticJobs import IMAGERY
+from LizardTechSyntheticJobs import LIDAR
+from LizardTechSyntheticJobs import generate_export_dir
+
+JOB_COUNT = 60
+SEED = 7
+
+# Summary options of each product's streaming mode, as the analysis scripts pass them
+STREAMING_SUMMARY_OPTIONS = {LIDAR: {},
+                             IMAGERY: {"level_filter": IMAGERY_LEVELS, "email_keyword": IMAGERY_EMAIL_KEYWORD}}
+
+
+@pytest.fixture(scope="module")
+def lidar_jobs_folder(tmp_path_factory) -> str:
+    jobs_folder = str(tmp_path_factory.mktemp("export_dir_lidar"))
+    generate_export_dir(export_dir=jobs_folder, job_count=JOB_COUNT, product=LIDAR, seed=SEED)
+    return jobs_folder
+
+
+@pytest.fixture(scope="module")
+def imagery_jobs_folder(tmp_path_factory) -> str:
+    jobs_folder = str(tmp_path_factory.mktemp("export_dir_imagery"))
+    generate_export_dir(export_dir=jobs_folder, job_count=JOB_COUNT, product=IMAGERY, seed=SEED)
+    return jobs_folder
+
+
+def _job_folders_and_stats(jobs_folder: str) -> list:
+    return [(job_folder_record.job_folder, job_folder_record.file_stats)
+            for job_folder_record in sorted(scan_job_folders(jobs_folder=jobs_folder), key=lambda x: x.job_folder)]
+
+
+def _write_workbook(job_results: list, output_folder: str, product: str = LIDAR, streaming: bool = False) -> str:
+    """
+    Analyze job results and write the excel workbook
+    :param job_results: list of JobResult
+    :param output_folder: folder for the workbook and side files
+    :param product: LIDAR or IMAGERY, which analysis to run
+    :param streaming: analyze in streaming mode
+    :return: workbook path
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    file_path_stem = os.path.join(output_folder, f"LizardTechAnalysis_{product}_test")
+    analyze_jobs = analyze_lidar_jobs if product == LIDAR else analyze_imagery_jobs
+    job_analysis = analyze_jobs(job_results=job_results, file_path_stem=file_path_stem,
+                                instrument=RunInstrument(enabled=False), streaming=streaming)
+    return write_output_tables(tables=job_analysis.tables, output_format="excel",
+                               output_file_path=file_path_stem).output_location
+
+
+def _read_bytes(file_path: str) -> bytes:
+    with open(file_path, "rb") as handler:
+        return handler.read()
+
+
+def _cell_texts(dataframe: pd.DataFrame) -> dict:
+    # pd.read_html infers numbers where the parser keeps the cell text, so values are compared as text
+    return {column: [None if pd.isna(value) else str(value) for value in dataframe[column]]
+            for column in dataframe.columns}
+
+
+@pytest.mark.parametrize("product", [LIDAR, IMAGERY])
+def test_parser_matches_read_html(product, lidar_jobs_folder, imagery_jobs_folder):
+    jobs_folder = lidar_jobs_folder if product == LIDAR else imagery_jobs_folder
+    html_paths = sorted(os.path.join(root, file) for root, dirs, files in os.walk(jobs_folder)
+                        for file in files if file.endswith(".html"))
+    assert html_paths
+    for html_path in html_paths:
+        try:
+            read_html_df = read_html_job_log(file_path=html_path)
+        except ValueError:
+            # Failed jobs have no table, which the parser reports the same way
+            with pytest.raises(ValueError):
+                parse_job_log(file_path=html_path)
+            continue
+        # The parser drops the colspan=6 stack trace overflow column, as the analysis did after read_html
+        read_html_df = read_html_df.drop(columns=["Unnamed: 5"], errors="ignore")
+        assert _cell_texts(parse_job_log(file_path=html_path).to_dataframe()) == _cell_texts(read_html_df), html_path
+
+
+def test_parallel_workbook_bytes_match_serial(lidar_jobs_folder, tmp_path):
+    job_folders_and_stats = _job_folders_and_stats(jobs_folder=lidar_jobs_folder)
+    serial_path = _write_workbook(job_results=ingest_job_folders(job_folders_and_stats=job_folders_and_stats),
+                                  output_folder=str(tmp_path / "serial"))
+    # xlsxwriter stamps times to the second, so a timestamp in the workbook would differ between the two
+    time.sleep(1.1)
+    parallel_path = _write_workbook(job_results=ingest_job_folders(job_folders_and_stats=job_folders_and_stats,
+                                                                   worker_count=2, chunk_size=4),
+                                    output_folder=str(tmp_path / "parallel"))
+    assert _read_bytes(file_path=serial_path) == _read_bytes(file_path=parallel_path)
+
+
+def test_manifest_rerun_matches_full_run(lidar_jobs_folder, tmp_path):
+    # The first run sees all but the last ten job folders, the rerun picks those up and must parse nothing else
+    jobs_folder = str(tmp_path / "export_dir")
+    shutil.copytree(lidar_jobs_folder, jobs_folder)
+    held_back_folder = str(tmp_path / "held_back")
+    held_back_names = sorted(os.listdir(jobs_folder))[-10:]
+    os.makedirs(held_back_folder)
+    for name in held_back_names:
+        shutil.move(os.path.join(jobs_folder, name), os.path.join(held_back_folder, name))
+
+    manifest_path = str(tmp_path / "LizardTechJobManifest_lidar_full.pickle")
+    job_manifest = JobManifest(manifest_path=manifest_path)
+    job_manifest.refresh(jobs_folder=jobs_folder, ingest_function=ingest_job_folders)
+    job_manifest.save()
+
+    for name in held_back_names:
+        shutil.move(os.path.join(held_back_folder, name), os.path.join(jobs_folder, name))
+    ingested_folders = []
+
+    def recording_ingest_function(job_folders_and_stats):
+        ingested_folders.extend(job_folder for job_folder, file_stats in job_folders_and_stats)
+        return ingest_job_folders(job_folders_and_stats=job_folders_and_stats)
+
+    job_manifest = JobManifest(manifest_path=manifest_path)
+    job_manifest.load()
+    rerun_results = job_manifest.refresh(jobs_folder=jobs_folder, ingest_function=recording_ingest_function)
+    assert sorted(os.path.basename(job_folder) for job_folder in ingested_folders) == held_back_names
+    assert job_manifest.unchanged_count == len(_job_folders_and_stats(jobs_folder=jobs_folder)) - len(held_back_names)
+
+    rerun_path = _write_workbook(job_results=rerun_results, output_folder=str(tmp_path / "rerun"))
+    full_results = ingest_job_folders(job_folders_and_stats=_job_folders_and_stats(jobs_folder=jobs_folder))
+    full_path = _write_workbook(job_results=full_results, output_folder=str(tmp_path / "full"))
+    assert _read_bytes(file_path=rerun_path) == _read_bytes(file_path=full_path)
+
+
+@pytest.mark.parametrize("product", [LIDAR, IMAGERY])
+def test_streaming_sheets_match_full_mode(product, lidar_jobs_folder, imagery_jobs_folder, tmp_path):
+    job_folders_and_stats = _job_folders_and_stats(
+        jobs_folder=lidar_jobs_folder if product == LIDAR else imagery_jobs_folder)
+    full_path = _write_workbook(job_results=ingest_job_folders(job_folders_and_stats=job_folders_and_stats),
+                                output_folder=str(tmp_path / "full"), product=product)
+    streaming_results = ingest_job_folders(job_folders_and_stats=job_folders_and_stats,
+                                           summary_options=STREAMING_SUMMARY_OPTIONS[product])
+    streaming_path = _write_workbook(job_results=streaming_results, output_folder=str(tmp_path / "streaming"),
+                                     product=product, streaming=True)
+    full_sheets = pd.read_excel(full_path, sheet_name=None)
+    streaming_sheets = pd.read_excel(streaming_path, sheet_name=None)
+    assert list(streaming_sheets) == list(full_sheets)
+    for sheet_name, full_sheet_df in full_sheets.items():
+        pd.testing.assert_frame_equal(streaming_sheets[sheet_name], full_sheet_df, obj=sheet_name)
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_archive_run_matches_direct_run(streaming, lidar_jobs_folder, tmp_path):
+    summary_options = STREAMING_SUMMARY_OPTIONS[LIDAR] if streaming else None
+    job_folders_and_stats = _job_folders_and_stats(jobs_folder=lidar_jobs_folder)
+    direct_results = ingest_job_folders(job_folders_and_stats=job_folders_and_stats, summary_options=summary_options)
+    direct_path = _write_workbook(job_results=direct_results, output_folder=str(tmp_path / "direct"),
+                                  streaming=streaming)
+
+    job_archive = JobArchive(archive_folder=str(tmp_path / "archive"))
+    assert job_archive.archive_jobs_folder(jobs_folder=lidar_jobs_folder,
+                                           ingest_function=ingest_job_folders) == len(job_folders_and_stats)
+    archive_results = job_archive.load_job_results(summary_options=summary_options)
+    archive_path = _write_workbook(job_results=archive_results, output_folder=str(tmp_path / "archive_run"),
+                                   streaming=streaming)
+    assert _read_bytes(file_path=archive_path) == _read_bytes(file_path=direct_path)
+
+
+def test_database_report_sheets_match_analysis(lidar_jobs_folder, tmp_path):
+    job_results = ingest_job_folders(job_folders_and_stats=_job_folders_and_stats(jobs_folder=lidar_jobs_folder))
+    file_path_stem = str(tmp_path / "LizardTechAnalysis_lidar_test")
+    job_analysis = analyze_lidar_jobs(job_results=job_results, file_path_stem=file_path_stem,
+                                      instrument=RunInstrument(enabled=False))
+    analysis_path = write_output_tables(tables=job_analysis.tables, output_format="excel",
+                                        output_file_path=file_path_stem).output_location
+    database_path = str(tmp_path / "LizardTechJobFacts_lidar.sqlite")
+    write_job_database(database_path=database_path, analysis_name="lidar", job_index=job_analysis.job_index,
+                       level_summary_df=job_analysis.level_summary_df, emails_df=job_analysis.emails_df,
+                       log_rows_df=job_analysis.log_rows_df, issuing_url_series=job_analysis.issuing_url_series,
+                       query_parameters_df=job_analysis.query_parameters_df,
+                       parameter_names=LIDAR_QUERY_PARAMETER_NAMES, joined_parameters=LIDAR_JOINED_PARAMETERS)
+    with JobDatabase(database_path=database_path) as job_database:
+        with create_output_writer(output_format="excel",
+                                  output_file_path=str(tmp_path / "LizardTechReport_lidar_test")) as output_writer:
+            job_database.write_report(output_writer=output_writer)
+    analysis_sheets = pd.read_excel(analysis_path, sheet_name=None)
+    report_sheets = pd.read_excel(output_writer.output_location, sheet_name=None)
+    assert list(report_sheets) == list(analysis_sheets)
+    for sheet_name, analysis_sheet_df in analysis_sheets.items():
+        pd.testing.assert_frame_equal(report_sheets[sheet_name], analysis_sheet_df, obj=sheet_name)